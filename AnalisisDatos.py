@@ -1,80 +1,126 @@
-import socketserver
+import argparse
+import logging
 import threading
-import pandas as pd
-import datetime
-from flask import Flask
-from dash import Dash, dcc, html
-from dash.dependencies import Input, Output
+import time
+import numpy as np
+from flask import Flask, Response, jsonify
+from dash import Dash, dcc, html, no_update
+from dash.dependencies import Input, Output, State
 import plotly.graph_objs as go
 
-# Datos recibidos (almacenados en un DataFrame para facilitar el análisis)
-data_df = pd.DataFrame(columns=["timestamp", "temperatura_DHT22", "temperatura_DHT11", 
-                                "temperatura_LM35_1", "temperatura_LM35_2", 
-                                "humedad_suelo_1", "humedad_suelo_2", 
-                                "humedad_suelo_3", "humedad_DHT22", "humedad_DHT11",
-                                "promedio_temperatura"])
-
-# Clase para manejar las conexiones al servidor
-class SensorTCPHandler(socketserver.BaseRequestHandler):
-    def handle(self):
-        global data_df
-        while True:
-            try:
-                data = self.request.recv(1024).strip()
-                if not data:
-                    break
-
-                message = data.decode('utf-8').strip()
-                if not message:
-                    continue
-
-                print(f"Datos recibidos: {message}")
-
-                # Separar los datos por comas
-                try:
-                    parts = message.split(",")
-                    if len(parts) == 10:
-                        # Convertir las partes a float
-                        tempDHT22, tempDHT11, tempLM35_1, tempLM35_2, humedadSuelo1, humedadSuelo2, humedadSuelo3, humedadDHT22, humedadDHT11, promedioTemp = map(float, parts)
-                        new_data = {
-                            "timestamp": datetime.datetime.now(),
-                            "temperatura_DHT22": tempDHT22,
-                            "temperatura_DHT11": tempDHT11,
-                            "temperatura_LM35_1": tempLM35_1,
-                            "temperatura_LM35_2": tempLM35_2,
-                            "humedad_suelo_1": humedadSuelo1,
-                            "humedad_suelo_2": humedadSuelo2,
-                            "humedad_suelo_3": humedadSuelo3,
-                            "humedad_DHT22": humedadDHT22,
-                            "humedad_DHT11": humedadDHT11,
-                            "promedio_temperatura": promedioTemp
-                        }
-                        data_df = pd.concat([data_df, pd.DataFrame([new_data])], ignore_index=True)
-                        if len(data_df) > 100:
-                            data_df = data_df.iloc[-100:]
-                    else:
-                        print(f"Error: Número de partes incorrecto ({len(parts)}) en los datos recibidos: {message}")
-                except ValueError as e:
-                    print(f"Error al procesar los datos recibidos: {e}")
-
-            except ConnectionResetError:
-                print("Conexión restablecida por el cliente")
-                break
-
-# Configurar el servidor en un hilo separado
-def start_tcp_server():
-    server = socketserver.ThreadingTCPServer(("0.0.0.0", 12345), SensorTCPHandler)
-    print("Servidor TCP escuchando en el puerto 12345...")
-    server.serve_forever()
-
-# Iniciar el servidor TCP en un hilo
-tcp_thread = threading.Thread(target=start_tcp_server, daemon=True)
-tcp_thread.start()
+import metrics
+from anomaly import AnomalyDetector, format_event_time
+from async_server import start_async_server
+import history_api
+import ingest_pipeline
+from ingest import DEFAULT_HOST, DEFAULT_PORT, WINDOW_SIZE
+from irrigation import IrrigationEngine
+from node_store import NodeStore
+from rollup import RollupEngine, query_series, series_since
+from sensor_schema import TEMP_COLUMNS, HUMIDITY_COLUMNS
+from streaming_stats import StreamingStats
+import threaded_server
+from timeseries_store import TimeSeriesStore
+
+log = logging.getLogger(__name__)
+
+# Rangos de tiempo que se pueden visualizar (segundos)
+TIME_RANGES = {
+    "5 minutos": 300,
+    "1 hora": 3600,
+    "6 horas": 6 * 3600,
+    "1 día": 86400,
+    "7 días": 7 * 86400,
+    "30 días": 30 * 86400,
+}
+
+# Series de cada gráfico: (columna, nombre en la leyenda)
+TEMP_TRACES = [
+    ("temperatura_DHT22", "Temp DHT22 (°C)"),
+    ("temperatura_DHT11", "Temp DHT11 (°C)"),
+    ("temperatura_LM35_1", "Temp LM35_1 (°C)"),
+    ("temperatura_LM35_2", "Temp LM35_2 (°C)"),
+]
+HUMIDITY_TRACES = [
+    ("humedad_suelo_1", "Humedad Suelo 1 (%)"),
+    ("humedad_suelo_2", "Humedad Suelo 2 (%)"),
+    ("humedad_suelo_3", "Humedad Suelo 3 (%)"),
+    ("humedad_DHT22", "Humedad DHT22 (%)"),
+    ("humedad_DHT11", "Humedad DHT11 (%)"),
+]
+
+# Datos recibidos, particionados por nodo (un buffer circular por ESP32),
+# con agregados a varias resoluciones para los rangos largos
+data_store = NodeStore(capacity=WINDOW_SIZE, rollups=RollupEngine(), stats=StreamingStats(WINDOW_SIZE),
+                       anomalies=AnomalyDetector(), irrigation=IrrigationEngine())
+# Alertas que se muestran en el dashboard
+ALERTS_SHOWN = 10
+
+# El servidor TCP con hilos vive en threaded_server.py (la ingesta sola no carga Dash)
+def start_tcp_server(store=None, host=DEFAULT_HOST, port=DEFAULT_PORT, pipeline=None):
+    threaded_server.start_tcp_server(store if store is not None else data_store, host, port, pipeline)
+
+# Partes estáticas de los gráficos (layout, ejes, colores): se construyen una sola vez
+def build_static_figure(title, yaxis_title, traces):
+    layout = go.Layout(title=title, xaxis_title="Tiempo", yaxis_title=yaxis_title, template="plotly_dark")
+    return {
+        "data": [{"type": "scatter", "x": [], "y": [], "mode": "lines+markers", "name": name} for _, name in traces],
+        "layout": layout.to_plotly_json(),
+    }
+
+TEMPERATURE_FIGURE = build_static_figure("Temperaturas en Tiempo Real", "Temperatura (°C)", TEMP_TRACES)
+HUMIDITY_FIGURE = build_static_figure("Humedad en Tiempo Real", "Humedad (%)", HUMIDITY_TRACES)
+
+def figure_with_series(static_figure, traces, series):
+    """Figura completa: el layout estático más los puntos de ``series``."""
+    data = [dict(trace, x=series["timestamp"], y=series[column]["mean"])
+            for trace, (column, _) in zip(static_figure["data"], traces)]
+    return {"data": data, "layout": static_figure["layout"]}
+
+def extend_data(traces, series):
+    """Argumento de ``extendData`` con los puntos nuevos de todas las series del gráfico."""
+    return {
+        "x": [series["timestamp"]] * len(traces),
+        "y": [series[column]["mean"] for column, _ in traces],
+    }
+
+def format_indicator(value, unit):
+    return "N/A" if np.isnan(value) else f"{value:.2f} {unit}"
+
+def max_points(series, time_range_s):
+    # Puntos que conserva el navegador por serie: la ventana en memoria si son
+    # datos crudos, o los buckets que entran en el rango si es un rollup
+    if series["resolution_s"] is None:
+        return WINDOW_SIZE
+    return time_range_s // series["resolution_s"] + 1
 
 # Configurar la aplicación Dash
 server = Flask(__name__)
 app = Dash(__name__, server=server)
 
+# Métricas en formato Prometheus; la ocupación de los buffers se calcula al exportar
+metrics.REGISTRY.add_collector(metrics.store_collector(lambda: data_store))
+
+@server.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+# Comandos de riego pendientes del nodo; cada consulta los retira de la cola
+@server.route("/riego/<node_id>")
+def irrigation_endpoint(node_id):
+    engine = getattr(data_store, "irrigation", None)
+    if engine is None:
+        return jsonify({"error": "Sin motor de riego"}), 404
+    try:
+        commands = engine.pull(node_id)
+    except OSError:
+        # En production.py el motor corre en el proceso de ingesta (ingest_api.py)
+        return jsonify({"error": "Sin conexión con la ingesta"}), 502
+    return jsonify({"node": node_id, "commands": commands})
+
+# Consultas al historial en disco (rangos largos y agregados por bucket)
+server.register_blueprint(history_api.create_blueprint(lambda: getattr(data_store, "history", None)))
+
 # Layout del Dashboard
 app.layout = html.Div([
     html.H1("Dashboard de Sensores - Visualización Atractiva", style={"textAlign": "center"}),
@@ -95,11 +141,33 @@ app.layout = html.Div([
         ], className="indicator"),
     ], className="summary-indicators", style={"display": "flex", "justifyContent": "space-around"}),
 
+    # Selector del nodo (ESP32) y del rango de tiempo que se visualiza
+    html.Div([
+        html.Div([
+            html.H4("Nodo"),
+            dcc.Dropdown(id="node-selector", clearable=False, placeholder="Esperando datos de los sensores...")
+        ], style={"width": "300px"}),
+        html.Div([
+            html.H4("Rango"),
+            dcc.Dropdown(id="time-range", options=[{"label": label, "value": seconds} for label, seconds in TIME_RANGES.items()],
+                         value=TIME_RANGES["5 minutos"], clearable=False)
+        ], style={"width": "200px"}),
+    ], style={"display": "flex", "gap": "40px"}),
+
     # Gráfico de Temperaturas
-    dcc.Graph(id="live-temperature-graph"),
+    dcc.Graph(id="live-temperature-graph", figure=TEMPERATURE_FIGURE),
 
     # Gráfico de Humedad
-    dcc.Graph(id="live-humidity-graph"),
+    dcc.Graph(id="live-humidity-graph", figure=HUMIDITY_FIGURE),
+
+    # Alertas de anomalías y de sensores que no concuerdan
+    html.Div([
+        html.H4("Alertas"),
+        html.Div(id="anomaly-alerts")
+    ]),
+
+    # Lo que ya tiene este navegador: nodo, resolución y último timestamp enviado
+    dcc.Store(id="graph-state"),
 
     # Intervalo para actualizar gráficos automáticamente
     dcc.Interval(
@@ -109,47 +177,147 @@ app.layout = html.Div([
     )
 ], style={"margin": "20px"})
 
-# Actualización de los gráficos y los indicadores
+# Actualización de la lista de nodos conocidos
+@app.callback(
+    [Output("node-selector", "options"), Output("node-selector", "value")],
+    [Input("interval-component", "n_intervals")],
+    [State("node-selector", "value")]
+)
+def update_node_options(n, selected_node):
+    nodes = data_store.nodes()
+    if selected_node not in nodes:
+        selected_node = nodes[0] if nodes else None
+    return [{"label": node, "value": node} for node in nodes], selected_node
+
+# Carga completa de los gráficos al cambiar de nodo o de rango
 @app.callback(
     [
         Output("live-temperature-graph", "figure"),
         Output("live-humidity-graph", "figure"),
+        Output("graph-state", "data")
+    ],
+    [Input("node-selector", "value"), Input("time-range", "value")]
+)
+def reset_graphs(node_id, time_range_s):
+    if node_id not in data_store:
+        return TEMPERATURE_FIGURE, HUMIDITY_FIGURE, None
+
+    # Serie reducida del rango visible: datos crudos o el rollup adecuado
+    now_ns = time.time_ns()
+    series = query_series(data_store, data_store.rollups, node_id, now_ns - time_range_s * 10**9, now_ns,
+                          complete_only=True)
+    state = {
+        "node": node_id,
+        "resolution_s": series["resolution_s"],
+        "last_ns": series["last_ns"],
+        "max_points": max_points(series, time_range_s),
+    }
+    return (figure_with_series(TEMPERATURE_FIGURE, TEMP_TRACES, series),
+            figure_with_series(HUMIDITY_FIGURE, HUMIDITY_TRACES, series), state)
+
+# Actualización incremental de los gráficos y de los indicadores: solo se
+# envían los puntos posteriores al último que recibió este navegador
+@app.callback(
+    [
+        Output("live-temperature-graph", "extendData"),
+        Output("live-humidity-graph", "extendData"),
+        Output("graph-state", "data", allow_duplicate=True),
         Output("max-temp", "children"),
         Output("avg-humidity", "children"),
         Output("data-count", "children")
     ],
-    [Input("interval-component", "n_intervals")]
+    [Input("interval-component", "n_intervals")],
+    [State("graph-state", "data")],
+    prevent_initial_call=True
 )
-def update_graphs(n):
-    global data_df
+@metrics.UPDATE_GRAPHS.time()
+def update_graphs(n, state):
+    if state is None or state["node"] not in data_store:
+        return no_update, no_update, no_update, "N/A", "N/A", "0"
+    node_id = state["node"]
 
-    if data_df.empty:
-        return go.Figure(), go.Figure(), "N/A", "N/A", "0"
+    # Indicadores Resumen, mantenidos al día en la ingesta, con las columnas que
+    # manda el nodo según su esquema
+    declared = data_store.columns_of(node_id)
+    temp_stats = data_store.stats.snapshot(node_id, [c for c in TEMP_COLUMNS if c in declared])
+    humidity_stats = data_store.stats.snapshot(node_id, [c for c in HUMIDITY_COLUMNS if c in declared])
+    # Como pandas con skipna: los sensores sin lecturas en la ventana no cuentan
+    max_temp = np.fmax.reduce(temp_stats["max"], initial=np.nan)
+    humidity = humidity_stats["mean"][~np.isnan(humidity_stats["mean"])]
+    avg_humidity = humidity.mean() if len(humidity) else np.nan
+    data_count = temp_stats["count"]
+    indicators = (format_indicator(max_temp, "°C"), format_indicator(avg_humidity, "%"), str(data_count))
 
-    # Gráfico de Temperaturas
-    temperature_fig = go.Figure()
-    temperature_fig.add_trace(go.Scatter(x=data_df["timestamp"], y=data_df["temperatura_DHT22"], mode='lines+markers', name="Temp DHT22 (°C)"))
-    temperature_fig.add_trace(go.Scatter(x=data_df["timestamp"], y=data_df["temperatura_DHT11"], mode='lines+markers', name="Temp DHT11 (°C)"))
-    temperature_fig.add_trace(go.Scatter(x=data_df["timestamp"], y=data_df["temperatura_LM35_1"], mode='lines+markers', name="Temp LM35_1 (°C)"))
-    temperature_fig.add_trace(go.Scatter(x=data_df["timestamp"], y=data_df["temperatura_LM35_2"], mode='lines+markers', name="Temp LM35_2 (°C)"))
-    temperature_fig.update_layout(title="Temperaturas en Tiempo Real", xaxis_title="Tiempo", yaxis_title="Temperatura (°C)", template="plotly_dark")
-
-    # Gráfico de Humedades
-    humidity_fig = go.Figure()
-    humidity_fig.add_trace(go.Scatter(x=data_df["timestamp"], y=data_df["humedad_suelo_1"], mode='lines+markers', name="Humedad Suelo 1 (%)"))
-    humidity_fig.add_trace(go.Scatter(x=data_df["timestamp"], y=data_df["humedad_suelo_2"], mode='lines+markers', name="Humedad Suelo 2 (%)"))
-    humidity_fig.add_trace(go.Scatter(x=data_df["timestamp"], y=data_df["humedad_suelo_3"], mode='lines+markers', name="Humedad Suelo 3 (%)"))
-    humidity_fig.add_trace(go.Scatter(x=data_df["timestamp"], y=data_df["humedad_DHT22"], mode='lines+markers', name="Humedad DHT22 (%)"))
-    humidity_fig.add_trace(go.Scatter(x=data_df["timestamp"], y=data_df["humedad_DHT11"], mode='lines+markers', name="Humedad DHT11 (%)"))
-    humidity_fig.update_layout(title="Humedad en Tiempo Real", xaxis_title="Tiempo", yaxis_title="Humedad (%)", template="plotly_dark")
+    series = series_since(data_store, data_store.rollups, node_id, state["resolution_s"], state["last_ns"], time.time_ns())
+    if series["last_ns"] is None:
+        return (no_update, no_update, no_update) + indicators
 
-    # Indicadores Resumen
-    max_temp = data_df[["temperatura_DHT22", "temperatura_DHT11", "temperatura_LM35_1", "temperatura_LM35_2"]].max().max()
-    avg_humidity = data_df[["humedad_suelo_1", "humedad_suelo_2", "humedad_suelo_3", "humedad_DHT22", "humedad_DHT11"]].mean().mean()
-    data_count = len(data_df)
+    if series["resolution_s"] is None:
+        # Datos crudos: el último punto lleva la hora de llegada
+        metrics.VISIBLE_LATENCY.observe((time.time_ns() - series["last_ns"]) / 1e9)
+    state = dict(state, last_ns=series["last_ns"])
+    temperature_extend = (extend_data(TEMP_TRACES, series), list(range(len(TEMP_TRACES))), state["max_points"])
+    humidity_extend = (extend_data(HUMIDITY_TRACES, series), list(range(len(HUMIDITY_TRACES))), state["max_points"])
+    return (temperature_extend, humidity_extend, state) + indicators
 
-    return temperature_fig, humidity_fig, f"{max_temp:.2f} °C", f"{avg_humidity:.2f} %", str(data_count)
+# Alertas del nodo seleccionado, más recientes primero
+@app.callback(
+    Output("anomaly-alerts", "children"),
+    [Input("interval-component", "n_intervals"), Input("node-selector", "value")]
+)
+def update_alerts(n, node_id):
+    detector = getattr(data_store, "anomalies", None)
+    if detector is None or node_id is None:
+        return html.P("Sin detector de anomalías" if detector is None else "Sin datos")
+    engine = getattr(data_store, "irrigation", None)
+    try:
+        active = detector.active(node_id)
+        events = detector.events(ALERTS_SHOWN, node_id)
+        irrigation = engine.state(node_id) if engine is not None else None
+    except OSError:
+        return html.P("Sin conexión con la ingesta")
+    children = [html.P("Activas: " + (", ".join(active) if active else "ninguna"))]
+    if irrigation is not None:
+        status = "regando (" + ", ".join(irrigation["rules"]) + ")" if irrigation["irrigating"] else "en espera"
+        children.append(html.P(f"Riego: {status}; secado {max(-min(irrigation['trend_per_hour']), 0.0):.2f} %/h"))
+    if events:
+        header = html.Tr([html.Th(name) for name in ("Hora", "Tipo", "Sensor", "Valor", "Detalle")])
+        rows = [html.Tr([html.Td(format_event_time(event["time_ns"])), html.Td(event["kind"]),
+                         html.Td(event["column"]), html.Td(f"{event['value']:.2f}"), html.Td(event["detail"])])
+                for event in events]
+        children.append(html.Table([header] + rows))
+    return children
 
 # Ejecutar el servidor de Dash
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor de sensores y dashboard en tiempo real")
+    parser.add_argument("--server", choices=["threaded", "async"], default="threaded",
+                        help="threaded: un hilo por conexión; async: asyncio en un solo hilo")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Puerto TCP de los ESP32")
+    parser.add_argument("--data-dir", default="datos", help="Directorio del historial en disco")
+    parser.add_argument("--no-history", action="store_true", help="No guardar el historial en disco")
+    parser.add_argument("--retention-days", type=float, default=None, help="Días de historial que se conservan")
+    ingest_pipeline.add_arguments(parser)
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    parser.add_argument("--log-sample", type=int, default=100,
+                        help="Con DEBUG, se registra uno de cada N bloques recibidos")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    metrics.RECEIVED_LOG_SAMPLER.every = args.log_sample
+
+    if not args.no_history:
+        retention_s = args.retention_days * 86400 if args.retention_days else None
+        data_store.history = TimeSeriesStore(args.data_dir, retention_s=retention_s)
+        if retention_s is not None:
+            data_store.history.start_retention()
+        data_store.rollups.load_history(data_store.history, time.time_ns())
+
+    # Iniciar el servidor TCP en un hilo
+    tcp_target = start_tcp_server if args.server == "threaded" else start_async_server
+    pipeline = ingest_pipeline.from_arguments(data_store, args)
+    tcp_thread = threading.Thread(target=tcp_target, kwargs={"store": data_store, "port": args.port,
+                                                             "pipeline": pipeline}, daemon=True)
+    tcp_thread.start()
+
     app.run_server(debug=True, use_reloader=False)
@@ -1,35 +1,212 @@
-import serial
+import logging
+import os
+import threading
 import time
-import matplotlib.pyplot as plt
+
 import numpy as np
+import serial
 
+# Puerto del Arduino: se puede cambiar sin tocar el código con la variable de entorno
+DEFAULT_PORT = os.environ.get("ANGULO_PUERTO", "COM8")
+DEFAULT_BAUDRATE = 9600
 
-def buscar_distancia( prueba:bool):
-    distances = []
-    if not prueba:
-        arduino = serial.Serial('COM8', 9600)
-        time.sleep(2)  # Espera para que el puerto se estabilice    
-        # Configuración de la visualización en tiempo real
-    
-    try:
-        while True:
-            if not prueba:
-                # Lee la distancia enviada desde el Arduino
-                if arduino.in_waiting > 0:
-                    distance = float(arduino.readline().decode().strip())
-                    print(f"Distancia medida por el sensor: {distance} cm")
+# Lecturas que se promedian: 120 equivalen a un segundo del sensor
+WINDOW_SIZE = 120
+# Espera máxima a que se llene la ventana (s)
+WAIT_TIMEOUT_S = 5.0
+
+log = logging.getLogger(__name__)
+
+
+class DistanceReader:
+    """Lector persistente del sensor de distancia en un hilo de fondo.
+
+    El puerto se abre una sola vez; el hilo hace lecturas bloqueantes con
+    ``timeout`` (sin consumir CPU mientras espera) y guarda las últimas
+    ``window`` lecturas en un buffer circular. ``mean``, ``median`` y
+    ``robust_mean`` se pueden consultar en cualquier momento.
+
+    Con ``prueba=True`` no se abre el puerto: se simulan lecturas a
+    ``rate_hz`` por segundo. Si el puerto falla el hilo termina
+    (``is_alive`` pasa a ``False``) y ``wait_full`` deja de esperar.
+    """
+
+    def __init__(self, port=DEFAULT_PORT, baudrate=DEFAULT_BAUDRATE, window=WINDOW_SIZE,
+                 timeout=1.0, prueba=False, rate_hz=120.0):
+        self.port = port
+        self.baudrate = baudrate
+        self.window = window
+        self.timeout = timeout
+        self.prueba = prueba
+        self.rate_hz = rate_hz
+        self._values = np.zeros(window, dtype=np.float64)
+        self._next = 0
+        self._size = 0
+        self._sum = 0.0
+        self.total = 0
+        self.invalid = 0
+        self._lock = threading.Lock()
+        self._filled = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._failed = False
+        self._thread = None
+        self._serial = None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        if not self.prueba:
+            self._serial = serial.Serial(self.port, self.baudrate, timeout=self.timeout)
+            time.sleep(2)  # Espera para que el puerto se estabilice (solo al abrirlo)
+        self._stop.clear()
+        target = self._simulate if self.prueba else self._read_serial
+        self._thread = threading.Thread(target=target, name=f"distancia-{self.port}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._serial is not None:
+            self._serial.close()
+            self._serial = None
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _read_serial(self):
+        while not self._stop.is_set():
+            try:
+                line = self._serial.readline()  # Bloquea hasta una línea o hasta el timeout
+            except serial.SerialException as e:
+                log.error("Error leyendo %s: %s", self.port, e)
+                # Quien espera la ventana no tiene que esperar lecturas que no van a llegar
+                with self._lock:
+                    self._failed = True
+                    self._filled.notify_all()
+                break
+            if not line:
+                continue
+            try:
+                distance = float(line.decode(errors="replace").strip())
+            except ValueError:
+                self.invalid += 1
+                continue
+            self.add(distance)
+
+    def _simulate(self):
+        period = 1.0 / self.rate_hz
+        deadline = time.monotonic()
+        while not self._stop.is_set():
+            self.add(np.random.uniform(10, 20))  # Simula la distancia para pruebas sin Arduino
+            deadline += period
+            self._stop.wait(max(deadline - time.monotonic(), 0.0))
+
+    def add(self, distance):
+        """Agrega una lectura; el promedio se actualiza en O(1)."""
+        with self._lock:
+            i = self._next
+            if self._size == self.window:
+                self._sum -= self._values[i]
             else:
-                distance = np.random.uniform(10, 20)  # Simula la distancia para pruebas sin Arduino
-            # Agrega el ángulo y la distancia a las listas
-            distances.append(distance)
-            # Limita el historial para que solo muestre los últimos 120 leidas que equivale a un segundo y calcula su promedio
-            if len(distances) > 120:
-                prom_distances = sum(distances)/len(distances)
-                return prom_distances
+                self._size += 1
+            self._values[i] = distance
+            self._sum += distance
+            self._next = (i + 1) % self.window
+            self.total += 1
+            # Al completar cada vuelta se recalcula la suma para no acumular redondeo
+            if self._next == 0:
+                self._sum = float(self._values[:self._size].sum())
+            if self._size == self.window:
+                self._filled.notify_all()
+
+    def wait_full(self, timeout=WAIT_TIMEOUT_S):
+        """Espera a que la ventana esté completa; ``False`` si vence ``timeout`` o falla el puerto."""
+        with self._filled:
+            self._filled.wait_for(lambda: self._size == self.window or self._failed, timeout)
+            return self._size == self.window
+
+    def __len__(self):
+        return self._size
+
+    def readings(self):
+        """Copia de las lecturas de la ventana (en el orden del buffer)."""
+        with self._lock:
+            return self._values[:self._size].copy()
+
+    def mean(self):
+        with self._lock:
+            return self._sum / self._size if self._size else float("nan")
+
+    def median(self):
+        readings = self.readings()
+        return float(np.median(readings)) if len(readings) else float("nan")
 
+    def robust_mean(self, threshold=3.5):
+        """Promedio sin valores atípicos: descarta lecturas a más de ``threshold`` MAD de la mediana."""
+        readings = self.readings()
+        if not len(readings):
+            return float("nan")
+        median = np.median(readings)
+        # 1.4826·MAD estima la desviación estándar si las lecturas son normales
+        mad = 1.4826 * np.median(np.abs(readings - median))
+        if mad == 0:
+            return float(median)
+        inliers = readings[np.abs(readings - median) <= threshold * mad]
+        return float(inliers.mean())
 
+
+# Un lector por puerto, compartido entre llamadas: el puerto no se vuelve a abrir
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def get_reader(prueba=False, port=DEFAULT_PORT, **kwargs):
+    """Lector del puerto, abierto la primera vez; uno cuyo hilo terminó (puerto caído) se reemplaza."""
+    key = "prueba" if prueba else port
+    with _readers_lock:
+        reader = _readers.get(key)
+        if reader is not None and not reader.is_alive():
+            log.warning("El lector de %s terminó; se vuelve a abrir el puerto", port)
+            reader.stop()
+            reader = None
+        if reader is None:
+            reader = DistanceReader(port, prueba=prueba, **kwargs).start()
+            _readers[key] = reader
+    return reader
+
+
+def buscar_distancia(prueba: bool, port=DEFAULT_PORT, estimador="mean", timeout=WAIT_TIMEOUT_S):
+    """Distancia estimada con la ventana de las últimas lecturas del sensor.
+
+    La primera llamada abre el puerto y espera a que se llene la ventana; las
+    siguientes responden de inmediato. ``estimador`` puede ser ``"mean"``,
+    ``"median"`` o ``"robust"``. Devuelve ``None`` si la ventana no se llena
+    en ``timeout`` segundos (sensor sin datos o puerto caído).
+    """
+    reader = get_reader(prueba, port)
+    try:
+        full = reader.wait_full(timeout)
     except KeyboardInterrupt:
-        print("Conexión terminada")
-    finally:
-        if not prueba:
-            arduino.close()
+        log.info("Conexión terminada")
+        with _readers_lock:
+            _readers.pop("prueba" if prueba else port, None)
+        reader.stop()
+        return None
+    if not full:
+        log.warning("Sin una ventana completa de %s en %g s (%d de %d lecturas)",
+                    "prueba" if prueba else port, timeout, len(reader), reader.window)
+        return None
+    if estimador == "median":
+        return reader.median()
+    if estimador == "robust":
+        return reader.robust_mean()
+    return reader.mean()
@@ -1,17 +1,25 @@
-import pandas as pd
-import numpy as np
+import time
 import plotly.graph_objs as go
-from dash import Dash, dcc, html
-from dash.dependencies import Input, Output
+from dash import Dash, dcc, html, no_update
+from dash.dependencies import Input, Output, State
 import dash_bootstrap_components as dbc
 
-# Initialize DataFrame with simulated values
-data_df = pd.DataFrame(columns=[
-    "timestamp", "temperatura_DHT22", "temperatura_DHT11", 
-    "temperatura_LM35_1", "temperatura_LM35_2", 
-    "humedad_suelo_1", "humedad_suelo_2", "humedad_suelo_3", 
-    "humedad_DHT22", "humedad_DHT11", "promedio_temperatura"
-])
+from node_store import NodeStore
+from rollup import RollupEngine, query_series, series_since
+from sensor_simulator import SensorSimulator
+from streaming_stats import StreamingStats
+
+# Store for the simulated readings (last 100 samples + multi-resolution rollups)
+SIM_NODE = "simulado"
+data_store = NodeStore(capacity=100, rollups=RollupEngine(), stats=StreamingStats(capacity=100))
+
+# Realistic single-node model (daily cycle, soil decay and irrigation, sensor noise)
+SIM_TIME_SCALE = 60
+SIM_START = time.time()
+simulator = SensorSimulator(1, seed=None, dropout=0.0, sensor_failure=0.0)
+
+# Time range shown in the graphs (seconds)
+VISIBLE_RANGE_S = 300
 
 # Constants for sensor ranges
 TEMP_MIN, TEMP_MAX = 15, 35
@@ -37,31 +45,12 @@ def create_color_legend():
         className="mt-4"
     )
 def generate_simulated_data():
-    global data_df
-    now = pd.Timestamp.now()
-    base_temp = 25
-    base_hum = 55
-    simulated_data = {
-        "timestamp": now,
-        "temperatura_DHT22": np.random.uniform(base_temp - 1.5, base_temp + 1.5),
-        "temperatura_DHT11": np.random.uniform(base_temp - 1.0, base_temp + 1.0),
-        "temperatura_LM35_1": np.random.uniform(base_temp - 1.0, base_temp + 2.0),
-        "temperatura_LM35_2": np.random.uniform(base_temp - 1.0, base_temp + 2.0),
-        "humedad_suelo_1": np.random.uniform(base_hum - 5, base_hum + 5),
-        "humedad_suelo_2": np.random.uniform(base_hum - 5, base_hum + 5),
-        "humedad_suelo_3": np.random.uniform(base_hum - 5, base_hum + 5),
-        "humedad_DHT22": np.random.uniform(base_hum - 3, base_hum + 3),
-        "humedad_DHT11": np.random.uniform(base_hum - 3, base_hum + 3),
-    }
-    simulated_data["promedio_temperatura"] = np.mean([
-        simulated_data["temperatura_DHT22"],
-        simulated_data["temperatura_DHT11"],
-        simulated_data["temperatura_LM35_1"],
-        simulated_data["temperatura_LM35_2"]
-    ])
-    data_df = pd.concat([data_df, pd.DataFrame([simulated_data])], ignore_index=True)
-    if len(data_df) > 100:
-        data_df = data_df.iloc[-100:]
+    # One reading from the simulated node; time runs SIM_TIME_SCALE times faster
+    # so the daily temperature cycle and soil drying are visible in a demo
+    elapsed = (time.time() - SIM_START) * SIM_TIME_SCALE
+    nodes, values = simulator.step(elapsed)
+    if len(nodes):
+        data_store.append(SIM_NODE, time.time_ns(), values[0])
 
 # Configure Dash application with dark theme
 app = Dash(__name__, external_stylesheets=[dbc.themes.DARKLY])
@@ -76,6 +65,42 @@ COLORS = {
     'success': '#2ECC40'
 }
 
+common_layout = dict(
+    paper_bgcolor='rgba(0,0,0,0)',
+    plot_bgcolor='rgba(0,0,0,0)',
+    font=dict(color=COLORS['text']),
+    margin=dict(l=60, r=30, t=50, b=50)
+)
+
+temp_vars = ["temperatura_DHT22", "temperatura_DHT11", "temperatura_LM35_1", "temperatura_LM35_2"]
+temp_colors = ['#93E59C', '#ECF08A', '#45B7D1', '#FFA07A']
+hum_vars = ["humedad_suelo_1", "humedad_suelo_2", "humedad_suelo_3", "humedad_DHT22", "humedad_DHT11"]
+hum_colors = ['#6C0694', '#ED9B19', '#5B11BB', '#93E59C', '#ECF08A']
+
+# Static figure parts (band, axes, colors) are built once; the callback only streams new points
+def build_static_figure(title, y_title, y_range, band, band_color, variables, colors):
+    fig = go.Figure()
+    fig.add_hrect(y0=band[0], y1=band[1], fillcolor=band_color, line_width=0, layer="below")
+    for var, color in zip(variables, colors):
+        fig.add_trace(go.Scatter(
+            x=[], y=[],
+            name=var.replace('_', ' ').title(),
+            line=dict(color=color, width=2), mode='lines+markers'
+        ))
+    fig.update_layout(
+        title=title,
+        yaxis=dict(range=y_range, title=y_title),
+        xaxis=dict(title="Tiempo"),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        **common_layout
+    )
+    return fig.to_plotly_json()
+
+TEMP_FIGURE = build_static_figure("Monitoreo de Temperatura", "Temperatura (°C)", [TEMP_MIN-5, TEMP_MAX+5],
+                                  (TEMP_MIN, TEMP_MAX), "rgba(0, 255, 0, 0.1)", temp_vars, temp_colors)
+HUM_FIGURE = build_static_figure("Monitoreo de Humedad", "Humedad (%)", [HUMIDITY_MIN-10, HUMIDITY_MAX+10],
+                                 (HUMIDITY_MIN, HUMIDITY_MAX), "rgba(0, 0, 255, 0.1)", hum_vars, hum_colors)
+
 # Dashboard Layout
 app.layout = dbc.Container([
     dbc.Row([
@@ -124,13 +149,13 @@ app.layout = dbc.Container([
 
     dbc.Row([
         dbc.Col([
-            dcc.Graph(id="live-temperature-graph")
+            dcc.Graph(id="live-temperature-graph", figure=TEMP_FIGURE)
         ], width=12, className="mb-4"),
     ]),
 
     dbc.Row([
         dbc.Col([
-            dcc.Graph(id="live-humidity-graph")
+            dcc.Graph(id="live-humidity-graph", figure=HUM_FIGURE)
         ], width=12, className="mb-4"),
     ]),
 
@@ -141,98 +166,78 @@ app.layout = dbc.Container([
         ], width=12)
     ]),
 
+    # Series resolution and last timestamp already sent to this browser
+    dcc.Store(id="graph-state"),
+
     dcc.Interval(id="interval-component", interval=2000, n_intervals=0)
 ], fluid=True, style={"backgroundColor": COLORS['background'], "color": COLORS['text']})
 
 
 
+def stats_table(stats, variables):
+    # One row per statistic (mean/min/max), one column per sensor variable
+    header = html.Thead(html.Tr([html.Th("")] + [html.Th(var) for var in variables]))
+    body = html.Tbody([
+        html.Tr([html.Th(stat)] + [html.Td(f"{value:.2f}") for value in stats[stat]])
+        for stat in ("mean", "min", "max")
+    ])
+    return dbc.Table([header, body], striped=True, bordered=True, hover=True, color="dark")
+
 @app.callback(
-    [Output("live-temperature-graph", "figure"),
-     Output("live-humidity-graph", "figure"),
+    [Output("live-temperature-graph", "extendData"),
+     Output("live-humidity-graph", "extendData"),
+     Output("graph-state", "data"),
      Output("avg-temp", "children"),
      Output("avg-humidity", "children"),
      Output("data-count", "children"),
      Output("detailed-stats", "children")],
-    [Input("interval-component", "n_intervals")]
+    [Input("interval-component", "n_intervals")],
+    [State("graph-state", "data")]
 )
-def update_graphs(n):
-    global data_df
+def update_graphs(n, state):
     generate_simulated_data()
 
-    common_layout = dict(
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font=dict(color=COLORS['text']),
-        margin=dict(l=60, r=30, t=50, b=50)
-    )
+    now_ns = time.time_ns()
+    if state is None:
+        # First tick for this browser: downsampled series for the visible range
+        series = query_series(data_store, data_store.rollups, SIM_NODE, now_ns - VISIBLE_RANGE_S * 10**9, now_ns,
+                              complete_only=True)
+        max_points = 100 if series["resolution_s"] is None else VISIBLE_RANGE_S // series["resolution_s"] + 1
+        state = {"resolution_s": series["resolution_s"], "last_ns": series["last_ns"], "max_points": max_points}
+    else:
+        # Only the points newer than the last one this browser received
+        series = series_since(data_store, data_store.rollups, SIM_NODE, state["resolution_s"], state["last_ns"], now_ns)
+
+    if series["last_ns"] is None:
+        temp_extend = hum_extend = no_update
+    else:
+        state = dict(state, last_ns=series["last_ns"])
+        temp_extend = ({"x": [series["timestamp"]] * len(temp_vars), "y": [series[var]["mean"] for var in temp_vars]},
+                       list(range(len(temp_vars))), state["max_points"])
+        hum_extend = ({"x": [series["timestamp"]] * len(hum_vars), "y": [series[var]["mean"] for var in hum_vars]},
+                      list(range(len(hum_vars))), state["max_points"])
+
+    # Indicators and detailed statistics come from the incremental window stats
+    temp_stats = data_store.stats.snapshot(SIM_NODE, temp_vars)
+    hum_stats = data_store.stats.snapshot(SIM_NODE, hum_vars)
+    avg_temp = temp_stats["mean"].mean()
+    avg_humidity = hum_stats["mean"].mean()
+    data_count = temp_stats["count"]
 
-    # Temperature Graph
-    temp_fig = go.Figure()
-    temp_fig.add_hrect(y0=TEMP_MIN, y1=TEMP_MAX, fillcolor="rgba(0, 255, 0, 0.1)", line_width=0, layer="below")
-    
-    temp_vars = ["temperatura_DHT22", "temperatura_DHT11", "temperatura_LM35_1", "temperatura_LM35_2"]
-    colors = [ '#93E59C', '#ECF08A', '#45B7D1', '#FFA07A']
-    
-    for temp_var, color in zip(temp_vars, colors):
-        temp_fig.add_trace(go.Scatter(
-            x=data_df["timestamp"], y=data_df[temp_var],
-            name=temp_var.replace('_', ' ').title(),
-            line=dict(color=color, width=2), mode='lines+markers'
-        ))
-
-    temp_fig.update_layout(
-        title="Monitoreo de Temperatura",
-        yaxis=dict(range=[TEMP_MIN-5, TEMP_MAX+5], title="Temperatura (°C)"),
-        xaxis=dict(title="Tiempo"),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-        **common_layout
-    )
-
-    # Humidity Graph
-    hum_fig = go.Figure()
-    hum_fig.add_hrect(y0=HUMIDITY_MIN, y1=HUMIDITY_MAX, fillcolor="rgba(0, 0, 255, 0.1)", line_width=0, layer="below")
-    
-    hum_vars = ["humedad_suelo_1", "humedad_suelo_2", "humedad_suelo_3", "humedad_DHT22", "humedad_DHT11"]
-    colors = ['#6C0694', '#ED9B19', '#5B11BB', '#93E59C', '#ECF08A']
-    
-    for hum_var, color in zip(hum_vars, colors):
-        hum_fig.add_trace(go.Scatter(
-            x=data_df["timestamp"], y=data_df[hum_var],
-            name=hum_var.replace('_', ' ').title(),
-            line=dict(color=color, width=2), mode='lines+markers'
-        ))
-
-    hum_fig.update_layout(
-        title="Monitoreo de Humedad",
-        yaxis=dict(range=[HUMIDITY_MIN-10, HUMIDITY_MAX+10], title="Humedad (%)"),
-        xaxis=dict(title="Tiempo"),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-        **common_layout
-    )
-
-    # Calculate indicators
-    avg_temp = data_df[temp_vars].mean().mean()
-    avg_humidity = data_df[hum_vars].mean().mean()
-    data_count = len(data_df)
-
-    # Detailed statistics
-    temp_stats = data_df[temp_vars].agg(['mean', 'min', 'max']).round(2)
-    hum_stats = data_df[hum_vars].agg(['mean', 'min', 'max']).round(2)
-    
     detailed_stats = html.Div([
         dbc.Row([
             dbc.Col([
                 html.H5("Estadísticas de Temperatura"),
-                dbc.Table.from_dataframe(temp_stats, striped=True, bordered=True, hover=True, dark=True)
+                stats_table(temp_stats, temp_vars)
             ], width=6),
             dbc.Col([
                 html.H5("Estadísticas de Humedad"),
-                dbc.Table.from_dataframe(hum_stats, striped=True, bordered=True, hover=True, dark=True)
+                stats_table(hum_stats, hum_vars)
             ], width=6),
         ])
     ])
 
-    return temp_fig, hum_fig, f"{avg_temp:.1f}°C", f"{avg_humidity:.1f}%", str(data_count), detailed_stats
+    return temp_extend, hum_extend, state, f"{avg_temp:.1f}°C", f"{avg_humidity:.1f}%", str(data_count), detailed_stats
 
 if __name__ == "__main__":
     app.run_server(debug=True, use_reloader=False)
@@ -16,7 +16,27 @@
 #define DHTTYPE_22 DHT22
 #define DHTTYPE_11 DHT11
 
+// 1: tramas binarias (wire_protocol.py); 0: línea CSV en el orden de SENSOR_COLUMNS
+#define PROTOCOLO_BINARIO 1
+
+// Trama binaria little-endian: encabezado de 34 bytes y los campos en el orden
+// del esquema 2 de sensor_schema.WIRE_SCHEMAS (el orden de este sketch)
+#define TRAMA_VERSION 1
+#define TRAMA_ESQUEMA 2
+struct __attribute__((packed)) Trama {
+  uint8_t magic[2];     // A5 5A
+  uint16_t largo;       // bytes de toda la trama
+  uint8_t version;
+  uint8_t esquema;
+  char nodo[16];        // identificador del nodo, relleno con ceros
+  uint32_t secuencia;
+  uint64_t horaMs;      // millis() del ESP32
+  float campos[10];
+};
+
 WiFiClient client;
+uint32_t secuencia = 0;
+char idNodo[17];
 
 // Crear instancias de los sensores DHT
 DHT dht22(DHT22_PIN, DHTTYPE_22);
@@ -45,6 +65,9 @@ void setup() {
   dht22.begin();
   dht11.begin();
   Serial.println("Sensores inicializados");
+
+  // Identificador del nodo a partir de la MAC
+  snprintf(idNodo, sizeof(idNodo), "esp32-%06lx", (unsigned long)(ESP.getEfuseMac() & 0xFFFFFF));
 }
 
 void loop() {
@@ -78,15 +101,34 @@ void loop() {
   // Calcular el promedio de todas las temperaturas
   float promedioTemp = promedioTemperaturas(tempDHT22, tempDHT11, tempLM35_1, tempLM35_2);
 
-  // Crear la cadena de datos separados por coma
+#if PROTOCOLO_BINARIO
+  // El esquema declara el orden de los campos: el servidor los ubica por nombre
+  Trama trama = {};
+  trama.magic[0] = 0xA5;
+  trama.magic[1] = 0x5A;
+  trama.largo = sizeof(Trama);
+  trama.version = TRAMA_VERSION;
+  trama.esquema = TRAMA_ESQUEMA;
+  strncpy(trama.nodo, idNodo, sizeof(trama.nodo));
+  trama.secuencia = secuencia++;
+  trama.horaMs = millis();
+  float campos[10] = {tempDHT22, tempDHT11, tempLM35_1, tempLM35_2, humedadSuelo1, humedadSuelo2,
+                      promedioTemp, promedioHumedadSuelo, humedadDHT22, humedadDHT11};
+  memcpy(trama.campos, campos, sizeof(campos));
+
+  // Enviar los datos al servidor
+  client.write((const uint8_t *)&trama, sizeof(trama));
+  Serial.println("Trama enviada al servidor: " + String(trama.secuencia));
+#else
+  // Línea CSV en el orden de SENSOR_COLUMNS; no hay tercera sonda de suelo
   String datos = String(tempDHT22) + "," + String(tempDHT11) + "," + String(tempLM35_1) + "," +
                  String(tempLM35_2) + "," + String(humedadSuelo1) + "," + String(humedadSuelo2) + "," +
-                 String(promedioTemp) + "," + String(promedioHumedadSuelo) + "," +
-                 String(humedadDHT22) + "," + String(humedadDHT11);
+                 "nan," + String(humedadDHT22) + "," + String(humedadDHT11) + "," + String(promedioTemp);
 
   // Enviar los datos al servidor
   client.println(datos);
   Serial.println("Datos enviados al servidor: " + datos);
+#endif
 
   delay(2000);
 }
@@ -0,0 +1,206 @@
+"""Tabla precalculada (distancia, velocidad) -> ángulo para apuntar en tiempo real.
+
+Con rozamiento, resolver el ángulo para cada lectura del sensor es demasiado
+lento para controlar la boquilla en lazo cerrado. La tabla se arma una vez
+con ``drag_trajectory.solve`` (o ``ballistics.solve`` si ``k = 0``) sobre una
+grilla uniforme y se guarda en un ``.npz``; luego cada consulta es una
+interpolación bilineal vectorizada.
+
+Cotas de error: al construir la tabla también se resuelven puntos dentro de
+cada celda y se guarda la mayor diferencia con la interpolación (con un
+margen). ``query`` devuelve esa cota junto con el ángulo; las celdas con
+alguna esquina fuera de alcance no se interpolan.
+
+Invalidación: el nombre y el contenido del archivo llevan una clave calculada
+a partir de ``g``, ``k``, el viento, las grillas y ``MODEL_VERSION``.
+``load_or_build`` reconstruye la tabla si alguno de esos parámetros cambió.
+
+    python angle_table.py --k 0.086 --wind 2 --distances 0 30 121 --velocities 10 30 41
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+
+import ballistics
+import drag_trajectory
+
+# Se incrementa cuando cambia el modelo físico o el solucionador
+MODEL_VERSION = 1
+
+DEFAULT_DIR = "tablas"
+DEFAULT_DISTANCES = (0.0, 30.0, 121)   # m: inicio, fin, cantidad de puntos
+DEFAULT_VELOCITIES = (10.0, 30.0, 41)  # m/s
+
+# Fracciones de cada celda (por eje) donde se compara la interpolación con el
+# solucionador, y margen que se agrega a la diferencia máxima medida
+ERROR_SAMPLES = (0.25, 0.5, 0.75)
+ERROR_SAFETY = 1.5
+
+
+def table_key(g, k, wind, distances, velocities):
+    """Clave de los parámetros que definen la tabla (cambia si cambia cualquiera)."""
+    params = {
+        "model_version": MODEL_VERSION,
+        "g": float(g), "k": float(k), "wind": float(wind),
+        "distances": [float(distances[0]), float(distances[1]), int(distances[2])],
+        "velocities": [float(velocities[0]), float(velocities[1]), int(velocities[2])],
+        "rtol": drag_trajectory.RTOL, "atol": drag_trajectory.ATOL,
+        "error_samples": list(ERROR_SAMPLES), "error_safety": ERROR_SAFETY,
+    }
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _solve(x_target, v0, g, k, wind):
+    if k == 0 and wind == 0:
+        return ballistics.solve(x_target, v0, g)
+    return drag_trajectory.solve(x_target, v0, k, wind, g)
+
+
+def _bilinear(grid, x0, dx, y0, dy, x, y):
+    # Devuelve el valor interpolado y la celda (i, j); NaN fuera de la grilla
+    nx, ny = grid.shape
+    fx = (x - x0) / dx
+    fy = (y - y0) / dy
+    inside = (fx >= 0) & (fx <= nx - 1) & (fy >= 0) & (fy <= ny - 1)
+    i = np.clip(np.floor(np.nan_to_num(fx)).astype(np.intp), 0, nx - 2)
+    j = np.clip(np.floor(np.nan_to_num(fy)).astype(np.intp), 0, ny - 2)
+    tx = fx - i
+    ty = fy - j
+    value = ((grid[i, j] * (1 - tx) + grid[i + 1, j] * tx) * (1 - ty)
+             + (grid[i, j + 1] * (1 - tx) + grid[i + 1, j + 1] * tx) * ty)
+    return np.where(inside, value, np.nan), i, j
+
+
+class AngleTable:
+    """Ángulos bajo y alto sobre una grilla uniforme de distancias y velocidades."""
+
+    def __init__(self, distances, velocities, theta_low, theta_high, error_low, error_high, key, params):
+        self.distances = distances
+        self.velocities = velocities
+        self.theta = {"low": theta_low, "high": theta_high}
+        self.error = {"low": error_low, "high": error_high}
+        self.key = key
+        self.params = params
+        self._d0, self._dd = distances[0], distances[1] - distances[0]
+        self._v0, self._dv = velocities[0], velocities[1] - velocities[0]
+
+    @classmethod
+    def build(cls, g=ballistics.G, k=0.0, wind=0.0, distances=DEFAULT_DISTANCES, velocities=DEFAULT_VELOCITIES):
+        d = np.linspace(*distances)
+        v = np.linspace(*velocities)
+        if len(d) < 2 or len(v) < 2:
+            raise ValueError("La grilla necesita al menos dos puntos por eje")
+        grid_d, grid_v = np.meshgrid(d, v, indexing="ij")
+        nodes = _solve(grid_d, grid_v, g, k, wind)
+
+        # Puntos de muestra dentro de cada celda donde se mide el error de la interpolación
+        offsets = np.array(ERROR_SAMPLES)
+        sample_d = (d[:-1, None] + offsets * (d[1] - d[0])).ravel()
+        sample_v = (v[:-1, None] + offsets * (v[1] - v[0])).ravel()
+        cell_d, cell_v = np.meshgrid(sample_d, sample_v, indexing="ij")
+        samples = _solve(cell_d, cell_v, g, k, wind)
+
+        params = {"g": g, "k": k, "wind": wind, "distances": list(distances), "velocities": list(velocities)}
+        theta, error = {}, {}
+        m = len(offsets)
+        for branch in ("low", "high"):
+            theta[branch] = nodes[f"theta_{branch}"]
+            interpolated, _, _ = _bilinear(theta[branch], d[0], d[1] - d[0], v[0], v[1] - v[0], cell_d, cell_v)
+            difference = np.abs(interpolated - samples[f"theta_{branch}"])
+            # Máximo por celda; una celda con esquinas fuera de alcance queda en NaN (no se interpola)
+            per_cell = difference.reshape(len(d) - 1, m, len(v) - 1, m)
+            error[branch] = ERROR_SAFETY * per_cell.max(axis=(1, 3))
+        return cls(d, v, theta["low"], theta["high"], error["low"], error["high"],
+                   table_key(g, k, wind, distances, velocities), params)
+
+    def save(self, path):
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, distances=self.distances, velocities=self.velocities,
+                 theta_low=self.theta["low"], theta_high=self.theta["high"],
+                 error_low=self.error["low"], error_high=self.error["high"],
+                 key=np.array(self.key), params=np.array(json.dumps(self.params)))
+        # Se reemplaza de una vez: un lector nunca ve una tabla a medio escribir
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["distances"], data["velocities"], data["theta_low"], data["theta_high"],
+                       data["error_low"], data["error_high"], str(data["key"]), json.loads(str(data["params"])))
+
+    def query(self, distance, v0, branch="low"):
+        """Ángulo (rad) interpolado y su cota de error; NaN fuera de la grilla o del alcance."""
+        if isinstance(distance, (int, float)) and isinstance(v0, (int, float)):
+            return self._query_scalar(distance, v0, branch)
+        distance = np.asarray(distance, dtype=np.float64)
+        v0 = np.asarray(v0, dtype=np.float64)
+        theta, i, j = _bilinear(self.theta[branch], self._d0, self._dd, self._v0, self._dv, distance, v0)
+        error = np.where(np.isnan(theta), np.nan, self.error[branch][i, j])
+        return theta, error
+
+    def _query_scalar(self, distance, v0, branch):
+        # Una sola lectura del sensor: aritmética de Python, sin arreglos temporales
+        grid = self.theta[branch]
+        nx, ny = grid.shape
+        fx = (distance - self._d0) / self._dd
+        fy = (v0 - self._v0) / self._dv
+        if not (0 <= fx <= nx - 1 and 0 <= fy <= ny - 1):
+            return math.nan, math.nan
+        i = min(int(fx), nx - 2)
+        j = min(int(fy), ny - 2)
+        tx = fx - i
+        ty = fy - j
+        row, next_row = grid[i].tolist(), grid[i + 1].tolist()
+        theta = ((row[j] * (1 - tx) + next_row[j] * tx) * (1 - ty)
+                 + (row[j + 1] * (1 - tx) + next_row[j + 1] * tx) * ty)
+        if math.isnan(theta):
+            return math.nan, math.nan
+        return theta, float(self.error[branch][i, j])
+
+    def max_error(self, branch="low"):
+        return float(np.nanmax(self.error[branch]))
+
+
+def table_path(directory, key):
+    return os.path.join(directory, f"angulos_{key}.npz")
+
+
+def load_or_build(directory=DEFAULT_DIR, g=ballistics.G, k=0.0, wind=0.0,
+                  distances=DEFAULT_DISTANCES, velocities=DEFAULT_VELOCITIES):
+    """Tabla para estos parámetros: la guardada si sigue siendo válida, o una nueva."""
+    key = table_key(g, k, wind, distances, velocities)
+    path = table_path(directory, key)
+    if os.path.exists(path):
+        table = AngleTable.load(path)
+        if table.key == key:
+            return table
+    table = AngleTable.build(g, k, wind, distances, velocities)
+    os.makedirs(directory, exist_ok=True)
+    table.save(path)
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construye la tabla de ángulos")
+    parser.add_argument("--dir", default=DEFAULT_DIR, help="Directorio de las tablas")
+    parser.add_argument("--g", type=float, default=ballistics.G)
+    parser.add_argument("--k", type=float, default=0.0, help="Coeficiente de rozamiento (1/m)")
+    parser.add_argument("--wind", type=float, default=0.0, help="Viento a favor (m/s)")
+    parser.add_argument("--distances", type=float, nargs=3, default=DEFAULT_DISTANCES, metavar=("INICIO", "FIN", "N"))
+    parser.add_argument("--velocities", type=float, nargs=3, default=DEFAULT_VELOCITIES, metavar=("INICIO", "FIN", "N"))
+    args = parser.parse_args()
+
+    distances = (args.distances[0], args.distances[1], int(args.distances[2]))
+    velocities = (args.velocities[0], args.velocities[1], int(args.velocities[2]))
+    table = load_or_build(args.dir, args.g, args.k, args.wind, distances, velocities)
+    print(f"Tabla {table_path(args.dir, table.key)}")
+    for branch in ("low", "high"):
+        print(f"Error máximo de interpolación ({branch}): {np.degrees(table.max_error(branch)):.4f}°")
+
+
+if __name__ == "__main__":
+    main()
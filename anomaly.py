@@ -0,0 +1,312 @@
+"""Detección en línea de anomalías y de sensores que no concuerdan.
+
+Cada trama del ESP32 trae sensores redundantes (cuatro de temperatura, tres
+de humedad de suelo y dos de humedad del aire). ``AnomalyDetector`` los usa
+para detectar sensores que fallan, con costo O(1) por muestra:
+
+- ``zscore``: la lectura se aleja más de ``z_threshold`` desvíos de la media
+  de las últimas ``window`` lecturas de esa columna (picos);
+- ``ewma``: la media móvil exponencial sale de los límites de control
+  (corrimientos lentos, como un sensor que se descalibra);
+- ``desacuerdo``: sensores que miden lo mismo difieren más que un umbral
+  (por ejemplo, el DHT22 contra el promedio de los LM35);
+- ``promedio``: ``promedio_temperatura`` no coincide con el promedio de las
+  cuatro temperaturas que vienen en la misma trama;
+- ``faltante``: el sensor devolvió ``nan``. Las columnas que el esquema del
+  nodo no trae (``declare_columns``) no son sensores que fallan.
+
+El estado de todos los nodos vive en arreglos (un renglón por nodo), así un
+lote con las últimas lecturas de muchos nodos se evalúa con operaciones de
+NumPy sobre el lote entero. ``ewma``, ``desacuerdo``, ``promedio`` y
+``faltante`` se informan al empezar (no en cada muestra mientras duran);
+``desacuerdo`` y ``promedio`` además tienen persistencia e histéresis.
+
+``append`` (la firma de los sinks de ``NodeStore``) no evalúa nada: deja el
+bloque en espera. Las esperas de todos los nodos se evalúan juntas cuando se
+juntan ``flush_rows`` lecturas, cuando pasa ``flush_interval_s`` o cuando
+alguien lee los eventos. Así la ingesta no paga una evaluación por bloque
+recibido; cada lectura se evalúa igual, en orden, aunque el nodo mande
+ráfagas.
+
+Los eventos van a una cola acotada (los más viejos se descartan) que lee el
+dashboard con ``events``.
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import metrics
+from node_store import PendingRows, node_rounds
+from sensor_schema import SENSOR_COLUMNS, TEMP_COLUMNS
+
+WINDOW = 60
+Z_THRESHOLD = 5.0
+MIN_SAMPLES = 20
+# Desvío mínimo: una columna constante no dispara el z-score por una décima
+MIN_STD = 0.05
+EWMA_LAMBDA = 0.1
+EWMA_LIMIT = 4.0
+# El ESP32 manda dos decimales: el promedio recalculado puede diferir en redondeo
+AVERAGE_TOLERANCE = 0.05
+# Histéresis: un desacuerdo se informa tras PERSIST lecturas seguidas sobre el
+# umbral y se da por terminado cuando baja de CLEAR_RATIO veces el umbral
+PERSIST = 3
+CLEAR_RATIO = 0.8
+MAX_EVENTS = 1000
+FLUSH_ROWS = 4096
+FLUSH_INTERVAL_S = 1.0
+
+# (nombre, columnas de un lado, columnas del otro, diferencia máxima entre sus promedios).
+# Los umbrales dejan margen sobre la exactitud de cada sensor (DHT11: ±2 °C y ±5 %)
+DISAGREEMENT_CHECKS = (
+    ("DHT22 vs LM35", ("temperatura_DHT22",), ("temperatura_LM35_1", "temperatura_LM35_2"), 3.0),
+    ("DHT22 vs DHT11 (temperatura)", ("temperatura_DHT22",), ("temperatura_DHT11",), 5.0),
+    ("LM35_1 vs LM35_2", ("temperatura_LM35_1",), ("temperatura_LM35_2",), 3.0),
+    ("DHT22 vs DHT11 (humedad)", ("humedad_DHT22",), ("humedad_DHT11",), 15.0),
+    ("suelo 1 vs 2", ("humedad_suelo_1",), ("humedad_suelo_2",), 40.0),
+    ("suelo 1 vs 3", ("humedad_suelo_1",), ("humedad_suelo_3",), 40.0),
+    ("suelo 2 vs 3", ("humedad_suelo_2",), ("humedad_suelo_3",), 40.0),
+)
+
+KINDS = ("zscore", "ewma", "desacuerdo", "promedio", "faltante")
+_counters = {kind: metrics.counter("sensor_anomalies_total", "Anomalías detectadas en la ingesta",
+                                   labels={"kind": kind}) for kind in KINDS}
+
+
+class AnomalyDetector:
+    """Detector para todos los nodos; ``extend_batch`` evalúa un lote en el momento."""
+
+    def __init__(self, columns=SENSOR_COLUMNS, window=WINDOW, z_threshold=Z_THRESHOLD, min_samples=MIN_SAMPLES,
+                 ewma_lambda=EWMA_LAMBDA, ewma_limit=EWMA_LIMIT, checks=DISAGREEMENT_CHECKS,
+                 average_tolerance=AVERAGE_TOLERANCE, persist=PERSIST, clear_ratio=CLEAR_RATIO,
+                 max_events=MAX_EVENTS, flush_rows=FLUSH_ROWS, flush_interval_s=FLUSH_INTERVAL_S):
+        self.columns = tuple(columns)
+        self.window = window
+        self.z_threshold = z_threshold
+        self.min_samples = min(min_samples, window)
+        self.ewma_lambda = ewma_lambda
+        # Desvío de la EWMA en régimen: σ·√(λ / (2 − λ))
+        self.ewma_factor = ewma_limit * np.sqrt(ewma_lambda / (2 - ewma_lambda))
+        index = {name: i for i, name in enumerate(self.columns)}
+        self.persist = persist
+        self.clear_ratio = clear_ratio
+        # Los pares de sensores y el promedio se evalúan juntos: columna k de
+        # ``_side_a``/``_side_b`` marca qué sensores se promedian de cada lado
+        pairs = [(name, "desacuerdo", a, b, threshold) for name, a, b, threshold in checks]
+        if "promedio_temperatura" in index:
+            pairs.append(("promedio_temperatura", "promedio", ("promedio_temperatura",), TEMP_COLUMNS,
+                          average_tolerance))
+        self._pair_names = [name for name, *_ in pairs]
+        self._pair_kinds = [kind for _, kind, *_ in pairs]
+        self._thresholds = np.array([threshold for *_, threshold in pairs])
+        self._side_a = np.zeros((len(self.columns), len(pairs)))
+        self._side_b = np.zeros((len(self.columns), len(pairs)))
+        for k, (_, _, a, b, _) in enumerate(pairs):
+            self._side_a[[index[c] for c in a], k] = 1.0
+            self._side_b[[index[c] for c in b], k] = 1.0
+        # El promedio no es un sensor: no se informa como faltante
+        self._sensor = np.array([name != "promedio_temperatura" for name in self.columns])
+
+        self._slots = {}
+        self._node_ids = []
+        self._lock = threading.Lock()
+        self._allocate(16)
+        self._events = deque(maxlen=max_events)
+        self.total_events = 0
+        # Esquemas declarados que todavía no se aplicaron al estado (sin tomar el candado)
+        self._declared_columns = {}
+
+        self._pending = PendingRows(len(self.columns), flush_rows, flush_interval_s)
+
+    def _allocate(self, n_nodes):
+        n_cols = len(self.columns)
+
+        def grow(old, shape, fill, dtype=np.float64):
+            new = np.full(shape, fill, dtype=dtype)
+            if old is not None:
+                new[:len(old)] = old
+            return new
+
+        self._ring = grow(getattr(self, "_ring", None), (n_nodes, self.window, n_cols), 0.0)
+        self._sum = grow(getattr(self, "_sum", None), (n_nodes, n_cols), 0.0)
+        self._sumsq = grow(getattr(self, "_sumsq", None), (n_nodes, n_cols), 0.0)
+        self._pos = grow(getattr(self, "_pos", None), n_nodes, 0, np.intp)
+        self._count = grow(getattr(self, "_count", None), n_nodes, 0, np.intp)
+        self._ewma = grow(getattr(self, "_ewma", None), (n_nodes, n_cols), np.nan)
+        self._ewma_out = grow(getattr(self, "_ewma_out", None), (n_nodes, n_cols), False, bool)
+        self._missing = grow(getattr(self, "_missing", None), (n_nodes, n_cols), False, bool)
+        self._declared = grow(getattr(self, "_declared", None), (n_nodes, n_cols), True, bool)
+        n_pairs = len(self._pair_names)
+        self._pair_active = grow(getattr(self, "_pair_active", None), (n_nodes, n_pairs), False, bool)
+        self._pair_run = grow(getattr(self, "_pair_run", None), (n_nodes, n_pairs), 0, np.intp)
+
+    def _slot(self, node_id):
+        slot = self._slots.get(node_id)
+        if slot is None:
+            slot = len(self._node_ids)
+            if slot == len(self._pos):
+                self._allocate(2 * slot)
+            self._slots[node_id] = slot
+            self._node_ids.append(node_id)
+        return slot
+
+    def append(self, node_id, timestamps_ns, values):
+        # Camino caliente de la ingesta: solo se guarda la referencia al bloque
+        if self._pending.add(node_id, timestamps_ns, values):
+            self.flush()
+
+    def declare_columns(self, node_id, columns):
+        """Columnas que manda el nodo según su esquema: las demás no se informan como faltantes."""
+        # Lo llaman los lectores de la red: se aplica en la próxima evaluación
+        self._declared_columns[node_id] = tuple(columns)
+
+    def flush(self):
+        """Evalúa las lecturas en espera de todos los nodos."""
+        with self._lock:
+            batch = self._pending.take()
+            if batch is not None:
+                self._evaluate(*batch)
+
+    def extend_batch(self, node_ids, timestamps_ns, values):
+        """Evalúa un lote con lecturas de muchos nodos (un nodo puede repetirse)."""
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(self.columns))
+        if not len(values):
+            return
+        timestamps_ns = np.broadcast_to(np.asarray(timestamps_ns, dtype=np.int64), (len(values),))
+        with self._lock:
+            self._evaluate(node_ids, timestamps_ns, values)
+
+    def _evaluate(self, node_ids, timestamps_ns, values):
+        self._apply_declared()
+        slots = np.fromiter((self._slot(node_id) for node_id in node_ids), dtype=np.intp, count=len(values))
+        for rows in node_rounds(slots):
+            self._update(slots[rows], values[rows], timestamps_ns[rows])
+
+    def _apply_declared(self):
+        while self._declared_columns:
+            node_id, columns = self._declared_columns.popitem()
+            slot = self._slot(node_id)
+            self._declared[slot] = [name in columns for name in self.columns]
+            self._missing[slot] &= self._declared[slot]
+
+    def _update(self, s, x, timestamps_ns):
+        # ``s`` no tiene nodos repetidos: cada fila actualiza un renglón distinto del estado
+        valid = ~np.isnan(x)
+        count = self._count[s]
+        n = count[:, None]
+        ready = n >= self.min_samples
+        total, total_sq = self._sum[s], self._sumsq[s]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.nan_to_num(total / n)
+            var = (total_sq - n * mean * mean) / (n - 1)
+        std = np.maximum(np.sqrt(np.maximum(np.nan_to_num(var), 0.0)), MIN_STD)
+
+        # Picos: z-score contra la ventana previa
+        deviation = np.abs(x - mean)
+        spike = ready & (deviation > self.z_threshold * std)
+
+        # EWMA con límites de control a partir de la media y el desvío de la ventana
+        previous = self._ewma[s]
+        ewma = np.where(np.isnan(previous), x, self.ewma_lambda * x + (1 - self.ewma_lambda) * previous)
+        ewma = np.where(valid, ewma, previous)
+        self._ewma[s] = ewma
+        out = ready & valid & (np.abs(ewma - mean) > self.ewma_factor * std)
+        drift = out & ~self._ewma_out[s]
+        self._ewma_out[s] = out
+
+        # Ventana deslizante: suma y suma de cuadrados en O(1). Los picos entran
+        # recortados y los nan como la media, para no contaminar la referencia
+        limit = np.where(ready, self.z_threshold * std, np.inf)
+        fill = np.where(valid, np.clip(x, mean - limit, mean + limit), mean)
+        pos = self._pos[s]
+        old = self._ring[s, pos] * (count == self.window)[:, None]
+        self._ring[s, pos] = fill
+        self._sum[s] = total + fill - old
+        self._sumsq[s] = total_sq + fill * fill - old * old
+        pos = (pos + 1) % self.window
+        self._pos[s] = pos
+        self._count[s] = np.minimum(count + 1, self.window)
+        # Cada vuelta completa se recalcula exacto (error de redondeo acumulado)
+        wrapped = s[pos == 0]
+        if len(wrapped):
+            self._sum[wrapped] = self._ring[wrapped].sum(axis=1)
+            self._sumsq[wrapped] = (self._ring[wrapped] ** 2).sum(axis=1)
+
+        # Sensores que no leyeron (de los que el nodo manda)
+        missing = ~valid & self._sensor & self._declared[s]
+        new_missing = missing & ~self._missing[s]
+        self._missing[s] = missing
+
+        # Pares de sensores redundantes y promedio recalculado: promedios de cada
+        # lado ignorando nan, como productos de matrices para todo el lote
+        read = valid.astype(np.float64)
+        x0 = np.where(valid, x, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            side_a = (x0 @ self._side_a) / (read @ self._side_a)
+            side_b = (x0 @ self._side_b) / (read @ self._side_b)
+            gaps = np.abs(side_a - side_b)
+            # Persistencia e histéresis (un nan no cuenta como desacuerdo)
+            over = gaps > self._thresholds
+            under = ~(gaps > self._thresholds * self.clear_ratio)
+        run = np.where(over, self._pair_run[s] + 1, 0)
+        self._pair_run[s] = run
+        active = self._pair_active[s]
+        new_pair = ~active & (run >= self.persist)
+        self._pair_active[s] = (active | new_pair) & ~under
+
+        if spike.any() or drift.any() or new_missing.any() or new_pair.any():
+            self._emit(s, x, timestamps_ns, mean, spike, drift, new_missing, new_pair, gaps, side_a, side_b)
+
+    def _emit(self, s, x, timestamps_ns, mean, spike, drift, new_missing, new_pair, gaps, side_a, side_b):
+        # Solo se recorren en Python las posiciones marcadas (pocas)
+        events = []
+        for kind, flags in (("zscore", spike), ("ewma", drift), ("faltante", new_missing)):
+            for row, col in zip(*np.nonzero(flags)):
+                detail = "sin lectura" if kind == "faltante" else f"media de la ventana {mean[row, col]:.2f}"
+                events.append((kind, row, self.columns[col], x[row, col], detail))
+        for row, k in zip(*np.nonzero(new_pair)):
+            if self._pair_kinds[k] == "promedio":
+                events.append(("promedio", row, self._pair_names[k], side_a[row, k], f"esperado {side_b[row, k]:.2f}"))
+            else:
+                events.append(("desacuerdo", row, self._pair_names[k], gaps[row, k],
+                               f"diferencia {gaps[row, k]:.2f} > {self._thresholds[k]}"))
+        for kind, row, column, value, detail in events:
+            self._events.append({
+                "time_ns": int(timestamps_ns[row]),
+                "node": self._node_ids[s[row]],
+                "kind": kind,
+                "column": column,
+                "value": float(value),
+                "detail": detail,
+            })
+            _counters[kind].inc()
+        self.total_events += len(events)
+
+    def events(self, limit=None, node_id=None):
+        """Eventos más recientes primero (como mucho ``limit``), opcionalmente de un solo nodo."""
+        self.flush()
+        with self._lock:
+            events = list(self._events)
+        events.reverse()
+        if node_id is not None:
+            events = [event for event in events if event["node"] == node_id]
+        return events[:limit] if limit is not None else events
+
+    def active(self, node_id):
+        """Condiciones que siguen activas en el nodo (para un indicador de estado)."""
+        self.flush()
+        with self._lock:
+            self._apply_declared()
+            slot = self._slots.get(node_id)
+            if slot is None:
+                return []
+            active = [f"ewma {self.columns[c]}" for c in np.flatnonzero(self._ewma_out[slot])]
+            active += [f"faltante {self.columns[c]}" for c in np.flatnonzero(self._missing[slot])]
+            active += [self._pair_names[k] for k in np.flatnonzero(self._pair_active[slot])]
+            return active
+
+
+def format_event_time(time_ns):
+    return time.strftime("%H:%M:%S", time.localtime(time_ns / 1e9))
@@ -0,0 +1,76 @@
+"""Servidor de ingesta basado en asyncio.
+
+Atiende todas las conexiones de los ESP32 desde un único hilo con un bucle de
+eventos, en lugar de un hilo del sistema operativo por conexión como
+``socketserver.ThreadingTCPServer``. Escribe en el mismo almacén por nodo
+(``NodeStore``) que leen los callbacks de Dash.
+"""
+import asyncio
+import logging
+
+import metrics
+from ingest import DEFAULT_HOST, DEFAULT_PORT, RECV_SIZE, declare_columns, peer_node_id, store_batch
+from wire_protocol import ProtocolFramer
+
+log = logging.getLogger(__name__)
+
+# Conexiones pendientes que acepta el sistema operativo (reconexiones masivas)
+BACKLOG = 4096
+# Con la cola de ingesta llena (política block), cada cuánto se reintenta encolar
+BACKPRESSURE_RETRY_S = 0.01
+
+
+async def submit(pipeline, node_id, node_ids, values):
+    # El bucle de eventos no puede bloquearse: la conexión deja de leer hasta que haya lugar
+    while not pipeline.submit(node_id, node_ids, values, block=False):
+        await asyncio.sleep(BACKPRESSURE_RETRY_S)
+
+
+async def write(store, pipeline, node_id, framer, batch):
+    if pipeline is not None:
+        pipeline.declare(node_id, framer.declared())
+        await submit(pipeline, node_id, *batch)
+    else:
+        declare_columns(store, node_id, framer.declared())
+        store_batch(store, node_id, *batch)
+
+
+async def handle_sensor_connection(reader, writer, store, pipeline=None):
+    framer = ProtocolFramer()
+    node_id = peer_node_id(writer.get_extra_info("peername"))
+    metrics.CONNECTIONS.inc()
+    try:
+        try:
+            while True:
+                data = await reader.read(RECV_SIZE)
+                if not data:
+                    break
+
+                metrics.BYTES.inc(len(data))
+                if log.isEnabledFor(logging.DEBUG) and metrics.RECEIVED_LOG_SAMPLER.sample():
+                    log.debug("Datos recibidos: %s", data.decode('utf-8', errors='replace').strip())
+
+                await write(store, pipeline, node_id, framer, framer.feed(data))
+        except ConnectionResetError:
+            log.info("Conexión restablecida por el cliente")
+        # Lo que quedó en el framer, por el mismo camino: con la cola llena la
+        # conexión espera sin bloquear el bucle (al cancelarse la tarea, se pierde)
+        await write(store, pipeline, node_id, framer, framer.flush())
+    finally:
+        writer.close()
+        metrics.CONNECTIONS.dec()
+
+
+async def serve(store, host=DEFAULT_HOST, port=DEFAULT_PORT, pipeline=None):
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_sensor_connection(reader, writer, store, pipeline),
+        host, port, backlog=BACKLOG,
+    )
+    log.info("Servidor TCP (asyncio) escuchando en el puerto %d...", port)
+    async with server:
+        await server.serve_forever()
+
+
+def start_async_server(store, host=DEFAULT_HOST, port=DEFAULT_PORT, pipeline=None):
+    """Bloquea el hilo actual ejecutando el servidor asyncio."""
+    asyncio.run(serve(store, host, port, pipeline))
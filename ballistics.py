@@ -0,0 +1,102 @@
+"""Solución vectorizada del tiro parabólico (sin rozamiento) para muchos objetivos.
+
+Para un objetivo a distancia ``x`` sobre el mismo nivel del lanzamiento y una
+velocidad inicial ``v0`` hay dos ángulos que dan en el blanco:
+
+    sin(2θ) = g·x / v0²      θ_bajo = ½·arcsin(g·x / v0²)      θ_alto = 90° − θ_bajo
+
+``solve`` resuelve arreglos de distancias y velocidades (con broadcasting)
+en una sola pasada de NumPy. Los objetivos fuera de alcance no cortan el
+cálculo: quedan marcados en ``reachable`` y sus resultados son NaN.
+
+No importa matplotlib ni tiene efectos al importarse; ``tract.py`` lo usa
+para la animación.
+"""
+import numpy as np
+
+G = 9.81  # Gravedad (m/s²)
+
+
+def solve(x_target, v0, g=G):
+    """Ángulos, tiempos de vuelo y alturas máximas para cada objetivo.
+
+    Devuelve un diccionario de arreglos con la forma de ``broadcast(x_target, v0)``:
+    ``reachable`` (bool), ``theta_low``/``theta_high`` (rad), ``flight_time_low``/
+    ``flight_time_high`` (s) y ``apex_low``/``apex_high`` (m).
+    """
+    x_target = np.asarray(x_target, dtype=np.float64)
+    v0 = np.asarray(v0, dtype=np.float64)
+    v0_squared = v0 * v0
+    s = np.asarray(g * x_target / v0_squared)
+
+    reachable = (s >= 0) & (s <= 1) & (v0 > 0)
+    # Fuera de alcance arcsin daría NaN con aviso; se calcula sobre s acotado y se enmascara
+    s = np.clip(s, 0.0, 1.0, out=s)
+    theta_low = np.arcsin(s)
+    theta_low *= 0.5
+    theta_high = 0.5 * np.pi - theta_low
+
+    # Sin senos ni cosenos: con c = cos(2θ_bajo) = √(1 − s²),
+    # sin²(θ_bajo) = s² / (2(1 + c)) (estable para s chico) y cos²(θ_bajo) = (1 + c) / 2;
+    # además sin(θ_alto) = cos(θ_bajo) y cos(θ_alto) = sin(θ_bajo)
+    one_plus_c = np.sqrt(1.0 - s * s)
+    one_plus_c += 1.0
+    sin2_low = s * s / (2.0 * one_plus_c)
+    cos2_low = one_plus_c
+    cos2_low *= 0.5
+
+    time_factor = 2.0 * v0 / g
+    apex_factor = v0_squared / (2.0 * g)
+    result = {
+        "reachable": reachable,
+        "theta_low": theta_low,
+        "theta_high": theta_high,
+        "flight_time_low": time_factor * np.sqrt(sin2_low),
+        "flight_time_high": time_factor * np.sqrt(cos2_low),
+        "apex_low": apex_factor * sin2_low,
+        "apex_high": apex_factor * cos2_low,
+    }
+    if not reachable.all():
+        for key, values in result.items():
+            if key != "reachable":
+                result[key] = np.where(reachable, values, np.nan)
+    return result
+
+
+def max_range(v0, g=G):
+    """Alcance máximo (a 45°) para cada velocidad inicial."""
+    v0 = np.asarray(v0, dtype=np.float64)
+    return v0 * v0 / g
+
+
+def trajectory(theta, v0, n_points=500, g=G):
+    """Puntos ``(t, x, y)`` de la trayectoria hasta que vuelve al suelo.
+
+    ``theta`` y ``v0`` pueden ser arreglos: el resultado tiene un eje final
+    de ``n_points`` muestras por trayectoria.
+    """
+    theta = np.asarray(theta, dtype=np.float64)[..., None]
+    v0 = np.asarray(v0, dtype=np.float64)[..., None]
+    vx = v0 * np.cos(theta)
+    vy = v0 * np.sin(theta)
+    t = np.linspace(0.0, 1.0, n_points) * (2.0 * vy / g)
+    x = vx * t
+    y = np.maximum(vy * t - 0.5 * g * t * t, 0.0)
+    return t, x, y
+
+
+def state_at_x(x, theta, v0, g=G):
+    """Estado exacto ``(t, y, vx, vy)`` de la trayectoria al pasar por la abscisa ``x``.
+
+    Evalúa las ecuaciones del movimiento (no interpola entre muestras);
+    acepta arreglos con broadcasting.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    theta = np.asarray(theta, dtype=np.float64)
+    v0 = np.asarray(v0, dtype=np.float64)
+    vx = v0 * np.cos(theta)
+    vy0 = v0 * np.sin(theta)
+    t = x / vx
+    y = vy0 * t - 0.5 * g * t * t
+    vy = vy0 - g * t
+    return t, y, np.broadcast_to(vx, t.shape), vy
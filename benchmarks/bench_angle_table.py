@@ -0,0 +1,69 @@
+"""Latencia de ``angle_table`` frente a resolver el ángulo con rozamiento en cada lectura.
+
+Construye (o reutiliza) la tabla para ``k`` y el viento dados y mide una
+consulta escalar (una lectura del sensor), un lote de consultas y
+``drag_trajectory.solve_angle``. También verifica las cotas de error contra
+el solucionador sobre puntos al azar.
+
+Uso:
+    python benchmarks/bench_angle_table.py --k 0.086 --wind 2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import angle_table  # noqa: E402
+import drag_trajectory  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=float, default=0.086)
+    parser.add_argument("--wind", type=float, default=2.0)
+    parser.add_argument("--dir", default=os.path.join(tempfile.gettempdir(), "tablas"))
+    parser.add_argument("--batch", type=int, default=1_000_000)
+    parser.add_argument("--check", type=int, default=200, help="Puntos para verificar las cotas de error")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = angle_table.load_or_build(args.dir, k=args.k, wind=args.wind)
+    print(f"tabla lista en {time.perf_counter() - start:.2f} s ({table.theta['low'].shape})")
+
+    repeat = 100_000
+    start = time.perf_counter()
+    for _ in range(repeat):
+        table.query(12.3, 25.0)
+    print(f"consulta escalar:  {(time.perf_counter() - start) / repeat * 1e6:10.2f} µs")
+
+    rng = np.random.default_rng(0)
+    distances = rng.uniform(0, 30, args.batch)
+    velocities = rng.uniform(10, 30, args.batch)
+    start = time.perf_counter()
+    table.query(distances, velocities)
+    print(f"consulta en lote:  {(time.perf_counter() - start) / args.batch * 1e6:10.3f} µs por objetivo")
+
+    repeat = 20
+    start = time.perf_counter()
+    for _ in range(repeat):
+        drag_trajectory.solve_angle(12.3, 25.0, args.k, args.wind)
+    print(f"solve_angle:       {(time.perf_counter() - start) / repeat * 1e6:10.0f} µs")
+
+    distances = rng.uniform(0, 30, args.check)
+    velocities = rng.uniform(10, 30, args.check)
+    theta, bound = table.query(distances, velocities)
+    exact = drag_trajectory.solve(distances, velocities, args.k, args.wind)["theta_low"]
+    inside = ~np.isnan(theta)
+    error = np.abs(theta - exact)[inside]
+    print(f"error real: máx {np.degrees(error.max()):.4f}°  "
+          f"dentro de la cota: {(error <= bound[inside]).mean():.1%}  "
+          f"(cubiertos por la tabla: {inside.mean():.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Costo del detector de anomalías en la ingesta.
+
+Compara, con lotes que traen la última lectura de cada nodo:
+
+* ``por nodo``: ``extend_batch`` de un nodo por vez (evaluar cada bloque al recibirlo);
+* ``append``: ``append`` por nodo (el sink de ``NodeStore``) y ``flush`` al final del lote;
+* ``lote``: ``extend_batch`` con todos los nodos a la vez.
+
+Los datos salen de ``SensorSimulator`` (sin caídas ni fallas), así que los
+eventos que se cuentan son falsas alarmas.
+
+Uso:
+    python benchmarks/bench_anomaly.py --nodes 10 100 1000 5000 --steps 200
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anomaly import AnomalyDetector  # noqa: E402
+from sensor_simulator import SensorSimulator  # noqa: E402
+
+
+def make_batches(n_nodes, steps, period):
+    simulator = SensorSimulator(n_nodes, seed=0, dropout=0.0, sensor_failure=0.0)
+    return [simulator.step(k * period)[1] for k in range(steps)]
+
+
+def run(detector, batches, node_ids, mode):
+    start = time.perf_counter()
+    for k, values in enumerate(batches):
+        timestamps = np.full(len(values), k, dtype=np.int64)
+        if mode == "lote":
+            detector.extend_batch(node_ids, timestamps, values)
+            continue
+        for i, node_id in enumerate(node_ids):
+            if mode == "por nodo":
+                detector.extend_batch([node_id], timestamps[i:i + 1], values[i:i + 1])
+            else:
+                detector.append(node_id, timestamps[i:i + 1], values[i:i + 1])
+        detector.flush()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--skip-per-node", action="store_true", help="No medir ``por nodo`` (lento con muchos nodos)")
+    parser.add_argument("--period", type=float, default=5.0, help="Segundos simulados entre lecturas")
+    args = parser.parse_args()
+
+    for n_nodes in args.nodes:
+        batches = make_batches(n_nodes, args.steps, args.period)
+        node_ids = np.array([f"nodo-{i}" for i in range(n_nodes)], dtype=object)
+        rows = n_nodes * args.steps
+        modes = ("append", "lote") if args.skip_per_node else ("por nodo", "append", "lote")
+        line = f"{n_nodes:>6d} nodos:"
+        for mode in modes:
+            # Sin disparos por tamaño ni por tiempo: un flush por lote
+            detector = AnomalyDetector(flush_rows=rows + 1, flush_interval_s=float("inf"))
+            elapsed = run(detector, batches, node_ids, mode)
+            line += f"   {mode} {rows / elapsed:>9,.0f} lecturas/s ({elapsed / args.steps * 1e3:7.2f} ms/lote)"
+        print(f"{line}   falsas alarmas: {detector.total_events} de {rows}")
+
+
+if __name__ == "__main__":
+    main()
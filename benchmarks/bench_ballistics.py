@@ -0,0 +1,72 @@
+"""Throughput del solucionador vectorizado de ``ballistics`` frente a un bucle por objetivo.
+
+El bucle reproduce lo que hacía ``tract.py`` para un solo objetivo (arcsin,
+tiempo de vuelo y altura máxima con ``math``); se mide sobre una muestra y
+se expresa en objetivos por segundo.
+
+Uso:
+    python benchmarks/bench_ballistics.py --targets 1000000
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ballistics  # noqa: E402
+
+
+def solve_loop(x_targets, v0s, g=ballistics.G):
+    results = []
+    for x, v0 in zip(x_targets, v0s):
+        s = g * x / v0 ** 2
+        if s < 0 or s > 1:
+            results.append(None)
+            continue
+        theta_low = 0.5 * math.asin(s)
+        theta_high = 0.5 * math.pi - theta_low
+        results.append((theta_low, theta_high,
+                        2 * v0 * math.sin(theta_low) / g, 2 * v0 * math.sin(theta_high) / g,
+                        (v0 * math.sin(theta_low)) ** 2 / (2 * g), (v0 * math.sin(theta_high)) ** 2 / (2 * g)))
+    return results
+
+
+def best_of(repeat, fn, *args):
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", type=int, default=1_000_000)
+    parser.add_argument("--loop-sample", type=int, default=100_000, help="Objetivos que se miden con el bucle")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Algunos objetivos quedan fuera de alcance a propósito
+    x_targets = rng.uniform(0, 80, args.targets)
+    v0s = rng.uniform(15, 30, args.targets)
+
+    elapsed = best_of(args.repeat, ballistics.solve, x_targets, v0s)
+    reachable = ballistics.solve(x_targets, v0s)["reachable"].mean()
+    print(f"objetivos: {args.targets}  alcanzables: {reachable:.1%}")
+    print(f"vectorizado: {elapsed * 1e3:8.1f} ms  {args.targets / elapsed / 1e6:8.1f} M objetivos/s")
+
+    n = min(args.loop_sample, args.targets)
+    loop = best_of(1, solve_loop, x_targets[:n].tolist(), v0s[:n].tolist())
+    print(f"bucle:       {loop / n * args.targets * 1e3:8.1f} ms  {n / loop / 1e6:8.1f} M objetivos/s"
+          f"  (medido sobre {n})")
+    print(f"aceleración: {loop / n * args.targets / elapsed:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
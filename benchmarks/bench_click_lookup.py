@@ -0,0 +1,83 @@
+"""Latencia de la consulta de un clic sobre trayectorias densas.
+
+Compara, para distintas cantidades de muestras:
+
+* ``argmin``: el ``np.abs(x_vals - x).argmin()`` original (O(n));
+* ``searchsorted``: búsqueda binaria en ``x_vals`` + ``ballistics.state_at_x``;
+* ``kd-tree``: ``TrajectoryPicker.nearest`` entre varias curvas superpuestas.
+
+También informa el error del estado analítico frente a la muestra más cercana.
+
+Uso:
+    python benchmarks/bench_click_lookup.py --samples 1000 100000 10000000 --curves 50
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ballistics  # noqa: E402
+import trajectory_picker  # noqa: E402
+
+
+def per_call_us(fn, clicks):
+    start = time.perf_counter()
+    for x, y in clicks:
+        fn(x, y)
+    return (time.perf_counter() - start) / len(clicks) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, nargs="+", default=[1_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--curves", type=int, default=50)
+    parser.add_argument("--clicks", type=int, default=200)
+    parser.add_argument("--v0", type=float, default=25.0)
+    parser.add_argument("--distance", type=float, default=15.0)
+    args = parser.parse_args()
+
+    theta = float(ballistics.solve(args.distance, args.v0)["theta_low"])
+    rng = np.random.default_rng(0)
+    clicks = np.column_stack([rng.uniform(0, args.distance, args.clicks), rng.uniform(0, 2, args.clicks)])
+
+    for n in args.samples:
+        _, x_vals, y_vals = ballistics.trajectory(theta, args.v0, n)
+
+        def argmin(x, y):
+            index = np.abs(x_vals - x).argmin()
+            return x_vals[index], y_vals[index]
+
+        def searchsorted(x, y):
+            index = np.searchsorted(x_vals, x)
+            return index, ballistics.state_at_x(x, theta, args.v0)
+
+        error = max(abs(argmin(x, y)[1] - float(ballistics.state_at_x(x, theta, args.v0)[1])) for x, y in clicks)
+        print(f"{n:>10d} muestras: argmin {per_call_us(argmin, clicks):10.1f} µs   "
+              f"searchsorted {per_call_us(searchsorted, clicks):6.1f} µs   "
+              f"(error en y de la muestra más cercana: {error:.2e} m)")
+
+    thetas = np.radians(np.linspace(5, 85, args.curves))
+    start = time.perf_counter()
+    picker = trajectory_picker.TrajectoryPicker(thetas, args.v0, scale=(100, 35))
+    built = time.perf_counter() - start
+    clicks = np.column_stack([rng.uniform(0, 60, args.clicks), rng.uniform(0, 30, args.clicks)])
+    print(f"kd-tree con {args.curves} curvas ({len(picker.t.ravel())} puntos, construido en {built * 1e3:.1f} ms): "
+          f"{per_call_us(picker.nearest, clicks):.1f} µs por clic")
+
+    # Verificación del refinamiento contra una búsqueda densa por fuerza bruta
+    worst = 0.0
+    for x, y in clicks[:20]:
+        state = picker.nearest(x, y)
+        t, xs, ys = ballistics.trajectory(thetas, args.v0, 20_000)
+        distance = np.hypot((xs - x) / 100, (ys - y) / 35)
+        worst = max(worst, state["distance"] - distance.min())
+    print(f"distancia del kd-tree refinado menos la del punto denso más cercano: {worst:.2e} "
+          f"({'ok' if worst <= 1e-6 else 'peor'})")
+
+
+if __name__ == "__main__":
+    main()
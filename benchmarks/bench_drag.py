@@ -0,0 +1,89 @@
+"""Costo de las trayectorias con rozamiento frente al tiro parabólico cerrado.
+
+Compara, en trayectorias u objetivos por segundo:
+
+- ``ballistics.solve`` (fórmula cerrada, sin rozamiento),
+- ``drag_trajectory.impact_batch`` (Dormand–Prince vectorizado) frente a un
+  bucle de ``drag_trajectory.integrate`` (``solve_ivp`` por trayectoria),
+- ``drag_trajectory.solve`` (ángulos en lote) frente a un bucle de ``solve_angle``.
+
+Los bucles se miden sobre una muestra. También muestra la diferencia entre
+el integrador en lote y ``solve_ivp`` y, con ``k = 0``, frente a la fórmula cerrada.
+
+Uso:
+    python benchmarks/bench_drag.py --launches 10000 --targets 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ballistics  # noqa: E402
+import drag_trajectory  # noqa: E402
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def report(name, count, elapsed, sample=None):
+    note = f"  (medido sobre {sample})" if sample else ""
+    print(f"{name:<34} {count / elapsed:>14,.0f} /s{note}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--launches", type=int, default=10_000, help="Trayectorias integradas en lote")
+    parser.add_argument("--targets", type=int, default=1_000, help="Objetivos para la búsqueda de ángulos")
+    parser.add_argument("--loop-sample", type=int, default=100, help="Casos que se miden con los bucles")
+    parser.add_argument("--diameter", type=float, default=0.005, help="Diámetro de gota (m) para k")
+    parser.add_argument("--wind", type=float, default=2.0, help="Viento a favor (m/s)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    k = float(drag_trajectory.sphere_drag_k(args.diameter))
+    print(f"k = {k:.4f} 1/m  viento = {args.wind} m/s")
+
+    theta = rng.uniform(np.radians(5), np.radians(85), args.launches)
+    v0 = rng.uniform(15, 30, args.launches)
+
+    elapsed, _ = timed(ballistics.solve, v0 * v0 * np.sin(2 * theta) / ballistics.G, v0)
+    report("fórmula cerrada (sin rozamiento)", args.launches, elapsed)
+
+    elapsed, batch = timed(drag_trajectory.impact_batch, theta, v0, k, args.wind)
+    report("impact_batch", args.launches, elapsed)
+
+    n = min(args.loop_sample, args.launches)
+    start = time.perf_counter()
+    loop = [drag_trajectory.integrate(theta[i], v0[i], k, args.wind, n_points=2) for i in range(n)]
+    report("bucle de solve_ivp", n, time.perf_counter() - start, n)
+    difference = np.abs(batch["impact_x"][:n] - [result["impact_x"] for result in loop])
+    print(f"{'':<34} diferencia de alcance con solve_ivp: máx {difference.max():.2e} m")
+
+    exact = v0 * v0 * np.sin(2 * theta) / ballistics.G
+    no_drag = drag_trajectory.impact_batch(theta, v0, 0.0)["impact_x"]
+    print(f"{'':<34} con k = 0, diferencia con la fórmula: máx {np.abs(no_drag - exact).max():.2e} m")
+
+    v0_targets = rng.uniform(15, 30, args.targets)
+    x_targets = rng.uniform(1, 25, args.targets)
+    elapsed, solved = timed(drag_trajectory.solve, x_targets, v0_targets, k, args.wind)
+    report("solve (ángulos en lote)", args.targets, elapsed)
+    print(f"{'':<34} alcanzables: {solved['reachable'].mean():.1%}")
+
+    n = min(args.loop_sample, args.targets)
+    start = time.perf_counter()
+    angles = [drag_trajectory.solve_angle(x_targets[i], v0_targets[i], k, args.wind) for i in range(n)]
+    report("bucle de solve_angle", n, time.perf_counter() - start, n)
+    angles = np.array([np.nan if angle is None else angle for angle in angles])
+    difference = np.nanmax(np.abs(solved["theta_low"][:n] - angles))
+    print(f"{'':<34} diferencia de ángulo con el bucle: máx {difference:.2e} rad")
+
+
+if __name__ == "__main__":
+    main()
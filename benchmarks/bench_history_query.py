@@ -0,0 +1,142 @@
+"""Consultas al historial en disco con ``/api/history`` (history_api.py).
+
+Escribe en un directorio temporal meses de lecturas sintéticas de un nodo
+(ciclo diario más ruido, una lectura cada ``--period`` segundos) y mide,
+con el cliente de prueba de Flask y la respuesta JSON leída completa:
+
+* ``frío``: la primera vez (caché vacía);
+* ``caché``: la misma consulta repetida, como la de un dashboard que se refresca;
+* ``memoria``: el camino anterior, ``read_range`` del rango entero y ``groupby`` de pandas.
+
+Informa la latencia mediana y el pico de memoria de Python (``tracemalloc``)
+de cada consulta. El pico incluye la respuesta entera, que el cliente de
+prueba junta; un cliente HTTP real la recibe en partes. Con respuestas de
+miles de renglones el costo es serializar el JSON: ``format=arrow`` lo evita.
+
+Uso:
+    python benchmarks/bench_history_query.py --days 90 --period 60
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import history_api  # noqa: E402
+from sensor_schema import SENSOR_COLUMNS  # noqa: E402
+from timeseries_store import TimeSeriesStore  # noqa: E402
+
+NODE = "nodo-1"
+COLUMNS = ["humedad_suelo_1", "humedad_suelo_2", "temperatura_DHT22"]
+# (nombre, días del rango hasta el final del historial, bucket, agregados)
+QUERIES = [
+    ("1 día, 1 h", 1, "1h", "mean,min,max"),
+    ("30 días, 1 h", 30, "1h", "mean,min,max"),
+    ("90 días, 1 d, p95", 90, "1d", "mean,p95"),
+    ("90 días, 15 m", 90, "15m", "mean,min,max,count"),
+]
+
+
+def fill(history, days, period, start_ns):
+    """Escribe ``days`` días de lecturas en bloques de un día."""
+    rng = np.random.default_rng(0)
+    per_day = int(86400 / period)
+    phase = np.arange(per_day) * period / 86400 * 2 * np.pi
+    for day in range(int(days)):
+        timestamps = start_ns + (day * per_day + np.arange(per_day, dtype=np.int64)) * int(period * 1e9)
+        values = 40 + 10 * np.sin(phase)[:, None] + rng.normal(0, 2, (per_day, len(SENSOR_COLUMNS)))
+        history.append(NODE, timestamps, values)
+    history.flush()
+
+
+def in_memory(history, start_ns, end_ns, bucket_s, aggregations):
+    import pandas as pd
+
+    records = history.read_range(NODE, start_ns, end_ns)
+    frame = pd.DataFrame({c: records[c] for c in COLUMNS})
+    groups = frame.groupby(records["timestamp"] // int(bucket_s * 1e9))
+    parts = []
+    for name in aggregations:
+        if name.startswith("p"):
+            parts.append(groups.quantile(float(name[1:]) / 100))
+        else:
+            parts.append(groups.agg(name))
+    return pd.concat(parts, axis=1).to_json(orient="split")
+
+
+def measure(call, repeat):
+    """``(mediana en s, pico de tracemalloc en bytes)`` de ``call``."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=float, default=90, help="Días de historial")
+    parser.add_argument("--period", type=float, default=60.0, help="Segundos entre lecturas")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-memory", action="store_true", help="Sin el camino con read_range y pandas")
+    args = parser.parse_args()
+
+    from flask import Flask
+
+    with tempfile.TemporaryDirectory() as root:
+        history = TimeSeriesStore(root)
+        start_ns = 1_700_006_400 * 10**9
+        fill(history, args.days, args.period, start_ns)
+        end_ns = history.last_timestamp(NODE) + 1
+        print(f"{args.days:.0f} días, {len(history.read_range(NODE)):,} lecturas de {len(SENSOR_COLUMNS)} columnas")
+
+        app = Flask(__name__)
+        app.register_blueprint(history_api.create_blueprint(lambda: history))
+        client = app.test_client()
+
+        for name, days, bucket, agg in QUERIES:
+            if days > args.days:
+                continue
+            query_start = end_ns - int(days * 86400e9)
+            url = (f"/api/history/{NODE}?columns={','.join(COLUMNS)}&start={query_start / 1e9}"
+                   f"&end={end_ns / 1e9}&bucket={bucket}&agg={agg}")
+
+            def get():
+                response = client.get(url)
+                assert response.status_code == 200, response.get_data(as_text=True)
+                return response.get_data()
+
+            def cold():
+                # Otro HistoryQueries: caché vacía
+                fresh = Flask(__name__)
+                fresh.register_blueprint(history_api.create_blueprint(lambda: history))
+                response = fresh.test_client().get(url)
+                assert response.status_code == 200
+                return response.get_data()
+
+            results = {"frío": measure(cold, args.repeat)}
+            get()
+            results["caché"] = measure(get, args.repeat)
+            if not args.no_memory:
+                aggregations = history_api.parse_aggregations(agg)
+                bucket_s = history_api.parse_duration(bucket)
+                results["memoria"] = measure(
+                    lambda: in_memory(history, query_start, end_ns, bucket_s, aggregations), args.repeat)
+            print(f"{name:<20s}" + "   ".join(f"{mode} {elapsed * 1e3:8.1f} ms ({peak / 2**20:6.1f} MiB)"
+                                             for mode, (elapsed, peak) in results.items()))
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
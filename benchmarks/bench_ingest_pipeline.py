@@ -0,0 +1,104 @@
+"""Ráfaga de reconexión: escritura directa contra la cola de ingesta con cada política.
+
+Simula que todos los nodos reconectan a la vez tras un corte del Wi-Fi:
+``--connections`` sockets mandan de golpe ``--rows`` lecturas ya codificadas
+al servidor con hilos (``threaded_server.py``), con un ``NodeStore`` completo
+(rollups, estadísticas y detector de anomalías). Informa lecturas/s
+atendidas (guardadas o descartadas), cuántas se guardaron y cuántas se
+descartaron, la profundidad máxima de la cola y el tamaño medio de los
+micro-lotes del escritor.
+
+Uso:
+    python benchmarks/bench_ingest_pipeline.py --rows 200000 --connections 64 --queue-rows 20000
+"""
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anomaly import AnomalyDetector  # noqa: E402
+from ingest_pipeline import POLICIES, IngestPipeline  # noqa: E402
+from node_store import NodeStore  # noqa: E402
+from rollup import RollupEngine  # noqa: E402
+from sensor_simulator import SensorSimulator, format_lines  # noqa: E402
+from streaming_stats import StreamingStats  # noqa: E402
+from threaded_server import SensorTCPHandler, SensorTCPServer  # noqa: E402
+
+
+def make_payloads(rows, nodes, connections):
+    simulator = SensorSimulator(nodes, seed=0, dropout=0.0, sensor_failure=0.0)
+    steps = -(-rows // nodes)
+    values = np.concatenate([simulator.step(k * 5.0)[1] for k in range(steps)])[:rows]
+    node = np.arange(len(values)) % nodes
+    names = np.array([f"nodo-{i}" for i in range(nodes)], dtype=object)
+    return [format_lines(values[node % connections == c], names[node[node % connections == c]])
+            for c in range(connections)]
+
+
+def run_case(payloads, rows, window, policy, queue_rows, flush_rows, flush_ms):
+    store = NodeStore(capacity=window, rollups=RollupEngine(), stats=StreamingStats(window),
+                      anomalies=AnomalyDetector())
+    pipeline = None
+    if policy != "direct":
+        pipeline = IngestPipeline(store, queue_rows, policy, flush_rows, flush_ms).start()
+    tcp = SensorTCPServer(("127.0.0.1", 0), SensorTCPHandler)
+    tcp.data_store = store
+    tcp.pipeline = pipeline
+    threading.Thread(target=tcp.serve_forever, daemon=True).start()
+    port = tcp.server_address[1]
+
+    senders = []
+    for payload in payloads:
+        def send(payload=payload):
+            with socket.create_connection(("127.0.0.1", port)) as sock:
+                sock.sendall(payload)
+        senders.append(threading.Thread(target=send))
+    start = time.perf_counter()
+    for sender in senders:
+        sender.start()
+    # Se espera a que cada lectura quede guardada o descartada
+    max_depth = 0
+    stored = dropped = 0
+    while stored + dropped < rows and time.perf_counter() - start < 600:
+        if pipeline is not None:
+            max_depth = max(max_depth, len(pipeline.queue))
+            dropped = pipeline.queue.dropped
+        stored = sum(store.stats.snapshot(node_id)["total"] for node_id in store.nodes())
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - start
+    if pipeline is not None:
+        pipeline.stop()
+    tcp.shutdown()
+    tcp.server_close()
+    return stored, dropped, elapsed, max_depth, (pipeline.flushes if pipeline is not None else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--nodes", type=int, default=2_000)
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--window", type=int, default=1_000)
+    parser.add_argument("--queue-rows", type=int, default=20_000)
+    parser.add_argument("--flush-rows", type=int, default=5_000)
+    parser.add_argument("--flush-ms", type=float, default=50.0)
+    parser.add_argument("--cases", nargs="+", default=["direct", *POLICIES], choices=["direct", *POLICIES])
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.rows, args.nodes, args.connections)
+    for case in args.cases:
+        stored, dropped, elapsed, depth, flushes = run_case(payloads, args.rows, args.window, case, args.queue_rows,
+                                                            args.flush_rows, args.flush_ms)
+        batch = f"   {stored / flushes:7.0f} lecturas/micro-lote" if flushes else ""
+        print(f"{case:<12s} {args.rows / elapsed:>10,.0f} lecturas/s   guardadas {stored:>8d}   "
+              f"descartadas {dropped:>8d}   cola máx. {depth:>7d}{batch}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Rendimiento del motor de riego con miles de nodos simulados.
+
+Lazo cerrado: ``SensorSimulator`` sin riego automático genera las lecturas
+de todos los nodos, ``IrrigationEngine`` las evalúa y los comandos ``regar``
+que salen de ``pull`` riegan el nodo simulado. Compara:
+
+* ``append``: ``append`` por nodo (el sink de ``NodeStore``) y ``flush`` al final del lote;
+* ``lote``: ``extend_batch`` con todos los nodos a la vez.
+
+Informa lecturas/s, ms por lote, comandos emitidos y la humedad de suelo
+mínima que llegó a tener algún nodo.
+
+Uso:
+    python benchmarks/bench_irrigation.py --nodes 1000 5000 10000 --days 2
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from irrigation import IrrigationEngine  # noqa: E402
+from sensor_simulator import SensorSimulator  # noqa: E402
+
+
+def run(n_nodes, steps, period, mode):
+    simulator = SensorSimulator(n_nodes, seed=0, auto_irrigate=False)
+    # Sin disparos por tamaño ni por tiempo: un flush por lote
+    engine = IrrigationEngine(flush_rows=n_nodes * 16 + 1, flush_interval_s=float("inf"))
+    node_ids = np.array([f"nodo-{i}" for i in range(n_nodes)], dtype=object)
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    elapsed = 0.0
+    driest = np.inf
+    for k in range(steps):
+        nodes, values = simulator.step(k * period)
+        timestamps = np.full(len(nodes), int(k * period * 1e9), dtype=np.int64)
+        start = time.perf_counter()
+        if mode == "lote":
+            engine.extend_batch(node_ids[nodes], timestamps, values)
+        else:
+            for i, node in enumerate(nodes):
+                engine.append(node_ids[node], timestamps[i:i + 1], values[i:i + 1])
+            engine.flush()
+        commands = engine.pull()
+        elapsed += time.perf_counter() - start
+        simulator.irrigate([index[command["node"]] for command in commands if command["action"] == "regar"])
+        driest = min(driest, simulator.soil.mean(axis=1).min())
+    return elapsed, engine.total_commands, driest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--days", type=float, default=1.0, help="Días simulados")
+    parser.add_argument("--period", type=float, default=300.0, help="Segundos simulados entre lecturas")
+    parser.add_argument("--modes", nargs="+", default=["append", "lote"], choices=["append", "lote"])
+    args = parser.parse_args()
+
+    steps = int(args.days * 86400 / args.period)
+    for n_nodes in args.nodes:
+        rows = n_nodes * steps
+        for mode in args.modes:
+            elapsed, commands, driest = run(n_nodes, steps, args.period, mode)
+            print(f"{n_nodes:>6d} nodos  {mode:<7s} {rows / elapsed:>10,.0f} lecturas/s "
+                  f"({elapsed / steps * 1e3:7.2f} ms/lote)   comandos {commands:>6d}   "
+                  f"suelo mínimo {driest:5.1f} %")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Microbenchmark: ingesta con pd.concat (enfoque anterior) vs SensorRingBuffer.
+
+Uso:
+    python benchmarks/bench_ring_buffer.py [--messages 2000] [--windows 100 10000 100000]
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ring_buffer import SensorRingBuffer  # noqa: E402
+from sensor_schema import SENSOR_COLUMNS  # noqa: E402
+
+
+def prefill_concat(window):
+    # Arranca con la ventana llena para medir el costo en régimen estacionario
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.uniform(0, 100, (window, len(SENSOR_COLUMNS))), columns=SENSOR_COLUMNS)
+    df.insert(0, "timestamp", pd.Timestamp.now())
+    return df
+
+
+def bench_concat_steady(rows, window):
+    data_df = prefill_concat(window)
+    start = time.perf_counter()
+    for row in rows:
+        new_data = {"timestamp": datetime.datetime.now(), **dict(zip(SENSOR_COLUMNS, row))}
+        data_df = pd.concat([data_df, pd.DataFrame([new_data])], ignore_index=True)
+        if len(data_df) > window:
+            data_df = data_df.iloc[-window:]
+    return time.perf_counter() - start
+
+
+def bench_ring_steady(rows, window):
+    buffer = SensorRingBuffer(capacity=window)
+    buffer.extend(np.zeros(window, dtype=np.int64), np.zeros((window, len(SENSOR_COLUMNS))))
+    start = time.perf_counter()
+    for row in rows:
+        buffer.append(time.time_ns(), row)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--windows", type=int, nargs="+", default=[100, 10_000, 100_000])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    rows = rng.uniform(0, 100, (args.messages, len(SENSOR_COLUMNS))).tolist()
+
+    print(f"{'ventana':>10} {'concat msg/s':>14} {'buffer msg/s':>14} {'aceleración':>12}")
+    for window in args.windows:
+        t_concat = bench_concat_steady(rows, window)
+        t_ring = bench_ring_steady(rows, window)
+        print(f"{window:>10} {args.messages / t_concat:>14,.0f} {args.messages / t_ring:>14,.0f} {t_concat / t_ring:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
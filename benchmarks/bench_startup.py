@@ -0,0 +1,82 @@
+"""Arranque en frío de cada entrada, medido con ``python -X importtime``.
+
+Cada caso importa, en un proceso nuevo, lo mismo que carga esa entrada
+antes de empezar a atender:
+
+* ``cli``: solo ``cli.py`` (lo que cuesta ``python cli.py <subcomando>`` antes de elegir);
+* ``ingest``: ``cli.py ingest`` con el servidor con hilos (``production`` y ``threaded_server``);
+* ``dashboard``: ``AnalisisDatos`` (Flask, Dash y plotly), que antes cargaba también la ingesta.
+
+Informa la mediana del tiempo de imports según ``-X importtime`` (sin lo
+que ya carga el intérprete vacío), el tiempo de reloj del proceso, los
+paquetes más pesados y cuáles de los pesados (Flask, Dash, plotly, pandas,
+matplotlib) quedaron cargados.
+
+Uso:
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = {
+    "cli": "import cli",
+    "ingest": "import production, threaded_server",
+    "dashboard": "import AnalisisDatos",
+}
+HEAVY = ("flask", "dash", "plotly", "pandas", "matplotlib")
+
+
+def import_times(code):
+    """``(µs de imports, {paquete: µs acumulados}, segundos de reloj)`` de un proceso nuevo."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    total = 0
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Los imports anidados vienen indentados: el total suma solo los de primer nivel
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+        package = name.strip().split(".")[0]
+        packages[package] = max(packages.get(package, 0), int(cumulative))
+    return total, packages, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=list(CASES))
+    parser.add_argument("--top", type=int, default=3, help="Paquetes más pesados que se muestran")
+    args = parser.parse_args()
+
+    # Lo que carga el intérprete vacío (site, .pth de los paquetes instalados) no es de la entrada
+    base_total, base_packages, base_wall = import_times("pass")
+    print(f"{'intérprete':<10s} imports {base_total / 1e3:7.1f} ms   proceso {base_wall * 1e3:7.1f} ms")
+    for case in args.cases:
+        totals, walls = [], []
+        for _ in range(args.repeat):
+            total, packages, elapsed = import_times(CASES[case])
+            totals.append(total)
+            walls.append(elapsed)
+        # Sin los módulos del caso (los incluyen a todos) ni el arranque del intérprete
+        skip = set(CASES[case].replace("import", "").replace(",", " ").split()) | set(base_packages)
+        heaviest = sorted(((name, us) for name, us in packages.items() if name not in skip),
+                          key=lambda item: -item[1])[:args.top]
+        loaded = [name for name in HEAVY if name in packages] or ["ninguno"]
+        print(f"{case:<10s} imports {(statistics.median(totals) - base_total) / 1e3:7.1f} ms   "
+              f"proceso {statistics.median(walls) * 1e3:7.1f} ms   pesados: {', '.join(loaded)}")
+        print(f"{'':<10s} más pesados: " + ", ".join(f"{name} {us / 1e3:.1f} ms" for name, us in heaviest))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark del historial en disco: velocidad de escritura y latencia de consultas por rango.
+
+Uso:
+    python benchmarks/bench_timeseries_store.py [--records 5000000] [--batch 1 100 1000]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sensor_schema import SENSOR_COLUMNS  # noqa: E402
+from timeseries_store import TimeSeriesStore  # noqa: E402
+
+SAMPLE_PERIOD_NS = 2 * 10**9  # un ESP32 envía cada 2 s
+
+
+def bench_writes(root, records, batch):
+    store = TimeSeriesStore(root)
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0, 100, (batch, len(SENSOR_COLUMNS)))
+    timestamps = np.arange(records, dtype=np.int64) * SAMPLE_PERIOD_NS
+    start = time.perf_counter()
+    for i in range(0, records, batch):
+        store.append("nodo-1", timestamps[i:i + batch], values[:len(timestamps[i:i + batch])])
+    store.close()
+    return records / (time.perf_counter() - start)
+
+
+def bench_range_scans(root, records, spans, repeats=20):
+    store = TimeSeriesStore(root)
+    rng = np.random.default_rng(1)
+    total_ns = records * SAMPLE_PERIOD_NS
+    results = []
+    for span_name, span_ns in spans:
+        span_ns = min(span_ns, total_ns)
+        latencies = []
+        rows = 0
+        for _ in range(repeats):
+            start_ns = int(rng.integers(0, total_ns - span_ns + 1))
+            t0 = time.perf_counter()
+            # Se recorre el rango por bloques y se reduce, como haría una consulta real
+            rows = 0
+            acc = 0.0
+            for chunk in store.iter_range("nodo-1", start_ns, start_ns + span_ns):
+                acc += float(chunk["humedad_suelo_1"].sum())
+                rows += len(chunk)
+            latencies.append(time.perf_counter() - t0)
+        results.append((span_name, rows, np.median(latencies) * 1000))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=2_000_000)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 100, 1000])
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_tsdb_")
+    try:
+        print("Escritura")
+        for batch in args.batch:
+            # Con lotes de 1 registro se mide una muestra menor para no tardar demasiado
+            records = args.records if batch > 1 else min(args.records, 200_000)
+            shutil.rmtree(root)
+            rate = bench_writes(root, records, batch)
+            print(f"  lote {batch:>6}: {rate:>14,.0f} registros/s")
+
+        shutil.rmtree(root)
+        bench_writes(root, args.records, 10_000)
+        days = args.records * SAMPLE_PERIOD_NS / 86400e9
+        print(f"Consultas por rango ({args.records:,} registros, {days:.1f} días de un nodo)")
+        spans = [("1 hora", 3600 * 10**9), ("1 día", 86400 * 10**9), ("7 días", 7 * 86400 * 10**9),
+                 ("30 días", 30 * 86400 * 10**9)]
+        for span_name, rows, median_ms in bench_range_scans(root, args.records, spans):
+            print(f"  {span_name:>8}: {rows:>10,} filas  mediana {median_ms:8.2f} ms")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Cuadros por segundo de la animación de ``tract.py`` con el backend Agg.
+
+Compara tres formas de dibujar cada cuadro:
+
+* ``recrear``: el esquema anterior, que borra y vuelve a crear los cuatro
+  vectores y las cuatro etiquetas y redibuja toda la figura;
+* ``en el lugar``: ``TrajectoryAnimation.draw_state`` y figura completa;
+* ``blit``: ``draw_state`` restaurando el fondo y dibujando solo los artistas
+  que cambian (lo que hace ``FuncAnimation(blit=True)``).
+
+Uso:
+    python benchmarks/bench_tract_animation.py --distance 15 --frames 200
+"""
+import argparse
+import os
+import sys
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tract  # noqa: E402
+
+
+def _recreate(anim, index, state):
+    # Réplica del update original: artistas nuevos en cada cuadro
+    ax = anim.ax
+    for artist in state:
+        artist.remove()
+    state.clear()
+    x, y = anim.x_vals[index], anim.y_vals[index]
+    vx, vy = anim.vx, anim.vy_vals[index]
+    anim.trajectory_line.set_data(anim.x_vals[:index], anim.y_vals[:index])
+    anim.position_dot.set_data([x], [y])
+    state.extend([
+        ax.quiver(x, y, vx, 0, angles='xy', scale_units='xy', scale=tract.escala_vectores, color='red'),
+        ax.quiver(x, y, 0, vy, angles='xy', scale_units='xy', scale=tract.escala_vectores, color='green'),
+        ax.quiver(x, y, vx, vy, angles='xy', scale_units='xy', scale=tract.escala_vectores, color='black'),
+        ax.quiver(0, 0, x, y, angles='xy', scale_units='xy', scale=1, color='pink'),
+        ax.text(x + vx * 0.1, y, 'v_x', color='red', fontsize=8),
+        ax.text(x, y + vy * 0.1, 'v_y', color='green', fontsize=8),
+        ax.text(x + vx * 0.1, y + vy * 0.1, 'v', color='black', fontsize=8),
+        ax.text(x / 2, y / 2, '  Posición', color='pink', fontsize=8),
+    ])
+    anim.time_text.set_text(f'Tiempo: {anim.t_vals[index]:.2f} s')
+    anim.velocity_text.set_text(f'Velocidad en x: {vx:.2f} m/s, Velocidad en y: {vy:.2f} m/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--distance", type=float, default=15.0)
+    parser.add_argument("--frames", type=int, default=200)
+    args = parser.parse_args()
+
+    anim = tract.TrajectoryAnimation(args.distance)
+    canvas = anim.fig.canvas
+    indices = [i % len(anim.t_vals) for i in range(args.frames)]
+
+    def run(label, step):
+        canvas.draw()
+        start = time.perf_counter()
+        for index in indices:
+            step(index)
+        elapsed = time.perf_counter() - start
+        print(f"{label:12s} {args.frames / elapsed:8.1f} cuadros/s")
+
+    state = []
+    anim.set_visible(True)
+
+    def recreate(index):
+        _recreate(anim, index, state)
+        canvas.draw()
+
+    def in_place(index):
+        anim.draw_state(index)
+        canvas.draw()
+
+    run("recrear", recreate)
+    for artist in state:
+        artist.remove()
+    run("en el lugar", in_place)
+
+    anim.set_visible(False)
+    canvas.draw()
+    background = canvas.copy_from_bbox(anim.ax.bbox)
+
+    def blit(index):
+        canvas.restore_region(background)
+        for artist in anim.draw_state(index):
+            anim.ax.draw_artist(artist)
+        canvas.blit(anim.ax.bbox)
+
+    start = time.perf_counter()
+    for index in indices:
+        blit(index)
+    print(f"{'blit':12s} {args.frames / (time.perf_counter() - start):8.1f} cuadros/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Throughput de ``trajectory_report``: resolución en lote y gráficos por segundo.
+
+Genera objetivos al azar, mide ``summarize`` (todos los objetivos en una
+pasada) y ``render_all`` con distinta cantidad de procesos y formatos. Los
+archivos se escriben en un directorio temporal que se borra al terminar.
+
+Uso:
+    python benchmarks/bench_trajectory_report.py --targets 200 --processes 1 2 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import trajectory_report  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", type=int, default=200)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--formats", nargs="+", choices=trajectory_report.FORMATS, default=["png", "pdf"])
+    parser.add_argument("--dpi", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    ids = [f"planta-{i:05d}" for i in range(args.targets)]
+    distances = rng.uniform(1, 60, args.targets)
+    velocities = rng.uniform(20, 30, args.targets)
+
+    start = time.perf_counter()
+    rows = trajectory_report.summarize(ids, distances, velocities)
+    elapsed = time.perf_counter() - start
+    print(f"resumen: {args.targets / elapsed:12.0f} objetivos/s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in args.formats:
+            for processes in args.processes:
+                output = os.path.join(tmp, f"{fmt}-{processes}" + (".pdf" if fmt == "pdf" else ""))
+                start = time.perf_counter()
+                count = trajectory_report.render_all(rows, output, fmt, processes, args.dpi)
+                elapsed = time.perf_counter() - start
+                print(f"{fmt:4s} {processes:3d} procesos: {count / elapsed:8.1f} gráficos/s")
+
+
+if __name__ == "__main__":
+    main()
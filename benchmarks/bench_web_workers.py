@@ -0,0 +1,143 @@
+"""Requests/s del dashboard según la cantidad de workers web.
+
+Crea un segmento ``SharedNodeStore`` con varios nodos, lo mantiene
+actualizado desde un hilo escritor (como el proceso de ingesta) y levanta
+el pool de workers de ``production.py``. Varios procesos cliente llaman en
+bucle al callback periódico ``update_graphs`` (``/_dash-update-component``)
+y se mide el throughput y la latencia para cada cantidad de workers.
+
+Uso:
+    python benchmarks/bench_web_workers.py --workers 1 2 4 8 --clients 16 --duration 10
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from production import listen, start_web_workers  # noqa: E402
+from sensor_schema import SENSOR_COLUMNS  # noqa: E402
+from shared_store import SharedNodeStore  # noqa: E402
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, json.dumps(payload).encode(), {"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+
+def _callback_payload(dependency, inputs, state=()):
+    # Formato de las llamadas que hace el navegador a /_dash-update-component
+    outputs = []
+    for output in dependency["output"].strip(".").split("..."):
+        component, prop = output.rsplit(".", 1)
+        outputs.append({"id": component, "property": prop.split("@")[0]})
+    return {
+        "output": dependency["output"],
+        "outputs": outputs,
+        "inputs": [{"id": i, "property": p, "value": v} for i, p, v in inputs],
+        "state": [{"id": i, "property": p, "value": v} for i, p, v in state],
+        "changedPropIds": [f"{inputs[0][0]}.{inputs[0][1]}"],
+    }
+
+
+def _client(base_url, payload, duration, results):
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        _post(base_url + "/_dash-update-component", payload)
+        latencies.append(time.perf_counter() - start)
+    results.put(latencies)
+
+
+def _writer(store, nodes, stop):
+    rng = np.random.default_rng(0)
+    while not stop.is_set():
+        now = time.time_ns()
+        for node_id in nodes:
+            store.append(node_id, now, rng.normal(25, 5, len(SENSOR_COLUMNS)))
+        time.sleep(0.1)
+
+
+def _wait_ready(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return json.load(urllib.request.urlopen(base_url + "/_dash-dependencies"))
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def bench(workers, clients, duration, nodes, port):
+    store = SharedNodeStore.create(f"bench_web_{os.getpid()}", max_nodes=max(nodes, 1), capacity=100)
+    node_ids = [f"nodo-{i}" for i in range(nodes)]
+    stop = threading.Event()
+    writer = threading.Thread(target=_writer, args=(store, node_ids, stop), daemon=True)
+    sock = listen("127.0.0.1", port)
+    processes = []
+    try:
+        # Una ventana llena en cada nodo antes de empezar
+        now = time.time_ns()
+        for node_id in node_ids:
+            store.extend(node_id, now - np.arange(100)[::-1] * 10**9, np.full((100, len(SENSOR_COLUMNS)), 25.0))
+        writer.start()
+        processes = start_web_workers(store.name, sock, workers)
+        base_url = f"http://127.0.0.1:{port}"
+        dependencies = _wait_ready(base_url)
+        reset = next(d for d in dependencies if ".figure" in d["output"])
+        update = next(d for d in dependencies if ".extendData" in d["output"])
+
+        # Estado inicial del gráfico, como lo obtiene el navegador al elegir un nodo
+        response = _post(base_url + "/_dash-update-component", _callback_payload(
+            reset, [("node-selector", "value", node_ids[0]), ("time-range", "value", 300)]))
+        state = response["response"]["graph-state"]["data"]
+        payload = _callback_payload(update, [("interval-component", "n_intervals", 1)],
+                                    [("graph-state", "data", state)])
+
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        client_processes = [context.Process(target=_client, args=(base_url, payload, duration, results))
+                            for _ in range(clients)]
+        for process in client_processes:
+            process.start()
+        latencies = np.concatenate([results.get() for _ in client_processes])
+        for process in client_processes:
+            process.join()
+    finally:
+        stop.set()
+        for process in processes:
+            process.terminate()
+            process.join()
+        sock.close()
+        store.close()
+        store.unlink()
+    return len(latencies) / duration, np.percentile(latencies, 50) * 1e3, np.percentile(latencies, 99) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=16, help="Procesos cliente concurrentes")
+    parser.add_argument("--duration", type=float, default=5.0, help="Segundos por medición")
+    parser.add_argument("--nodes", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'req/s':>10} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    for workers in args.workers:
+        rate, p50, p99 = bench(workers, args.clients, args.duration, args.nodes, args.port)
+        print(f"{workers:>8} {rate:>10.0f} {p50:>10.1f} {p99:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
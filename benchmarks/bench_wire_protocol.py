@@ -0,0 +1,64 @@
+"""Decodificación de lecturas: CSV (``LineFramer``) contra tramas binarias (``BinaryFramer``).
+
+Codifica lecturas de ``SensorSimulator`` en los dos formatos y las pasa por
+el framer en bloques del tamaño de un ``recv`` (como llegan del socket).
+Informa lecturas/s decodificadas y bytes por lectura.
+
+Uso:
+    python benchmarks/bench_wire_protocol.py --rows 200000 --recv-size 4096 65536
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from framing import LineFramer  # noqa: E402
+from ingest import RECV_SIZE  # noqa: E402
+from sensor_simulator import SensorSimulator, format_lines  # noqa: E402
+from wire_protocol import BinaryFramer, encode_frames  # noqa: E402
+
+
+def decode(framer, payload, recv_size):
+    start = time.perf_counter()
+    rows = 0
+    for i in range(0, len(payload), recv_size):
+        rows += len(framer.feed(payload[i:i + recv_size])[1])
+    rows += len(framer.flush()[1])
+    return rows, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--nodes", type=int, default=100)
+    parser.add_argument("--recv-size", type=int, nargs="+", default=[RECV_SIZE, 65536])
+    args = parser.parse_args()
+
+    simulator = SensorSimulator(args.nodes, seed=0, dropout=0.0, sensor_failure=0.0)
+    steps = -(-args.rows // args.nodes)
+    values = np.concatenate([simulator.step(k * 5.0)[1] for k in range(steps)])[:args.rows]
+    node_ids = np.array([f"nodo-{i}" for i in range(args.nodes)], dtype=object)[np.arange(len(values)) % args.nodes]
+    seq = np.arange(len(values)) // args.nodes
+
+    payloads = {
+        "csv": format_lines(values, node_ids),
+        "binario": encode_frames(values, node_ids, seq, seq * 5000),
+    }
+    framers = {"csv": lambda: LineFramer(stats=None), "binario": lambda: BinaryFramer(stats=None)}
+    for recv_size in args.recv_size:
+        rates = {}
+        for name, payload in payloads.items():
+            rows, elapsed = decode(framers[name](), payload, recv_size)
+            assert rows == len(values), (name, rows)
+            rates[name] = rows / elapsed
+            print(f"recv de {recv_size:>6d} B  {name:<8s} {rates[name]:>12,.0f} lecturas/s   "
+                  f"{len(payload) / len(values):5.1f} B/lectura")
+        print(f"{'':>18s} binario/csv: x{rates['binario'] / rates['csv']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Generador de carga: simula N nodos ESP32 enviando lecturas por TCP.
+
+Levanta el servidor elegido (con hilos o asyncio) en un proceso hijo, abre N
+conexiones concurrentes y mide mensajes por segundo y la latencia de ingesta
+(desde que el nodo envía la línea hasta que queda guardada en el buffer).
+
+Cada línea empieza con el identificador del nodo simulado y su último campo
+(``promedio_temperatura``) lleva la hora de envío, así el servidor puede
+calcular la latencia sin cambiar el formato de los 10 valores.
+
+Uso:
+    python benchmarks/load_generator.py --server async --nodes 1000 --rate 1 --duration 20
+
+Con miles de nodos puede hacer falta subir el límite de descriptores (``ulimit -n``).
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from node_store import NodeStore  # noqa: E402
+from ring_buffer import SensorRingBuffer  # noqa: E402
+
+
+class LatencyRecordingBuffer(SensorRingBuffer):
+    """Buffer que además registra la latencia de cada lectura guardada.
+
+    Las mediciones son atributos de clase: se juntan las de todos los nodos.
+    """
+
+    latencies = []
+    first_arrival = None
+    last_arrival = None
+
+    def extend(self, timestamps_ns, values):
+        now = time.time()
+        cls = LatencyRecordingBuffer
+        cls.latencies.extend((now - np.asarray(values)[:, -1]).tolist())
+        if cls.first_arrival is None:
+            cls.first_arrival = now
+        cls.last_arrival = now
+        super().extend(timestamps_ns, values)
+
+
+def _run_server(kind, port, window, conn):
+    # Los servidores imprimen cada mensaje; eso no es parte de lo que se mide
+    sys.stdout = open(os.devnull, "w")
+    store = NodeStore(window, buffer_factory=LatencyRecordingBuffer)
+    if kind == "async":
+        from async_server import start_async_server
+        target = start_async_server
+    else:
+        from threaded_server import start_tcp_server
+        target = start_tcp_server
+    threading.Thread(target=target, kwargs={"store": store, "port": port}, daemon=True).start()
+    conn.send("ready")
+    conn.recv()  # espera la orden de terminar
+    conn.send((LatencyRecordingBuffer.latencies, LatencyRecordingBuffer.first_arrival,
+               LatencyRecordingBuffer.last_arrival))
+
+
+async def _node(node_id, host, port, rate, stop_at, sent, errors):
+    # Desfase aleatorio para que los nodos no envíen todos al mismo tiempo
+    await asyncio.sleep(random.uniform(0, 1 / rate))
+    for _ in range(50):
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            break
+        except OSError:
+            await asyncio.sleep(0.1)
+    else:
+        errors[0] += 1
+        return
+    values = ",".join([node_id] + [f"{v:.2f}" for v in np.random.uniform(15, 80, 9)])
+    interval = 1 / rate
+    next_send = time.perf_counter()
+    try:
+        while time.perf_counter() < stop_at:
+            writer.write(f"{values},{time.time()!r}\n".encode())
+            await writer.drain()
+            sent[0] += 1
+            next_send += interval
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+    except ConnectionError:
+        errors[0] += 1
+    finally:
+        writer.close()
+
+
+async def _run_nodes(host, port, nodes, rate, duration):
+    sent = [0]
+    errors = [0]
+    stop_at = time.perf_counter() + duration
+    await asyncio.gather(*(_node(f"nodo-{i}", host, port, rate, stop_at, sent, errors) for i in range(nodes)))
+    return sent[0], errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", choices=["threaded", "async"], default="async")
+    parser.add_argument("--nodes", type=int, default=100, help="Cantidad de nodos simulados")
+    parser.add_argument("--rate", type=float, default=1.0, help="Mensajes por segundo de cada nodo")
+    parser.add_argument("--duration", type=float, default=10.0, help="Duración de la prueba en segundos")
+    parser.add_argument("--port", type=int, default=12399)
+    parser.add_argument("--window", type=int, default=1000, help="Ventana por nodo")
+    args = parser.parse_args()
+
+    parent_conn, child_conn = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=_run_server, args=(args.server, args.port, args.window, child_conn), daemon=True)
+    server.start()
+    if not parent_conn.poll(30):
+        server.terminate()
+        sys.exit("El servidor no arrancó")
+    parent_conn.recv()
+
+    sent, errors = asyncio.run(_run_nodes("127.0.0.1", args.port, args.nodes, args.rate, args.duration))
+    time.sleep(0.5)  # deja que el servidor termine de procesar lo que está en vuelo
+    parent_conn.send("stop")
+    latencies, first_arrival, last_arrival = parent_conn.recv()
+    server.terminate()
+
+    received = len(latencies)
+    elapsed = (last_arrival - first_arrival) if received > 1 else float("nan")
+    latencies_ms = np.array(latencies) * 1000
+    print(f"servidor: {args.server}  nodos: {args.nodes}  tasa por nodo: {args.rate}/s")
+    print(f"enviados: {sent}  guardados: {received}  conexiones con error: {errors}")
+    print(f"mensajes/s: {received / elapsed:,.0f}")
+    if received:
+        print(f"latencia p50: {np.percentile(latencies_ms, 50):.2f} ms  "
+              f"p99: {np.percentile(latencies_ms, 99):.2f} ms  max: {latencies_ms.max():.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
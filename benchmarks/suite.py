@@ -0,0 +1,299 @@
+"""Suite de benchmarks de punta a punta: ingesta TCP, almacenamiento y dashboard.
+
+Para cada combinación de cantidad de nodos y tamaño de ventana mide, cada
+una en un proceso nuevo (para que el pico de memoria sea el de ese caso):
+
+* ``ingest``: lecturas por segundo que guarda ``SensorTCPHandler`` (el
+  servidor con hilos de ``threaded_server``) recibiendo de
+  ``sensor_simulator`` por sockets TCP reales, como harían los ESP32;
+* ``dashboard``: latencia (p50/p99) de ``update_graphs`` de
+  ``AnalisisDatos.py`` y de ``Datos_De_Prueba.py`` (este solo con 1 nodo)
+  con la ventana llena, tamaño en bytes del JSON que se envía por tick y
+  la carga inicial (``reset_graphs`` o el primer tick);
+* el pico de memoria residente (RSS) de cada proceso.
+
+Los casos cuyo consumo estimado supera ``--max-memory-mb`` se registran como
+omitidos. Los resultados se escriben en JSON (con el commit de git y la
+versión de Python) para comparar entre versiones.
+
+Uso:
+    python benchmarks/suite.py --nodes 1 100 1000 --windows 100 10000 1000000 --output resultados.json
+    python benchmarks/suite.py --quick
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sensor_schema import SENSOR_COLUMNS  # noqa: E402
+import sensor_simulator  # noqa: E402
+
+SAMPLE_PERIOD_NS = 2 * 10**9  # un ESP32 envía cada 2 s
+# Bytes por fila guardada: buffer espejado (x2), timestamps y estadísticas de ventana
+BYTES_PER_ROW = 2 * (len(SENSOR_COLUMNS) + 1) * 8 + len(SENSOR_COLUMNS) * 8
+# Por nodo, independiente de la ventana: niveles de rollup preasignados y estructuras de Python
+NODE_OVERHEAD_BYTES = 2 * 2**20
+# Lecturas distintas que se generan para llenar las ventanas (se reutilizan entre nodos)
+FILL_POOL = 10_000
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KiB; macOS, bytes
+    return peak / 1024 if sys.platform != "darwin" else peak / 2**20
+
+
+def percentiles(samples_s):
+    samples_ms = np.asarray(samples_s) * 1000
+    return {"p50_ms": float(np.percentile(samples_ms, 50)), "p99_ms": float(np.percentile(samples_ms, 99)),
+            "max_ms": float(samples_ms.max())}
+
+
+def payload_bytes(outputs):
+    import plotly
+
+    return len(json.dumps(outputs, cls=plotly.utils.PlotlyJSONEncoder).encode())
+
+
+def fill_rows(rows, seed=0):
+    """``rows`` lecturas realistas; para ventanas grandes se repite un bloque de ``FILL_POOL``."""
+    simulator = sensor_simulator.SensorSimulator(min(rows, FILL_POOL), seed, dropout=0.0, sensor_failure=0.0)
+    _, values = simulator.step(0.0)
+    return np.resize(values, (rows, values.shape[1]))
+
+
+def fill_store(store, n_nodes, window, seed=0):
+    """Llena la ventana de cada nodo con lecturas del simulador; devuelve filas/s."""
+    end_ns = time.time_ns()
+    timestamps = end_ns - (window - np.arange(window, dtype=np.int64)) * SAMPLE_PERIOD_NS
+    values = fill_rows(window, seed)
+    chunk = max(1, min(window, 100_000))
+    start = time.perf_counter()
+    for i in range(n_nodes):
+        for first in range(0, window, chunk):
+            store.extend(f"nodo-{i}", timestamps[first:first + chunk], values[first:first + chunk])
+    return n_nodes * window / (time.perf_counter() - start)
+
+
+def _tick(store, n_nodes, simulator, tick):
+    # Lo que llega entre dos ticks del dashboard: una lectura por nodo
+    now = time.time_ns()
+    _, values = simulator.step(1e9 + tick * 2.0)
+    for i in range(n_nodes):
+        store.append(f"nodo-{i}", now, values[i])
+
+
+def bench_dashboard(n_nodes, window, ticks):
+    """Latencia y payload de los callbacks con la ventana llena (corre en un proceso propio)."""
+    from node_store import NodeStore
+    from rollup import RollupEngine
+    from streaming_stats import StreamingStats
+    import AnalisisDatos
+
+    result = {"kind": "dashboard", "nodes": n_nodes, "window": window}
+    store = NodeStore(capacity=window, rollups=RollupEngine(), stats=StreamingStats(window))
+    result["store_rows_per_s"] = fill_store(store, n_nodes, window)
+    AnalisisDatos.data_store = store
+    AnalisisDatos.WINDOW_SIZE = window
+    simulator = sensor_simulator.SensorSimulator(n_nodes, 1, dropout=0.0, sensor_failure=0.0)
+
+    start = time.perf_counter()
+    figures = AnalisisDatos.reset_graphs("nodo-0", 300)
+    result["analisis_initial_ms"] = (time.perf_counter() - start) * 1000
+    result["analisis_initial_bytes"] = payload_bytes(figures)
+    state = figures[2]
+    latencies, sizes = [], []
+    for tick in range(ticks):
+        _tick(store, n_nodes, simulator, tick)
+        start = time.perf_counter()
+        outputs = AnalisisDatos.update_graphs(tick, state)
+        latencies.append(time.perf_counter() - start)
+        sizes.append(payload_bytes(outputs))
+        if isinstance(outputs[2], dict):
+            state = outputs[2]
+    result["analisis_update"] = percentiles(latencies)
+    result["analisis_tick_bytes"] = float(np.mean(sizes))
+
+    if n_nodes == 1:
+        import Datos_De_Prueba
+
+        # Reemplaza su store (ventana fija de 100) por uno del tamaño pedido, ya lleno
+        sim_store = NodeStore(capacity=window, rollups=RollupEngine(), stats=StreamingStats(window))
+        end_ns = time.time_ns()
+        sim_store.extend(Datos_De_Prueba.SIM_NODE,
+                         end_ns - (window - np.arange(window, dtype=np.int64)) * SAMPLE_PERIOD_NS, fill_rows(window, 2))
+        Datos_De_Prueba.data_store = sim_store
+        start = time.perf_counter()
+        outputs = Datos_De_Prueba.update_graphs(0, None)
+        result["prueba_initial_ms"] = (time.perf_counter() - start) * 1000
+        result["prueba_initial_bytes"] = payload_bytes(outputs)
+        state = outputs[2]
+        latencies, sizes = [], []
+        for tick in range(1, ticks + 1):
+            # update_graphs genera su propia lectura simulada en cada tick
+            start = time.perf_counter()
+            outputs = Datos_De_Prueba.update_graphs(tick, state)
+            latencies.append(time.perf_counter() - start)
+            sizes.append(payload_bytes(outputs))
+            state = outputs[2]
+        result["prueba_update"] = percentiles(latencies)
+        result["prueba_tick_bytes"] = float(np.mean(sizes))
+    return result
+
+
+def bench_ingest(n_nodes, window, rows, timeout=120.0):
+    """Lecturas/s guardadas por el servidor TCP con hilos (corre en un proceso propio)."""
+    from node_store import NodeStore
+    from framing import frame_stats
+    from threaded_server import SensorTCPHandler, SensorTCPServer
+
+    store = NodeStore(capacity=window)
+    tcp = SensorTCPServer(("127.0.0.1", 0), SensorTCPHandler)
+    tcp.data_store = store
+    port = tcp.server_address[1]
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")  # nada de lo que imprima el servidor es parte de la medición
+    threading.Thread(target=tcp.serve_forever, daemon=True).start()
+    try:
+        # Lecturas del simulador ya formateadas: se mide el servidor, no el generador
+        names = np.array([f"nodo-{i}" for i in range(n_nodes)], dtype=object)
+        values = fill_rows(rows)
+        nodes = np.arange(rows) % n_nodes
+        n_sockets = min(n_nodes, 32)
+        # El socket de cada nodo es fijo, como en sensor_simulator.run
+        payloads = [sensor_simulator.format_lines(values[nodes % n_sockets == slot],
+                                                  names[nodes[nodes % n_sockets == slot]])
+                    for slot in range(n_sockets)]
+        produced = rows
+
+        def send(data):
+            with socket.create_connection(("127.0.0.1", port)) as sock:
+                sock.sendall(data)
+
+        before = frame_stats.snapshot()["frames"]
+        start = time.perf_counter()
+        senders = [threading.Thread(target=send, args=(data,)) for data in payloads]
+        for sender in senders:
+            sender.start()
+        for sender in senders:
+            sender.join()
+        deadline = start + timeout
+        while frame_stats.snapshot()["frames"] - before < produced and time.perf_counter() < deadline:
+            time.sleep(0.005)
+        elapsed = time.perf_counter() - start
+        stored = frame_stats.snapshot()["frames"] - before
+    finally:
+        tcp.shutdown()
+        tcp.server_close()
+        sys.stdout.close()
+        sys.stdout = stdout
+    return {"kind": "ingest", "nodes": n_nodes, "window": window, "rows": produced, "stored": stored,
+            "connections": n_sockets, "elapsed_s": elapsed, "rows_per_s": stored / elapsed}
+
+
+def _child(conn, fn, args):
+    try:
+        result = fn(*args)
+        result["peak_rss_mb"] = peak_rss_mb()
+        conn.send(result)
+    except Exception as e:  # el error queda en el JSON en lugar de cortar la suite
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+
+
+def run_isolated(fn, *args):
+    context = multiprocessing.get_context("spawn")
+    parent, child = context.Pipe()
+    process = context.Process(target=_child, args=(child, fn, args))
+    process.start()
+    result = parent.recv()
+    process.join()
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--windows", type=int, nargs="+", default=[100, 10_000, 1_000_000])
+    parser.add_argument("--ingest-rows", type=int, default=200_000, help="Lecturas enviadas en cada prueba de ingesta")
+    parser.add_argument("--ticks", type=int, default=50, help="Ticks del dashboard por caso")
+    parser.add_argument("--max-memory-mb", type=float, default=4096)
+    parser.add_argument("--only", choices=["ingest", "dashboard"], default=None)
+    parser.add_argument("--quick", action="store_true", help="Escala reducida para una verificación rápida")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+    if args.quick:
+        args.nodes, args.windows, args.ingest_rows, args.ticks = [1, 100], [100, 10_000], 20_000, 10
+
+    report = {
+        "suite": "sensores",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": [],
+    }
+    for n_nodes in args.nodes:
+        for window in args.windows:
+            estimated_mb = n_nodes * (window * BYTES_PER_ROW + NODE_OVERHEAD_BYTES) / 2**20
+            cases = []
+            if args.only in (None, "ingest"):
+                cases.append(("ingest", bench_ingest, (n_nodes, window, args.ingest_rows)))
+            if args.only in (None, "dashboard"):
+                cases.append(("dashboard", bench_dashboard, (n_nodes, window, args.ticks)))
+            for kind, fn, fn_args in cases:
+                if estimated_mb > args.max_memory_mb:
+                    result = {"kind": kind, "nodes": n_nodes, "window": window,
+                              "skipped": f"memoria estimada {estimated_mb:.0f} MB > {args.max_memory_mb:.0f} MB"}
+                else:
+                    result = dict(run_isolated(fn, *fn_args), kind=kind, nodes=n_nodes, window=window)
+                report["results"].append(result)
+                print(_summary_line(result), flush=True)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados en {args.output}")
+
+
+def _summary_line(result):
+    head = f"{result['kind']:9s} nodos={result['nodes']:<5d} ventana={result['window']:<8d}"
+    if "skipped" in result:
+        return f"{head} omitido ({result['skipped']})"
+    if "error" in result:
+        return f"{head} error: {result['error']}"
+    rss = result.get("peak_rss_mb")
+    rss = f"  RSS {rss:.0f} MB" if rss is not None else ""
+    if result["kind"] == "ingest":
+        return f"{head} {result['rows_per_s']:10,.0f} lecturas/s{rss}"
+    line = (f"{head} update p50 {result['analisis_update']['p50_ms']:.2f} ms "
+            f"p99 {result['analisis_update']['p99_ms']:.2f} ms, {result['analisis_tick_bytes']:.0f} B/tick")
+    if "prueba_update" in result:
+        line += f"; prueba p50 {result['prueba_update']['p50_ms']:.2f} ms, {result['prueba_tick_bytes']:.0f} B/tick"
+    return line + rss
+
+
+if __name__ == "__main__":
+    main()
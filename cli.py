@@ -0,0 +1,116 @@
+"""Punto de entrada con subcomandos para cada parte del sistema.
+
+    python cli.py ingest --port 12345 --shm-name sensores
+    python cli.py dashboard --shm-name sensores --web-port 8050
+    python cli.py simulate --nodos 50 --tasa 100
+    python cli.py trajectory --distancia 15
+
+``ingest`` solo recibe datos de los ESP32 y los escribe en un segmento de
+memoria compartida (``SharedNodeStore``) y en el historial, y sirve las
+alertas y el riego en ``--metrics-port``; ``dashboard`` sirve el dashboard
+de AnalisisDatos.py leyendo el segmento, el historial y ese puerto, así cada
+parte se puede reiniciar por separado. ``simulate`` y ``trajectory`` son ``sensor_simulator.py`` y
+``tract.py``. ``python cli.py <subcomando> --help`` muestra sus opciones.
+
+Este módulo no importa nada pesado ni arranca nada al importarse: cada
+subcomando importa lo que usa cuando se ejecuta. La ingesta no carga Flask,
+Dash ni plotly (``benchmarks/bench_startup.py`` mide el arranque con
+``python -X importtime``).
+"""
+import argparse
+import logging
+import signal
+import sys
+
+PROG = "cli.py"
+
+
+def ingest(argv):
+    import production
+
+    parser = argparse.ArgumentParser(prog=f"{PROG} ingest",
+                                     description="Solo ingesta: TCP de los ESP32 a memoria compartida")
+    production.add_ingest_arguments(parser)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    from ingest import WINDOW_SIZE
+    from shared_store import SharedNodeStore
+
+    store = SharedNodeStore.create(args.shm_name, max_nodes=args.max_nodes, capacity=WINDOW_SIZE)
+    # Con SIGTERM (el de los gestores de servicios) también se libera el segmento
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        production.run_ingest(**production.ingest_kwargs(args))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
+        store.unlink()
+
+
+def dashboard(argv):
+    import production
+
+    parser = argparse.ArgumentParser(prog=f"{PROG} dashboard",
+                                     description="Solo dashboard, leyendo la memoria compartida de la ingesta")
+    parser.add_argument("--shm-name", default=production.DEFAULT_SHM_NAME,
+                        help="Segmento creado por el proceso de ingesta")
+    parser.add_argument("--web-host", default=production.DEFAULT_HOST)
+    parser.add_argument("--web-port", type=int, default=production.DEFAULT_WEB_PORT)
+    parser.add_argument("--data-dir", default=production.DEFAULT_DATA_DIR,
+                        help="Historial que escribe la ingesta (solo lectura)")
+    parser.add_argument("--no-history", action="store_true", help="Sin /api/history")
+    parser.add_argument("--metrics-port", type=int, default=production.DEFAULT_METRICS_PORT,
+                        help="Puerto de /metrics de la ingesta, con las alertas y el riego (0: sin ellos)")
+    parser.add_argument("--threaded", action="store_true", help="Atender requests en hilos")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    try:
+        server = production.create_server(args.shm_name, None if args.no_history else args.data_dir,
+                                          production.ingest_url(args.metrics_port))
+    except FileNotFoundError:
+        parser.error(f"No existe el segmento {args.shm_name!r}: primero inicie `{PROG} ingest`")
+    from werkzeug.serving import make_server
+
+    # Un log por request sería más costoso que el request mismo
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    print(f"Dashboard en http://{args.web_host}:{args.web_port}")
+    try:
+        make_server(args.web_host, args.web_port, server, threaded=args.threaded).serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def simulate(argv):
+    import sensor_simulator
+
+    sensor_simulator.main(argv, prog=f"{PROG} simulate")
+
+
+def trajectory(argv):
+    import tract
+
+    tract.main(argv, prog=f"{PROG} trajectory")
+
+
+COMMANDS = {
+    "ingest": ingest,
+    "dashboard": dashboard,
+    "simulate": simulate,
+    "trajectory": trajectory,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog=PROG, description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=COMMANDS, metavar="subcomando", help=", ".join(COMMANDS))
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Opciones del subcomando")
+    args = parser.parse_args(argv)
+    COMMANDS[args.command](args.args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
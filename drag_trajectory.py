@@ -0,0 +1,335 @@
+"""Trayectorias con rozamiento cuadrático y viento, integradas numéricamente.
+
+El chorro de agua de la boquilla de riego se frena mucho en el aire, así que
+la parábola de ``ballistics`` no alcanza. El modelo es
+
+    dv/dt = (0, −g) − k·|v − w|·(v − w)
+
+con ``k = ½·ρ_aire·Cd·A / m`` (1/m, ver ``sphere_drag_k``) y ``w = (wind, 0)``
+el viento horizontal (positivo a favor del tiro).
+
+- ``integrate``: una trayectoria con ``scipy.integrate.solve_ivp`` (RK45) y un
+  evento que detecta el impacto con el suelo.
+- ``solve_angle``: ángulo (bajo o alto) para una distancia objetivo, buscando
+  la raíz con ``brentq``.
+- ``impact_batch`` y ``solve``: muchas condiciones de lanzamiento a la vez.
+  Un Dormand–Prince 5(4) propio avanza todas las trayectorias como arreglos,
+  cada una con su propio paso adaptativo; ``solve`` devuelve las mismas
+  claves que ``ballistics.solve``.
+"""
+import numpy as np
+from scipy.integrate import solve_ivp
+from scipy.optimize import brentq, minimize_scalar
+
+from ballistics import G
+
+# Tolerancias de los integradores (relativa y absoluta, en m y m/s)
+RTOL = 1e-6
+ATOL = 1e-6
+
+# Tableau de Dormand–Prince 5(4), el mismo par que usa RK45 de scipy
+_A = (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+    (35 / 384, 0.0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84),
+)
+# Diferencia entre la solución de orden 5 y la de orden 4 (estimación del error)
+_E = (71 / 57600, 0.0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40)
+
+
+def sphere_drag_k(diameter_m, cd=0.47, air_density=1.225, density=1000.0):
+    """Coeficiente ``k`` (1/m) de una gota esférica de agua de diámetro ``diameter_m``."""
+    return 3.0 * air_density * cd / (4.0 * density * np.asarray(diameter_m, dtype=np.float64))
+
+
+def _acceleration(vx, vy, k, wind, g):
+    rx = vx - wind
+    speed = np.sqrt(rx * rx + vy * vy)
+    return -k * speed * rx, -g - k * speed * vy
+
+
+def integrate(theta, v0, k, wind=0.0, g=G, n_points=500, rtol=RTOL, atol=ATOL):
+    """Integra una trayectoria hasta el impacto; devuelve muestras y resultados.
+
+    El diccionario tiene ``t``, ``x``, ``y``, ``vx``, ``vy`` (``n_points``
+    muestras uniformes en el tiempo) y ``impact_x``, ``flight_time``, ``apex``.
+    """
+    def rhs(t, state):
+        ax, ay = _acceleration(state[2], state[3], k, wind, g)
+        return [state[2], state[3], ax, ay]
+
+    def ground(t, state):
+        return state[1]
+
+    ground.terminal = True
+    ground.direction = -1
+
+    def crest(t, state):
+        return state[3]
+
+    crest.direction = -1
+
+    state0 = [0.0, 0.0, v0 * np.cos(theta), v0 * np.sin(theta)]
+    # Cota del tiempo de vuelo: el tiro sin rozamiento siempre dura más
+    t_max = 2.0 * v0 / g + 1.0
+    solution = solve_ivp(rhs, (0.0, t_max), state0, method="RK45", events=(ground, crest),
+                         dense_output=True, rtol=rtol, atol=atol)
+    flight_time = solution.t_events[0][0] if len(solution.t_events[0]) else solution.t[-1]
+    t = np.linspace(0.0, flight_time, n_points)
+    x, y, vx, vy = solution.sol(t)
+    y = np.maximum(y, 0.0)
+    return {
+        "t": t, "x": x, "y": y, "vx": vx, "vy": vy,
+        "impact_x": x[-1],
+        "flight_time": flight_time,
+        "apex": solution.y_events[1][0][1] if len(solution.t_events[1]) else 0.0,
+    }
+
+
+def _max_range_angle(range_of, lo=0.0, hi=0.5 * np.pi):
+    result = minimize_scalar(lambda theta: -range_of(theta), bounds=(lo, hi), method="bounded",
+                             options={"xatol": 1e-8})
+    return result.x, -result.fun
+
+
+def solve_angle(x_target, v0, k, wind=0.0, g=G, branch="low"):
+    """Ángulo (rad) que lleva el chorro a ``x_target``, o ``None`` si no alcanza.
+
+    Con rozamiento el alcance ya no es simétrico respecto de 45°: primero se
+    busca el ángulo de alcance máximo y luego la raíz en el tramo pedido
+    (``branch="low"`` o ``"high"``).
+    """
+    def range_of(theta):
+        return integrate(theta, v0, k, wind, g, n_points=2)["impact_x"]
+
+    theta_max, range_max = _max_range_angle(range_of)
+    if x_target > range_max:
+        return None
+    if branch == "low":
+        lo, hi = 0.0, theta_max
+    else:
+        lo, hi = theta_max, 0.5 * np.pi
+    f_lo = range_of(lo) - x_target
+    f_hi = range_of(hi) - x_target
+    if f_lo * f_hi > 0:
+        return None
+    return brentq(lambda theta: range_of(theta) - x_target, lo, hi, xtol=1e-10)
+
+
+def impact_batch(theta, v0, k, wind=0.0, g=G, rtol=RTOL, atol=ATOL, max_steps=10_000):
+    """Impacto de muchas trayectorias a la vez (todos los argumentos hacen broadcasting).
+
+    Devuelve ``impact_x``, ``flight_time`` y ``apex``; las trayectorias que no
+    terminan en ``max_steps`` pasos quedan en NaN.
+    """
+    theta, v0, k, wind = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in (theta, v0, k, wind)))
+    shape = theta.shape
+    theta, v0, k, wind = (a.ravel() for a in (theta, v0, k, wind))
+    n = theta.size
+
+    impact_x = np.full(n, np.nan)
+    flight_time = np.full(n, np.nan)
+    apex = np.zeros(n)
+
+    # Estado de las trayectorias activas: filas x, y, vx, vy
+    state = np.zeros((4, n))
+    state[2] = v0 * np.cos(theta)
+    state[3] = v0 * np.sin(theta)
+    t = np.zeros(n)
+    # Paso inicial: una fracción del tiempo de vuelo sin rozamiento
+    h = np.maximum(0.02 * 2.0 * np.abs(state[3]) / g, 1e-4)
+    active = np.arange(n)
+
+    # Un tiro horizontal o hacia abajo toca el suelo en t = 0
+    grounded = state[3] <= 0
+    impact_x[grounded] = 0.0
+    flight_time[grounded] = 0.0
+    keep = ~grounded
+    active, state, t, h = active[keep], state[:, keep], t[keep], h[keep]
+    k_act, wind_act = k[active], wind[active]
+
+    def derivative(s):
+        ax, ay = _acceleration(s[2], s[3], k_act, wind_act, g)
+        return np.stack((s[2], s[3], ax, ay))
+
+    f0 = derivative(state)
+    for _ in range(max_steps):
+        if not active.size:
+            break
+        stages = [f0]
+        for a_row in _A[1:]:
+            increment = sum(coef * stage for coef, stage in zip(a_row, stages) if coef)
+            stages.append(derivative(state + h * increment))
+        new_state = state + h * sum(coef * stage for coef, stage in zip(_A[6], stages) if coef)
+        error = h * sum(coef * stage for coef, stage in zip(_E, stages) if coef)
+        scale = atol + rtol * np.maximum(np.abs(state), np.abs(new_state))
+        error_norm = np.sqrt(np.mean((error / scale) ** 2, axis=0))
+        accepted = error_norm <= 1.0
+        f1 = stages[6]  # FSAL: la derivada en el punto nuevo
+
+        # Vértice: vy cambia de signo dentro del paso
+        crest = accepted & (state[3] > 0) & (new_state[3] <= 0)
+        if crest.any():
+            s = state[3, crest] / (state[3, crest] - new_state[3, crest])
+            y_crest = _hermite(s, h[crest], state[1, crest], state[3, crest], new_state[1, crest], new_state[3, crest])
+            apex[active[crest]] = np.maximum(apex[active[crest]], y_crest)
+
+        # Impacto: y pasa a negativo dentro del paso
+        landed = accepted & (new_state[1] <= 0)
+        if landed.any():
+            s = _hermite_root(h[landed], state[1, landed], state[3, landed], new_state[1, landed], new_state[3, landed])
+            idx = active[landed]
+            impact_x[idx] = _hermite(s, h[landed], state[0, landed], state[2, landed],
+                                     new_state[0, landed], new_state[2, landed])
+            flight_time[idx] = t[landed] + s * h[landed]
+
+        # Control del paso (igual que RK45: factor de seguridad 0.9, entre ×0.2 y ×10)
+        with np.errstate(divide="ignore"):
+            factor = np.clip(0.9 * error_norm ** -0.2, 0.2, 10.0)
+        factor[~accepted] = np.minimum(factor[~accepted], 1.0)
+
+        t = np.where(accepted, t + h, t)
+        state = np.where(accepted, new_state, state)
+        f0 = np.where(accepted, f1, f0)
+        h = h * factor
+
+        keep = ~landed
+        if not keep.all():
+            active, state, t, h, f0 = active[keep], state[:, keep], t[keep], h[keep], f0[:, keep]
+            k_act, wind_act = k_act[keep], wind_act[keep]
+
+    return {
+        "impact_x": impact_x.reshape(shape),
+        "flight_time": flight_time.reshape(shape),
+        "apex": apex.reshape(shape),
+    }
+
+
+def _hermite(s, h, p0, v0, p1, v1):
+    """Interpolación cúbica de Hermite dentro de un paso (``s`` en [0, 1])."""
+    s2 = s * s
+    s3 = s2 * s
+    return ((2 * s3 - 3 * s2 + 1) * p0 + (s3 - 2 * s2 + s) * h * v0
+            + (-2 * s3 + 3 * s2) * p1 + (s3 - s2) * h * v1)
+
+
+def _hermite_root(h, y0, vy0, y1, vy1, iterations=12):
+    # Newton sobre la cúbica, protegido con bisección: y(0) > 0 >= y(1) acota la raíz
+    lo = np.zeros_like(y0)
+    hi = np.ones_like(y0)
+    s = np.clip(y0 / np.where(y0 - y1 > 0, y0 - y1, 1.0), 0.0, 1.0)
+    for _ in range(iterations):
+        s2 = s * s
+        value = _hermite(s, h, y0, vy0, y1, vy1)
+        slope = ((6 * s2 - 6 * s) * y0 + (3 * s2 - 4 * s + 1) * h * vy0
+                 + (-6 * s2 + 6 * s) * y1 + (3 * s2 - 2 * s) * h * vy1)
+        above = value > 0
+        lo = np.where(above, s, lo)
+        hi = np.where(above, hi, s)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = s - value / slope
+        inside = (newton >= lo) & (newton <= hi)
+        s = np.where(inside, newton, 0.5 * (lo + hi))
+    return s
+
+
+def _golden_max(range_of, lo, hi, iterations=30):
+    # Sección áurea vectorizada: ángulo de alcance máximo de cada lanzamiento
+    ratio = (np.sqrt(5.0) - 1.0) / 2.0
+    a, b = lo.copy(), hi.copy()
+    c = b - ratio * (b - a)
+    d = a + ratio * (b - a)
+    fc, fd = range_of(c), range_of(d)
+    for _ in range(iterations):
+        left = fc > fd
+        b = np.where(left, d, b)
+        a = np.where(left, a, c)
+        c_new = np.where(left, b - ratio * (b - a), d)
+        d_new = np.where(left, c, a + ratio * (b - a))
+        # Solo una evaluación nueva por iteración y por lanzamiento
+        f_probe = range_of(np.where(left, c_new, d_new))
+        fc, fd = np.where(left, f_probe, fd), np.where(left, fc, f_probe)
+        c, d = c_new, d_new
+    theta = 0.5 * (a + b)
+    return theta, range_of(theta)
+
+
+def _illinois(f, lo, hi, f_lo, f_hi, xtol, max_iter=60):
+    # Regula falsi (variante Illinois) vectorizada sobre brackets [lo, hi] con f_lo < 0 < f_hi
+    root = 0.5 * (lo + hi)
+    active = np.arange(lo.size)
+    last_side = np.zeros(lo.size, dtype=np.int8)
+    for _ in range(max_iter):
+        if not active.size:
+            break
+        a, b, fa, fb = lo[active], hi[active], f_lo[active], f_hi[active]
+        c = b - fb * (b - a) / (fb - fa)
+        fc = f(c, active)
+        root[active] = c
+        done = (np.abs(fc) <= xtol) | (np.abs(b - a) <= 1e-12)
+        below = fc < 0
+        side = np.where(below, -1, 1).astype(np.int8)
+        # Si el mismo extremo se mueve dos veces seguidas, se reduce a la mitad el valor del otro
+        repeat = side == last_side[active]
+        lo[active] = np.where(below, c, a)
+        f_lo[active] = np.where(below, fc, np.where(repeat, 0.5 * fa, fa))
+        hi[active] = np.where(below, b, c)
+        f_hi[active] = np.where(below, np.where(repeat, 0.5 * fb, fb), fc)
+        last_side[active] = side
+        active = active[~done]
+    return root
+
+
+def solve(x_target, v0, k, wind=0.0, g=G, xtol=1e-4):
+    """Ángulos para muchos objetivos con rozamiento, con las claves de ``ballistics.solve``.
+
+    ``reachable`` marca los objetivos dentro del alcance máximo; ``theta_high``
+    es NaN si con viento a favor ni el tiro vertical se queda corto.
+    """
+    x_target, v0, k, wind = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in (x_target, v0, k, wind)))
+    shape = x_target.shape
+    x_target, v0, k, wind = (np.ascontiguousarray(a).ravel() for a in (x_target, v0, k, wind))
+    n = x_target.size
+
+    def range_all(theta):
+        return impact_batch(theta, v0, k, wind, g)["impact_x"]
+
+    theta_max, range_max = _golden_max(range_all, np.zeros(n), np.full(n, 0.5 * np.pi))
+    reachable = (x_target >= 0) & (x_target <= range_max)
+
+    result = {"reachable": reachable.reshape(shape)}
+    idx = np.nonzero(reachable)[0]
+    for branch in ("low", "high"):
+        theta = np.full(n, np.nan)
+        if idx.size:
+            sub_v0, sub_k, sub_wind, sub_x = v0[idx], k[idx], wind[idx], x_target[idx]
+
+            def f(angles, which, sign=1.0 if branch == "low" else -1.0):
+                impact = impact_batch(angles, sub_v0[which], sub_k[which], sub_wind[which], g)["impact_x"]
+                return sign * (impact - sub_x[which])
+
+            if branch == "low":
+                lo, hi = np.zeros(idx.size), theta_max[idx].copy()
+            else:
+                lo, hi = theta_max[idx].copy(), np.full(idx.size, 0.5 * np.pi)
+            every = np.arange(idx.size)
+            f_lo, f_hi = f(lo, every), f(hi, every)
+            # El tramo alto necesita que el tiro vertical quede corto
+            valid = (f_lo <= 0) & (f_hi >= 0)
+            roots = np.full(idx.size, np.nan)
+            if valid.any():
+                sub = np.nonzero(valid)[0]
+                roots[sub] = _illinois(lambda angles, which: f(angles, sub[which]), lo[sub], hi[sub],
+                                       f_lo[sub], f_hi[sub], xtol)
+            theta[idx] = roots
+
+        impact = impact_batch(np.nan_to_num(theta), v0, k, wind, g)
+        missing = np.isnan(theta)
+        result[f"theta_{branch}"] = theta.reshape(shape)
+        result[f"flight_time_{branch}"] = np.where(missing, np.nan, impact["flight_time"]).reshape(shape)
+        result[f"apex_{branch}"] = np.where(missing, np.nan, impact["apex"]).reshape(shape)
+    return result
@@ -0,0 +1,166 @@
+"""Separación en líneas (framing) y parseo por lotes de los mensajes CSV.
+
+TCP no respeta los límites de los mensajes: un ``recv`` puede traer varias
+líneas juntas o cortar una a la mitad. ``LineFramer`` acumula los bytes de una
+conexión, entrega todas las líneas completas de cada lectura como un único
+arreglo NumPy y guarda el fragmento final incompleto para la siguiente lectura.
+
+Una línea puede empezar con un campo extra que identifica al nodo emisor::
+
+    invernadero-3,23.1,22.8,...,23.0
+"""
+import logging
+
+import numpy as np
+
+import metrics
+from sensor_schema import SENSOR_COLUMNS
+
+log = logging.getLogger(__name__)
+
+# Con basura constante en la red, solo una de cada tantas líneas inválidas va al log
+_malformed_log_sampler = metrics.Sampler(100)
+
+# Una línea válida mide ~60 bytes; algo mucho más largo es basura sin saltos de línea
+MAX_LINE_LENGTH = 4096
+
+
+class FrameStats:
+    """Contadores globales de tramas, compartidos por todas las conexiones.
+
+    Son contadores de ``metrics`` (por hilo, sin candados); los globales se
+    exportan en ``/metrics``.
+    """
+
+    def __init__(self, frames=None, malformed=None, dropped=None):
+        registry = metrics.Registry()
+        self._frames = frames or metrics.Counter(registry, "frames", "")
+        self._malformed = malformed or metrics.Counter(registry, "malformed", "")
+        self._dropped = dropped or metrics.Counter(registry, "dropped", "")
+
+    def add(self, frames=0, malformed=0, dropped=0):
+        if frames:
+            self._frames.inc(frames)
+        if malformed:
+            self._malformed.inc(malformed)
+        if dropped:
+            self._dropped.inc(dropped)
+
+    @property
+    def frames(self):
+        return self._frames.value
+
+    @property
+    def malformed(self):
+        return self._malformed.value
+
+    @property
+    def dropped(self):
+        return self._dropped.value
+
+    def snapshot(self):
+        return {"frames": self.frames, "malformed": self.malformed, "dropped": self.dropped}
+
+
+frame_stats = FrameStats(metrics.MESSAGES, metrics.PARSE_ERRORS, metrics.DROPPED)
+
+
+class LineFramer:
+    """Framing por saltos de línea para una conexión.
+
+    ``frames`` cuenta las líneas válidas, ``malformed`` las que no tienen
+    ``n_fields`` números y ``dropped`` los fragmentos descartados por superar
+    ``MAX_LINE_LENGTH`` sin encontrar un salto de línea.
+    """
+
+    def __init__(self, n_fields=len(SENSOR_COLUMNS), stats=frame_stats):
+        self.n_fields = n_fields
+        self.stats = stats
+        self.frames = 0
+        self.malformed = 0
+        self.dropped = 0
+        self._pending = b""
+
+    def feed(self, data):
+        """Agrega bytes recibidos y devuelve ``(node_ids, values)`` de las líneas completas.
+
+        ``values`` tiene forma (n, n_fields); ``node_ids`` es ``None`` si ninguna
+        línea trae identificador de nodo (ver ``parse_lines``).
+        """
+        lines = (self._pending + data).split(b"\n")
+        self._pending = lines.pop()
+        dropped = 0
+        if len(self._pending) > MAX_LINE_LENGTH:
+            self._pending = b""
+            dropped = 1
+        return self._parse(lines, dropped)
+
+    def flush(self):
+        """Procesa lo que quedó pendiente al cerrarse la conexión (línea sin ``\\n`` final)."""
+        lines = [self._pending]
+        self._pending = b""
+        return self._parse(lines, 0)
+
+    def _parse(self, lines, dropped):
+        lines = [line.strip() for line in lines]
+        lines = [line for line in lines if line]
+        node_ids, values = parse_lines(lines, self.n_fields)
+        malformed = len(lines) - len(values)
+        self.frames += len(values)
+        self.malformed += malformed
+        self.dropped += dropped
+        if self.stats is not None and (lines or dropped):
+            self.stats.add(len(values), malformed, dropped)
+        return node_ids, values
+
+
+def parse_lines(lines, n_fields=len(SENSOR_COLUMNS)):
+    """Convierte líneas CSV (bytes) en ``(node_ids, values)``, descartando las inválidas.
+
+    ``values`` tiene forma (n, n_fields). Las líneas con un campo de más llevan
+    el identificador del nodo al principio; ``node_ids`` es la lista de
+    identificadores (``None`` en las líneas sin él) o ``None`` si ninguna lo trae.
+
+    El camino normal convierte todas las líneas con la cantidad correcta de
+    campos en una sola llamada a ``np.loadtxt`` (parser en C). Solo si el bloque
+    contiene algún valor no numérico se vuelve a parsear línea por línea.
+    """
+    expected_commas = n_fields - 1
+    valid = []
+    node_ids = []
+    has_ids = False
+    for line in lines:
+        commas = line.count(b",")
+        if commas == expected_commas:
+            valid.append(line)
+            node_ids.append(None)
+        elif commas == expected_commas + 1:
+            node_id, line = line.split(b",", 1)
+            valid.append(line)
+            node_ids.append(node_id.strip().decode("utf-8", errors="replace"))
+            has_ids = True
+        else:
+            if _malformed_log_sampler.sample():
+                log.warning("Número de partes incorrecto (%d) en los datos recibidos: %r", commas + 1, line)
+    if not valid:
+        return None, np.empty((0, n_fields))
+
+    try:
+        values = np.loadtxt(valid, delimiter=",", dtype=np.float64, ndmin=2)
+    except ValueError:
+        kept, values = _parse_lines_slow(valid, n_fields)
+        node_ids = [node_ids[i] for i in kept]
+    return (node_ids if has_ids else None), values
+
+
+def _parse_lines_slow(lines, n_fields):
+    kept = []
+    rows = []
+    for i, line in enumerate(lines):
+        try:
+            rows.append([float(part) for part in line.split(b",")])
+            kept.append(i)
+        except ValueError as e:
+            if _malformed_log_sampler.sample():
+                log.warning("Error al procesar los datos recibidos: %s", e)
+    return kept, np.array(rows, dtype=np.float64).reshape(len(rows), n_fields)
@@ -0,0 +1,405 @@
+"""API HTTP de consultas al historial en disco: rango de tiempo y agregados por bucket.
+
+    GET /api/history            nodos y columnas del historial
+    GET /api/history/<nodo>?columns=humedad_suelo_1,humedad_suelo_2&start=2024-05-01&end=2024-06-01
+                            &bucket=1h&agg=mean,min,max,p95&format=json
+
+``start`` y ``end`` son ISO 8601 (sin zona: hora local) o segundos desde la
+época; por defecto, el último día. ``bucket`` acepta los sufijos ``s``,
+``m``, ``h`` y ``d`` (``15m``, ``1h``) y los buckets se alinean a múltiplos
+de su duración desde la época (UTC); con agregados, ``start`` se redondea
+hacia abajo al comienzo de su bucket. ``agg`` combina ``mean``, ``min``,
+``max``, ``count`` y percentiles ``pNN`` (``p50``, ``p99.9``). Sin
+``bucket`` ni ``agg`` se devuelven las lecturas crudas.
+
+La agregación recorre el ``TimeSeriesStore`` en bloques memmap
+(``iter_range``): cada bloque se reduce por bucket con ``reduceat`` y al
+siguiente solo pasa el bucket que quedó abierto, así que la memoria no
+depende del largo del rango (con percentiles, del largo de un bucket). La
+respuesta sale en partes a medida que se calcula: JSON
+(``{"columns": [...], "rows": [[...], ...]}``, con ``null`` donde no hubo
+lecturas) o un stream IPC de Arrow con ``format=arrow`` (requiere
+``pyarrow``).
+
+El historial solo crece hacia adelante: los buckets anteriores al último
+registro del nodo ya no cambian. Ese tramo de cada consulta se guarda en
+una caché LRU, y una consulta repetida (la de un dashboard que se refresca)
+solo recalcula el bucket abierto del final. Como ``start`` y el final del
+tramo guardado caen en bordes de bucket, el rango por defecto ("el último
+día" hasta ahora) sigue usando la misma entrada hasta que empieza otro bucket.
+"""
+import io
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+import metrics
+
+BASE_AGGREGATIONS = ("mean", "min", "max", "count")
+DEFAULT_RANGE_S = 86400
+CHUNK_ROWS = 1 << 16
+# Buckets como máximo por consulta agregada
+MAX_BUCKETS = 1_000_000
+CACHE_ENTRIES = 128
+# Resultados más grandes no se guardan en la caché
+CACHE_ROWS = 100_000
+# Decimales de los valores en JSON: las lecturas son float32 con precisión de centésimas,
+# y con 17 dígitos la respuesta ocupa el doble y tarda el doble en serializarse
+JSON_DECIMALS = 4
+
+_DURATION = re.compile(r"^(\d+(?:\.\d+)?)([smhd]?)$")
+_PERCENTILE = re.compile(r"^p(\d+(?:\.\d+)?)$")
+_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+_cache = {result: metrics.counter("history_cache_total", "Consultas al historial según la caché",
+                                  labels={"result": result}) for result in ("hit", "miss")}
+QUERY_SECONDS = metrics.histogram("history_query_seconds", "Duración de una consulta al historial (hasta el último byte)")
+
+
+def parse_time(text, default_ns):
+    """Instante en ns de ``text`` (ISO 8601 o segundos desde la época); ``default_ns`` si falta."""
+    if text is None or text == "":
+        return default_ns
+    try:
+        return int(float(text) * 1e9)
+    except ValueError:
+        pass
+    try:
+        return int(datetime.fromisoformat(text).timestamp() * 1e9)
+    except ValueError:
+        raise ValueError(f"Fecha inválida: {text!r} (ISO 8601 o segundos desde la época)") from None
+
+
+def parse_duration(text):
+    """Segundos de una duración como ``90``, ``15m``, ``1h`` o ``7d``."""
+    match = _DURATION.match(text.strip())
+    if not match or float(match.group(1)) <= 0:
+        raise ValueError(f"Duración inválida: {text!r} (por ejemplo 90, 15m, 1h, 7d)")
+    return float(match.group(1)) * _UNITS[match.group(2)]
+
+
+def parse_aggregations(text):
+    """Lista de agregados de ``text`` (``mean,max,p95``); ``ValueError`` si alguno no existe."""
+    aggregations = [name.strip() for name in text.split(",") if name.strip()]
+    for name in aggregations:
+        match = _PERCENTILE.match(name)
+        if name not in BASE_AGGREGATIONS and not (match and 0 <= float(match.group(1)) <= 100):
+            raise ValueError(f"Agregado desconocido: {name!r} (opciones: {', '.join(BASE_AGGREGATIONS)}, pNN)")
+    if not aggregations:
+        raise ValueError("Falta el agregado")
+    return aggregations
+
+
+def output_columns(columns, aggregations):
+    """Nombres de las columnas de la respuesta, después de ``time``."""
+    if not aggregations:
+        return list(columns)
+    return [f"{column}_{name}" for column in columns for name in aggregations]
+
+
+def _reduce(keys, x, quantiles):
+    # Estadísticas de cada bucket de un bloque ordenado por tiempo
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    valid = ~np.isnan(x)
+    stats = {
+        "key": keys[starts],
+        "count": np.add.reduceat(valid.astype(np.int64), starts, axis=0),
+        "sum": np.add.reduceat(np.where(valid, x, 0.0), starts, axis=0),
+        "min": np.fmin.reduceat(x, starts, axis=0),
+        "max": np.fmax.reduceat(x, starts, axis=0),
+    }
+    if quantiles:
+        # Percentil lineal (como np.percentile) sobre los valores de cada bucket
+        # ordenados con los nan al final del bucket
+        group = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(keys)]))[:, None]
+        with np.errstate(invalid="ignore"):
+            low = np.nanmin(x, axis=0, initial=np.inf, where=valid)
+            span = np.nanmax(x, axis=0, initial=-np.inf, where=valid) - low + 1
+        if np.isfinite(span).all():
+            # Un solo sort de todas las columnas: cada bucket se corre a su propio tramo
+            # (group * span) y los nan quedan arriba de todos los valores del bucket
+            offset = group * span
+            ordered = np.sort(np.where(valid, x - low, span) + offset, axis=0) - offset + low
+        else:
+            ordered = np.stack([x[np.lexsort((x[:, j], group[:, 0])), j] for j in range(x.shape[1])], axis=1)
+        count = stats["count"]
+        last = len(keys) - 1
+        result = np.empty((len(quantiles),) + count.shape)
+        for k, q in enumerate(quantiles):
+            position = starts[:, None] + q * np.maximum(count - 1, 0)
+            lo = np.clip(np.floor(position).astype(np.intp), 0, last)
+            hi = np.clip(np.ceil(position).astype(np.intp), 0, last)
+            lower = np.take_along_axis(ordered, lo, axis=0)
+            upper = np.take_along_axis(ordered, hi, axis=0)
+            with np.errstate(invalid="ignore"):
+                result[k] = np.where(count > 0, lower + (upper - lower) * (position - lo), np.nan)
+        stats["quantiles"] = result
+    return stats
+
+
+def _take(stats, rows):
+    return {name: (value[:, rows] if name == "quantiles" else value[rows]) for name, value in stats.items()}
+
+
+def _merge(carry, stats):
+    # El primer bucket del bloque continúa el que quedó abierto (sin percentiles)
+    stats["count"][0] += carry["count"][0]
+    stats["sum"][0] += carry["sum"][0]
+    stats["min"][0] = np.fmin(stats["min"][0], carry["min"][0])
+    stats["max"][0] = np.fmax(stats["max"][0], carry["max"][0])
+
+
+def _finish(stats, bucket_ns, aggregations):
+    count = stats["count"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(count > 0, stats["sum"] / count, np.nan)
+    quantile_index = 0
+    by_name = {}
+    for name in aggregations:
+        if name == "mean":
+            by_name[name] = mean
+        elif name == "count":
+            by_name[name] = count.astype(np.float64)
+        elif name in ("min", "max"):
+            by_name[name] = stats[name]
+        elif name not in by_name:
+            by_name[name] = stats["quantiles"][quantile_index]
+            quantile_index += 1
+    n_columns = count.shape[1]
+    # Mismo orden que output_columns: por columna y, dentro de cada una, por agregado
+    values = np.stack([by_name[name][:, j] for j in range(n_columns) for name in aggregations], axis=1)
+    return stats["key"] * bucket_ns, values
+
+
+def align(start_ns, bucket_s):
+    """Comienzo del bucket de ``bucket_s`` segundos que contiene ``start_ns``."""
+    bucket_ns = int(bucket_s * 1e9)
+    return start_ns // bucket_ns * bucket_ns
+
+
+def aggregate(history, node_id, columns, start_ns, end_ns, bucket_s, aggregations, chunk_rows=CHUNK_ROWS):
+    """Bloques ``(timestamps_ns, values)`` con un renglón por bucket de ``[start_ns, end_ns)``.
+
+    El timestamp de cada renglón es el comienzo de su bucket; ``values``
+    tiene las columnas de ``output_columns``. Un bucket sin lecturas no
+    aparece. Sin ``aggregations`` se devuelven los registros crudos.
+    """
+    if not aggregations:
+        for chunk in history.iter_range(node_id, start_ns, end_ns, chunk_rows):
+            yield chunk["timestamp"].copy(), np.stack([chunk[c] for c in columns], axis=1).astype(np.float64)
+        return
+    bucket_ns = int(bucket_s * 1e9)
+    # Percentiles en el orden en que aparecen (sin repetir)
+    quantiles = [float(name[1:]) / 100 for name in dict.fromkeys(aggregations) if name.startswith("p")]
+    carry = None
+    for chunk in history.iter_range(node_id, start_ns, end_ns, chunk_rows):
+        keys = chunk["timestamp"] // bucket_ns
+        x = np.stack([chunk[c] for c in columns], axis=1).astype(np.float64)
+        if quantiles:
+            # El bucket abierto vuelve a entrar entero: los percentiles necesitan todos sus valores
+            if carry is not None:
+                keys = np.concatenate([carry[0], keys])
+                x = np.concatenate([carry[1], x])
+            stats = _reduce(keys, x, quantiles)
+            open_from = np.searchsorted(keys, keys[-1])
+            carry = keys[open_from:], x[open_from:]
+        else:
+            stats = _reduce(keys, x, quantiles)
+            if carry is not None:
+                if carry["key"][0] == stats["key"][0]:
+                    _merge(carry, stats)
+                else:
+                    yield _finish(carry, bucket_ns, aggregations)
+            carry = _take(stats, slice(-1, None))
+        if len(stats["key"]) > 1:
+            yield _finish(_take(stats, slice(None, -1)), bucket_ns, aggregations)
+    if carry is not None:
+        if quantiles:
+            carry = _reduce(carry[0], carry[1], quantiles)
+        yield _finish(carry, bucket_ns, aggregations)
+
+
+class HistoryQueries:
+    """Consultas sobre un ``TimeSeriesStore`` con la caché LRU de los tramos que ya no cambian."""
+
+    def __init__(self, history, cache_entries=CACHE_ENTRIES, cache_rows=CACHE_ROWS, chunk_rows=CHUNK_ROWS):
+        self.history = history
+        self.cache_entries = cache_entries
+        self.cache_rows = cache_rows
+        self.chunk_rows = chunk_rows
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def blocks(self, node_id, columns, start_ns, end_ns, bucket_s=None, aggregations=()):
+        """Igual que ``aggregate``, pero el tramo anterior al último registro sale de la caché si está."""
+        last_ns = self.history.last_timestamp(node_id)
+        if not aggregations or last_ns is None:
+            yield from aggregate(self.history, node_id, columns, start_ns, end_ns, bucket_s, aggregations,
+                                 self.chunk_rows)
+            return
+        # Hasta ``frozen`` no pueden llegar registros nuevos. La clave de la caché
+        # usa bordes de bucket: una consulta con start = "ahora - 1 día" la
+        # repite mientras no empiece otro bucket
+        bucket_ns = int(bucket_s * 1e9)
+        start_ns = align(start_ns, bucket_s)
+        frozen = align(min(end_ns, last_ns), bucket_s)
+        if frozen > start_ns:
+            key = (node_id, tuple(columns), start_ns, frozen, bucket_ns, tuple(aggregations))
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+            if cached is not None:
+                _cache["hit"].inc()
+                yield cached
+            else:
+                _cache["miss"].inc()
+                parts = []
+                for block in aggregate(self.history, node_id, columns, start_ns, frozen, bucket_s, aggregations,
+                                       self.chunk_rows):
+                    parts.append(block)
+                    yield block
+                self._store(key, parts, len(columns) * len(aggregations))
+            start_ns = frozen
+        if end_ns > start_ns:
+            yield from aggregate(self.history, node_id, columns, start_ns, end_ns, bucket_s, aggregations,
+                                 self.chunk_rows)
+
+    def _store(self, key, parts, n_columns):
+        rows = sum(len(timestamps) for timestamps, _ in parts)
+        if rows > self.cache_rows:
+            return
+        if parts:
+            result = np.concatenate([t for t, _ in parts]), np.concatenate([v for _, v in parts])
+        else:
+            result = np.empty(0, dtype=np.int64), np.empty((0, n_columns))
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+
+def json_stream(header, names, blocks):
+    """Respuesta JSON en partes: ``header`` más ``columns`` y ``rows`` (``time`` en ISO 8601 UTC)."""
+    head = json.dumps({**header, "columns": ["time"] + list(names)})
+    yield head[:-1] + ', "rows": ['
+    first = True
+    for timestamps, values in blocks:
+        if not len(timestamps):
+            continue
+        rows = np.empty((len(timestamps), values.shape[1] + 1), dtype=object)
+        rows[:, 0] = np.datetime_as_string(timestamps.view("datetime64[ns]"), unit="ms", timezone="UTC")
+        rows[:, 1:] = np.where(np.isnan(values), None, values.round(JSON_DECIMALS))
+        text = json.dumps(rows.tolist())[1:-1]
+        yield text if first else "," + text
+        first = False
+    yield "]}"
+
+
+def arrow_stream(names, blocks):
+    """Respuesta como stream IPC de Arrow: un record batch por bloque (``nan`` como nulo)."""
+    import pyarrow as pa
+
+    schema = pa.schema([("time", pa.timestamp("ns"))] + [(name, pa.float64()) for name in names])
+    sink = io.BytesIO()
+
+    def take():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    writer = pa.ipc.new_stream(sink, schema)
+    yield take()
+    for timestamps, values in blocks:
+        arrays = [pa.array(timestamps.view("datetime64[ns]"))]
+        arrays += [pa.array(values[:, i], from_pandas=True) for i in range(values.shape[1])]
+        writer.write_batch(pa.record_batch(arrays, schema=schema))
+        yield take()
+    writer.close()
+    yield take()
+
+
+def _timed(chunks):
+    start = time.perf_counter()
+    try:
+        yield from chunks
+    finally:
+        QUERY_SECONDS.observe(time.perf_counter() - start)
+
+
+def create_blueprint(get_history, cache_entries=CACHE_ENTRIES):
+    """Blueprint de Flask con ``/api/history``; ``get_history()`` da el ``TimeSeriesStore`` (o ``None``)."""
+    from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+    blueprint = Blueprint("history_api", __name__)
+    state = {"queries": None}
+
+    def queries():
+        history = get_history()
+        if history is None:
+            return None
+        if state["queries"] is None or state["queries"].history is not history:
+            state["queries"] = HistoryQueries(history, cache_entries)
+        return state["queries"]
+
+    @blueprint.route("/api/history")
+    def history_index():
+        current = queries()
+        if current is None:
+            return jsonify({"error": "Sin historial en disco"}), 404
+        return jsonify({"nodes": current.history.nodes(), "columns": list(current.history.columns),
+                        "aggregations": list(BASE_AGGREGATIONS) + ["pNN"]})
+
+    @blueprint.route("/api/history/<node_id>")
+    def history_query(node_id):
+        current = queries()
+        if current is None:
+            return jsonify({"error": "Sin historial en disco"}), 404
+        args = request.args
+        try:
+            columns = [c for c in args.get("columns", "").split(",") if c] or list(current.history.columns)
+            unknown = [c for c in columns if c not in current.history.columns]
+            if unknown:
+                raise ValueError(f"Columnas desconocidas: {', '.join(unknown)}")
+            end_ns = parse_time(args.get("end"), time.time_ns())
+            start_ns = parse_time(args.get("start"), end_ns - DEFAULT_RANGE_S * 10**9)
+            if start_ns >= end_ns:
+                raise ValueError("start debe ser anterior a end")
+            aggregations = []
+            bucket_s = None
+            if "agg" in args or "bucket" in args:
+                aggregations = parse_aggregations(args.get("agg", "mean"))
+                bucket_s = parse_duration(args.get("bucket", "1h"))
+                start_ns = align(start_ns, bucket_s)
+                if (end_ns - start_ns) / (bucket_s * 1e9) > MAX_BUCKETS:
+                    raise ValueError(f"Más de {MAX_BUCKETS} buckets: use un bucket más largo")
+            output = args.get("format", "json")
+            if output not in ("json", "arrow"):
+                raise ValueError(f"Formato desconocido: {output!r} (json o arrow)")
+            current.history.last_timestamp(node_id)
+        except ValueError as error:
+            return jsonify({"error": str(error)}), 400
+        except KeyError:
+            return jsonify({"error": f"Nodo desconocido: {node_id}"}), 404
+
+        names = output_columns(columns, aggregations)
+        blocks = current.blocks(node_id, columns, start_ns, end_ns, bucket_s, aggregations)
+        if output == "arrow":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                return jsonify({"error": "format=arrow requiere pyarrow"}), 501
+            return Response(stream_with_context(_timed(arrow_stream(names, blocks))),
+                            mimetype="application/vnd.apache.arrow.stream")
+        header = {"node": node_id, "start_ns": start_ns, "end_ns": end_ns, "bucket_s": bucket_s}
+        return Response(stream_with_context(_timed(json_stream(header, names, blocks))),
+                        mimetype="application/json")
+
+    return blueprint
@@ -0,0 +1,81 @@
+"""Funciones de ingesta compartidas por los servidores TCP (con hilos y asyncio)."""
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_PORT = 12345
+
+# Cantidad de lecturas que se conservan en memoria por cada nodo
+WINDOW_SIZE = 100
+
+# Tamaño de cada lectura del socket; puede traer varias líneas a la vez
+RECV_SIZE = 4096
+
+
+class ArrivalClock:
+    """Hora de llegada (ns) estrictamente creciente entre llamadas.
+
+    Un reloj grueso (o que retrocede) repetiría valores: dos lotes con la
+    misma hora harían que ``series_since``, que sigue desde el último
+    timestamp enviado, se saltee el segundo.
+    """
+
+    def __init__(self):
+        self._last_ns = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self._last_ns = max(time.time_ns(), self._last_ns + 1)
+            return self._last_ns
+
+
+_arrival = ArrivalClock()
+
+
+def peer_node_id(address):
+    """Identificador de nodo por defecto: la IP del emisor (el puerto cambia al reconectar)."""
+    return address[0] if isinstance(address, tuple) else str(address)
+
+
+def resolve_node_ids(default_node, node_ids, n):
+    """Identificador de nodo de cada lectura: las que no traen uno propio van a ``default_node``."""
+    if node_ids is None:
+        return np.full(n, default_node, dtype=object)
+    return np.array([default_node if node_id is None else node_id for node_id in node_ids], dtype=object)
+
+
+def store_batch(store, default_node, node_ids, values):
+    """Guarda en el ``NodeStore`` un lote de lecturas ya parseadas, con la hora de llegada.
+
+    ``node_ids`` viene de ``LineFramer.feed``; las lecturas sin identificador
+    propio se asignan a ``default_node``.
+    """
+    if not len(values):
+        return
+    timestamps = np.full(len(values), _arrival(), dtype=np.int64)
+    if node_ids is None:
+        store.extend(default_node, timestamps, values)
+        return
+    store_rows(store, resolve_node_ids(default_node, node_ids, len(values)), timestamps, values)
+
+
+def declare_columns(store, default_node, declared):
+    """Registra en el almacén las columnas del esquema de cada nodo (``ProtocolFramer.declared``)."""
+    for node_id, columns in declared:
+        store.declare_columns(default_node if node_id is None else node_id, columns)
+
+
+def store_rows(store, node_ids, timestamps, values):
+    """Guarda lecturas de varios nodos con un solo ``extend`` por nodo, en orden de llegada."""
+    codes = {}
+    index = np.fromiter((codes.setdefault(node_id, len(codes)) for node_id in node_ids), dtype=np.intp,
+                        count=len(node_ids))
+    if len(codes) == 1:
+        store.extend(node_ids[0], timestamps, values)
+        return
+    order = np.argsort(index, kind="stable")
+    for node_id, rows in zip(codes, np.split(order, np.flatnonzero(np.diff(index[order])) + 1)):
+        store.extend(node_id, timestamps[rows], values[rows])
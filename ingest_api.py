@@ -0,0 +1,92 @@
+"""Resultados del detector de anomalías y del motor de riego para los procesos web, por HTTP.
+
+En producción (production.py, ``cli.py ingest``) el ``AnomalyDetector`` y el
+``IrrigationEngine`` corren en el proceso de ingesta, el único que recibe
+las lecturas. Sus resultados no van al segmento de memoria compartida (son
+eventos de largo variable y una cola de comandos que se retiran al leerlos):
+la ingesta los sirve en el mismo puerto que ``/metrics``:
+
+- ``GET /anomalias/<nodo>?limit=N``: condiciones activas y eventos recientes
+  (sin ``<nodo>``, los eventos de todos los nodos);
+- ``GET /riego/<nodo>``: retira los comandos de riego pendientes del nodo;
+- ``GET /riego/<nodo>/estado``: válvula y reglas de riego del nodo.
+
+El identificador del nodo va codificado con ``urllib.parse.quote``.
+``RemoteAnomalies`` y ``RemoteIrrigation`` tienen la interfaz de lectura de
+``AnomalyDetector`` e ``IrrigationEngine`` que usa AnalisisDatos.py sobre
+esas rutas; los workers web los asignan a ``data_store``. Sin conexión con
+la ingesta, sus métodos lanzan ``OSError``.
+"""
+import json
+import urllib.parse
+import urllib.request
+
+JSON_TYPE = "application/json"
+TIMEOUT_S = 2.0
+
+
+def _json(payload):
+    return JSON_TYPE, json.dumps(payload).encode()
+
+
+def routes(store):
+    """Rutas de ``metrics.start_http_server`` sobre los sinks ``anomalies`` e ``irrigation`` de ``store``."""
+
+    def sink(name):
+        value = getattr(store, name, None)
+        if value is None:
+            raise KeyError(f"La ingesta no tiene {name}")
+        return value
+
+    def anomalies(rest, query):
+        detector = sink("anomalies")
+        node_id = urllib.parse.unquote(rest) or None
+        limit = int(query["limit"][0]) if "limit" in query else None
+        return _json({"node": node_id, "active": detector.active(node_id),
+                      "events": detector.events(limit, node_id)})
+
+    def irrigation(rest, query):
+        engine = sink("irrigation")
+        node, _, action = rest.partition("/")
+        node_id = urllib.parse.unquote(node)
+        if action == "estado":
+            return _json(engine.state(node_id))
+        if action:
+            raise KeyError(f"Acción desconocida: {action}")
+        return _json({"node": node_id, "commands": engine.pull(node_id)})
+
+    return {"/anomalias/": anomalies, "/riego/": irrigation}
+
+
+class _Remote:
+    def __init__(self, url, timeout=TIMEOUT_S):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _get(self, *path, **query):
+        url = self.url + "/" + "/".join(urllib.parse.quote(str(part), safe="") for part in path)
+        query = {key: value for key, value in query.items() if value is not None}
+        if query:
+            url += "?" + urllib.parse.urlencode(query)
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            return json.load(response)
+
+
+class RemoteAnomalies(_Remote):
+    """``active`` y ``events`` del ``AnomalyDetector`` de la ingesta en ``url``."""
+
+    def active(self, node_id):
+        return self._get("anomalias", node_id)["active"]
+
+    def events(self, limit=None, node_id=None):
+        return self._get("anomalias", "" if node_id is None else node_id, limit=limit)["events"]
+
+
+class RemoteIrrigation(_Remote):
+    """``pull`` y ``state`` del ``IrrigationEngine`` de la ingesta en ``url``."""
+
+    def pull(self, node_id):
+        return self._get("riego", node_id)["commands"]
+
+    def state(self, node_id):
+        return self._get("riego", node_id, "estado")
@@ -0,0 +1,264 @@
+"""Etapa entre la lectura de la red y el almacenamiento: cola acotada y un único escritor.
+
+Los hilos (o corrutinas) que leen los sockets solo parsean y encolan cada
+bloque; la cola le pone la hora de llegada al encolarlo, así los lotes
+quedan en la cola (y se guardan) con timestamps crecientes aunque lleguen
+de conexiones distintas del mismo nodo. Un hilo escritor vacía la cola en
+micro-lotes, cuando junta ``flush_rows`` lecturas o cuando la más vieja
+lleva ``flush_ms`` esperando, y guarda cada lote con un solo ``extend`` por
+nodo: las ventanas, los rollups, las estadísticas y el detector de
+anomalías se actualizan una vez por lote y no una vez por ``recv``.
+
+La cola se mide en lecturas. Cuando se llena (por ejemplo, todos los nodos
+reconectando a la vez después de un corte del Wi-Fi) la política de
+contrapresión decide qué pasa:
+
+- ``block``: el lector espera a que haya lugar; deja de leer el socket y
+  TCP frena al emisor;
+- ``drop-oldest``: se descartan los lotes más viejos de la cola;
+- ``sample``: desde la mitad de la cola se guarda una de cada k lecturas,
+  con k creciendo a medida que se llena; lo que no entra en la cola se
+  descarta (llena: todo lo nuevo).
+
+    pipeline = IngestPipeline(data_store, policy="drop-oldest").start()
+    pipeline.submit(node_id, *framer.feed(data))
+"""
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import metrics
+from ingest import ArrivalClock, declare_columns, resolve_node_ids, store_rows
+
+log = logging.getLogger(__name__)
+
+POLICIES = ("block", "drop-oldest", "sample")
+QUEUE_ROWS = 100_000
+FLUSH_ROWS = 5_000
+FLUSH_MS = 50.0
+# Ocupación desde la que la política "sample" empieza a descartar
+SAMPLE_START = 0.5
+
+QUEUE_DEPTH = metrics.gauge("sensor_ingest_queue_rows", "Lecturas esperando al escritor")
+BLOCKED = metrics.counter("sensor_ingest_blocked_total", "Bloques que esperaron lugar en la cola (política block)")
+_dropped = {policy: metrics.counter("sensor_ingest_dropped_rows_total", "Lecturas descartadas por la cola llena",
+                                    labels={"policy": policy}) for policy in ("drop-oldest", "sample")}
+FLUSH_SIZE = metrics.histogram("sensor_ingest_flush_rows", "Lecturas por micro-lote del escritor",
+                               buckets=(1, 10, 100, 1_000, 5_000, 10_000, 50_000, 100_000))
+QUEUE_WAIT = metrics.histogram("sensor_ingest_queue_seconds",
+                               "Espera de la lectura más vieja de cada micro-lote hasta quedar guardada")
+
+
+class IngestQueue:
+    """Cola de lotes ``(node_ids, timestamps, values)`` acotada en lecturas, de varios lectores a un escritor.
+
+    El candado cubre la ``deque``, el contador de lecturas y el reloj de
+    llegada; los lotes solo se copian dentro de él cuando hay que descartar
+    parte de uno (``sample`` o un lote más grande que la cola con ``drop-oldest``).
+    """
+
+    def __init__(self, capacity_rows=QUEUE_ROWS, policy="block"):
+        if policy not in POLICIES:
+            raise ValueError(f"Política de contrapresión desconocida: {policy!r} (opciones: {', '.join(POLICIES)})")
+        self.capacity_rows = capacity_rows
+        self.policy = policy
+        self.rows = 0
+        self.dropped = 0
+        self._batches = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._sample_index = 0
+        self._waiting = 0
+        self._clock = ArrivalClock()
+
+    def __len__(self):
+        return self.rows
+
+    def put(self, node_ids, values, block=True):
+        """Encola un lote con la hora de llegada.
+
+        Devuelve ``False`` solo con ``block=False`` y la cola llena (política ``block``).
+        """
+        with self._lock:
+            if self.policy == "block":
+                # Un lote más grande que la cola entra solo con la cola vacía
+                while self.rows and self.rows + len(values) > self.capacity_rows:
+                    if not block:
+                        return False
+                    BLOCKED.inc()
+                    # El escritor no espera a completar el micro-lote si hay lectores frenados
+                    self._waiting += 1
+                    self._not_empty.notify()
+                    self._not_full.wait()
+                    self._waiting -= 1
+            elif self.policy == "drop-oldest":
+                if len(values) > self.capacity_rows:
+                    self._drop(len(values) - self.capacity_rows)
+                    keep = slice(len(values) - self.capacity_rows, None)
+                    node_ids, values = node_ids[keep], values[keep]
+                while self.rows + len(values) > self.capacity_rows:
+                    old = self._batches.popleft()
+                    self.rows -= len(old[2])
+                    QUEUE_DEPTH.dec(len(old[2]))
+                    self._drop(len(old[2]))
+            else:
+                stride = self._sample_stride()
+                if stride == math.inf:
+                    self._drop(len(values))
+                    return True
+                keep = np.ones(len(values), dtype=bool)
+                if stride > 1:
+                    keep = (self._sample_index + np.arange(len(values))) % stride == 0
+                    self._sample_index += len(values)
+                # Lo muestreado que no entra en la cola también se descarta
+                keep[np.flatnonzero(keep)[max(self.capacity_rows - self.rows, 0):]] = False
+                if not keep.all():
+                    self._drop(len(values) - int(keep.sum()))
+                    node_ids, values = node_ids[keep], values[keep]
+                    if not len(values):
+                        return True
+            # Hora de llegada con el candado tomado: crece de un lote al siguiente
+            timestamps = np.full(len(values), self._clock(), dtype=np.int64)
+            self._batches.append((node_ids, timestamps, values, time.monotonic()))
+            self.rows += len(values)
+            QUEUE_DEPTH.inc(len(values))
+            self._not_empty.notify()
+        return True
+
+    def _sample_stride(self):
+        fill = (self.rows + 1) / self.capacity_rows
+        if fill <= SAMPLE_START:
+            return 1
+        if fill >= 1.0:
+            return math.inf
+        # Se conserva la fracción libre de la mitad superior de la cola
+        return math.ceil((1.0 - SAMPLE_START) / (1.0 - fill))
+
+    def _drop(self, rows):
+        if rows:
+            self.dropped += rows
+            _dropped[self.policy].inc(rows)
+
+    def wake(self):
+        """Despierta al escritor que espera en ``take``."""
+        with self._lock:
+            self._not_empty.notify_all()
+
+    def take(self, max_rows, max_wait_s, timeout=None):
+        """Espera un micro-lote: hasta juntar ``max_rows`` o que el más viejo espere ``max_wait_s``.
+
+        Con la cola llena, o con lectores esperando lugar, no espera más.
+
+        Devuelve la lista de lotes (vacía si pasa ``timeout`` sin que llegue nada)
+        y el instante (``time.monotonic``) en que llegó el más viejo.
+        """
+        with self._lock:
+            if not self._batches and not self._not_empty.wait(timeout):
+                return [], None
+            if not self._batches:
+                return [], None
+            oldest = self._batches[0][3]
+            deadline = oldest + max_wait_s
+            max_rows = min(max_rows, self.capacity_rows)
+            while self.rows < max_rows and not self._waiting:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._not_empty.wait(remaining):
+                    break
+            batches = []
+            rows = 0
+            while self._batches and rows < max_rows:
+                batch = self._batches.popleft()
+                batches.append(batch)
+                rows += len(batch[2])
+            self.rows -= rows
+            self._not_full.notify_all()
+        QUEUE_DEPTH.dec(rows)
+        return batches, oldest
+
+
+class IngestPipeline:
+    """Cola de ingesta y su hilo escritor sobre ``store`` (un ``NodeStore`` o ``SharedNodeStore``)."""
+
+    def __init__(self, store, capacity_rows=QUEUE_ROWS, policy="block", flush_rows=FLUSH_ROWS, flush_ms=FLUSH_MS):
+        self.store = store
+        self.queue = IngestQueue(capacity_rows, policy)
+        self.flush_rows = flush_rows
+        self.flush_s = flush_ms / 1000.0
+        self.written = 0
+        self.flushes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """Detiene el escritor después de guardar lo que quedó en la cola."""
+        self._stop.set()
+        self.queue.wake()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, default_node, node_ids, values, block=True):
+        """Encola un bloque parseado (los argumentos de ``store_batch`` sin el almacén)."""
+        if not len(values):
+            return True
+        node_ids = resolve_node_ids(default_node, node_ids, len(values))
+        return self.queue.put(node_ids, values, block)
+
+    def declare(self, default_node, declared):
+        """Columnas del esquema de cada nodo: van directo al almacén, sin pasar por la cola."""
+        declare_columns(self.store, default_node, declared)
+
+    def _run(self):
+        while True:
+            stopping = self._stop.is_set()
+            batches, oldest = self.queue.take(self.flush_rows, 0.0 if stopping else self.flush_s,
+                                              timeout=0.0 if stopping else 0.1)
+            if not batches:
+                if stopping:
+                    return
+                continue
+            try:
+                self._write(batches)
+            except Exception:
+                log.exception("Error al guardar un micro-lote de %d bloques", len(batches))
+            QUEUE_WAIT.observe(time.monotonic() - oldest)
+
+    def _write(self, batches):
+        if len(batches) == 1:
+            node_ids, timestamps, values, _ = batches[0]
+        else:
+            node_ids = np.concatenate([batch[0] for batch in batches])
+            timestamps = np.concatenate([batch[1] for batch in batches])
+            values = np.concatenate([batch[2] for batch in batches])
+        store_rows(self.store, node_ids, timestamps, values)
+        self.written += len(values)
+        self.flushes += 1
+        FLUSH_SIZE.observe(len(values))
+
+
+def add_arguments(parser):
+    """Opciones de la cola de ingesta, compartidas por AnalisisDatos.py y production.py."""
+    parser.add_argument("--backpressure", choices=POLICIES, default="block",
+                        help="Qué hacer con la cola de ingesta llena")
+    parser.add_argument("--queue-rows", type=int, default=QUEUE_ROWS, help="Lecturas que entran en la cola")
+    parser.add_argument("--flush-rows", type=int, default=FLUSH_ROWS, help="Lecturas por micro-lote")
+    parser.add_argument("--flush-ms", type=float, default=FLUSH_MS,
+                        help="Espera máxima de una lectura antes de guardarse")
+    parser.add_argument("--direct", action="store_true",
+                        help="Sin cola: cada conexión escribe en el almacén al recibir")
+
+
+def from_arguments(store, args):
+    """``IngestPipeline`` ya iniciado según las opciones, o ``None`` con ``--direct``."""
+    if args.direct:
+        return None
+    return IngestPipeline(store, args.queue_rows, args.backpressure, args.flush_rows, args.flush_ms).start()
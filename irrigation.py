@@ -0,0 +1,248 @@
+"""Motor de riego: decide en la ingesta cuándo regar cada nodo.
+
+Cada regla es una tupla ``(nombre, columnas, bajo, alto, duración_s, horizonte_s)``.
+La señal de la regla es el promedio (ignorando ``nan``) de ``columnas``; la
+regla pide regar cuando la señal queda por debajo de ``bajo`` durante
+``duración_s`` seguidos y deja de pedirlo cuando supera ``alto``
+(histéresis). Con ``horizonte_s`` se compara en cambio el valor previsto
+dentro de ese horizonte según la velocidad de secado. Con la misma forma se
+escriben:
+
+- umbral con histéresis: ``("umbral", SOIL_COLUMNS, 25, 70, 0, 0)``;
+- condición sostenida: ``("bajo 30 % por 10 min", SOIL_COLUMNS, 30, 70, 600, 0)``;
+- predicción: ``("bajo 35 % en 2 h", SOIL_COLUMNS, 35, 70, 0, 7200)``.
+
+La velocidad de secado sale de un suavizado de Holt (nivel y pendiente por
+segundo) con constantes de tiempo en segundos, así que admite lecturas
+irregulares y nodos que se saltean envíos.
+
+Las reglas se compilan una vez en arreglos (una columna por regla) y el
+estado vive en matrices nodo × regla: cada lote se evalúa para todos los
+nodos y todas las reglas con unas pocas operaciones de NumPy, O(1) por regla
+y por lectura. Igual que ``AnomalyDetector``, ``append`` (el sink de
+``NodeStore``) solo deja el bloque en espera y la evaluación se hace por
+lotes, con todas las lecturas de cada nodo en orden.
+
+Un nodo riega mientras alguna de sus reglas lo pide. Al abrir y al cerrar la
+válvula se encola un comando (``regar`` / ``detener``) que el nodo retira
+con ``pull`` (AnalisisDatos.py lo expone en ``GET /riego/<nodo>``). Si la
+señal es ``nan`` (fallan todas las sondas) las reglas mantienen su estado.
+"""
+import threading
+from collections import deque
+
+import numpy as np
+
+import metrics
+from node_store import PendingRows, node_rounds
+from sensor_schema import SENSOR_COLUMNS, SOIL_COLUMNS
+
+RULES = (
+    ("umbral", SOIL_COLUMNS, 25.0, 70.0, 0, 0),
+    ("bajo 30 % por 10 min", SOIL_COLUMNS, 30.0, 70.0, 600, 0),
+    ("bajo 35 % en 2 h", SOIL_COLUMNS, 35.0, 70.0, 0, 7200),
+)
+# Constantes de tiempo del suavizado de Holt: nivel y pendiente
+LEVEL_TAU_S = 600.0
+TREND_TAU_S = 1800.0
+# Lecturas antes de confiar en la pendiente para las predicciones
+MIN_SAMPLES = 10
+COMMANDS_PER_NODE = 8
+MAX_COMMANDS = 1000
+FLUSH_ROWS = 4096
+FLUSH_INTERVAL_S = 1.0
+
+ACTIONS = ("regar", "detener")
+_commands = {action: metrics.counter("irrigation_commands_total", "Comandos de riego emitidos",
+                                     labels={"action": action}) for action in ACTIONS}
+VALVES_OPEN = metrics.gauge("irrigation_valves_open", "Nodos regando")
+
+
+class IrrigationEngine:
+    """Reglas de riego para todos los nodos; ``extend_batch`` evalúa un lote en el momento."""
+
+    def __init__(self, rules=RULES, columns=SENSOR_COLUMNS, level_tau_s=LEVEL_TAU_S, trend_tau_s=TREND_TAU_S,
+                 min_samples=MIN_SAMPLES, commands_per_node=COMMANDS_PER_NODE, max_commands=MAX_COMMANDS,
+                 flush_rows=FLUSH_ROWS, flush_interval_s=FLUSH_INTERVAL_S):
+        self.columns = tuple(columns)
+        index = {name: i for i, name in enumerate(self.columns)}
+        self.rule_names = [name for name, *_ in rules]
+        # Columna k de ``_weights`` marca las columnas que promedia la regla k
+        self._weights = np.zeros((len(self.columns), len(rules)))
+        for k, (_, rule_columns, *_) in enumerate(rules):
+            self._weights[[index[c] for c in rule_columns], k] = 1.0
+        self._low = np.array([low for _, _, low, *_ in rules], dtype=np.float64)
+        self._high = np.array([high for _, _, _, high, _, _ in rules], dtype=np.float64)
+        if np.any(self._low >= self._high):
+            raise ValueError("Cada regla necesita bajo < alto")
+        self._duration_ns = np.array([duration * 1e9 for *_, duration, _ in rules], dtype=np.int64)
+        self._horizon_s = np.array([horizon for *_, horizon in rules], dtype=np.float64)
+        self._predicts = self._horizon_s > 0
+        self.level_tau_s = level_tau_s
+        self.trend_tau_s = trend_tau_s
+        self.min_samples = min_samples
+
+        self._slots = {}
+        self._node_ids = []
+        self._lock = threading.Lock()
+        self._allocate(16)
+        self.commands_per_node = commands_per_node
+        self._queues = {}
+        self._log = deque(maxlen=max_commands)
+        self.total_commands = 0
+        self._pending = PendingRows(len(self.columns), flush_rows, flush_interval_s)
+
+    def _allocate(self, n_nodes):
+        n_rules = len(self.rule_names)
+
+        def grow(old, shape, fill, dtype=np.float64):
+            new = np.full(shape, fill, dtype=dtype)
+            if old is not None:
+                new[:len(old)] = old
+            return new
+
+        self._level = grow(getattr(self, "_level", None), (n_nodes, n_rules), np.nan)
+        self._trend = grow(getattr(self, "_trend", None), (n_nodes, n_rules), 0.0)
+        self._last_ns = grow(getattr(self, "_last_ns", None), (n_nodes, n_rules), 0, np.int64)
+        self._count = grow(getattr(self, "_count", None), (n_nodes, n_rules), 0, np.intp)
+        # Desde cuándo se cumple la condición de regar (-1: no se cumple)
+        self._since = grow(getattr(self, "_since", None), (n_nodes, n_rules), -1, np.int64)
+        self._active = grow(getattr(self, "_active", None), (n_nodes, n_rules), False, bool)
+        self._valve = grow(getattr(self, "_valve", None), n_nodes, False, bool)
+
+    def _slot(self, node_id):
+        slot = self._slots.get(node_id)
+        if slot is None:
+            slot = len(self._node_ids)
+            if slot == len(self._valve):
+                self._allocate(2 * slot)
+            self._slots[node_id] = slot
+            self._node_ids.append(node_id)
+        return slot
+
+    def append(self, node_id, timestamps_ns, values):
+        # Camino caliente de la ingesta: solo se guarda la referencia al bloque
+        if self._pending.add(node_id, timestamps_ns, values):
+            self.flush()
+
+    def flush(self):
+        """Evalúa las lecturas en espera de todos los nodos."""
+        with self._lock:
+            batch = self._pending.take()
+            if batch is not None:
+                self._evaluate(*batch)
+
+    def extend_batch(self, node_ids, timestamps_ns, values):
+        """Evalúa un lote con lecturas de muchos nodos (un nodo puede repetirse)."""
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(self.columns))
+        if not len(values):
+            return
+        timestamps_ns = np.broadcast_to(np.asarray(timestamps_ns, dtype=np.int64), (len(values),))
+        with self._lock:
+            self._evaluate(node_ids, timestamps_ns, values)
+
+    def _evaluate(self, node_ids, timestamps_ns, values):
+        slots = np.fromiter((self._slot(node_id) for node_id in node_ids), dtype=np.intp, count=len(values))
+        for rows in node_rounds(slots):
+            self._update(slots[rows], values[rows], timestamps_ns[rows])
+
+    def _update(self, s, x, timestamps_ns):
+        # ``s`` no tiene nodos repetidos: cada fila actualiza un renglón distinto del estado
+        t = timestamps_ns[:, None]
+        valid = ~np.isnan(x)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            signal = (np.where(valid, x, 0.0) @ self._weights) / (valid @ self._weights)
+        has_signal = ~np.isnan(signal)
+
+        # Holt con constantes de tiempo: la primera lectura fija el nivel
+        level, trend = self._level[s], self._trend[s]
+        dt = (t - self._last_ns[s]) / 1e9
+        first = np.isnan(level)
+        step = has_signal & ~first & (dt > 0)
+        dt = np.where(step, dt, 1.0)
+        forecast = level + trend * dt
+        new_level = forecast + (1 - np.exp(-dt / self.level_tau_s)) * (signal - forecast)
+        new_trend = trend + (1 - np.exp(-dt / self.trend_tau_s)) * ((new_level - level) / dt - trend)
+        self._level[s] = np.where(step, new_level, np.where(has_signal & first, signal, level))
+        self._trend[s] = np.where(step, new_trend, trend)
+        self._last_ns[s] = np.where(has_signal, t, self._last_ns[s])
+        count = self._count[s] + has_signal
+        self._count[s] = count
+
+        # Condición de regar: la señal, o su valor previsto, debajo de ``bajo``
+        predicted = np.where(self._predicts, self._level[s] + self._trend[s] * self._horizon_s, signal)
+        predicted = np.where(self._predicts & (count < self.min_samples), np.nan, predicted)
+        with np.errstate(invalid="ignore"):
+            below = predicted < self._low
+            above = signal > self._high
+        since = self._since[s]
+        since = np.where(below, np.where(since < 0, t, since), np.where(has_signal, -1, since))
+        self._since[s] = since
+        start = below & (t - since >= self._duration_ns)
+        active = (self._active[s] | start) & ~above
+        self._active[s] = active
+
+        valve = active.any(axis=1)
+        previous = self._valve[s]
+        self._valve[s] = valve
+        opened = valve & ~previous
+        closed = previous & ~valve
+        if opened.any() or closed.any():
+            self._emit(s, signal, timestamps_ns, start, opened, closed)
+
+    def _emit(self, s, signal, timestamps_ns, start, opened, closed):
+        # Solo se recorren en Python los nodos que cambian de estado (pocos)
+        for action, rows in (("regar", np.flatnonzero(opened)), ("detener", np.flatnonzero(closed))):
+            for row in rows:
+                rules = [self.rule_names[k] for k in np.flatnonzero(start[row])] if action == "regar" else []
+                value = signal[row, np.flatnonzero(start[row])[0]] if rules else np.nanmean(signal[row])
+                node_id = self._node_ids[s[row]]
+                command = {
+                    "time_ns": int(timestamps_ns[row]),
+                    "node": node_id,
+                    "action": action,
+                    "rules": rules,
+                    "value": float(value),
+                }
+                queue = self._queues.get(node_id)
+                if queue is None:
+                    self._queues[node_id] = queue = deque(maxlen=self.commands_per_node)
+                queue.append(command)
+                self._log.append(command)
+                _commands[action].inc()
+            self.total_commands += len(rows)
+        VALVES_OPEN.inc(int(opened.sum()) - int(closed.sum()))
+
+    def pull(self, node_id=None):
+        """Retira los comandos pendientes del nodo (de todos los nodos con ``None``), más viejos primero."""
+        self.flush()
+        with self._lock:
+            if node_id is not None:
+                queue = self._queues.pop(node_id, None)
+                return list(queue) if queue else []
+            queues, self._queues = self._queues, {}
+        return sorted((command for queue in queues.values() for command in queue), key=lambda c: c["time_ns"])
+
+    def commands(self, limit=None, node_id=None):
+        """Comandos emitidos más recientes primero (retirados o no), opcionalmente de un solo nodo."""
+        self.flush()
+        with self._lock:
+            commands = list(self._log)
+        commands.reverse()
+        if node_id is not None:
+            commands = [command for command in commands if command["node"] == node_id]
+        return commands[:limit] if limit is not None else commands
+
+    def state(self, node_id):
+        """Válvula, nivel y velocidad de secado (%/h) por regla y reglas que piden regar."""
+        self.flush()
+        with self._lock:
+            slot = self._slots.get(node_id)
+            if slot is None:
+                return None
+            return {
+                "irrigating": bool(self._valve[slot]),
+                "level": self._level[slot].tolist(),
+                "trend_per_hour": (self._trend[slot] * 3600).tolist(),
+                "rules": [self.rule_names[k] for k in np.flatnonzero(self._active[slot])],
+            }
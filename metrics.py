@@ -0,0 +1,303 @@
+"""Métricas de ejecución en formato de texto de Prometheus y logging muestreado.
+
+Los contadores y los histogramas no toman ningún candado al actualizarse:
+cada hilo incrementa su propia celda (``threading.local``) y la exportación
+suma las celdas de todos los hilos. El candado del registro solo se toma la
+primera vez que un hilo usa una métrica, cuando el hilo termina y al
+exportar. La celda de un hilo que termina se suma a la de los hilos
+retirados y se descarta: los totales nunca bajan y la cantidad de celdas no
+crece con cada conexión del servidor con hilos.
+
+    MESSAGES = metrics.counter("sensor_messages_total", "Lecturas válidas recibidas")
+    MESSAGES.inc(len(values))
+    metrics.REGISTRY.render()   # texto para /metrics
+
+``Sampler`` decide cada cuántas llamadas se registra un mensaje repetitivo
+(por ejemplo, cada bloque recibido) para que el log no sea un costo en el
+camino caliente.
+"""
+import bisect
+import functools
+import threading
+import time
+import weakref
+
+# Límites (s) de los histogramas de latencia
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Guard:
+    """Objeto que vive en el ``threading.local`` del hilo: se libera cuando el hilo termina."""
+
+    __slots__ = ("__weakref__",)
+
+
+class _PerThread:
+    """Celdas por hilo: cada hilo escribe solo la suya, sin candados."""
+
+    def __init__(self, registry, make_cell):
+        self._registry = registry
+        self._make_cell = make_cell
+        self._local = threading.local()
+        self._cells = {}
+        self._next_key = 0
+        # Suma de las celdas de los hilos que ya terminaron
+        self._retired = make_cell()
+
+    def cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = self._make_cell()
+            guard = _Guard()
+            with self._registry.lock:
+                key = self._next_key
+                self._next_key += 1
+                self._cells[key] = cell
+            weakref.finalize(guard, self._retire, key)
+            self._local.cell = cell
+            self._local.guard = guard
+            return cell
+
+    def _retire(self, key):
+        with self._registry.lock:
+            cell = self._cells.pop(key)
+            for i, value in enumerate(cell):
+                self._retired[i] += value
+
+    def cells(self):
+        with self._registry.lock:
+            return list(self._cells.values()) + [list(self._retired)]
+
+
+class Counter:
+    """Contador monótono (``_total``); con ``dec`` también sirve de gauge de altas y bajas."""
+
+    def __init__(self, registry, name, help_text, labels=None, kind="counter"):
+        self.name = name
+        self.help = help_text
+        self.labels = labels or {}
+        self.kind = kind
+        self._cells = _PerThread(registry, lambda: [0])
+
+    def inc(self, amount=1):
+        self._cells.cell()[0] += amount
+
+    def dec(self, amount=1):
+        self._cells.cell()[0] -= amount
+
+    @property
+    def value(self):
+        return sum(cell[0] for cell in self._cells.cells())
+
+    def samples(self):
+        yield self.name, self.labels, self.value
+
+
+class Histogram:
+    """Histograma acumulativo de Prometheus con límites fijos."""
+
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, buckets=LATENCY_BUCKETS, labels=None):
+        self.name = name
+        self.help = help_text
+        self.labels = labels or {}
+        self.buckets = tuple(buckets)
+        n = len(self.buckets) + 1
+        # Celda: [cuentas por bucket..., suma]; el último bucket es +Inf
+        self._cells = _PerThread(registry, lambda: [0] * n + [0.0])
+
+    def observe(self, value):
+        cell = self._cells.cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def time(self):
+        """Decorador que observa la duración de cada llamada."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        n = len(self.buckets) + 1
+        counts = [0] * n
+        total = 0.0
+        for cell in self._cells.cells():
+            for i in range(n):
+                counts[i] += cell[i]
+            total += cell[-1]
+        return counts, total
+
+    def samples(self):
+        counts, total = self.snapshot()
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            yield f"{self.name}_bucket", dict(self.labels, le=le), cumulative
+        yield f"{self.name}_sum", self.labels, total
+        yield f"{self.name}_count", self.labels, cumulative
+
+
+class Registry:
+    def __init__(self):
+        # Reentrante: la celda de un hilo que termina se retira con este candado
+        self.lock = threading.RLock()
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        with self.lock:
+            self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """``collector()`` se llama al exportar y devuelve ``(nombre, tipo, ayuda, [(labels, valor)])``."""
+        with self.lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        with self.lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        lines = []
+        described = set()
+        for metric in metrics:
+            if metric.name not in described:
+                described.add(metric.name)
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for collector in collectors:
+            for name, kind, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def counter(name, help_text, labels=None, registry=REGISTRY):
+    return registry.register(Counter(registry, name, help_text, labels))
+
+
+def gauge(name, help_text, labels=None, registry=REGISTRY):
+    """Gauge que se mueve con ``inc``/``dec`` (por ejemplo, conexiones abiertas)."""
+    return registry.register(Counter(registry, name, help_text, labels, kind="gauge"))
+
+
+def histogram(name, help_text, buckets=LATENCY_BUCKETS, labels=None, registry=REGISTRY):
+    return registry.register(Histogram(registry, name, help_text, buckets, labels))
+
+
+class Sampler:
+    """``sample()`` es verdadero en una de cada ``every`` llamadas de cada hilo."""
+
+    def __init__(self, every=100):
+        self.every = every
+        self._local = threading.local()
+
+    def sample(self):
+        count = getattr(self._local, "count", 0)
+        self._local.count = count + 1
+        return count % self.every == 0
+
+
+# Métricas de la ingesta, compartidas por el servidor con hilos y el de asyncio
+MESSAGES = counter("sensor_messages_total", "Lecturas válidas recibidas")
+PARSE_ERRORS = counter("sensor_parse_errors_total", "Líneas descartadas por mal formadas")
+DROPPED = counter("sensor_dropped_fragments_total", "Fragmentos descartados por superar el largo máximo de línea")
+BYTES = counter("sensor_received_bytes_total", "Bytes recibidos de los nodos")
+CONNECTIONS = gauge("sensor_active_connections", "Conexiones TCP abiertas con los nodos")
+VISIBLE_LATENCY = histogram("sensor_ingest_to_visible_seconds",
+                            "Tiempo desde que llega una lectura hasta que se envía al navegador")
+UPDATE_GRAPHS = histogram("dashboard_callback_seconds", "Duración de los callbacks de Dash",
+                          labels={"callback": "update_graphs"})
+
+# Bloques recibidos que se escriben en el log (nivel DEBUG)
+RECEIVED_LOG_SAMPLER = Sampler(100)
+
+
+def store_collector(get_store):
+    """Collector de ocupación de los buffers de ``get_store()`` (se consulta al exportar)."""
+    def collect():
+        store = get_store()
+        nodes = store.nodes()
+        rows = sum(len(store.buffer(node_id)) for node_id in nodes)
+        capacity = store.capacity * len(nodes)
+        return [
+            ("sensor_nodes", "gauge", "Nodos con ventana en memoria", [({}, len(nodes))]),
+            ("sensor_buffer_rows", "gauge", "Lecturas guardadas en las ventanas", [({}, rows)]),
+            ("sensor_buffer_occupancy_ratio", "gauge", "Fracción ocupada de las ventanas",
+             [({}, rows / capacity if capacity else 0.0)]),
+        ]
+    return collect
+
+
+def start_http_server(port, host="0.0.0.0", registry=REGISTRY, routes=None):
+    """Sirve ``/metrics`` en un hilo propio, para procesos sin Flask (la ingesta de production.py).
+
+    ``routes`` agrega rutas: prefijo -> ``handler(resto, query)`` que devuelve
+    ``(content_type, body)``, con ``resto`` el camino después del prefijo y
+    ``query`` el diccionario de ``urllib.parse.parse_qs``. Un ``KeyError``
+    responde 404 y un ``ValueError``, 400.
+    """
+    # Solo la ingesta sin dashboard lo usa: importarlo siempre demoraría el arranque de todos
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs
+
+    routes = routes or {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path, _, query = self.path.partition("?")
+            if path == "/metrics":
+                content_type, body = CONTENT_TYPE, registry.render().encode()
+            else:
+                prefix = next((prefix for prefix in routes if path.startswith(prefix)), None)
+                if prefix is None:
+                    self.send_error(404)
+                    return
+                try:
+                    content_type, body = routes[prefix](path[len(prefix):], parse_qs(query))
+                except KeyError as error:
+                    self.send_error(404, error.args[0] if error.args else None)
+                    return
+                except ValueError as error:
+                    self.send_error(400, str(error))
+                    return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=httpd.serve_forever, name="metrics-http", daemon=True).start()
+    return httpd
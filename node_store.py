@@ -0,0 +1,171 @@
+"""Almacenamiento particionado por nodo sensor (ESP32).
+
+Cada nodo tiene su propio ``SensorRingBuffer`` con su propia ventana y su
+propio candado, de modo que un nodo muy activo no bloquea ni desplaza las
+lecturas de los demás. El candado del almacén solo se toma al crear un nodo.
+
+Si se asigna ``history`` (un ``TimeSeriesStore``), cada lote también se
+guarda en disco además de la ventana en memoria; si se asigna ``rollups``
+(un ``RollupEngine``), se actualizan sus agregados, y si se asigna ``stats``
+(un ``StreamingStats``), las estadísticas de la ventana. ``anomalies`` (un
+``AnomalyDetector``) revisa las lecturas en busca de sensores que fallan e
+``irrigation`` (un ``IrrigationEngine``) decide cuándo regar.
+
+``declare_columns`` registra las columnas que manda cada nodo según el
+esquema de su protocolo (las demás llegan en ``nan`` y no son sensores que
+fallan) y se la pasa a los sinks que la usan; ``columns_of`` la consulta.
+
+Los sinks que evalúan a todos los nodos juntos (``anomalies`` e
+``irrigation``) dejan cada bloque en espera con ``PendingRows`` y lo evalúan
+por lotes.
+"""
+import threading
+import time
+
+import numpy as np
+
+from ring_buffer import SensorRingBuffer
+from sensor_schema import SENSOR_COLUMNS
+
+
+class NodeStore:
+    def __init__(self, capacity=100, buffer_factory=SensorRingBuffer, history=None, rollups=None,
+                 stats=None, anomalies=None, irrigation=None):
+        self.capacity = capacity
+        self.buffer_factory = buffer_factory
+        self.history = history
+        self.rollups = rollups
+        self.stats = stats
+        self.anomalies = anomalies
+        self.irrigation = irrigation
+        self._buffers = {}
+        self._columns = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buffers)
+
+    def __contains__(self, node_id):
+        return node_id in self._buffers
+
+    def buffer(self, node_id):
+        """Devuelve el buffer del nodo, creándolo la primera vez que aparece."""
+        buffer = self._buffers.get(node_id)
+        if buffer is None:
+            with self._lock:
+                buffer = self._buffers.get(node_id)
+                if buffer is None:
+                    buffer = self.buffer_factory(self.capacity)
+                    self._buffers[node_id] = buffer
+        return buffer
+
+    def append(self, node_id, timestamp_ns, values):
+        self.extend(node_id, [timestamp_ns], [values])
+
+    def extend(self, node_id, timestamps_ns, values):
+        self.buffer(node_id).extend(timestamps_ns, values)
+        if self.history is not None:
+            self.history.append(node_id, timestamps_ns, values)
+        if self.rollups is not None:
+            self.rollups.append(node_id, timestamps_ns, values)
+        if self.stats is not None:
+            self.stats.append(node_id, timestamps_ns, values)
+        if self.anomalies is not None:
+            self.anomalies.append(node_id, timestamps_ns, values)
+        if self.irrigation is not None:
+            self.irrigation.append(node_id, timestamps_ns, values)
+
+    def declare_columns(self, node_id, columns):
+        """Columnas que manda el nodo; sin declarar, todas las de ``SENSOR_COLUMNS``."""
+        self._columns[node_id] = tuple(columns)
+        for sink in (self.anomalies, self.irrigation):
+            if sink is not None and hasattr(sink, "declare_columns"):
+                sink.declare_columns(node_id, columns)
+
+    def columns_of(self, node_id):
+        return self._columns.get(node_id, SENSOR_COLUMNS)
+
+    def nodes(self):
+        """Identificadores de los nodos conocidos, ordenados."""
+        return sorted(self._buffers)
+
+    def query(self, node_id, start_ns=None, end_ns=None):
+        """Copia ``(timestamps, values)`` de las lecturas del nodo en ``[start_ns, end_ns)``.
+
+        Los timestamps de cada nodo son crecientes, así que el rango se ubica
+        con búsqueda binaria.
+        """
+        if node_id not in self._buffers:
+            raise KeyError(f"Nodo desconocido: {node_id}")
+        timestamps, values = self._buffers[node_id].snapshot()
+        lo = 0 if start_ns is None else np.searchsorted(timestamps, start_ns, side="left")
+        hi = len(timestamps) if end_ns is None else np.searchsorted(timestamps, end_ns, side="left")
+        return timestamps[lo:hi], values[:, lo:hi]
+
+    def to_dataframe(self, node_id):
+        return self._buffers[node_id].to_dataframe()
+
+
+class PendingRows:
+    """Bloques recibidos que un sink todavía no evaluó, agrupados por nodo.
+
+    ``add`` (el camino caliente de la ingesta) solo guarda la referencia al
+    bloque y avisa cuando se juntaron ``flush_rows`` lecturas o pasó
+    ``flush_interval_s`` desde la última evaluación. ``take`` devuelve todas
+    las lecturas en espera como un solo lote, las de cada nodo en orden.
+    """
+
+    def __init__(self, n_columns, flush_rows, flush_interval_s):
+        self.n_columns = n_columns
+        self.flush_rows = flush_rows
+        self.flush_interval_s = flush_interval_s
+        self._chunks = {}
+        self._rows = 0
+        self._lock = threading.Lock()
+        self._last_take = time.monotonic()
+
+    def add(self, node_id, timestamps_ns, values):
+        """Deja un bloque en espera; ``True`` si ya corresponde evaluar."""
+        with self._lock:
+            chunks = self._chunks.get(node_id)
+            if chunks is None:
+                self._chunks[node_id] = chunks = []
+            chunks.append((timestamps_ns, values))
+            self._rows += len(timestamps_ns)
+            return self._rows >= self.flush_rows or time.monotonic() - self._last_take >= self.flush_interval_s
+
+    def take(self):
+        """``(node_ids, timestamps_ns, values)`` de lo que estaba en espera, o ``None`` si no había nada."""
+        with self._lock:
+            pending, self._chunks = self._chunks, {}
+            self._rows = 0
+            self._last_take = time.monotonic()
+        if not pending:
+            return None
+        node_ids, timestamps_ns, values = [], [], []
+        for node_id, chunks in pending.items():
+            node_timestamps = np.concatenate([np.asarray(t, dtype=np.int64).ravel() for t, _ in chunks])
+            node_values = np.concatenate([np.asarray(v, dtype=np.float64).reshape(-1, self.n_columns)
+                                          for _, v in chunks])
+            node_ids += [node_id] * len(node_values)
+            timestamps_ns.append(node_timestamps)
+            values.append(node_values)
+        return node_ids, np.concatenate(timestamps_ns), np.concatenate(values)
+
+
+def node_rounds(slots):
+    """Filas de un lote por rondas: la ronda k tiene la k-ésima lectura de cada nodo.
+
+    Los sinks vectorizados actualizan un renglón de estado por nodo; con un
+    nodo repetido en el lote, sus lecturas se procesan en orden, una por ronda.
+    """
+    if len(slots) <= 1 or len(np.unique(slots)) == len(slots):
+        yield np.arange(len(slots))
+        return
+    order = np.argsort(slots, kind="stable")
+    first = np.r_[0, np.flatnonzero(np.diff(slots[order])) + 1]
+    rank = np.empty(len(slots), dtype=np.intp)
+    rank[order] = np.arange(len(slots)) - np.repeat(first, np.diff(np.r_[first, len(slots)]))
+    # Filas ordenadas por ronda (y por posición dentro de cada ronda), cortadas una sola vez
+    by_rank = np.argsort(rank, kind="stable")
+    yield from np.split(by_rank, np.flatnonzero(np.diff(rank[by_rank])) + 1)
@@ -0,0 +1,193 @@
+"""Entrada de producción: un proceso de ingesta y un pool de procesos web.
+
+    python production.py --workers 4 --web-port 8050
+
+El proceso de ingesta atiende a los ESP32 por TCP y es el único que escribe
+en el segmento de memoria compartida (``SharedNodeStore``) y en el historial
+en disco; también corre el detector de anomalías y el motor de riego. Cada
+worker web sirve el dashboard de ``AnalisisDatos`` leyendo ese segmento y el
+historial (``TimeSeriesStore`` en solo lectura, para ``/api/history``). Los
+workers se crean con fork y aceptan conexiones del mismo socket, como los
+workers sync de gunicorn (solo POSIX); si uno termina, se reemplaza.
+
+Cada worker web exporta sus métricas (callbacks, ocupación de los buffers) en
+``/metrics`` del dashboard; las de la ingesta (mensajes, errores, conexiones)
+se sirven desde el proceso de ingesta en ``--metrics-port``, junto con las
+alertas y los comandos de riego (ingest_api.py) que los workers piden para
+"Alertas" y ``/riego/<nodo>``.
+
+También se puede usar gunicorn para la parte web:
+
+    python production.py --workers 0
+    gunicorn -w 4 -b 0.0.0.0:8050 'production:create_server("sensores", "datos", "http://127.0.0.1:9100")'
+"""
+import argparse
+import logging
+import multiprocessing
+import socket
+import time
+
+import ingest_pipeline
+from ingest import DEFAULT_HOST, DEFAULT_PORT, WINDOW_SIZE
+from shared_store import SharedNodeStore
+
+DEFAULT_SHM_NAME = "sensores"
+DEFAULT_WEB_PORT = 8050
+DEFAULT_DATA_DIR = "datos"
+DEFAULT_METRICS_PORT = 9100
+
+
+def ingest_url(metrics_port):
+    """URL de las alertas y el riego de la ingesta (ingest_api.py), o ``None`` sin ``--metrics-port``."""
+    return f"http://127.0.0.1:{metrics_port}" if metrics_port else None
+
+
+def create_server(shm_name=DEFAULT_SHM_NAME, data_dir=DEFAULT_DATA_DIR, ingest=ingest_url(DEFAULT_METRICS_PORT)):
+    """Servidor Flask del dashboard conectado (solo lectura) al segmento ``shm_name``.
+
+    ``data_dir`` es el historial de la ingesta e ``ingest`` la URL de sus
+    alertas y comandos de riego; con ``None``, el dashboard no los muestra.
+    """
+    import AnalisisDatos
+    import ingest_api
+
+    store = SharedNodeStore.attach(shm_name)
+    if data_dir is not None:
+        from timeseries_store import TimeSeriesStore
+
+        store.history = TimeSeriesStore(data_dir, read_only=True)
+    if ingest is not None:
+        store.anomalies = ingest_api.RemoteAnomalies(ingest)
+        store.irrigation = ingest_api.RemoteIrrigation(ingest)
+    AnalisisDatos.data_store = store
+    return AnalisisDatos.server
+
+
+def run_ingest(shm_name, server="threaded", port=DEFAULT_PORT, data_dir=None, retention_s=None,
+               metrics_port=None, pipeline_args=None):
+    import ingest_api
+    import metrics
+    from anomaly import AnomalyDetector
+    from irrigation import IrrigationEngine
+
+    store = SharedNodeStore.attach(shm_name)
+    if data_dir is not None:
+        from timeseries_store import TimeSeriesStore
+
+        store.history = TimeSeriesStore(data_dir, retention_s=retention_s)
+        if retention_s is not None:
+            store.history.start_retention()
+        store.load_history(store.history, time.time_ns())
+    store.anomalies = AnomalyDetector()
+    store.irrigation = IrrigationEngine()
+    if metrics_port:
+        metrics.start_http_server(metrics_port, routes=ingest_api.routes(store))
+    pipeline = ingest_pipeline.from_arguments(store, pipeline_args) if pipeline_args is not None else None
+    if server == "threaded":
+        from threaded_server import start_tcp_server as target
+    else:
+        from async_server import start_async_server as target
+    target(store=store, port=port, pipeline=pipeline)
+
+
+def run_web_worker(shm_name, fd, threaded=False, data_dir=None, ingest=None):
+    from werkzeug.serving import make_server
+
+    # Un log por request en cada worker sería más costoso que el request mismo
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    make_server(DEFAULT_HOST, 0, create_server(shm_name, data_dir, ingest), threaded=threaded, fd=fd).serve_forever()
+
+
+def listen(host, port, backlog=1024):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+def start_web_workers(shm_name, sock, workers, threaded=False, data_dir=None, ingest=None):
+    context = multiprocessing.get_context("fork")
+    processes = []
+    for _ in range(workers):
+        process = context.Process(target=run_web_worker, args=(shm_name, sock.fileno(), threaded, data_dir, ingest),
+                                  daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def add_ingest_arguments(parser):
+    """Opciones del proceso de ingesta, compartidas con ``cli.py ingest``."""
+    parser.add_argument("--server", choices=["threaded", "async"], default="threaded",
+                        help="Servidor TCP de la ingesta")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Puerto TCP de los ESP32")
+    parser.add_argument("--shm-name", default=DEFAULT_SHM_NAME, help="Nombre del segmento de memoria compartida")
+    parser.add_argument("--max-nodes", type=int, default=64, help="Cantidad máxima de nodos en el segmento")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="Directorio del historial en disco")
+    parser.add_argument("--no-history", action="store_true", help="No guardar el historial en disco")
+    parser.add_argument("--retention-days", type=float, default=None, help="Días de historial que se conservan")
+    parser.add_argument("--metrics-port", type=int, default=DEFAULT_METRICS_PORT,
+                        help="Puerto de /metrics, las alertas y el riego de la ingesta (0: no)")
+    ingest_pipeline.add_arguments(parser)
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+
+
+def ingest_kwargs(args):
+    """Argumentos de ``run_ingest`` según las opciones de ``add_ingest_arguments``."""
+    return {
+        "shm_name": args.shm_name, "server": args.server, "port": args.port,
+        "data_dir": None if args.no_history else args.data_dir,
+        "retention_s": args.retention_days * 86400 if args.retention_days else None,
+        "metrics_port": args.metrics_port, "pipeline_args": args,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingesta y dashboard en procesos separados")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="Procesos web (0: solo ingesta, p. ej. para usar gunicorn)")
+    parser.add_argument("--threaded", action="store_true", help="Cada worker atiende requests en hilos")
+    parser.add_argument("--web-host", default=DEFAULT_HOST)
+    parser.add_argument("--web-port", type=int, default=DEFAULT_WEB_PORT)
+    add_ingest_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    store = SharedNodeStore.create(args.shm_name, max_nodes=args.max_nodes, capacity=WINDOW_SIZE)
+    context = multiprocessing.get_context("fork")
+    processes = []
+    try:
+        ingest = context.Process(target=run_ingest, daemon=True, kwargs=ingest_kwargs(args))
+        ingest.start()
+        processes.append(ingest)
+
+        sock = listen(args.web_host, args.web_port) if args.workers else None
+        web_args = (args.threaded, ingest_kwargs(args)["data_dir"], ingest_url(args.metrics_port))
+        workers = start_web_workers(args.shm_name, sock, args.workers, *web_args) if sock else []
+        processes.extend(workers)
+        print(f"Dashboard en http://{args.web_host}:{args.web_port} con {len(workers)} workers")
+
+        while ingest.is_alive():
+            time.sleep(1)
+            for i, worker in enumerate(workers):
+                if not worker.is_alive():
+                    print(f"Worker {worker.pid} terminó (código {worker.exitcode}); se reemplaza")
+                    workers[i] = start_web_workers(args.shm_name, sock, 1, *web_args)[0]
+                    processes.append(workers[i])
+        print(f"El proceso de ingesta terminó (código {ingest.exitcode})")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+        store.close()
+        store.unlink()
+
+
+if __name__ == "__main__":
+    main()
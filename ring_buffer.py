@@ -0,0 +1,142 @@
+"""Buffer circular columnar respaldado por NumPy para las lecturas de los sensores.
+
+Reemplaza el patrón ``pd.concat`` + ``iloc[-N:]`` por arreglos de tamaño fijo:
+agregar una lectura es O(1) y la ventana se obtiene como vista sin copiar.
+"""
+import threading
+import time
+
+import numpy as np
+
+from sensor_schema import SENSOR_COLUMNS
+
+# Los cambios de hora ocurren en múltiplos de 15 minutos (UTC): dentro de un
+# cuarto de hora la diferencia con UTC es una sola
+_QUARTER_NS = 900 * 10**9
+# Un rango más corto que esto tiene a lo sumo un cambio de hora
+_SINGLE_CHANGE_QUARTERS = 150 * 96
+
+
+def _utc_offset_ns(quarter):
+    return time.localtime(int(quarter) * 900).tm_gmtoff * 10**9
+
+
+def local_datetimes(timestamps_ns):
+    """Convierte timestamps (ns desde epoch, UTC) a datetime64[ns] en hora local.
+
+    La diferencia con UTC se toma en cada instante, como ``datetime.now()``:
+    un proceso que corre durante un cambio de horario de verano la sigue.
+    """
+    timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+    if not len(timestamps_ns):
+        return timestamps_ns.astype("datetime64[ns]")
+    quarters = timestamps_ns // _QUARTER_NS
+    lo, hi = quarters.min(), quarters.max()
+    offset_ns = _utc_offset_ns(lo)
+    if offset_ns != _utc_offset_ns(hi) or hi - lo >= _SINGLE_CHANGE_QUARTERS:
+        # El rango cruza un cambio de hora: una diferencia por cuarto de hora distinto
+        unique, inverse = np.unique(quarters, return_inverse=True)
+        offset_ns = np.array([_utc_offset_ns(quarter) for quarter in unique], dtype=np.int64)[inverse]
+    return (timestamps_ns + offset_ns).astype("datetime64[ns]")
+
+
+class SensorRingBuffer:
+    """Ventana deslizante de tamaño fijo con un arreglo float64 por columna.
+
+    Cada muestra se escribe dos veces, en ``i`` y en ``i + capacity``. Así la
+    ventana completa siempre ocupa un tramo contiguo de los arreglos y se puede
+    devolver en orden temporal como vista, sin importar dónde esté la cabeza.
+
+    Las vistas devueltas siguen siendo válidas hasta que se agreguen
+    ``capacity`` muestras nuevas; para conservarlas más tiempo use ``snapshot``.
+    """
+
+    def __init__(self, capacity=100, columns=SENSOR_COLUMNS):
+        if capacity <= 0:
+            raise ValueError("La capacidad del buffer debe ser positiva")
+        self.capacity = int(capacity)
+        self.columns = tuple(columns)
+        self._index = {name: i for i, name in enumerate(self.columns)}
+        # Timestamps en nanosegundos desde epoch (UTC)
+        self._timestamps = np.zeros(2 * self.capacity, dtype=np.int64)
+        # Una fila contigua por columna: self._values[k] es el arreglo de la columna k
+        self._values = np.zeros((len(self.columns), 2 * self.capacity), dtype=np.float64)
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp_ns, values):
+        """Agrega una lectura (``values`` en el orden de ``columns``)."""
+        with self._lock:
+            i = self._next
+            j = i + self.capacity
+            self._timestamps[i] = self._timestamps[j] = timestamp_ns
+            self._values[:, i] = values
+            self._values[:, j] = values
+            self._next = (i + 1) % self.capacity
+            if self._size < self.capacity:
+                self._size += 1
+
+    def extend(self, timestamps_ns, values):
+        """Agrega un bloque de lecturas; ``values`` tiene forma (n, len(columns))."""
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64).reshape(len(timestamps_ns), len(self.columns))
+        n = len(timestamps_ns)
+        if n == 0:
+            return
+        with self._lock:
+            start = self._next
+            # Si el bloque es más grande que la ventana solo sobreviven las últimas filas
+            if n > self.capacity:
+                start = (start + n - self.capacity) % self.capacity
+                timestamps_ns = timestamps_ns[-self.capacity:]
+                values = values[-self.capacity:]
+            idx = (start + np.arange(len(timestamps_ns))) % self.capacity
+            self._timestamps[idx] = timestamps_ns
+            self._timestamps[idx + self.capacity] = timestamps_ns
+            self._values[:, idx] = values.T
+            self._values[:, idx + self.capacity] = values.T
+            self._next = (self._next + n) % self.capacity
+            self._size = min(self._size + n, self.capacity)
+
+    def clear(self):
+        with self._lock:
+            self._next = 0
+            self._size = 0
+
+    def _window_slice(self):
+        end = self._next + self.capacity
+        return slice(end - self._size, end)
+
+    def timestamps(self):
+        """Vista de los timestamps (ns) de la ventana, del más antiguo al más reciente."""
+        return self._timestamps[self._window_slice()]
+
+    def column(self, name):
+        """Vista de una columna de la ventana en orden temporal."""
+        return self._values[self._index[name], self._window_slice()]
+
+    def window(self):
+        """Vistas ``(timestamps, values)``; ``values`` tiene forma (len(columns), n)."""
+        with self._lock:
+            window = self._window_slice()
+            return self._timestamps[window], self._values[:, window]
+
+    def snapshot(self):
+        """Copia consistente de la ventana, segura frente a escrituras posteriores."""
+        with self._lock:
+            window = self._window_slice()
+            return self._timestamps[window].copy(), self._values[:, window].copy()
+
+    def to_dataframe(self):
+        """Copia de la ventana como DataFrame con el mismo formato que tenía ``data_df``."""
+        # pandas solo se necesita en el lado del dashboard
+        import pandas as pd
+
+        timestamps, values = self.snapshot()
+        df = pd.DataFrame(dict(zip(self.columns, values)))
+        df.insert(0, "timestamp", local_datetimes(timestamps))
+        return df
@@ -0,0 +1,282 @@
+"""Agregados incrementales (rollups) a varias resoluciones para las consultas del dashboard.
+
+A medida que llegan las lecturas, cada nodo mantiene buckets de 10 s, 1 min,
+15 min y 1 h con la cantidad, suma, mínimo y máximo de cada columna (sin
+contar los ``nan``). Cada resolución es un arreglo circular de tamaño fijo
+indexado por número de bucket, así que agregar un lote cuesta lo mismo sin
+importar cuánto historial se conserve.
+
+Cada resolución conserva solo el rango más largo para el que la elige
+``choose_resolution`` (los rangos del dashboard llegan a 30 días); los
+rangos más largos se consultan en el historial (``history_api.py``). Un
+bucket vacío se reconoce por ``bucket == 0``, así los anillos en memoria
+compartida se usan tal como nacen, en cero, y los de memoria del proceso
+empiezan chicos y crecen a medida que el nodo manda datos.
+
+``query_series`` es la capa de consulta: para el rango visible elige la
+resolución que da una cantidad de puntos más cercana a ``target_points``, o
+los datos crudos de la ventana en memoria si el rango es corto.
+"""
+import math
+import threading
+
+import numpy as np
+
+from ring_buffer import local_datetimes
+from sensor_schema import SENSOR_COLUMNS
+
+# (resolución en segundos, cantidad de buckets que se conservan)
+DEFAULT_LEVELS = (
+    (10, 360),          # 1 hora
+    (60, 1440),         # 1 día
+    (900, 7 * 96),      # 7 días
+    (3600, 30 * 24),    # 30 días
+)
+
+# Buckets con que empieza cada anillo en memoria del proceso
+INITIAL_BUCKETS = 64
+
+# Cantidad de puntos por serie que se le envían al navegador
+DEFAULT_TARGET_POINTS = 500
+
+
+class RollupLevel:
+    """Buckets de una resolución para un nodo.
+
+    Sin ``storage`` el anillo empieza con ``INITIAL_BUCKETS`` y se duplica
+    (hasta ``capacity``) cuando los buckets recibidos ya no entran: un nodo
+    nuevo o que manda poco no ocupa la memoria de todo el rango.
+    """
+
+    def __init__(self, resolution_s, capacity, n_columns, storage=None):
+        self.resolution_s = resolution_s
+        self.resolution_ns = int(resolution_s * 1e9)
+        self.capacity = capacity
+        self.n_columns = n_columns
+        self._first = None
+        if storage is None:
+            self._allocate(min(capacity, INITIAL_BUCKETS))
+        else:
+            # Arreglos ya reservados (memoria compartida, en cero al crearse) con
+            # los mismos tipos y formas; se usan tal cual, sin reiniciarlos
+            self.bucket, self.count, self.sum, self.min, self.max = storage
+
+    def _allocate(self, size):
+        self.bucket = np.zeros(size, dtype=np.int64)
+        self.count = np.zeros((size, self.n_columns), dtype=np.int32)
+        self.sum = np.zeros((size, self.n_columns), dtype=np.float64)
+        self.min = np.zeros((size, self.n_columns), dtype=np.float32)
+        self.max = np.zeros((size, self.n_columns), dtype=np.float32)
+
+    def _fit(self, buckets):
+        # El anillo crece hasta cubrir desde el primer bucket recibido hasta el último
+        first = int(buckets.min()) if self._first is None else min(self._first, int(buckets.min()))
+        self._first = first
+        size = len(self.bucket)
+        needed = min(self.capacity, int(buckets.max()) - first + 1)
+        if needed <= size:
+            return
+        old = self.bucket, self.count, self.sum, self.min, self.max
+        self._allocate(min(self.capacity, max(needed, 2 * size)))
+        # Los buckets que entran en el anillo nuevo caen en slots distintos
+        used = (old[0] > 0) & (old[0] > int(buckets.max()) - len(self.bucket))
+        slots = old[0][used] % len(self.bucket)
+        for new, previous in zip((self.bucket, self.count, self.sum, self.min, self.max), old):
+            new[slots] = previous[used]
+
+    def _claim(self, buckets, slots):
+        # Un slot vacío (0) o que guarda un bucket más viejo se reinicia para el bucket nuevo
+        stale = self.bucket[slots] < buckets
+        reset = slots[stale]
+        self.bucket[reset] = buckets[stale]
+        self.count[reset] = 0
+        self.sum[reset] = 0.0
+        self.min[reset] = np.inf
+        self.max[reset] = -np.inf
+        # Lecturas más viejas que lo que conserva el anillo se ignoran
+        return self.bucket[slots] == buckets
+
+    def add(self, timestamps_ns, values):
+        buckets = timestamps_ns // self.resolution_ns
+        valid = ~np.isnan(values)
+        if len(self.bucket) < self.capacity:
+            self._fit(buckets)
+        size = len(self.bucket)
+        if buckets[0] == buckets[-1]:
+            # Caso habitual: todo el lote cae en el mismo bucket
+            bucket = buckets[:1]
+            slot = bucket % size
+            if self._claim(bucket, slot)[0]:
+                i = slot[0]
+                self.count[i] += valid.sum(axis=0, dtype=np.int32)
+                self.sum[i] += np.where(valid, values, 0.0).sum(axis=0)
+                # fmin/fmax ignoran los nan (una columna sin lecturas queda en ±inf)
+                np.fmin(self.min[i], np.fmin.reduce(values, axis=0), out=self.min[i])
+                np.fmax(self.max[i], np.fmax.reduce(values, axis=0), out=self.max[i])
+            return
+
+        unique, inverse = np.unique(buckets, return_inverse=True)
+        slots = unique % size
+        kept = self._claim(unique, slots)[inverse]
+        rows = slots[inverse][kept]
+        values = values[kept]
+        valid = valid[kept]
+        np.add.at(self.count, rows, valid.astype(np.int32))
+        np.add.at(self.sum, rows, np.where(valid, values, 0.0))
+        np.fmin.at(self.min, rows, values.astype(np.float32))
+        np.fmax.at(self.max, rows, values.astype(np.float32))
+
+    def query(self, start_ns, end_ns):
+        """Buckets de ``[start_ns, end_ns)`` ordenados: ``(timestamps, count, mean, min, max)``.
+
+        ``count`` es por columna; una columna sin lecturas en el bucket tiene ``nan``.
+        """
+        first = start_ns // self.resolution_ns
+        last = (end_ns - 1) // self.resolution_ns
+        slots = np.nonzero((self.bucket >= max(first, 1)) & (self.bucket <= last))[0]
+        slots = slots[np.argsort(self.bucket[slots])]
+        count = self.count[slots]
+        has_readings = count.any(axis=1)
+        slots, count = slots[has_readings], count[has_readings]
+        empty = count == 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(empty, np.nan, self.sum[slots] / count)
+        low = np.where(empty, np.nan, self.min[slots])
+        high = np.where(empty, np.nan, self.max[slots])
+        return self.bucket[slots] * self.resolution_ns, count, mean, low, high
+
+
+class RollupEngine:
+    """Rollups de todos los nodos; ``append`` tiene la misma firma que ``TimeSeriesStore``."""
+
+    def __init__(self, levels=DEFAULT_LEVELS, columns=SENSOR_COLUMNS):
+        self.levels = tuple(levels)
+        self.columns = tuple(columns)
+        self._nodes = {}
+        self._lock = threading.Lock()
+
+    def _node(self, node_id):
+        node = self._nodes.get(node_id)
+        if node is None:
+            with self._lock:
+                node = self._nodes.get(node_id)
+                if node is None:
+                    levels = [RollupLevel(res, cap, len(self.columns)) for res, cap in self.levels]
+                    node = (threading.Lock(), levels)
+                    self._nodes[node_id] = node
+        return node
+
+    def append(self, node_id, timestamps_ns, values):
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        if not len(timestamps_ns):
+            return
+        values = np.asarray(values, dtype=np.float64).reshape(len(timestamps_ns), len(self.columns))
+        lock, levels = self._node(node_id)
+        with lock:
+            for level in levels:
+                level.add(timestamps_ns, values)
+
+    def nodes(self):
+        return sorted(self._nodes)
+
+    def load_history(self, history, now_ns):
+        """Reconstruye los rollups desde un ``TimeSeriesStore`` al reiniciar el servidor."""
+        horizon_ns = max(resolution_s * capacity for resolution_s, capacity in self.levels) * 10**9
+        for node_id in history.nodes():
+            for chunk in history.iter_range(node_id, now_ns - horizon_ns):
+                values = np.column_stack([chunk[name] for name in self.columns])
+                self.append(node_id, chunk["timestamp"], values)
+
+    def query(self, node_id, resolution_s, start_ns, end_ns):
+        if node_id not in self._nodes:
+            empty = np.empty((0, len(self.columns)))
+            return np.empty(0, dtype=np.int64), np.empty((0, len(self.columns)), dtype=np.int32), empty, empty, empty
+        lock, levels = self._nodes[node_id]
+        level = next(level for level in levels if level.resolution_s == resolution_s)
+        with lock:
+            return level.query(start_ns, end_ns)
+
+    def choose_resolution(self, start_ns, end_ns, target_points=DEFAULT_TARGET_POINTS):
+        """Elige la resolución para el rango; devuelve ``(resolution_s, error)``.
+
+        Entre las resoluciones que todavía conservan todo el rango, se queda con
+        la que da una cantidad de buckets más cercana a ``target_points`` en
+        escala logarítmica (``error``); ante un empate gana la más gruesa.
+        """
+        span_ns = end_ns - start_ns
+        choice, best_error = None, math.inf
+        for resolution_s, capacity in self.levels:
+            resolution_ns = resolution_s * 1e9
+            if capacity * resolution_ns < span_ns:
+                continue
+            error = abs(math.log(max(span_ns / resolution_ns, 1) / target_points))
+            if error <= best_error:
+                choice, best_error = resolution_s, error
+        if choice is None:
+            # Ninguna conserva todo el rango: la más gruesa es la que más cubre
+            choice = self.levels[-1][0]
+        return choice, best_error
+
+
+def _raw_series(columns, timestamps, values):
+    series = {"timestamp": local_datetimes(timestamps), "resolution_s": None,
+              "last_ns": int(timestamps[-1]) if len(timestamps) else None}
+    for name, column in zip(columns, values):
+        series[name] = {"mean": column, "min": column, "max": column}
+    return series
+
+
+def _rollup_series(columns, resolution_s, timestamps, mean, low, high):
+    series = {"timestamp": local_datetimes(timestamps), "resolution_s": resolution_s,
+              "last_ns": int(timestamps[-1]) if len(timestamps) else None}
+    for i, name in enumerate(columns):
+        series[name] = {"mean": mean[:, i], "min": low[:, i], "max": high[:, i]}
+    return series
+
+
+def query_series(store, rollups, node_id, start_ns, end_ns, target_points=DEFAULT_TARGET_POINTS,
+                 complete_only=False):
+    """Serie del nodo para el rango visible, con unos ``target_points`` puntos.
+
+    Devuelve un diccionario con ``timestamp`` (datetime64[ns], hora local), ``resolution_s``
+    (``None`` si son datos crudos), ``last_ns`` (timestamp del último punto)
+    y, por columna, ``mean``/``min``/``max``.
+    Los datos crudos vienen de la ventana en memoria (``NodeStore``) y se usan
+    si cubren todo el rango y no pasan de ``target_points`` o se acercan más
+    a esa cantidad que cualquier rollup.
+
+    Con ``complete_only`` se omite el bucket en curso, para luego continuar la
+    serie con ``series_since`` sin repetir ni dejar desactualizado ese punto.
+    """
+    resolution_s, error = rollups.choose_resolution(start_ns, end_ns, target_points)
+    if node_id in store:
+        timestamps, values = store.query(node_id, start_ns, end_ns)
+        window = store.buffer(node_id).timestamps()
+        covers = len(window) and (window[0] <= start_ns or len(window) < store.capacity)
+        if covers and len(timestamps) and (len(timestamps) <= target_points
+                                           or abs(math.log(len(timestamps) / target_points)) <= error):
+            return _raw_series(store.buffer(node_id).columns, timestamps, values)
+
+    if complete_only:
+        resolution_ns = resolution_s * 10**9
+        end_ns = min(end_ns, end_ns // resolution_ns * resolution_ns)
+    timestamps, count, mean, low, high = rollups.query(node_id, resolution_s, start_ns, end_ns)
+    return _rollup_series(rollups.columns, resolution_s, timestamps, mean, low, high)
+
+
+def series_since(store, rollups, node_id, resolution_s, after_ns, now_ns):
+    """Puntos nuevos de una serie ya enviada al navegador, con el formato de ``query_series``.
+
+    Con datos crudos son las lecturas posteriores a ``after_ns``; con un
+    rollup, los buckets que se completaron después del último enviado (el
+    bucket en curso todavía puede cambiar y no se envía).
+    """
+    if resolution_s is None:
+        timestamps, values = store.query(node_id, None if after_ns is None else after_ns + 1, None)
+        return _raw_series(store.buffer(node_id).columns, timestamps, values)
+
+    resolution_ns = resolution_s * 10**9
+    start_ns = 0 if after_ns is None else after_ns + resolution_ns
+    current_bucket_ns = now_ns // resolution_ns * resolution_ns
+    timestamps, count, mean, low, high = rollups.query(node_id, resolution_s, start_ns, current_bucket_ns)
+    return _rollup_series(rollups.columns, resolution_s, timestamps, mean, low, high)
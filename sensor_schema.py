@@ -0,0 +1,25 @@
+"""Esquema compartido de las lecturas que envía cada ESP32."""
+
+# Orden de los campos en el mensaje CSV (10 valores separados por comas)
+SENSOR_COLUMNS = (
+    "temperatura_DHT22", "temperatura_DHT11",
+    "temperatura_LM35_1", "temperatura_LM35_2",
+    "humedad_suelo_1", "humedad_suelo_2",
+    "humedad_suelo_3", "humedad_DHT22", "humedad_DHT11",
+    "promedio_temperatura",
+)
+
+TEMP_COLUMNS = ("temperatura_DHT22", "temperatura_DHT11", "temperatura_LM35_1", "temperatura_LM35_2")
+SOIL_COLUMNS = ("humedad_suelo_1", "humedad_suelo_2", "humedad_suelo_3")
+HUMIDITY_COLUMNS = ("humedad_suelo_1", "humedad_suelo_2", "humedad_suelo_3", "humedad_DHT22", "humedad_DHT11")
+
+# Esquemas del protocolo binario (wire_protocol.py): número -> campos en el orden
+# en que viajan. El servidor ubica cada campo por nombre en SENSOR_COLUMNS: los
+# campos que no conoce se descartan y las columnas que faltan quedan en nan.
+WIRE_SCHEMAS = {
+    1: SENSOR_COLUMNS,
+    # Sketch Esp32_collect_send_data: dos sondas de suelo y su promedio
+    2: ("temperatura_DHT22", "temperatura_DHT11", "temperatura_LM35_1", "temperatura_LM35_2",
+        "humedad_suelo_1", "humedad_suelo_2", "promedio_temperatura", "promedio_humedad_suelo",
+        "humedad_DHT22", "humedad_DHT11"),
+}
@@ -0,0 +1,276 @@
+"""Simulador de carga realista: miles de nodos ESP32 enviando lecturas por TCP.
+
+Genera las lecturas de todos los nodos en lotes vectorizados con NumPy:
+
+* temperatura con ciclo diario (mínimo de madrugada, máximo a la tarde),
+  desfase por nodo y el ruido y la resolución de cada sensor (el DHT11 solo
+  da grados y porcentajes enteros);
+* humedad del aire inversa a la temperatura;
+* humedad de suelo que decae exponencialmente (más rápido con calor) hasta
+  que un riego la vuelve a subir;
+* caídas: nodos que dejan de enviar un rato y sensores que devuelven ``nan``
+  (como ``String(NAN)`` en el ESP32).
+
+Las lecturas salen por sockets TCP reales en el formato CSV de 10 campos de
+``sensor_schema.SENSOR_COLUMNS``. Por defecto cada línea lleva el id del nodo
+adelante y los nodos se reparten entre ``--conexiones`` sockets; con
+``--sin-id`` cada nodo usa su propia conexión y envía exactamente lo mismo que
+el ESP32 (el servidor identifica al nodo por su IP). Con ``--binario`` se
+envían tramas del protocolo binario de ``wire_protocol.py`` en lugar de CSV,
+con número de secuencia por nodo y la hora simulada.
+
+El contenido es determinista: depende solo de ``--semilla`` y del tiempo
+simulado, nunca del reloj. El reloj solo marca el ritmo de envío
+(``--tasa`` lecturas por segundo en total, entre todos los nodos).
+
+    python sensor_simulator.py --nodos 2000 --tasa 5000 --duracion 60 --puerto 12345
+    python sensor_simulator.py --nodos 50 --escala-tiempo 3600   # un día en 24 s
+"""
+import argparse
+import math
+import socket
+import time
+
+import numpy as np
+
+from ingest import DEFAULT_PORT
+from sensor_schema import SENSOR_COLUMNS
+from wire_protocol import encode_frames
+
+BASE_TEMP = 25.0  # °C, media diaria
+BASE_HUM = 55.0   # %, humedad del aire media
+
+DAY_S = 86400.0
+HOTTEST_HOUR = 15.0  # hora del máximo de temperatura
+
+# Ruido (desvío estándar) de cada sensor de temperatura y humedad del aire
+TEMP_NOISE = np.array([0.3, 1.0, 0.5, 0.5])   # DHT22, DHT11, LM35_1, LM35_2
+AIR_HUM_NOISE = np.array([1.5, 3.0])           # DHT22, DHT11
+
+# Suelo: humedad a la que tiende sin riego, a la que llega al regar y umbral de riego
+SOIL_DRY = 15.0
+SOIL_WET = 80.0
+SOIL_THRESHOLD = 35.0
+SOIL_DECAY_PER_HOUR = 0.03  # a BASE_TEMP; crece 5 % por cada grado más
+
+
+class SensorSimulator:
+    """Estado y modelo de ``n_nodes`` nodos; ``step`` avanza un subconjunto hasta un instante."""
+
+    def __init__(self, n_nodes, seed=0, start_hour=6.0, dropout=0.001, recovery=0.05,
+                 sensor_failure=0.0005, auto_irrigate=True):
+        self.n_nodes = n_nodes
+        self.rng = np.random.default_rng(seed)
+        rng = self.rng
+        self.start_hour = start_hour
+        self.dropout = dropout            # probabilidad por lectura de que un nodo deje de enviar
+        self.recovery = recovery          # probabilidad por lectura de que vuelva
+        self.sensor_failure = sensor_failure  # probabilidad por valor de leer nan
+        # Sin riego automático solo se riega con ``irrigate`` (por ejemplo, con los comandos de irrigation.py)
+        self.auto_irrigate = auto_irrigate
+
+        # Características fijas de cada nodo
+        self.temp_offset = rng.normal(0.0, 1.5, n_nodes)
+        self.temp_amplitude = rng.uniform(4.0, 7.0, n_nodes)
+        self.sensor_bias = rng.normal(0.0, 0.3, (n_nodes, 4))
+        self.soil_decay = SOIL_DECAY_PER_HOUR / 3600 * rng.uniform(0.7, 1.3, (n_nodes, 3))
+
+        # Estado que evoluciona
+        self.soil = rng.uniform(SOIL_THRESHOLD, SOIL_WET, (n_nodes, 3))
+        self.last_t = np.zeros(n_nodes)
+        self.online = np.ones(n_nodes, dtype=bool)
+        self.irrigations = 0
+
+    def temperature(self, t, nodes=slice(None)):
+        """Temperatura real (sin ruido) de los nodos en el tiempo simulado ``t`` (s)."""
+        hour = self.start_hour + np.asarray(t) / 3600
+        phase = 2 * np.pi * (hour - HOTTEST_HOUR) / 24
+        return BASE_TEMP + self.temp_offset[nodes] + self.temp_amplitude[nodes] * np.cos(phase)
+
+    def irrigate(self, nodes):
+        """Riega ``nodes`` (índices): su suelo vuelve a ``SOIL_WET``."""
+        nodes = np.asarray(nodes, dtype=np.intp)
+        if len(nodes):
+            self.soil[nodes] = SOIL_WET + self.rng.normal(0.0, 2.0, (len(nodes), 3))
+            self.irrigations += len(nodes)
+
+    def step(self, t, nodes=None):
+        """Lecturas de ``nodes`` (índices; todos si es ``None``) en el tiempo simulado ``t``.
+
+        ``t`` puede ser un escalar o un arreglo con un tiempo por nodo. Devuelve
+        ``(nodes, values)`` solo de los nodos que están enviando; ``values``
+        tiene forma (n, 10) en el orden de ``SENSOR_COLUMNS``.
+        """
+        rng = self.rng
+        nodes = np.arange(self.n_nodes) if nodes is None else np.asarray(nodes)
+        n = len(nodes)
+        t = np.broadcast_to(np.asarray(t, dtype=np.float64), (n,))
+        dt = np.maximum(t - self.last_t[nodes], 0.0)
+        self.last_t[nodes] = t
+        temp = self.temperature(t, nodes)
+
+        # Suelo: decaimiento exponencial hacia SOIL_DRY, más rápido con calor
+        rate = self.soil_decay[nodes] * (1.05 ** (temp - BASE_TEMP))[:, None]
+        soil = SOIL_DRY + (self.soil[nodes] - SOIL_DRY) * np.exp(-rate * dt[:, None])
+        self.soil[nodes] = soil
+        # Riego cuando el promedio del nodo baja del umbral
+        if self.auto_irrigate:
+            self.irrigate(nodes[soil.mean(axis=1) < SOIL_THRESHOLD])
+        soil = self.soil[nodes]
+
+        # Caídas de nodo: cadena de Markov online/offline evaluada en cada lectura
+        online = self.online[nodes]
+        flip = rng.random(n) < np.where(online, self.dropout, self.recovery)
+        online ^= flip
+        self.online[nodes] = online
+
+        values = np.empty((n, len(SENSOR_COLUMNS)))
+        temps = temp[:, None] + self.sensor_bias[nodes] + rng.normal(0.0, 1.0, (n, 4)) * TEMP_NOISE
+        values[:, 0:4] = temps
+        values[:, 1] = np.round(values[:, 1])  # DHT11: resolución de 1 °C
+        values[:, 4:7] = soil + rng.normal(0.0, 0.8, (n, 3))
+        air = BASE_HUM - 2.5 * (temp - BASE_TEMP - self.temp_offset[nodes])
+        values[:, 7:9] = air[:, None] + rng.normal(0.0, 1.0, (n, 2)) * AIR_HUM_NOISE
+        values[:, 8] = np.round(values[:, 8])  # DHT11: resolución de 1 %
+        np.clip(values[:, 4:9], 0.0, 100.0, out=values[:, 4:9])
+        # Sensores que fallan en esta lectura
+        if self.sensor_failure:
+            failed = rng.random((n, 9)) < self.sensor_failure
+            values[:, :9][failed] = np.nan
+        # Como en el ESP32: promedio de las temperaturas leídas
+        read = ~np.isnan(values[:, 0:4])
+        count = read.sum(axis=1)
+        with np.errstate(invalid="ignore"):
+            values[:, 9] = np.where(read, values[:, 0:4], 0.0).sum(axis=1) / count
+        return nodes[online], values[online]
+
+
+def format_lines(values, node_ids=None):
+    """Líneas CSV (bytes) con dos decimales, con el id del nodo adelante si se da."""
+    row_format = ",".join(["%.2f"] * values.shape[1]) + "\n"
+    if node_ids is None:
+        text = "".join(row_format % tuple(row) for row in values.tolist())
+    else:
+        row_format = "%s," + row_format
+        text = "".join(row_format % (node_id, *row) for node_id, row in zip(node_ids, values.tolist()))
+    return text.encode()
+
+
+class Schedule:
+    """Cuándo reporta cada nodo: cada ``period`` segundos simulados, con fase fija por nodo."""
+
+    def __init__(self, n_nodes, period, seed=0):
+        self.period = period
+        self.phase = np.random.default_rng(seed + 1).uniform(0.0, period, n_nodes)
+        self.order = np.argsort(self.phase)
+        self.sorted_phase = self.phase[self.order]
+
+    def due(self, t0, t1):
+        """``(nodos, tiempos)`` de las lecturas con tiempo simulado en ``[t0, t1)``, ordenadas."""
+        nodes, times = [], []
+        cycle = math.floor(t0 / self.period)
+        while cycle * self.period < t1:
+            base = cycle * self.period
+            lo = np.searchsorted(self.sorted_phase, t0 - base, side="left")
+            hi = np.searchsorted(self.sorted_phase, t1 - base, side="left")
+            nodes.append(self.order[lo:hi])
+            times.append(base + self.sorted_phase[lo:hi])
+            cycle += 1
+        return np.concatenate(nodes), np.concatenate(times)
+
+
+def run(host="127.0.0.1", port=DEFAULT_PORT, n_nodes=100, rate=100.0, duration=10.0, connections=16,
+        with_ids=True, seed=0, time_scale=1.0, tick=0.05, simulator_kwargs=None, report=None, binary=False):
+    """Envía lecturas durante ``duration`` segundos de reloj; devuelve contadores.
+
+    ``rate`` es el total de lecturas por segundo (de reloj) entre todos los
+    nodos; ``time_scale`` cuántos segundos simulados pasan por segundo de reloj.
+    """
+    simulator = SensorSimulator(n_nodes, seed, **(simulator_kwargs or {}))
+    # Cada nodo reporta cada n_nodes/rate segundos de reloj
+    schedule = Schedule(n_nodes, n_nodes / rate * time_scale, seed)
+    node_names = np.array([f"nodo-{i}" for i in range(n_nodes)], dtype=object)
+    seq = np.zeros(n_nodes, dtype=np.uint32)
+
+    n_sockets = n_nodes if not with_ids else min(connections, n_nodes)
+    sockets = []
+    for _ in range(n_sockets):
+        sock = socket.create_connection((host, port))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sockets.append(sock)
+
+    sent = 0
+    offline_skipped = 0
+    late_ticks = 0
+    start = time.perf_counter()
+    tick_index = 0
+    try:
+        while tick_index * tick < duration:
+            t0 = tick_index * tick * time_scale
+            t1 = (tick_index + 1) * tick * time_scale
+            due_nodes, due_times = schedule.due(t0, t1)
+            nodes, values = simulator.step(due_times, due_nodes)
+            offline_skipped += len(due_nodes) - len(nodes)
+            # El socket de cada nodo es fijo: nodo i -> conexión i % n_sockets
+            slots = nodes % n_sockets
+            for slot in np.unique(slots):
+                mask = slots == slot
+                ids = node_names[nodes[mask]] if with_ids else None
+                if binary:
+                    payload = encode_frames(values[mask], ids, seq[nodes[mask]], int(t0 * 1000))
+                else:
+                    payload = format_lines(values[mask], ids)
+                sockets[slot].sendall(payload)
+            seq[nodes] += 1
+            sent += len(nodes)
+
+            tick_index += 1
+            wait = start + tick_index * tick - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                late_ticks += 1
+            if report is not None:
+                report(sent, time.perf_counter() - start)
+    finally:
+        for sock in sockets:
+            sock.close()
+    elapsed = time.perf_counter() - start
+    return {"sent": sent, "elapsed": elapsed, "rate": sent / elapsed, "offline_skipped": offline_skipped,
+            "irrigations": simulator.irrigations, "late_ticks": late_ticks, "ticks": tick_index}
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Simulador de nodos ESP32 por TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--nodos", type=int, default=100)
+    parser.add_argument("--tasa", type=float, default=100.0, help="Lecturas por segundo entre todos los nodos")
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos de reloj")
+    parser.add_argument("--conexiones", type=int, default=16, help="Sockets compartidos por los nodos (con id)")
+    parser.add_argument("--sin-id", action="store_true", help="Una conexión por nodo y líneas sin id, como el ESP32")
+    parser.add_argument("--binario", action="store_true", help="Tramas del protocolo binario en lugar de CSV")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--escala-tiempo", type=float, default=1.0,
+                        help="Segundos simulados por segundo de reloj (3600 = una hora por segundo)")
+    parser.add_argument("--caidas", type=float, default=0.001, help="Probabilidad por lectura de que un nodo se caiga")
+    parser.add_argument("--fallas", type=float, default=0.0005, help="Probabilidad por valor de leer nan")
+    args = parser.parse_args(argv)
+
+    def report(sent, elapsed):
+        if int(elapsed) != int(report.last):
+            print(f"{elapsed:5.0f} s: {sent} lecturas ({sent / elapsed:,.0f}/s)")
+        report.last = elapsed
+    report.last = 0.0
+
+    result = run(args.host, args.puerto, args.nodos, args.tasa, args.duracion, args.conexiones,
+                 not args.sin_id, args.semilla, args.escala_tiempo,
+                 simulator_kwargs={"dropout": args.caidas, "sensor_failure": args.fallas}, report=report,
+                 binary=args.binario)
+    print(f"enviadas: {result['sent']} en {result['elapsed']:.1f} s ({result['rate']:,.0f}/s); "
+          f"omitidas por nodos caídos: {result['offline_skipped']}; riegos: {result['irrigations']}; "
+          f"ticks atrasados: {result['late_ticks']}/{result['ticks']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""Ventanas, estadísticas y rollups de los nodos en memoria compartida.
+
+Separa la ingesta del servidor web: un único proceso de ingesta escribe y
+cualquier cantidad de procesos web (los workers de ``production.py`` o de
+gunicorn) leen el mismo segmento de ``multiprocessing.shared_memory``, sin
+copias entre procesos.
+
+Cada nodo ocupa un slot de tamaño fijo con su ventana (el mismo esquema
+espejado que ``SensorRingBuffer``), las estadísticas de ``WindowedStats`` y
+los buckets de ``RollupLevel``. La consistencia usa un seqlock por slot: el
+escritor incrementa ``seq`` antes y después de cada lote (impar = escritura
+en curso) y el lector repite la lectura si ``seq`` era impar o cambió. Los
+lectores nunca bloquean al escritor.
+
+Como en ``NodeStore``, el proceso de ingesta puede asignar ``history``,
+``anomalies`` e ``irrigation``: reciben cada lote al guardarse. Los
+resultados de los dos últimos no entran en el segmento; la ingesta los
+sirve por HTTP (ingest_api.py) y los procesos web los leen por ahí.
+
+``SharedNodeStore`` tiene la misma interfaz de lectura que ``NodeStore``
+(``nodes``, ``query``, ``buffer``, ``columns_of``, ``stats.snapshot``,
+``rollups.query``), así
+que ``query_series`` y los callbacks del dashboard funcionan sin cambios.
+"""
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from rollup import DEFAULT_LEVELS, RollupEngine, RollupLevel
+from sensor_schema import SENSOR_COLUMNS
+from streaming_stats import WindowedStats
+
+MAGIC = 0x53454E53
+LAYOUT_VERSION = 3
+NODE_ID_BYTES = 64
+# Espera máxima de un lector a un slot en escritura: un lote tarda microsegundos,
+# así que vencerla indica que el escritor murió a mitad de un lote
+READ_TIMEOUT_S = 1.0
+
+# Encabezado (int64): magic, versión, max_nodes, capacity, n_columns, n_levels,
+# n_nodes y luego (resolución, capacidad) de cada nivel de rollup
+HEADER_WORDS = 64
+_N_NODES = 6
+_LEVELS = 7
+
+# Filas del campo "stats" de cada slot
+STAT_KEYS = ("mean", "var", "std", "min", "max")
+ROLLUP_FIELDS = ("bucket", "count", "sum", "min", "max")
+
+
+def slot_dtype(capacity, n_columns, levels=DEFAULT_LEVELS):
+    """Tipo estructurado de un slot: todo lo que se guarda de un nodo."""
+    fields = [
+        ("seq", "<u8"),
+        ("node_id", f"S{NODE_ID_BYTES}"),
+        ("next", "<i8"),
+        ("size", "<i8"),
+        # Columnas que el esquema del nodo no trae (en cero: las manda todas)
+        ("undeclared", "?", (n_columns,)),
+        ("timestamps", "<i8", (2 * capacity,)),
+        ("values", "<f8", (n_columns, 2 * capacity)),
+        ("stats_count", "<i8"),
+        ("stats_total", "<i8"),
+        ("stats", "<f8", (len(STAT_KEYS), n_columns)),
+    ]
+    for resolution_s, level_capacity in levels:
+        prefix = f"r{resolution_s}_"
+        fields += [
+            (prefix + "bucket", "<i8", (level_capacity,)),
+            (prefix + "count", "<i4", (level_capacity, n_columns)),
+            (prefix + "sum", "<f8", (level_capacity, n_columns)),
+            (prefix + "min", "<f4", (level_capacity, n_columns)),
+            (prefix + "max", "<f4", (level_capacity, n_columns)),
+        ]
+    return np.dtype(fields, align=True)
+
+
+def _attach_segment(name):
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        pass
+    # Antes de Python 3.13 el resource_tracker de un proceso que solo se conecta
+    # (p. ej. un worker de gunicorn) borraría el segmento al terminar
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name)
+    finally:
+        resource_tracker.register = register
+
+
+class _WindowView:
+    """Lo que ``query_series`` usa de ``NodeStore.buffer``: ``columns`` y ``timestamps``."""
+
+    def __init__(self, store, slot):
+        self.store = store
+        self.slot = slot
+        self.columns = store.columns
+        self.capacity = store.capacity
+
+    def __len__(self):
+        return int(self.store._slots["size"][self.slot])
+
+    def timestamps(self):
+        return self.snapshot()[0]
+
+    def snapshot(self):
+        return self.store._read(self.slot, lambda: self.store._window(self.slot))
+
+
+class _SharedStats:
+    """Interfaz de ``StreamingStats`` sobre las estadísticas del segmento."""
+
+    def __init__(self, store):
+        self.store = store
+        self._index = {name: i for i, name in enumerate(store.columns)}
+
+    def snapshot(self, node_id, columns=None):
+        store = self.store
+        slot = store._slot(node_id)
+
+        def read():
+            count = int(store._slots["stats_count"][slot])
+            total = int(store._slots["stats_total"][slot])
+            return count, total, store._slots["stats"][slot].copy()
+
+        count, total, stats = store._read(slot, read)
+        if columns is not None:
+            stats = stats[:, [self._index[name] for name in columns]]
+        snapshot = {"count": count, "total": total}
+        snapshot.update(zip(STAT_KEYS, stats))
+        return snapshot
+
+
+class _SharedRollups:
+    """Interfaz de consulta de ``RollupEngine`` sobre los buckets del segmento."""
+
+    choose_resolution = RollupEngine.choose_resolution
+
+    def __init__(self, store):
+        self.store = store
+        self.columns = store.columns
+        self.levels = store.levels
+
+    def nodes(self):
+        return self.store.nodes()
+
+    def query(self, node_id, resolution_s, start_ns, end_ns):
+        store = self.store
+        if node_id not in store:
+            empty = np.empty((0, len(self.columns)))
+            return np.empty(0, dtype=np.int64), np.empty((0, len(self.columns)), dtype=np.int32), empty, empty, empty
+        slot = store._slot(node_id)
+        level = next(level for level in store._levels(slot) if level.resolution_s == resolution_s)
+        return store._read(slot, lambda: level.query(start_ns, end_ns))
+
+
+class SharedNodeStore:
+    """Almacén por nodo en un segmento de memoria compartida.
+
+    Se crea con ``create`` (el proceso dueño, que lo borra con ``unlink``) y
+    los demás procesos se conectan con ``attach``. Solo un proceso debe
+    escribir (``extend``); dentro de ese proceso las escrituras de varios
+    hilos se serializan por nodo.
+    """
+
+    def __init__(self, shm, columns=SENSOR_COLUMNS):
+        self._shm = shm
+        self._header = np.ndarray((HEADER_WORDS,), dtype=np.int64, buffer=shm.buf)
+        if self._header[0] != MAGIC or self._header[1] != LAYOUT_VERSION:
+            raise ValueError(f"El segmento {shm.name} no es un SharedNodeStore compatible")
+        self.max_nodes, self.capacity, n_columns, n_levels = (int(v) for v in self._header[2:6])
+        if n_columns != len(columns):
+            raise ValueError(f"El segmento tiene {n_columns} columnas, se esperaban {len(columns)}")
+        self.columns = tuple(columns)
+        self.levels = tuple((int(self._header[_LEVELS + 2 * i]), int(self._header[_LEVELS + 2 * i + 1]))
+                            for i in range(n_levels))
+        self.dtype = slot_dtype(self.capacity, n_columns, self.levels)
+        self._slots = np.ndarray((self.max_nodes,), dtype=self.dtype, buffer=shm.buf, offset=HEADER_WORDS * 8)
+        self.history = None
+        self.anomalies = None
+        self.irrigation = None
+        self.stats = _SharedStats(self)
+        self.rollups = _SharedRollups(self)
+        self._slot_of = {}
+        self._rollup_levels = {}
+        self._writers = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, name=None, max_nodes=64, capacity=100, columns=SENSOR_COLUMNS, levels=DEFAULT_LEVELS):
+        levels = tuple(levels)
+        if _LEVELS + 2 * len(levels) > HEADER_WORDS:
+            raise ValueError("Demasiados niveles de rollup para el encabezado")
+        dtype = slot_dtype(capacity, len(columns), levels)
+        # El segmento nace en cero; las páginas de los slots sin usar no ocupan memoria
+        shm = shared_memory.SharedMemory(name, create=True, size=HEADER_WORDS * 8 + max_nodes * dtype.itemsize)
+        header = np.ndarray((HEADER_WORDS,), dtype=np.int64, buffer=shm.buf)
+        header[2:6] = max_nodes, capacity, len(columns), len(levels)
+        for i, (resolution_s, level_capacity) in enumerate(levels):
+            header[_LEVELS + 2 * i:_LEVELS + 2 * i + 2] = resolution_s, level_capacity
+        header[1] = LAYOUT_VERSION
+        header[0] = MAGIC
+        return cls(shm, columns)
+
+    @classmethod
+    def attach(cls, name, columns=SENSOR_COLUMNS):
+        return cls(_attach_segment(name), columns)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def close(self):
+        # Las vistas NumPy deben soltarse antes de cerrar el segmento
+        self._header = self._slots = None
+        self._rollup_levels.clear()
+        self._writers.clear()
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.unlink()
+
+    # Lectura (cualquier proceso)
+
+    def _refresh(self):
+        n = int(self._header[_N_NODES])
+        if n != len(self._slot_of):
+            with self._lock:
+                for slot in range(len(self._slot_of), n):
+                    self._slot_of.setdefault(self._slots["node_id"][slot].decode("utf-8"), slot)
+
+    def _slot(self, node_id):
+        slot = self._slot_of.get(node_id)
+        if slot is None:
+            self._refresh()
+            slot = self._slot_of.get(node_id)
+            if slot is None:
+                raise KeyError(f"Nodo desconocido: {node_id}")
+        return slot
+
+    def _read(self, slot, read):
+        """Repite ``read()`` hasta obtener una copia consistente del slot (seqlock).
+
+        Lanza ``TimeoutError`` si no lo logra en ``READ_TIMEOUT_S``.
+        """
+        seq = self._slots["seq"]
+        deadline = None
+        attempts = 0
+        while True:
+            before = int(seq[slot])
+            if not before & 1:
+                result = read()
+                if int(seq[slot]) == before:
+                    return result
+            attempts += 1
+            if deadline is None:
+                deadline = time.monotonic() + READ_TIMEOUT_S
+            elif time.monotonic() > deadline:
+                raise TimeoutError(f"El slot {slot} sigue en escritura: ¿terminó el proceso de ingesta?")
+            # Primero solo se cede el procesador; si la escritura sigue, se espera de verdad
+            time.sleep(0 if attempts < 100 else 0.001)
+
+    def _window(self, slot):
+        size = int(self._slots["size"][slot])
+        end = int(self._slots["next"][slot]) + self.capacity
+        window = slice(end - size, end)
+        return self._slots["timestamps"][slot][window].copy(), self._slots["values"][slot][:, window].copy()
+
+    def _levels(self, slot):
+        levels = self._rollup_levels.get(slot)
+        if levels is None:
+            levels = [RollupLevel(resolution_s, level_capacity, len(self.columns),
+                                  storage=[self._slots[f"r{resolution_s}_{field}"][slot] for field in ROLLUP_FIELDS])
+                      for resolution_s, level_capacity in self.levels]
+            self._rollup_levels[slot] = levels
+        return levels
+
+    def __len__(self):
+        self._refresh()
+        return len(self._slot_of)
+
+    def __contains__(self, node_id):
+        self._refresh()
+        return node_id in self._slot_of
+
+    def nodes(self):
+        self._refresh()
+        return sorted(self._slot_of)
+
+    def buffer(self, node_id):
+        return _WindowView(self, self._slot(node_id))
+
+    def columns_of(self, node_id):
+        slot = self._slot(node_id)
+        undeclared = self._read(slot, lambda: self._slots["undeclared"][slot].copy())
+        return tuple(name for name, skip in zip(self.columns, undeclared) if not skip)
+
+    def query(self, node_id, start_ns=None, end_ns=None):
+        """Copia ``(timestamps, values)`` de las lecturas del nodo en ``[start_ns, end_ns)``."""
+        timestamps, values = self.buffer(node_id).snapshot()
+        lo = 0 if start_ns is None else np.searchsorted(timestamps, start_ns, side="left")
+        hi = len(timestamps) if end_ns is None else np.searchsorted(timestamps, end_ns, side="left")
+        return timestamps[lo:hi], values[:, lo:hi]
+
+    # Escritura (solo el proceso de ingesta)
+
+    def _claim(self, node_id):
+        slot = self._slot_of.get(node_id)
+        if slot is None:
+            with self._lock:
+                slot = self._slot_of.get(node_id)
+                if slot is None:
+                    encoded = str(node_id).encode("utf-8")
+                    if len(encoded) > NODE_ID_BYTES:
+                        raise ValueError(f"Identificador de nodo demasiado largo: {node_id}")
+                    slot = int(self._header[_N_NODES])
+                    if slot >= self.max_nodes:
+                        raise RuntimeError(f"No quedan slots libres en memoria compartida (max_nodes={self.max_nodes})")
+                    # Los buckets del slot ya están vacíos (en cero): no se tocan sus páginas
+                    self._slots["node_id"][slot] = encoded
+                    # El nodo se publica recién con el slot inicializado
+                    self._header[_N_NODES] = slot + 1
+                    self._slot_of[node_id] = slot
+        writer = self._writers.get(slot)
+        if writer is None:
+            with self._lock:
+                writer = self._writers.get(slot)
+                if writer is None:
+                    writer = (threading.Lock(), WindowedStats(self.capacity, self.columns), self._levels(slot))
+                    self._writers[slot] = writer
+        return slot, writer
+
+    def declare_columns(self, node_id, columns):
+        """Columnas que manda el nodo según su esquema; sin declarar, todas."""
+        slot, (lock, _, _) = self._claim(node_id)
+        seq = self._slots["seq"]
+        with lock:
+            seq[slot] += 1
+            self._slots["undeclared"][slot] = [name not in columns for name in self.columns]
+            seq[slot] += 1
+        for sink in (self.anomalies, self.irrigation):
+            if sink is not None and hasattr(sink, "declare_columns"):
+                sink.declare_columns(node_id, columns)
+
+    def append(self, node_id, timestamp_ns, values):
+        self.extend(node_id, [timestamp_ns], [values])
+
+    def extend(self, node_id, timestamps_ns, values, window=True):
+        """Agrega lecturas del nodo; con ``window=False`` solo actualiza los rollups."""
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        n = len(timestamps_ns)
+        if n == 0:
+            return
+        values = np.asarray(values, dtype=np.float64).reshape(n, len(self.columns))
+        if window and self.history is not None:
+            self.history.append(node_id, timestamps_ns, values)
+        slot, (lock, stats, levels) = self._claim(node_id)
+        seq = self._slots["seq"]
+        with lock:
+            if window:
+                for row in values:
+                    stats.add(row)
+                snapshot = stats.snapshot()
+            seq[slot] += 1
+            if window:
+                self._write_window(slot, timestamps_ns, values)
+                self._slots["stats_count"][slot] = snapshot["count"]
+                self._slots["stats_total"][slot] = snapshot["total"]
+                self._slots["stats"][slot] = [snapshot[key] for key in STAT_KEYS]
+            for level in levels:
+                level.add(timestamps_ns, values)
+            seq[slot] += 1
+        if window:
+            for sink in (self.anomalies, self.irrigation):
+                if sink is not None:
+                    sink.append(node_id, timestamps_ns, values)
+
+    def _write_window(self, slot, timestamps_ns, values):
+        # Igual que SensorRingBuffer.extend, con la cabeza y el tamaño en el segmento
+        n = len(timestamps_ns)
+        capacity = self.capacity
+        start = int(self._slots["next"][slot])
+        if n > capacity:
+            start = (start + n - capacity) % capacity
+            timestamps_ns = timestamps_ns[-capacity:]
+            values = values[-capacity:]
+        idx = (start + np.arange(len(timestamps_ns))) % capacity
+        ts = self._slots["timestamps"][slot]
+        vals = self._slots["values"][slot]
+        ts[idx] = ts[idx + capacity] = timestamps_ns
+        vals[:, idx] = vals[:, idx + capacity] = values.T
+        self._slots["next"][slot] = (int(self._slots["next"][slot]) + n) % capacity
+        self._slots["size"][slot] = min(int(self._slots["size"][slot]) + n, capacity)
+
+    def load_history(self, history, now_ns):
+        """Reconstruye los rollups desde un ``TimeSeriesStore`` al iniciar la ingesta."""
+        horizon_ns = max(resolution_s * capacity for resolution_s, capacity in self.levels) * 10**9
+        for node_id in history.nodes():
+            for chunk in history.iter_range(node_id, now_ns - horizon_ns):
+                values = np.column_stack([chunk[name] for name in self.columns])
+                self.extend(node_id, chunk["timestamp"], values, window=False)
@@ -0,0 +1,193 @@
+"""Estadísticas de la ventana calculadas de forma incremental al recibir cada lectura.
+
+Los dashboards mostraban máximos, promedios y tablas de mín/prom/máx
+recalculados con pandas sobre toda la ventana en cada tick y para cada
+cliente. ``StreamingStats`` los mantiene al día en la ingesta:
+
+- media y varianza de la ventana con Welford (agregar y quitar muestras),
+- mínimo y máximo de la ventana con deques monótonas,
+- cantidad de muestras en la ventana y total recibido.
+
+Los ``nan`` (el ESP32 manda ``nan`` cuando un sensor no lee) no cuentan,
+como en pandas: cada columna lleva su propia cantidad de lecturas válidas y
+una columna sin lecturas en la ventana da ``nan``.
+
+Los callbacks solo leen un ``snapshot``, que cuesta O(columnas).
+"""
+import threading
+from collections import deque
+
+import numpy as np
+
+from sensor_schema import SENSOR_COLUMNS
+
+
+class WindowedStats:
+    """Estadísticas de las últimas ``capacity`` lecturas de un nodo."""
+
+    def __init__(self, capacity, columns=SENSOR_COLUMNS):
+        self.capacity = capacity
+        self.columns = tuple(columns)
+        n = len(self.columns)
+        # Copia de la ventana para saber qué valor sale cuando entra uno nuevo
+        self._ring = np.zeros((capacity, n), dtype=np.float64)
+        self._next = 0
+        self.count = 0
+        self.total = 0
+        # Lecturas nan de cada columna en la ventana y filas que tienen alguna:
+        # sin nan en la ventana se usa el camino de siempre, con ``count`` escalar
+        self._nans = np.zeros(n, dtype=np.int64)
+        self._nan_rows = 0
+        self._mean = np.zeros(n)
+        self._m2 = np.zeros(n)
+        self._evictions = 0
+        # Deques monótonas de (número de muestra, valor): el frente es el máximo / mínimo
+        self._max = [deque() for _ in self.columns]
+        self._min = [deque() for _ in self.columns]
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if self.count == self.capacity:
+            self._remove(self._ring[self._next].copy())
+        self._ring[self._next] = values
+        self._next = (self._next + 1) % self.capacity
+        self.count += 1
+
+        # Welford: agregar una muestra
+        row = values.tolist()
+        has_nan = any(value != value for value in row)
+        if not has_nan and not self._nan_rows:
+            delta = values - self._mean
+            self._mean += delta / self.count
+            self._m2 += delta * (values - self._mean)
+        else:
+            # Solo en las columnas que leyeron, con la cantidad de lecturas de cada una
+            valid = ~np.isnan(values)
+            if has_nan:
+                self._nans += ~valid
+                self._nan_rows += 1
+            # En las columnas nan el resultado es nan y no se copia
+            delta = values - self._mean
+            mean = self._mean + delta / np.maximum(self.count - self._nans, 1)
+            m2 = self._m2 + delta * (values - mean)
+            np.copyto(self._mean, mean, where=valid)
+            np.copyto(self._m2, m2, where=valid)
+
+        seq = self.total
+        expired = seq - self.capacity
+        for value, high, low in zip(row, self._max, self._min):
+            if high and high[0][0] <= expired:
+                high.popleft()
+            if low and low[0][0] <= expired:
+                low.popleft()
+            if value != value:
+                continue
+            while high and high[-1][1] <= value:
+                high.pop()
+            high.append((seq, value))
+            while low and low[-1][1] >= value:
+                low.pop()
+            low.append((seq, value))
+        self.total += 1
+
+    def _remove(self, values):
+        # Welford inverso: quitar la muestra que sale de la ventana
+        self.count -= 1
+        has_nan = any(value != value for value in values.tolist())
+        if not has_nan and not self._nan_rows:
+            if self.count == 0:
+                self._mean[:] = 0.0
+                self._m2[:] = 0.0
+                return
+            delta = values - self._mean
+            self._mean -= delta / self.count
+            self._m2 -= delta * (values - self._mean)
+        else:
+            valid = ~np.isnan(values)
+            if has_nan:
+                self._nans -= ~valid
+                self._nan_rows -= 1
+            n = self.count - self._nans
+            delta = values - self._mean
+            mean = self._mean - delta / np.maximum(n, 1)
+            m2 = self._m2 - delta * (values - mean)
+            np.copyto(self._mean, mean, where=valid)
+            np.copyto(self._m2, m2, where=valid)
+            # Una columna sin lecturas en la ventana vuelve a empezar de cero
+            empty = n == 0
+            if empty.any():
+                self._mean[empty] = 0.0
+                self._m2[empty] = 0.0
+
+        # Quitar muestras acumula error de redondeo: cada ``capacity`` salidas se
+        # recalcula exacto sobre la ventana (costo amortizado O(1) por muestra)
+        self._evictions += 1
+        if self._evictions >= self.capacity:
+            self._evictions = 0
+            window = np.delete(self._ring, self._next, axis=0) if self.count < self.capacity else self._ring
+            if not self._nan_rows:
+                self._mean = window.mean(axis=0)
+                self._m2 = ((window - self._mean) ** 2).sum(axis=0)
+            else:
+                read = ~np.isnan(window)
+                n = self.count - self._nans
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    self._mean = np.where(n > 0, np.where(read, window, 0.0).sum(axis=0) / n, 0.0)
+                self._m2 = np.where(read, (window - self._mean) ** 2, 0.0).sum(axis=0)
+
+    def snapshot(self):
+        """Estadísticas actuales por columna (arreglos alineados con ``columns``)."""
+        if self.count == 0:
+            nan = np.full(len(self.columns), np.nan)
+            return {"count": 0, "total": self.total, "mean": nan, "var": nan, "std": nan, "min": nan, "max": nan}
+        valid = self.count - self._nans
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = np.where(valid > 1, np.maximum(self._m2, 0.0) / (valid - 1), np.nan)
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": np.where(valid > 0, self._mean, np.nan),
+            "var": var,
+            "std": np.sqrt(var),
+            "min": np.array([low[0][1] if low else np.nan for low in self._min]),
+            "max": np.array([high[0][1] if high else np.nan for high in self._max]),
+        }
+
+
+class StreamingStats:
+    """``WindowedStats`` de todos los nodos; ``append`` tiene la misma firma que ``RollupEngine``."""
+
+    def __init__(self, capacity=100, columns=SENSOR_COLUMNS):
+        self.capacity = capacity
+        self.columns = tuple(columns)
+        self._index = {name: i for i, name in enumerate(self.columns)}
+        self._nodes = {}
+        self._lock = threading.Lock()
+
+    def _node(self, node_id):
+        node = self._nodes.get(node_id)
+        if node is None:
+            with self._lock:
+                node = self._nodes.get(node_id)
+                if node is None:
+                    node = (threading.Lock(), WindowedStats(self.capacity, self.columns))
+                    self._nodes[node_id] = node
+        return node
+
+    def append(self, node_id, timestamps_ns, values):
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(self.columns))
+        lock, stats = self._node(node_id)
+        with lock:
+            for row in values:
+                stats.add(row)
+
+    def snapshot(self, node_id, columns=None):
+        """Estadísticas del nodo; con ``columns`` solo las de esas columnas, en ese orden."""
+        lock, stats = self._node(node_id)
+        with lock:
+            snapshot = stats.snapshot()
+        if columns is not None:
+            idx = [self._index[name] for name in columns]
+            for key in ("mean", "var", "std", "min", "max"):
+                snapshot[key] = snapshot[key][idx]
+        return snapshot
@@ -0,0 +1,185 @@
+"""Qué alertas dispara ``AnomalyDetector`` sobre series conocidas.
+
+Uso:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anomaly import AnomalyDetector  # noqa: E402
+from sensor_schema import SENSOR_COLUMNS, TEMP_COLUMNS  # noqa: E402
+
+NODE = "nodo-1"
+WARMUP = 100
+COL = {name: i for i, name in enumerate(SENSOR_COLUMNS)}
+TEMP = [COL[name] for name in TEMP_COLUMNS]
+
+
+def readings(n, seed=0):
+    """Lecturas sanas: los sensores redundantes concuerdan y el promedio es el de las temperaturas."""
+    rng = np.random.default_rng(seed)
+    values = np.empty((n, len(SENSOR_COLUMNS)))
+    values[:, TEMP] = 25.0 + rng.normal(0.0, 0.2, (n, len(TEMP)))
+    for name in ("humedad_suelo_1", "humedad_suelo_2", "humedad_suelo_3"):
+        values[:, COL[name]] = 40.0 + rng.normal(0.0, 0.5, n)
+    for name in ("humedad_DHT22", "humedad_DHT11"):
+        values[:, COL[name]] = 60.0 + rng.normal(0.0, 0.5, n)
+    return with_average(values)
+
+
+def with_average(values):
+    values[:, COL["promedio_temperatura"]] = np.round(values[:, TEMP].mean(axis=1), 2)
+    return values
+
+
+def run(values, detector=None, node_id=NODE):
+    detector = detector or AnomalyDetector()
+    timestamps = np.arange(len(values), dtype=np.int64) * 10**9
+    detector.extend_batch([node_id] * len(values), timestamps, values)
+    return detector
+
+
+def fired(detector, kind=None):
+    """(tipo, columna) de los eventos, del más viejo al más nuevo."""
+    return [(event["kind"], event["column"]) for event in reversed(detector.events())
+            if kind is None or event["kind"] == kind]
+
+
+def test_clean_series_is_quiet():
+    detector = run(readings(1000))
+    assert fired(detector) == []
+    assert detector.active(NODE) == []
+
+
+def test_spike_fires_zscore():
+    values = readings(WARMUP + 50)
+    values[WARMUP, COL["humedad_suelo_1"]] += 20.0
+    detector = run(values)
+    assert fired(detector, "zscore") == [("zscore", "humedad_suelo_1")]
+    event = next(event for event in detector.events() if event["kind"] == "zscore")
+    assert event["time_ns"] == WARMUP * 10**9
+    assert event["value"] == values[WARMUP, COL["humedad_suelo_1"]]
+    # Un pico suelto no es un desacuerdo (persistencia) ni un faltante
+    assert {kind for kind, _ in fired(detector)} <= {"zscore", "ewma"}
+
+
+def test_no_alert_before_min_samples():
+    values = readings(WARMUP)
+    values[5, COL["humedad_suelo_1"]] += 20.0
+    assert fired(run(values), "zscore") == []
+
+
+def test_slow_drift_fires_ewma():
+    values = readings(WARMUP + 200)
+    values[WARMUP:, COL["humedad_DHT22"]] += 0.05 * np.arange(200)
+    detector = run(values)
+    assert fired(detector, "zscore") == []
+    drift = fired(detector, "ewma")
+    assert drift and set(drift) == {("ewma", "humedad_DHT22")}
+    assert "ewma humedad_DHT22" in detector.active(NODE)
+
+
+@pytest.mark.parametrize("length, reported", [(2, False), (3, True), (30, True)])
+def test_disagreement_needs_persistence(length, reported):
+    values = readings(WARMUP + 50)
+    values[WARMUP:WARMUP + length, COL["humedad_suelo_3"]] += 50.0
+    detector = run(values)
+    expected = [("desacuerdo", "suelo 1 vs 3"), ("desacuerdo", "suelo 2 vs 3")] if reported else []
+    # Se informa una vez, al empezar, aunque dure
+    assert sorted(fired(detector, "desacuerdo")) == expected
+
+
+def test_disagreement_hysteresis():
+    values = readings(WARMUP + 60)
+    values[WARMUP:WARMUP + 10, COL["temperatura_DHT11"]] += 8.0
+    with_average(values)
+    detector = run(values[:WARMUP + 10])
+    assert "DHT22 vs DHT11 (temperatura)" in detector.active(NODE)
+    run(values[WARMUP + 10:], detector)
+    assert "DHT22 vs DHT11 (temperatura)" not in detector.active(NODE)
+
+    # Una segunda vez se vuelve a informar
+    again = readings(60, seed=1)
+    again[10:20, COL["temperatura_DHT11"]] += 8.0
+    run(with_average(again), detector)
+    assert fired(detector, "desacuerdo").count(("desacuerdo", "DHT22 vs DHT11 (temperatura)")) == 2
+
+
+@pytest.mark.parametrize("error, reported", [(0.03, False), (1.0, True)])
+def test_average_mismatch(error, reported):
+    values = readings(WARMUP + 20)
+    values[WARMUP:WARMUP + 5, COL["promedio_temperatura"]] += error
+    detector = run(values)
+    assert fired(detector, "promedio") == ([("promedio", "promedio_temperatura")] if reported else [])
+
+
+def test_missing_reading_fires_once():
+    values = readings(WARMUP + 20)
+    values[WARMUP:WARMUP + 10, COL["humedad_DHT11"]] = np.nan
+    detector = run(values[:WARMUP + 5])
+    assert fired(detector) == [("faltante", "humedad_DHT11")]
+    assert detector.active(NODE) == ["faltante humedad_DHT11"]
+    run(values[WARMUP + 5:], detector)
+    # Termina cuando vuelve a leer; un nan no es un pico ni un desacuerdo
+    assert fired(detector) == [("faltante", "humedad_DHT11")]
+    assert detector.active(NODE) == []
+
+
+def test_missing_average_is_not_a_sensor():
+    values = readings(WARMUP + 20)
+    values[WARMUP:, COL["promedio_temperatura"]] = np.nan
+    assert fired(run(values)) == []
+
+
+def test_undeclared_columns_are_not_missing():
+    values = readings(WARMUP + 20)
+    values[:, COL["humedad_suelo_3"]] = np.nan
+    detector = AnomalyDetector()
+    detector.declare_columns(NODE, [name for name in SENSOR_COLUMNS if name != "humedad_suelo_3"])
+    run(values, detector)
+    assert fired(detector) == []
+    assert detector.active(NODE) == []
+
+    # Un nodo sin esquema declarado sí informa la columna
+    run(values, detector, "nodo-2")
+    assert detector.events(node_id="nodo-2")[0]["column"] == "humedad_suelo_3"
+
+
+def test_declaring_clears_active_missing():
+    values = readings(WARMUP)
+    values[:, COL["humedad_suelo_3"]] = np.nan
+    detector = run(values)
+    assert detector.active(NODE) == ["faltante humedad_suelo_3"]
+    detector.declare_columns(NODE, [name for name in SENSOR_COLUMNS if name != "humedad_suelo_3"])
+    assert detector.active(NODE) == []
+
+
+def test_pending_blocks_match_batch():
+    # Varios nodos intercalados por ``append`` (en espera) contra el mismo lote de una vez
+    nodes = [f"nodo-{i}" for i in range(4)]
+    series = {node: readings(WARMUP + 20, seed=i) for i, node in enumerate(nodes)}
+    series["nodo-1"][WARMUP, COL["humedad_suelo_2"]] += 30.0
+    series["nodo-2"][WARMUP:WARMUP + 5, COL["humedad_DHT22"]] = np.nan
+
+    pending = AnomalyDetector(flush_rows=10**9, flush_interval_s=3600)
+    for start in range(0, WARMUP + 20, 7):
+        for node in nodes:
+            block = series[node][start:start + 7]
+            pending.append(node, np.arange(start, start + len(block), dtype=np.int64) * 10**9, block)
+
+    batch = AnomalyDetector()
+    node_ids = [node for _ in range(WARMUP + 20) for node in nodes]
+    values = np.stack([series[node] for node in nodes], axis=1).reshape(-1, len(SENSOR_COLUMNS))
+    timestamps = np.repeat(np.arange(WARMUP + 20, dtype=np.int64) * 10**9, len(nodes))
+    batch.extend_batch(node_ids, timestamps, values)
+
+    def key(detector):
+        return sorted((e["node"], e["time_ns"], e["kind"], e["column"]) for e in detector.events())
+
+    assert key(pending) == key(batch)
+    assert {node for node, *_ in key(batch)} == {"nodo-1", "nodo-2"}
@@ -0,0 +1,151 @@
+"""Agregados por bucket del historial contra ``pandas.resample`` y la caché de ``HistoryQueries``.
+
+Uso:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import history_api  # noqa: E402
+from history_api import HistoryQueries, aggregate, align, output_columns  # noqa: E402
+from sensor_schema import SENSOR_COLUMNS  # noqa: E402
+from timeseries_store import TimeSeriesStore  # noqa: E402
+
+NODE = "nodo-1"
+COLUMNS = ["temperatura_DHT22", "humedad_suelo_1", "promedio_temperatura"]
+AGGREGATIONS = ["mean", "min", "max", "count", "p50", "p95"]
+START_NS = 1_700_000_123 * 10**9
+# Pocos registros por segmento: las consultas cruzan muchos archivos
+SEGMENT_RECORDS = 97
+
+
+def readings(n, start_ns=START_NS, seed=0):
+    """Lecturas con huecos irregulares (de 0 a 40 s) y algunos nan."""
+    rng = np.random.default_rng(seed)
+    timestamps = start_ns + np.cumsum(rng.integers(1, 40 * 10**9, n))
+    values = rng.normal(25.0, 5.0, (n, len(SENSOR_COLUMNS)))
+    values[rng.random(values.shape) < 0.05] = np.nan
+    # Una columna sin lecturas durante un tramo: buckets con count 0
+    values[n // 3:n // 3 + 200, SENSOR_COLUMNS.index("humedad_suelo_1")] = np.nan
+    return timestamps, values
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TimeSeriesStore(str(tmp_path), segment_records=SEGMENT_RECORDS)
+    timestamps, values = readings(3000)
+    for block in np.array_split(np.arange(len(timestamps)), 17):
+        store.append(NODE, timestamps[block], values[block])
+    store.append("nodo-2", *readings(100, seed=1))
+    yield store
+    store.close()
+
+
+def expected(store, start_ns, end_ns, bucket_s, aggregations=AGGREGATIONS):
+    """Lo mismo con pandas: ``resample`` alineado a la época, sin los buckets sin registros."""
+    records = store.read_range(NODE, start_ns, end_ns)
+    frame = pd.DataFrame({c: records[c].astype(np.float64) for c in COLUMNS},
+                         index=pd.to_datetime(records["timestamp"]))
+    resampled = frame.resample(pd.Timedelta(seconds=bucket_s), origin="epoch")
+    by_name = {"mean": resampled.mean(), "min": resampled.min(), "max": resampled.max(),
+               "count": resampled.count().astype(np.float64)}
+    for name in aggregations:
+        if name.startswith("p"):
+            by_name[name] = resampled.quantile(float(name[1:]) / 100)
+    present = resampled.size() > 0
+    table = pd.DataFrame({f"{c}_{name}": by_name[name][c] for c in COLUMNS for name in aggregations})[present]
+    assert list(table.columns) == output_columns(COLUMNS, aggregations)
+    return table.index.asi8, table.to_numpy()
+
+
+def collect(blocks):
+    blocks = list(blocks)
+    if not blocks:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0))
+    return np.concatenate([t for t, _ in blocks]), np.concatenate([v for _, v in blocks])
+
+
+def assert_same(actual, reference):
+    np.testing.assert_array_equal(actual[0], reference[0])
+    np.testing.assert_allclose(actual[1], reference[1], rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("chunk_rows", [7, 100, 1 << 16])
+@pytest.mark.parametrize("bucket_s", [10, 300, 3600])
+def test_aggregate_matches_resample(store, chunk_rows, bucket_s):
+    timestamps = store.read_range(NODE)["timestamp"]
+    # Un rango que no empieza ni termina en un borde de bucket ni de segmento
+    start_ns, end_ns = int(timestamps[55]) + 1, int(timestamps[-321])
+    start_ns = align(start_ns, bucket_s)
+    actual = collect(aggregate(store, NODE, COLUMNS, start_ns, end_ns, bucket_s, AGGREGATIONS, chunk_rows))
+    assert_same(actual, expected(store, start_ns, end_ns, bucket_s))
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 7, 64])
+def test_percentiles_across_chunks(store, chunk_rows):
+    # Buckets de un día: cada uno cruza muchos bloques y segmentos
+    aggregations = ["p0", "p25", "p50", "p99.9", "p100"]
+    actual = collect(aggregate(store, NODE, COLUMNS, START_NS, START_NS + 10**15, 86400, aggregations, chunk_rows))
+    assert_same(actual, expected(store, START_NS, START_NS + 10**15, 86400, aggregations))
+
+
+def test_raw_records(store):
+    records = store.read_range(NODE, START_NS, START_NS + 3600 * 10**9)
+    timestamps, values = collect(aggregate(store, NODE, COLUMNS, START_NS, START_NS + 3600 * 10**9, None, (), 13))
+    np.testing.assert_array_equal(timestamps, records["timestamp"])
+    np.testing.assert_array_equal(values, np.stack([records[c] for c in COLUMNS], axis=1))
+
+
+def test_cached_query_matches_uncached(store):
+    queries = HistoryQueries(store, chunk_rows=50)
+    timestamps = store.read_range(NODE)["timestamp"]
+    # ``start`` sin alinear: la caché lo alinea al comienzo de su bucket
+    start_ns, end_ns = int(timestamps[10]) + 12345, int(timestamps[-1]) + 10**9
+    reference = collect(aggregate(store, NODE, COLUMNS, align(start_ns, 600), end_ns, 600, AGGREGATIONS, 50))
+
+    hits, misses = history_api._cache["hit"].value, history_api._cache["miss"].value
+    first = collect(queries.blocks(NODE, COLUMNS, start_ns, end_ns, 600, AGGREGATIONS))
+    second = collect(queries.blocks(NODE, COLUMNS, start_ns, end_ns, 600, AGGREGATIONS))
+    assert history_api._cache["miss"].value - misses == 1
+    assert history_api._cache["hit"].value - hits == 1
+    assert_same(first, reference)
+    assert_same(second, reference)
+    assert_same(second, expected(store, align(start_ns, 600), end_ns, 600))
+
+    # Otro ``start`` dentro del mismo bucket usa la misma entrada
+    collect(queries.blocks(NODE, COLUMNS, align(start_ns, 600) + 1, end_ns, 600, AGGREGATIONS))
+    assert history_api._cache["hit"].value - hits == 2
+    assert len(queries._cache) == 1
+
+
+def test_cache_with_new_records(store):
+    queries = HistoryQueries(store, chunk_rows=50)
+    end_ns = START_NS + 10**15
+    collect(queries.blocks(NODE, COLUMNS, START_NS, end_ns, 3600, AGGREGATIONS))
+    # Llegan lecturas nuevas: el bucket abierto se recalcula, lo anterior sale de la caché
+    last_ns = store.last_timestamp(NODE)
+    timestamps, values = readings(500, start_ns=last_ns, seed=2)
+    store.append(NODE, timestamps, values)
+    cached = collect(queries.blocks(NODE, COLUMNS, START_NS, end_ns, 3600, AGGREGATIONS))
+    fresh = collect(aggregate(store, NODE, COLUMNS, align(START_NS, 3600), end_ns, 3600, AGGREGATIONS, 50))
+    assert_same(cached, fresh)
+    assert_same(cached, expected(store, align(START_NS, 3600), end_ns, 3600))
+
+
+def test_cache_entries_are_bounded(store):
+    queries = HistoryQueries(store, cache_entries=2, chunk_rows=50)
+    for bucket_s in (60, 120, 300):
+        collect(queries.blocks(NODE, COLUMNS, START_NS, START_NS + 10**15, bucket_s, ["mean"]))
+    assert [key[4] for key in queries._cache] == [120 * 10**9, 300 * 10**9]
+
+
+def test_empty_range(store):
+    assert collect(aggregate(store, NODE, COLUMNS, 0, START_NS, 60, AGGREGATIONS))[0].size == 0
+    queries = HistoryQueries(store)
+    assert collect(queries.blocks(NODE, COLUMNS, 0, START_NS, 60, AGGREGATIONS))[0].size == 0
@@ -0,0 +1,162 @@
+"""Políticas de contrapresión de ``IngestQueue`` y hora de llegada de los lotes.
+
+Uso:
+    python -m pytest tests
+"""
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest import ArrivalClock  # noqa: E402
+from ingest_pipeline import IngestQueue  # noqa: E402
+from sensor_schema import SENSOR_COLUMNS  # noqa: E402
+
+CAPACITY = 10
+
+
+class Batches:
+    """Lotes numerados: la primera columna de cada fila es su número de lectura."""
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, rows):
+        values = np.zeros((rows, len(SENSOR_COLUMNS)))
+        values[:, 0] = self.total + np.arange(rows)
+        self.total += rows
+        return np.array(["nodo"] * rows, dtype=object), values
+
+
+def taken_rows(queue, max_rows=10**6):
+    batches, _ = queue.take(max_rows, 0.0, timeout=0.0)
+    return [int(row) for _, _, values, _ in batches for row in values[:, 0]]
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError, match="contrapresión"):
+        IngestQueue(CAPACITY, "lifo")
+
+
+def test_block_without_waiting_reports_full():
+    queue = IngestQueue(CAPACITY, "block")
+    batch = Batches()
+    assert queue.put(*batch(6))
+    assert queue.put(*batch(4))
+    assert not queue.put(*batch(1), block=False)
+    assert (queue.rows, queue.dropped) == (CAPACITY, 0)
+    assert taken_rows(queue) == list(range(10))
+    assert queue.put(*batch(1), block=False)
+
+
+def test_block_waits_for_the_writer():
+    queue = IngestQueue(CAPACITY, "block")
+    batch = Batches()
+    queue.put(*batch(CAPACITY))
+    done = threading.Event()
+    reader = threading.Thread(target=lambda: (queue.put(*batch(3)), done.set()))
+    reader.start()
+    assert not done.wait(0.1)
+    # El escritor no espera a completar el micro-lote: hay un lector frenado
+    batches, _ = queue.take(10**6, 60.0, timeout=1.0)
+    assert sum(len(values) for _, _, values, _ in batches) == CAPACITY
+    assert done.wait(1.0)
+    reader.join()
+    assert queue.rows == 3 and queue.dropped == 0
+
+
+def test_block_oversized_batch_enters_empty_queue():
+    queue = IngestQueue(CAPACITY, "block")
+    batch = Batches()
+    assert queue.put(*batch(3 * CAPACITY), block=False)
+    assert not queue.put(*batch(1), block=False)
+    assert len(taken_rows(queue)) == 3 * CAPACITY
+
+
+def test_drop_oldest_drops_whole_batches():
+    queue = IngestQueue(CAPACITY, "drop-oldest")
+    batch = Batches()
+    for _ in range(4):
+        assert queue.put(*batch(4))
+        assert queue.rows <= CAPACITY
+    assert queue.dropped == 8
+    assert taken_rows(queue) == list(range(8, 16))
+
+
+def test_drop_oldest_truncates_oversized_batch():
+    queue = IngestQueue(CAPACITY, "drop-oldest")
+    batch = Batches()
+    queue.put(*batch(4))
+    assert queue.put(*batch(25))
+    # Se queda con las lecturas más nuevas del lote grande y descarta lo demás
+    assert queue.dropped == 4 + 15
+    assert taken_rows(queue) == list(range(19, 29))
+
+
+@pytest.mark.parametrize("sizes", [[1] * 200, [3, 7, 1, 12, 5] * 20, [CAPACITY // 2 + 1] * 10])
+def test_sample_never_exceeds_capacity(sizes):
+    queue = IngestQueue(CAPACITY, "sample")
+    batch = Batches()
+    for size in sizes:
+        assert queue.put(*batch(size))
+        assert queue.rows <= CAPACITY
+    kept = taken_rows(queue)
+    assert len(kept) + queue.dropped == batch.total
+    assert kept == sorted(kept)
+
+
+def test_sample_keeps_everything_below_half():
+    queue = IngestQueue(100, "sample")
+    batch = Batches()
+    for _ in range(10):
+        queue.put(*batch(4))
+    assert (queue.rows, queue.dropped) == (40, 0)
+
+
+def test_sample_thins_out_as_it_fills():
+    queue = IngestQueue(100, "sample")
+    batch = Batches()
+    for _ in range(2000):
+        queue.put(*batch(1))
+    kept = taken_rows(queue)
+    # La primera mitad entra entera; después cada vez más espaciado
+    assert kept[:50] == list(range(50))
+    steps = np.diff(kept[49:])
+    assert steps[:10].mean() < steps[-10:].mean()
+    assert len(kept) < 100 and len(kept) + queue.dropped == 2000
+
+
+def test_take_limits_and_timeout():
+    queue = IngestQueue(100, "block")
+    assert queue.take(10, 0.0, timeout=0.01) == ([], None)
+    batch = Batches()
+    for _ in range(5):
+        queue.put(*batch(4))
+    batches, oldest = queue.take(6, 0.0)
+    # Lotes enteros hasta llegar a ``max_rows``
+    assert [len(values) for _, _, values, _ in batches] == [4, 4]
+    assert oldest <= time.monotonic()
+    assert queue.rows == 12
+
+
+def test_arrival_times_increase_between_batches():
+    queue = IngestQueue(1000, "block")
+    batch = Batches()
+    for size in (1, 5, 2, 8) * 25:
+        queue.put(*batch(size))
+    batches, _ = queue.take(10**6, 0.0)
+    stamps = [int(timestamps[0]) for _, timestamps, _, _ in batches]
+    assert all((timestamps == timestamps[0]).all() for _, timestamps, _, _ in batches)
+    assert all(b > a for a, b in zip(stamps, stamps[1:]))
+
+
+def test_arrival_clock_with_coarse_or_backward_clock(monkeypatch):
+    readings = iter([1000, 1000, 1000, 900, 5000, 5000])
+    monkeypatch.setattr(time, "time_ns", lambda: next(readings))
+    clock = ArrivalClock()
+    assert [clock() for _ in range(6)] == [1000, 1001, 1002, 1003, 5000, 5001]
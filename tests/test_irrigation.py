@@ -0,0 +1,157 @@
+"""Reglas de riego de ``IrrigationEngine``: cruces de umbral, secuencia regar/detener y colas de comandos.
+
+Uso:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from irrigation import IrrigationEngine  # noqa: E402
+from sensor_schema import SENSOR_COLUMNS, SOIL_COLUMNS  # noqa: E402
+
+NODE = "nodo-1"
+MINUTE_NS = 60 * 10**9
+START_NS = 1_700_000_000 * 10**9
+SOIL = [SENSOR_COLUMNS.index(name) for name in SOIL_COLUMNS]
+THRESHOLD = ("umbral", SOIL_COLUMNS, 25.0, 70.0, 0, 0)
+SUSTAINED = ("bajo 30 % por 10 min", SOIL_COLUMNS, 30.0, 70.0, 600, 0)
+PREDICTION = ("bajo 35 % en 2 h", SOIL_COLUMNS, 35.0, 70.0, 0, 7200)
+
+
+def soil(levels):
+    """Lecturas con las tres sondas de suelo en ``levels`` (una fila por lectura)."""
+    values = np.full((len(levels), len(SENSOR_COLUMNS)), 22.0)
+    values[:, SOIL] = np.asarray(levels, dtype=np.float64)[:, None]
+    return values
+
+
+def run(levels, engine=None, node_id=NODE, start_ns=START_NS, step_ns=MINUTE_NS, **options):
+    engine = engine or IrrigationEngine(**options)
+    timestamps = start_ns + np.arange(len(levels), dtype=np.int64) * step_ns
+    engine.extend_batch([node_id] * len(levels), timestamps, soil(levels))
+    return engine
+
+
+def actions(commands):
+    return [(command["action"], (command["time_ns"] - START_NS) // MINUTE_NS) for command in commands]
+
+
+def test_threshold_with_hysteresis():
+    # Se abre debajo de 25, sigue regando hasta pasar 70 y vuelve a abrir debajo de 25
+    engine = run([50, 40, 30, 24, 20, 50, 70, 71, 60, 30, 24.9], rules=[THRESHOLD])
+    commands = engine.pull(NODE)
+    assert actions(commands) == [("regar", 3), ("detener", 7), ("regar", 10)]
+    assert commands[0]["rules"] == ["umbral"] and commands[0]["value"] == 24.0
+    assert commands[1]["rules"] == [] and commands[1]["value"] == 71.0
+    assert engine.state(NODE)["irrigating"] and engine.state(NODE)["rules"] == ["umbral"]
+
+
+def test_signal_ignores_failed_probes():
+    values = soil([50, 20, 20, 20])
+    values[1:, SOIL[0]] = np.nan
+    # Todas las sondas en nan: la regla mantiene su estado
+    values[3, SOIL] = np.nan
+    values[2, SOIL[1:]] = 80.0
+    engine = IrrigationEngine(rules=[THRESHOLD])
+    engine.extend_batch([NODE] * 4, START_NS + np.arange(4) * MINUTE_NS, values)
+    assert actions(engine.pull(NODE)) == [("regar", 1), ("detener", 2)]
+    assert not engine.state(NODE)["irrigating"]
+
+
+def test_sustained_condition():
+    # Once lecturas bajo 30 (diez minutos): abre en la undécima
+    engine = run([40] + [29] * 11, rules=[SUSTAINED])
+    assert actions(engine.pull(NODE)) == [("regar", 11)]
+
+
+def test_sustained_condition_restarts():
+    # Una lectura sobre 30 reinicia la cuenta sin cerrar nada
+    engine = run([29] * 8 + [31] + [29] * 10, rules=[SUSTAINED])
+    assert engine.pull(NODE) == []
+    run([29], engine, start_ns=START_NS + 19 * MINUTE_NS)
+    assert actions(engine.pull(NODE)) == [("regar", 19)]
+
+
+def test_prediction_opens_before_the_threshold():
+    # Se seca 10 %/h desde 60 %: a 35 % llega a las 2,5 h
+    minutes = np.arange(150)
+    engine = run(60 - minutes / 6, rules=[PREDICTION])
+    commands = engine.pull(NODE)
+    assert [command["action"] for command in commands] == ["regar"]
+    assert commands[0]["rules"] == ["bajo 35 % en 2 h"]
+    assert commands[0]["value"] > 35.0
+    assert engine.state(NODE)["trend_per_hour"][0] == pytest.approx(-10.0, rel=0.2)
+
+
+def test_prediction_waits_for_min_samples():
+    engine = run([60, 50, 40, 36], rules=[PREDICTION], min_samples=10)
+    assert engine.pull(NODE) == []
+
+
+def test_valve_opens_once_for_several_rules():
+    engine = run([40] + [20] * 12 + [75], rules=[THRESHOLD, SUSTAINED])
+    commands = engine.pull(NODE)
+    assert actions(commands) == [("regar", 1), ("detener", 13)]
+    assert commands[0]["rules"] == ["umbral"]
+
+
+def test_commands_per_node_keeps_the_newest():
+    # Cinco ciclos: diez comandos, la cola del nodo guarda los tres más nuevos
+    engine = run([20, 80] * 5, rules=[THRESHOLD], commands_per_node=3)
+    assert actions(engine.pull(NODE)) == [("detener", 7), ("regar", 8), ("detener", 9)]
+    assert engine.pull(NODE) == []
+    assert engine.total_commands == 10
+
+
+def test_max_commands_bounds_the_log():
+    engine = run([20, 80] * 5, rules=[THRESHOLD], max_commands=4)
+    assert actions(engine.commands()) == [("detener", 9), ("regar", 8), ("detener", 7), ("regar", 6)]
+    assert actions(engine.commands(limit=1)) == [("detener", 9)]
+    # El historial no se vacía al retirar los comandos
+    engine.pull(NODE)
+    assert len(engine.commands()) == 4
+
+
+def test_pull_all_nodes():
+    engine = IrrigationEngine(rules=[THRESHOLD])
+    run([50, 20], engine, node_id="nodo-a")
+    run([20, 80], engine, node_id="nodo-b")
+    commands = engine.pull()
+    assert [(c["node"], c["action"]) for c in commands] == [("nodo-b", "regar"), ("nodo-a", "regar"),
+                                                            ("nodo-b", "detener")]
+    assert engine.pull() == []
+    assert [c["node"] for c in engine.commands(node_id="nodo-a")] == ["nodo-a"]
+
+
+def test_pending_blocks_match_batch():
+    rng = np.random.default_rng(0)
+    nodes = [f"nodo-{i}" for i in range(5)]
+    series = {node: np.clip(50 + np.cumsum(rng.normal(0, 4, 300)), 0, 100) for node in nodes}
+
+    pending = IrrigationEngine(flush_rows=10**9, flush_interval_s=3600)
+    for start in range(0, 300, 13):
+        for node in nodes:
+            levels = series[node][start:start + 13]
+            pending.append(node, START_NS + np.arange(start, start + len(levels)) * MINUTE_NS, soil(levels))
+
+    batch = IrrigationEngine()
+    node_ids = [node for _ in range(300) for node in nodes]
+    values = soil(np.stack([series[node] for node in nodes], axis=1).ravel())
+    batch.extend_batch(node_ids, np.repeat(START_NS + np.arange(300) * MINUTE_NS, len(nodes)), values)
+
+    def key(engine):
+        return sorted((c["node"], c["time_ns"], c["action"], tuple(c["rules"])) for c in engine.commands())
+
+    assert key(pending) and key(pending) == key(batch)
+    assert all(pending.state(node) == batch.state(node) for node in nodes)
+
+
+def test_invalid_rule_and_unknown_node():
+    with pytest.raises(ValueError):
+        IrrigationEngine(rules=[("al revés", SOIL_COLUMNS, 70.0, 25.0, 0, 0)])
+    assert IrrigationEngine().state("nadie") is None
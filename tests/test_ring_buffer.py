@@ -0,0 +1,60 @@
+"""Hora local de los timestamps de la ventana alrededor de un cambio de horario de verano.
+
+Uso:
+    python -m pytest tests
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ring_buffer import local_datetimes  # noqa: E402
+
+
+
+@pytest.fixture
+def new_york():
+    if not hasattr(time, "tzset"):
+        pytest.skip("time.tzset solo existe en POSIX")
+    previous = os.environ.get("TZ")
+    os.environ["TZ"] = "America/New_York"
+    time.tzset()
+    yield "America/New_York"
+    if previous is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = previous
+    time.tzset()
+
+
+def expected(timestamps_ns, zone):
+    return pd.to_datetime(timestamps_ns, utc=True).tz_convert(zone).tz_localize(None).to_numpy()
+
+
+@pytest.mark.parametrize("start, hours, step_s", [
+    ("2024-03-10T05:00:00", 4, 60),       # cambio de marzo dentro del rango
+    ("2024-11-03T04:00:00", 4, 10),       # cambio de noviembre
+    ("2024-01-01T00:00:00", 24 * 365, 3600),  # un año: dos cambios
+    ("2024-07-01T00:00:00", 1, 1),        # sin cambios
+])
+def test_matches_pandas(new_york, start, hours, step_s):
+    first = pd.Timestamp(start, tz="UTC").value
+    timestamps = first + np.arange(0, hours * 3600, step_s, dtype=np.int64) * 10**9
+    np.testing.assert_array_equal(local_datetimes(timestamps), expected(timestamps, new_york))
+
+
+def test_offset_follows_the_clock_change(new_york):
+    # El mismo proceso, antes y después del cambio: la diferencia no queda fija
+    before = pd.Timestamp("2024-03-10T06:00:00", tz="UTC").value
+    after = pd.Timestamp("2024-03-10T08:00:00", tz="UTC").value
+    assert local_datetimes([before])[0] == np.datetime64("2024-03-10T01:00:00")
+    assert local_datetimes([after])[0] == np.datetime64("2024-03-10T04:00:00")
+
+
+def test_empty():
+    assert len(local_datetimes(np.empty(0, dtype=np.int64))) == 0
@@ -0,0 +1,107 @@
+"""Las estadísticas incrementales contra pandas (``rolling`` con ``skipna``) sobre la misma ventana.
+
+Uso:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sensor_schema import HUMIDITY_COLUMNS, SENSOR_COLUMNS, TEMP_COLUMNS  # noqa: E402
+from streaming_stats import StreamingStats, WindowedStats  # noqa: E402
+
+CAPACITY = 100
+
+
+def readings(n, nan_fraction, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(25.0, 5.0, (n, len(SENSOR_COLUMNS)))
+    values[rng.random(values.shape) < nan_fraction] = np.nan
+    return values
+
+
+def expected(values, capacity=CAPACITY):
+    """Estadísticas de pandas de la ventana que termina en cada lectura."""
+    rolling = pd.DataFrame(values).rolling(capacity, min_periods=1)
+    return {"mean": rolling.mean().to_numpy(), "var": rolling.var().to_numpy(), "std": rolling.std().to_numpy(),
+            "min": rolling.min().to_numpy(), "max": rolling.max().to_numpy()}
+
+
+def assert_matches(values, stats_at):
+    reference = expected(values)
+    for tick in range(len(values)):
+        snapshot = stats_at(tick)
+        assert snapshot["count"] == min(tick + 1, CAPACITY)
+        assert snapshot["total"] == tick + 1
+        for key, table in reference.items():
+            np.testing.assert_allclose(snapshot[key], table[tick], rtol=1e-9, atol=1e-9,
+                                       err_msg=f"{key} en la lectura {tick}")
+
+
+@pytest.mark.parametrize("nan_fraction", [0.0, 0.05, 0.5])
+def test_window_matches_pandas(nan_fraction):
+    values = readings(4 * CAPACITY, nan_fraction)
+    stats = WindowedStats(CAPACITY)
+    snapshots = []
+    for row in values:
+        stats.add(row)
+        snapshots.append(stats.snapshot())
+    assert_matches(values, snapshots.__getitem__)
+
+
+def test_single_nan_does_not_spoil_the_window():
+    values = readings(4 * CAPACITY, 0.0, seed=1)
+    values[10, 3] = np.nan
+    stats = WindowedStats(CAPACITY)
+    snapshots = []
+    for row in values:
+        stats.add(row)
+        snapshots.append(stats.snapshot())
+    assert_matches(values, snapshots.__getitem__)
+    assert not np.isnan(snapshots[11]["mean"]).any()
+
+
+def test_column_without_readings():
+    values = readings(3 * CAPACITY, 0.02, seed=2)
+    missing = SENSOR_COLUMNS.index("humedad_suelo_3")
+    values[:, missing] = np.nan
+    stats = WindowedStats(CAPACITY)
+    for row in values:
+        stats.add(row)
+    snapshot = stats.snapshot()
+    for key in ("mean", "var", "std", "min", "max"):
+        assert np.isnan(snapshot[key][missing])
+        assert not np.isnan(np.delete(snapshot[key], missing)).any()
+
+
+def test_column_that_stops_reading():
+    # Un sensor que deja de leer: su columna queda en nan cuando sale su última lectura
+    values = readings(3 * CAPACITY, 0.0, seed=3)
+    values[CAPACITY:, 0] = np.nan
+    stats = WindowedStats(CAPACITY)
+    snapshots = []
+    for row in values:
+        stats.add(row)
+        snapshots.append(stats.snapshot())
+    assert_matches(values, snapshots.__getitem__)
+    assert np.isnan(snapshots[-1]["mean"][0])
+
+
+def test_node_stats_by_column():
+    values = readings(2 * CAPACITY, 0.1, seed=4)
+    stats = StreamingStats(CAPACITY)
+    timestamps = np.arange(len(values), dtype=np.int64)
+    # En bloques de tamaños distintos, como llegan de la red
+    for start, end in ((0, 1), (1, 37), (37, 150), (150, len(values))):
+        stats.append("nodo-1", timestamps[start:end], values[start:end])
+    reference = expected(values)
+    for columns in (TEMP_COLUMNS, HUMIDITY_COLUMNS):
+        idx = [SENSOR_COLUMNS.index(name) for name in columns]
+        snapshot = stats.snapshot("nodo-1", columns)
+        for key, table in reference.items():
+            np.testing.assert_allclose(snapshot[key], table[-1][idx], rtol=1e-9, atol=1e-9)
@@ -0,0 +1,74 @@
+"""Rotación por tiempo y retención del historial en disco.
+
+Uso:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sensor_schema import SENSOR_COLUMNS  # noqa: E402
+from timeseries_store import TimeSeriesStore  # noqa: E402
+
+HOUR_NS = 3600 * 10**9
+NOW_NS = 1_800_000_000 * 10**9
+
+
+def readings(start_ns, hours, period_s=60):
+    timestamps = start_ns + np.arange(int(hours * 3600 / period_s), dtype=np.int64) * period_s * 10**9
+    return timestamps, np.ones((len(timestamps), len(SENSOR_COLUMNS)))
+
+
+def segments(store, node_id):
+    return store._logs[node_id].segments
+
+
+def test_segments_rotate_by_time(tmp_path):
+    # 8 h de retención: segmentos de 1 h
+    store = TimeSeriesStore(str(tmp_path), retention_s=8 * 3600)
+    timestamps, values = readings(NOW_NS - 4 * HOUR_NS, 4)
+    # Pocas lecturas por segmento: sin la rotación por tiempo habría uno solo
+    store.append("nodo", timestamps, values)
+    spans = [(int(s.records()["timestamp"][0]), s.last_ts()) for s in segments(store, "nodo")]
+    assert len(spans) == 4
+    assert all(last - first < HOUR_NS for first, last in spans)
+    assert len(store.read_range("nodo")) == len(timestamps)
+    store.close()
+
+
+def test_old_segments_are_removed(tmp_path):
+    store = TimeSeriesStore(str(tmp_path), retention_s=3600)
+    old = readings(NOW_NS - 5 * HOUR_NS, 2)
+    store.append("viejo", *old)
+    store.append("activo", *old)
+    store.append("activo", *readings(NOW_NS - HOUR_NS // 2, 0.5))
+    paths = [s.path for s in segments(store, "viejo")]
+    assert len(paths) > 1
+
+    store.apply_retention(NOW_NS)
+    # El nodo que dejó de mandar pierde también su segmento activo
+    assert segments(store, "viejo") == []
+    assert not any(os.path.exists(path) for path in paths)
+    assert len(store.read_range("viejo")) == 0
+    recent = store.read_range("activo")
+    assert len(recent) and recent["timestamp"].min() >= NOW_NS - 2 * HOUR_NS
+
+    # Se puede seguir escribiendo después de borrar el segmento activo
+    store.append("viejo", *readings(NOW_NS, 0.1))
+    assert len(store.read_range("viejo")) == 6
+    store.close()
+
+
+def test_retention_thread(tmp_path):
+    store = TimeSeriesStore(str(tmp_path), retention_s=3600)
+    store.append("nodo", *readings(1_000 * HOUR_NS, 1))
+    thread = store.start_retention(interval_s=0.01)
+    # Espera unas cuantas pasadas del hilo
+    thread.join(timeout=0.2)
+    assert segments(store, "nodo") == []
+    store.close()
+    thread.join(timeout=1.0)
+    assert not thread.is_alive()
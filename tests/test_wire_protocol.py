@@ -0,0 +1,204 @@
+"""Tramas de ``encode_frames`` decodificadas por ``BinaryFramer`` en recepciones arbitrarias.
+
+Uso:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sensor_schema import SENSOR_COLUMNS, WIRE_SCHEMAS  # noqa: E402
+from wire_protocol import (HEADER_SIZE, SCHEMA_COLUMNS, BinaryFramer, ProtocolFramer,  # noqa: E402
+                           encode_frames)
+
+NODES = ["nodo-a", "nodo-b", "nodo-c"]
+
+
+def readings(n, schema=1, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0.0, 100.0, (n, len(WIRE_SCHEMAS[schema]))).astype(np.float32)
+
+
+def expected(values, schema=1):
+    """Las filas de ``values`` en las columnas de ``SENSOR_COLUMNS`` (nan las que el esquema no trae)."""
+    result = np.full((len(values), len(SENSOR_COLUMNS)), np.nan)
+    for i, name in enumerate(WIRE_SCHEMAS[schema]):
+        if name in SENSOR_COLUMNS:
+            result[:, SENSOR_COLUMNS.index(name)] = values[:, i]
+    return result
+
+
+def feed_all(framer, chunks):
+    node_ids, values = [], []
+    for chunk in chunks:
+        ids, block = framer.feed(chunk)
+        if len(block):
+            node_ids.extend(ids if ids is not None else [None] * len(block))
+            values.append(block)
+    return node_ids, (np.concatenate(values) if values else np.empty((0, len(SENSOR_COLUMNS))))
+
+
+def split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_round_trip():
+    values = readings(50)
+    node_ids = [NODES[i % len(NODES)] for i in range(50)]
+    framer = BinaryFramer(stats=None)
+    ids, decoded = framer.feed(encode_frames(values, node_ids, seq=np.arange(50) // 3))
+    assert list(ids) == node_ids
+    np.testing.assert_array_equal(decoded, expected(values))
+    assert (framer.frames, framer.malformed, framer.dropped) == (50, 0, 0)
+
+
+@pytest.mark.parametrize("size", [1, 5, HEADER_SIZE, HEADER_SIZE + 1, 100, 4096])
+def test_split_chunks(size):
+    values = readings(40)
+    node_ids = [NODES[i % len(NODES)] for i in range(40)]
+    data = encode_frames(values, node_ids)
+    framer = BinaryFramer(stats=None)
+    ids, decoded = feed_all(framer, split(data, size))
+    assert ids == node_ids
+    np.testing.assert_array_equal(decoded, expected(values))
+    assert framer.flush()[1].shape == (0, len(SENSOR_COLUMNS))
+    assert (framer.frames, framer.malformed, framer.dropped, framer.gaps) == (40, 0, 0, 0)
+
+
+def test_frames_without_node_id():
+    values = readings(3)
+    framer = BinaryFramer(stats=None)
+    ids, decoded = framer.feed(encode_frames(values))
+    assert ids is None
+    np.testing.assert_array_equal(decoded, expected(values))
+    assert framer.declared() == [(None, SCHEMA_COLUMNS[1])]
+
+
+def test_garbage_before_magic():
+    values = readings(5)
+    data = b"basura\r\n\x00\xa5" + encode_frames(values, NODES[:1] * 5)
+    framer = BinaryFramer(stats=None)
+    _, decoded = feed_all(framer, split(data, 7))
+    np.testing.assert_array_equal(decoded, expected(values))
+    assert framer.frames == 5 and framer.dropped > 0 and framer.malformed == 0
+
+
+def test_garbage_between_frames():
+    values = readings(6)
+    frames = [encode_frames(values[i:i + 1], ["nodo-a"], seq=i) for i in range(6)]
+    data = frames[0] + frames[1] + b"\xa5\xa5xx" + frames[2] + b"\x5a" * 50 + b"".join(frames[3:])
+    framer = BinaryFramer(stats=None)
+    _, decoded = framer.feed(data)
+    np.testing.assert_array_equal(decoded, expected(values))
+    assert framer.gaps == 0
+
+
+def test_corrupted_magic_loses_only_that_frame():
+    values = readings(5)
+    frames = [encode_frames(values[i:i + 1], ["nodo-a"], seq=i) for i in range(5)]
+    frames[2] = b"\x00" + frames[2][1:]
+    framer = BinaryFramer(stats=None)
+    _, decoded = framer.feed(b"".join(frames))
+    np.testing.assert_array_equal(decoded, expected(values[[0, 1, 3, 4]]))
+    assert framer.dropped > 0
+    assert framer.gaps == 1
+
+
+@pytest.mark.parametrize("offset, byte", [(4, 9), (5, 99)])
+def test_unknown_version_or_schema_is_skipped(offset, byte):
+    values = readings(3)
+    frames = [encode_frames(values[i:i + 1], ["nodo-a"], seq=i) for i in range(3)]
+    bad = bytearray(frames[1])
+    bad[offset] = byte
+    framer = BinaryFramer(stats=None)
+    _, decoded = feed_all(framer, split(frames[0] + bytes(bad) + frames[2], 10))
+    np.testing.assert_array_equal(decoded, expected(values[[0, 2]]))
+    assert (framer.malformed, framer.dropped) == (1, 0)
+
+
+def test_short_length_resyncs():
+    values = readings(2)
+    bad = bytearray(encode_frames(readings(1, seed=1), ["nodo-a"]))
+    bad[2:4] = (3).to_bytes(2, "little")
+    framer = BinaryFramer(stats=None)
+    _, decoded = framer.feed(bytes(bad) + encode_frames(values, ["nodo-a"] * 2))
+    np.testing.assert_array_equal(decoded, expected(values))
+    assert framer.dropped > 0 and framer.malformed == 0
+
+
+def test_incomplete_frame_on_flush():
+    data = encode_frames(readings(2), ["nodo-a"] * 2)
+    framer = BinaryFramer(stats=None)
+    _, decoded = framer.feed(data[:-5])
+    assert len(decoded) == 1
+    assert len(framer.flush()[1]) == 0
+    assert framer.dropped == 1
+
+
+@pytest.mark.parametrize("seq, gaps", [
+    ([0, 1, 2, 3], 0),
+    ([0, 1, 4, 5], 2),
+    ([10, 20], 9),
+    ([2**32 - 2, 2**32 - 1, 0, 1], 0),   # la secuencia da la vuelta
+    ([2**32 - 1, 1], 1),
+    ([50, 51, 0, 1], 0),                 # el nodo se reinició
+])
+def test_sequence_gaps(seq, gaps):
+    framer = BinaryFramer(stats=None)
+    framer.feed(encode_frames(readings(len(seq)), ["nodo-a"] * len(seq), seq=np.array(seq, dtype=np.uint32)))
+    assert framer.gaps == gaps
+
+
+def test_sequence_gaps_per_node_and_across_feeds():
+    framer = BinaryFramer(stats=None)
+    # Dos nodos intercalados: cada uno con su secuencia
+    framer.feed(encode_frames(readings(4), ["nodo-a", "nodo-b", "nodo-a", "nodo-b"], seq=[0, 100, 1, 101]))
+    assert framer.gaps == 0
+    framer.feed(encode_frames(readings(2), ["nodo-b", "nodo-a"], seq=[105, 2]))
+    assert framer.gaps == 3
+
+
+def test_schema_declaration():
+    framer = BinaryFramer(stats=None)
+    values = readings(4, schema=2)
+    ids, decoded = framer.feed(encode_frames(values, ["nodo-a", "nodo-b"] * 2, schema=2))
+    np.testing.assert_array_equal(decoded, expected(values, schema=2))
+    # Las columnas que el esquema no trae llegan en nan; los campos desconocidos se descartan
+    assert np.isnan(decoded[:, SENSOR_COLUMNS.index("humedad_suelo_3")]).all()
+    assert sorted(framer.declared()) == [("nodo-a", SCHEMA_COLUMNS[2]), ("nodo-b", SCHEMA_COLUMNS[2])]
+    assert "humedad_suelo_3" not in SCHEMA_COLUMNS[2]
+
+    # Se informa solo al cambiar de esquema
+    framer.feed(encode_frames(readings(1, schema=2), ["nodo-a"], schema=2))
+    assert framer.declared() == []
+    framer.feed(encode_frames(readings(1), ["nodo-a"]) + encode_frames(readings(1, schema=2), ["nodo-b"], schema=2))
+    assert framer.declared() == [("nodo-a", SCHEMA_COLUMNS[1])]
+
+
+def test_mixed_schemas_in_one_chunk():
+    first, second = readings(3), readings(2, schema=2)
+    data = encode_frames(first, ["nodo-a"] * 3) + encode_frames(second, ["nodo-b"] * 2, schema=2)
+    framer = BinaryFramer(stats=None)
+    ids, decoded = feed_all(framer, split(data, 11))
+    assert ids == ["nodo-a"] * 3 + ["nodo-b"] * 2
+    np.testing.assert_array_equal(decoded, np.concatenate([expected(first), expected(second, schema=2)]))
+
+
+def test_protocol_framer_detects_protocol():
+    binary = ProtocolFramer(stats=None)
+    values = readings(2)
+    _, decoded = binary.feed(encode_frames(values, ["nodo-a"] * 2))
+    assert binary.protocol == "binario"
+    np.testing.assert_array_equal(decoded, expected(values))
+    assert binary.declared() == [("nodo-a", SCHEMA_COLUMNS[1])]
+
+    csv = ProtocolFramer(stats=None)
+    assert csv.protocol is None
+    _, decoded = csv.feed(b",".join(b"1.5" for _ in SENSOR_COLUMNS) + b"\n")
+    assert csv.protocol == "csv"
+    np.testing.assert_array_equal(decoded, np.full((1, len(SENSOR_COLUMNS)), 1.5))
+    assert csv.declared() == []
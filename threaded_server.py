@@ -0,0 +1,72 @@
+"""Servidor de ingesta con un hilo por conexión (``socketserver.ThreadingTCPServer``).
+
+Solo depende de las piezas de la ingesta (framing, almacén, cola): un
+proceso que solo recibe datos no carga Flask, Dash ni plotly. El dashboard
+(AnalisisDatos.py) lo arranca en un hilo; ``async_server.py`` es la variante
+con asyncio.
+"""
+import functools
+import logging
+import socketserver
+
+import metrics
+from ingest import DEFAULT_HOST, DEFAULT_PORT, RECV_SIZE, declare_columns, peer_node_id, store_batch
+from wire_protocol import ProtocolFramer
+
+log = logging.getLogger(__name__)
+
+
+# Clase para manejar las conexiones al servidor
+class SensorTCPHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # Con cola de ingesta, el escritor guarda; sin ella, cada conexión escribe en el almacén
+        pipeline = self.server.pipeline
+        if pipeline is not None:
+            write, declare = pipeline.submit, pipeline.declare
+        else:
+            write = functools.partial(store_batch, self.server.data_store)
+            declare = functools.partial(declare_columns, self.server.data_store)
+        framer = ProtocolFramer()
+        node_id = peer_node_id(self.client_address)
+        metrics.CONNECTIONS.inc()
+        try:
+            while True:
+                try:
+                    data = self.request.recv(RECV_SIZE)
+                    if not data:
+                        break
+
+                    metrics.BYTES.inc(len(data))
+                    # Escribir cada bloque sería más caro que procesarlo: solo una muestra, en DEBUG
+                    if log.isEnabledFor(logging.DEBUG) and metrics.RECEIVED_LOG_SAMPLER.sample():
+                        log.debug("Datos recibidos: %s", data.decode('utf-8', errors='replace').strip())
+
+                    # Todas las líneas completas del bloque se parsean y guardan juntas
+                    batch = framer.feed(data)
+                    declare(node_id, framer.declared())
+                    write(node_id, *batch)
+
+                except ConnectionResetError:
+                    log.info("Conexión restablecida por el cliente")
+                    break
+            write(node_id, *framer.flush())
+        finally:
+            metrics.CONNECTIONS.dec()
+
+
+class SensorTCPServer(socketserver.ThreadingTCPServer):
+    # IngestPipeline que guarda las lecturas; None: cada conexión escribe en data_store
+    pipeline = None
+    # Permite reiniciar el servidor sin esperar a que el puerto salga de TIME_WAIT
+    allow_reuse_address = True
+    daemon_threads = True
+    # Cola de conexiones pendientes: todos los nodos reconectan a la vez tras un corte
+    request_queue_size = 1024
+
+
+def start_tcp_server(store, host=DEFAULT_HOST, port=DEFAULT_PORT, pipeline=None):
+    server = SensorTCPServer((host, port), SensorTCPHandler)
+    server.data_store = store
+    server.pipeline = pipeline
+    log.info("Servidor TCP escuchando en el puerto %d...", port)
+    server.serve_forever()
@@ -0,0 +1,332 @@
+"""Almacenamiento persistente, de solo agregado, para el historial de los sensores.
+
+Cada nodo tiene un directorio con archivos de segmento. Un segmento es una
+secuencia de registros de ancho fijo (timestamp int64 + un float32 por
+columna), sin encabezado, así que se puede abrir directamente con
+``numpy.memmap`` y recorrer meses de lecturas sin cargarlas en memoria::
+
+    datos/
+        nodo-1/
+            00000001730000000000000.seg
+            00000001730086400000000.seg
+
+El nombre de cada segmento es el timestamp (ns) de su primer registro. Esa
+lista ordenada es el índice temporal entre segmentos y, dentro de un segmento,
+los timestamps son crecientes: un rango se ubica con dos búsquedas binarias.
+
+Con ``read_only=True`` otro proceso (los workers web de production.py) lee
+el historial que escribe la ingesta: antes de cada consulta vuelve a listar
+los directorios para ver los nodos y los segmentos nuevos y los que borró
+la retención. Como los segmentos se escriben sin buffer, los registros
+completos ya son visibles por memmap.
+"""
+import bisect
+import os
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+
+from sensor_schema import SENSOR_COLUMNS
+
+SEGMENT_SUFFIX = ".seg"
+# Con retención, cada segmento cubre como mucho 1/RETENTION_SEGMENTS de ella:
+# lo que se conserva de más es a lo sumo esa fracción
+RETENTION_SEGMENTS = 8
+RETENTION_INTERVAL_S = 60.0
+
+
+def record_dtype(columns=SENSOR_COLUMNS):
+    return np.dtype([("timestamp", "<i8")] + [(name, "<f4") for name in columns])
+
+
+class _Segment:
+    def __init__(self, path, first_ts, dtype):
+        self.path = path
+        self.first_ts = first_ts
+        self.dtype = dtype
+        self._mmap = None
+        self._mmap_len = 0
+
+    def __len__(self):
+        return os.path.getsize(self.path) // self.dtype.itemsize
+
+    def records(self):
+        """Vista memmap de los registros completos escritos hasta ahora."""
+        n = len(self)
+        if n == 0:
+            return np.empty(0, dtype=self.dtype)
+        # Un segmento solo crece: se reutiliza el memmap mientras no cambie de tamaño
+        if self._mmap is None or self._mmap_len != n:
+            self._mmap = np.memmap(self.path, dtype=self.dtype, mode="r", shape=(n,))
+            self._mmap_len = n
+        return self._mmap
+
+    def last_ts(self):
+        records = self.records()
+        return int(records["timestamp"][-1]) if len(records) else self.first_ts
+
+
+class _NodeLog:
+    """Segmentos de un nodo y el archivo abierto para escribir."""
+
+    def __init__(self, directory, dtype, read_only=False):
+        self.directory = directory
+        self.dtype = dtype
+        self.lock = threading.Lock()
+        if not read_only:
+            os.makedirs(directory, exist_ok=True)
+        self.segments = []
+        self.rescan()
+        self.file = None
+        self.active_records = 0
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def rescan(self):
+        """Vuelve a listar los segmentos del directorio (los que ya estaban conservan su memmap)."""
+        known = {segment.path: segment for segment in self.segments}
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX))
+        paths = [os.path.join(self.directory, name) for name in names]
+        self.segments = [known.get(path) or _Segment(path, int(name[:-len(SEGMENT_SUFFIX)]), self.dtype)
+                         for name, path in zip(names, paths)]
+        self.first_ts = [segment.first_ts for segment in self.segments]
+        self.last_ts = self.segments[-1].last_ts() if self.segments else None
+
+    def open_segment(self, first_ts):
+        self.close()
+        # Dos segmentos pueden empezar en el mismo instante si el reloj se detuvo
+        if self.first_ts and first_ts <= self.first_ts[-1]:
+            first_ts = self.first_ts[-1] + 1
+        path = os.path.join(self.directory, f"{first_ts:023d}{SEGMENT_SUFFIX}")
+        # Sin buffer de Python: lo escrito queda visible de inmediato para los memmap
+        self.file = open(path, "ab", buffering=0)
+        self.active_records = 0
+        self.segments.append(_Segment(path, first_ts, self.dtype))
+        self.first_ts.append(first_ts)
+
+    def sync(self):
+        if self.file is not None and self.unsynced:
+            os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+
+class TimeSeriesStore:
+    """Historial en disco, particionado por nodo.
+
+    ``segment_records`` registros por segmento antes de rotar, o
+    ``segment_span_s`` segundos desde su primer registro (por defecto, con
+    ``retention_s``, 1/``RETENTION_SEGMENTS`` de ella); ``fsync_every``
+    registros o ``fsync_interval`` segundos entre ``fsync``; ``retention_s``
+    antigüedad máxima de los segmentos que conserva ``apply_retention``
+    (también al rotar y, con ``start_retention``, periódicamente);
+    ``read_only`` para leer desde otro proceso el historial que escribe la ingesta.
+    """
+
+    def __init__(self, root, columns=SENSOR_COLUMNS, segment_records=1 << 20,
+                 fsync_every=10_000, fsync_interval=1.0, retention_s=None, read_only=False,
+                 segment_span_s=None):
+        self.root = root
+        self.columns = tuple(columns)
+        self.dtype = record_dtype(self.columns)
+        self.segment_records = segment_records
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.retention_s = retention_s
+        if segment_span_s is None and retention_s is not None:
+            segment_span_s = retention_s / RETENTION_SEGMENTS
+        self.segment_span_ns = None if segment_span_s is None else max(int(segment_span_s * 1e9), 1)
+        self.read_only = read_only
+        self._stopped = threading.Event()
+        self._logs = {}
+        self._lock = threading.Lock()
+        if not read_only:
+            os.makedirs(root, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            if os.path.isdir(os.path.join(self.root, name)):
+                self._log(urllib.parse.unquote(name))
+
+    def _existing(self, node_id):
+        """Log de un nodo que ya tiene historial; en solo lectura, releído del disco."""
+        if node_id not in self._logs and self.read_only:
+            self._scan()
+        if node_id not in self._logs:
+            raise KeyError(f"Nodo desconocido: {node_id}")
+        log = self._logs[node_id]
+        if self.read_only:
+            with log.lock:
+                log.rescan()
+        return log
+
+    def _log(self, node_id):
+        log = self._logs.get(node_id)
+        if log is None:
+            with self._lock:
+                log = self._logs.get(node_id)
+                if log is None:
+                    directory = os.path.join(self.root, urllib.parse.quote(str(node_id), safe=""))
+                    log = _NodeLog(directory, self.dtype, self.read_only)
+                    self._logs[node_id] = log
+        return log
+
+    def nodes(self):
+        if self.read_only:
+            self._scan()
+        return sorted(self._logs)
+
+    def last_timestamp(self, node_id):
+        """Timestamp del último registro del nodo (``None`` si no tiene).
+
+        Los registros nuevos nunca son anteriores a este: todo lo que está
+        antes ya no cambia.
+        """
+        log = self._existing(node_id)
+        with log.lock:
+            return log.last_ts
+
+    def append(self, node_id, timestamps_ns, values):
+        """Agrega lecturas de un nodo; ``values`` tiene forma (n, len(columns)).
+
+        Los timestamps se fuerzan a no decrecer (un reloj que retrocede no debe
+        romper la búsqueda binaria).
+        """
+        if self.read_only:
+            raise ValueError("Historial abierto en solo lectura")
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        values = np.asarray(values).reshape(len(timestamps_ns), len(self.columns))
+        if not len(timestamps_ns):
+            return
+        log = self._log(node_id)
+        with log.lock:
+            if log.last_ts is not None:
+                timestamps_ns = np.maximum(timestamps_ns, log.last_ts)
+            timestamps_ns = np.maximum.accumulate(timestamps_ns)
+
+            records = np.empty(len(timestamps_ns), dtype=self.dtype)
+            records["timestamp"] = timestamps_ns
+            for i, name in enumerate(self.columns):
+                records[name] = values[:, i]
+
+            start = 0
+            while start < len(records):
+                if (log.file is None or log.active_records >= self.segment_records
+                        or (self.segment_span_ns is not None
+                            and timestamps_ns[start] >= log.first_ts[-1] + self.segment_span_ns)):
+                    # Al rotar se aprovecha para aplicar la retención de este nodo
+                    if self.retention_s is not None:
+                        self._expire(log, time.time_ns() - int(self.retention_s * 1e9))
+                    log.open_segment(int(timestamps_ns[start]))
+                end = start + self.segment_records - log.active_records
+                if self.segment_span_ns is not None:
+                    end = min(end, int(np.searchsorted(timestamps_ns, log.first_ts[-1] + self.segment_span_ns)))
+                chunk = records[start:max(end, start + 1)]
+                log.file.write(chunk.tobytes())
+                log.active_records += len(chunk)
+                start += len(chunk)
+
+            log.last_ts = int(timestamps_ns[-1])
+            log.unsynced += len(records)
+            if log.unsynced >= self.fsync_every or time.monotonic() - log.last_sync >= self.fsync_interval:
+                log.sync()
+
+    def flush(self):
+        for log in list(self._logs.values()):
+            with log.lock:
+                log.sync()
+
+    def close(self):
+        self._stopped.set()
+        for log in list(self._logs.values()):
+            with log.lock:
+                log.close()
+
+    def start_retention(self, interval_s=RETENTION_INTERVAL_S):
+        """Aplica la retención cada ``interval_s`` en un hilo propio, hasta ``close``.
+
+        Sin esto la retención solo corre al rotar, y un nodo que dejó de
+        mandar datos conserva su historial para siempre.
+        """
+        def run():
+            while not self._stopped.wait(interval_s):
+                self.apply_retention()
+
+        thread = threading.Thread(target=run, name="history-retention", daemon=True)
+        thread.start()
+        return thread
+
+    def iter_range(self, node_id, start_ns=None, end_ns=None, chunk_rows=1 << 16):
+        """Recorre los registros de ``[start_ns, end_ns)`` en bloques memmap de hasta ``chunk_rows``.
+
+        Los bloques son vistas sobre el archivo (no copias): solo se leen del
+        disco las páginas que realmente se tocan.
+        """
+        log = self._existing(node_id)
+        with log.lock:
+            segments = list(log.segments)
+            first_ts = list(log.first_ts)
+
+        # Primer segmento que puede contener start_ns
+        first = 0 if start_ns is None else max(bisect.bisect_right(first_ts, start_ns) - 1, 0)
+        for segment in segments[first:]:
+            if end_ns is not None and segment.first_ts >= end_ns:
+                break
+            try:
+                records = segment.records()
+            except FileNotFoundError:
+                # En solo lectura: la retención de la ingesta lo borró después de listarlo
+                continue
+            timestamps = records["timestamp"]
+            lo = 0 if start_ns is None else int(np.searchsorted(timestamps, start_ns, side="left"))
+            hi = len(records) if end_ns is None else int(np.searchsorted(timestamps, end_ns, side="left"))
+            for chunk_start in range(lo, hi, chunk_rows):
+                yield records[chunk_start:min(chunk_start + chunk_rows, hi)]
+
+    def read_range(self, node_id, start_ns=None, end_ns=None):
+        """Copia en memoria de los registros de ``[start_ns, end_ns)``."""
+        chunks = list(self.iter_range(node_id, start_ns, end_ns))
+        if not chunks:
+            return np.empty(0, dtype=self.dtype)
+        return np.concatenate(chunks)
+
+    def apply_retention(self, now_ns=None):
+        """Borra los segmentos cuyo último registro es más viejo que ``retention_s``."""
+        if self.retention_s is None or self.read_only:
+            return 0
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        cutoff = now_ns - int(self.retention_s * 1e9)
+        removed = 0
+        for log in list(self._logs.values()):
+            with log.lock:
+                removed += self._expire(log, cutoff)
+        return removed
+
+    @staticmethod
+    def _expire(log, cutoff):
+        # Debe llamarse con log.lock tomado. El segmento activo también se borra
+        # si es viejo (el nodo dejó de mandar): la próxima lectura abre otro
+        keep = []
+        for segment in log.segments:
+            if segment.last_ts() < cutoff:
+                if log.file is not None and segment is log.segments[-1]:
+                    log.close()
+                segment._mmap = None
+                os.remove(segment.path)
+            else:
+                keep.append(segment)
+        removed = len(log.segments) - len(keep)
+        log.segments = keep
+        log.first_ts = [segment.first_ts for segment in keep]
+        return removed
@@ -1,217 +1,289 @@
+"""Animación del tiro parabólico hacia la distancia medida por el sensor.
+
+    python tract.py --prueba                        # ventana interactiva
+    python tract.py --distancia 15 --headless tiro.gif
+    python tract.py --distancia 15 --headless cuadros/   # secuencia de PNG
+
+Los artistas (línea, punto, vectores y etiquetas) se crean una sola vez y en
+cada cuadro solo se actualizan sus datos, así ``blit=True`` redibuja
+únicamente lo que cambia. La animación sigue el tiempo real: si dibujar se
+atrasa, se saltean cuadros en lugar de ralentizar el tiro.
+
+Un clic muestra el estado exacto (tiempo, posición y velocidades) en la x
+elegida, calculado con las ecuaciones del movimiento y no con la muestra más
+cercana. Con ``--ambos`` se superpone la trayectoria del ángulo alto y el
+clic elige la curva más cercana con ``trajectory_picker``.
+
+Con ``--headless`` se usa el backend Agg (sin ventana) y se genera un video
+(.mp4 con ffmpeg, .gif con Pillow) o una carpeta de cuadros PNG.
+Importar este módulo no abre ventanas ni lee el sensor.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-import Angulo_search
+
+import ballistics
 
 # Parámetros
-g = 9.81  # Gravedad (m/s²)
+g = ballistics.G  # Gravedad (m/s²)
 v0 = 25  # Velocidad inicial (m/s)
-
-Distancia_X = Angulo_search.buscar_distancia(prueba=True)
-print(f"Distancia: {Distancia_X} ")
-x_target =Distancia_X#float(input("Ingrese la distancia en el eje x donde quiere que la altura sea 0: "))
-
-escala_vectores = 10 #float(input("Ingrese el valor de escala para los vectores de velocidad (prueba distintos valores): "))
-
-
-# Comprobar si el objetivo es alcanzable con la velocidad inicial dada
-s = (g * x_target) / (v0 ** 2)
-if abs(s) > 1:
-    print("El objetivo está fuera del alcance máximo para la velocidad inicial dada.")
-    exit()
-
-# Calcular el ángulo óptimo usando física
-theta_rad = 0.5 * np.arcsin(s)
-angulo_optimo = np.degrees(theta_rad)
-
-# Mostrar resultados del debug
-print(f"El ángulo óptimo para que la altura en x = {x_target} sea 0 es aproximadamente: {angulo_optimo:.2f}°")
-# Cálculo del ángulo óptimo usando física
-theta_rad = 0.5 * np.arcsin((g * x_target) / (v0 ** 2))
-angulo_optimo = (np.degrees(theta_rad) )+ 45
-
-# Parámetros para la ecuación de la parábola
-tan_theta = np.tan(theta_rad)
-cos_theta_squared = np.cos(theta_rad) ** 2
-
-# Mostrar la ecuación de la parábola en la terminal
-print(f"Ecuación de la parábola: y = {tan_theta:.3f} * x - ({g / (2 * v0**2 * cos_theta_squared):.3f}) * x^2")
-
-# Generar puntos para la trayectoria con el ángulo óptimo
-angle_rad = theta_rad
-t_max = (2 * v0 * np.sin(angle_rad)) / g  # Tiempo total de vuelo
-t_vals = np.linspace(0, t_max, 500)  # Valores de tiempo
-
-# Calcular posiciones (x, y) en función del tiempo
-x_vals = v0 * np.cos(angle_rad) * t_vals
-y_vals = v0 * np.sin(angle_rad) * t_vals - (0.5 * g * t_vals**2)
-y_vals = np.maximum(y_vals, 0)  # Asegurarse de que y no sea negativo (no caer por debajo del suelo)
-
-# Configurar la figura de Matplotlib con eje x fijo de 0 a 100
-fig, ax = plt.subplots(figsize=(10, 6))
-ax.set_xlim(0, 100)  # Rango fijo de 0 a 100 en el eje x
-ax.set_ylim(0, max(y_vals) * 1.5)
-ax.set_xlabel("Distancia (m)")
-ax.set_ylabel("Altura (m)")
-ax.set_title(f"Trayectoria Parabólica (Ángulo = {angulo_optimo})")
-
-# Elementos de la animación
-trajectory_line, = ax.plot([], [], 'b-', lw=2)  # Línea de trayectoria
-position_dot, = ax.plot([], [], 'ro')  # Punto de la posición
-
-# Texto para mostrar datos
-time_text = ax.text(0.02, 0.95, '', transform=ax.transAxes)
-velocity_text = ax.text(0.02, 0.90, '', transform=ax.transAxes)
-
-# Vectores de velocidad (quiver), etiquetas y vector de posición
-vectors = []
-labels = []
-
-# Función de inicialización
-def init():
-    trajectory_line.set_data([], [])
-    position_dot.set_data([], [])
-    time_text.set_text('')
-    velocity_text.set_text('')
-    # Limpiar los vectores y etiquetas
-    global vectors, labels
-    for vec in vectors:
-        vec.remove()
-    for lbl in labels:
-        lbl.remove()
-    vectors = []
-    labels = []
-    return trajectory_line, position_dot, time_text, velocity_text
-
-# Función de actualización para cada cuadro de la animación
-def update(frame):
-    t = t_vals[frame]
-    x = x_vals[frame]
-    y = y_vals[frame]
-    
-    # Actualizar la línea de trayectoria
-    trajectory_line.set_data(x_vals[:frame], y_vals[:frame])
-    
-    # Actualizar el punto de posición
-    position_dot.set_data([x], [y])
-    
-    # Calcular componentes de velocidad
-    vx = v0 * np.cos(angle_rad)  # Velocidad en x constante
-    vy = v0 * np.sin(angle_rad) - g * t  # Velocidad en y cambia con el tiempo
-    v = np.sqrt(vx**2 + vy**2)  # Magnitud de la velocidad resultante
-
-    # Actualizar los vectores de velocidad
-    global vectors, labels
-    for vec in vectors:
-        vec.remove()
-    for lbl in labels:
-        lbl.remove()
-    vectors = []
-    labels = []
-
-    # Vector de velocidad en x (rojo)
-    vector_vx = ax.quiver(x, y, vx, 0, angles='xy', scale_units='xy', scale=escala_vectores, color='red')
-    vectors.append(vector_vx)
-    label_vx = ax.text(x + vx * 0.1, y, 'v_x', color='red', fontsize=8)
-    labels.append(label_vx)
-
-    # Vector de velocidad en y (verde)
-    vector_vy = ax.quiver(x, y, 0, vy, angles='xy', scale_units='xy', scale=escala_vectores, color='green')
-    vectors.append(vector_vy)
-    label_vy = ax.text(x, y + vy * 0.1, 'v_y', color='green', fontsize=8)
-    labels.append(label_vy)
-
-    # Vector de velocidad resultante (negro)
-    vector_v = ax.quiver(x, y, vx, vy, angles='xy', scale_units='xy', scale=escala_vectores, color='black')
-    vectors.append(vector_v)
-    label_v = ax.text(x + vx * 0.1, y + vy * 0.1, 'v', color='black', fontsize=8)
-    labels.append(label_v)
-
-    # Vector de posición (azul)
-    vector_position = ax.quiver(0, 0, x, y, angles='xy', scale_units='xy', scale=1, color='pink')
-    vectors.append(vector_position)
-    label_position = ax.text(x / 2, y / 2, '  Posición', color='pink', fontsize=8)
-    labels.append(label_position)
-
-    # Actualizar el texto de tiempo y velocidad
-    time_text.set_text(f'Tiempo: {t:.2f} s')
-    velocity_text.set_text(f'Velocidad total: {v:.2f} m/s, Velocidad en x: {vx:.2f} m/s, Velocidad en y: {vy:.2f} m/s')
-    
-    return trajectory_line, position_dot, time_text, velocity_text, *vectors, *labels
-
-# Crear la animación
-ani = animation.FuncAnimation(fig, update, frames=len(t_vals), init_func=init, blit=True, interval=0.1, repeat=False)
-
-plt.legend(["Trayectoria"])
-
-# Conectar el evento de clic para mostrar vectores en puntos específicos
-def mostrar_vectores_en_punto(x, y, vx, vy):
-    global vectors, labels
-    # Limpiar los vectores y etiquetas anteriores
-    for vec in vectors:
-        vec.remove()
-    for lbl in labels:
-        lbl.remove()
-    vectors = []
-    labels = []
-
-    # Vector de velocidad en x (rojo)
-    vector_vx = ax.quiver(x, y, vx, 0, angles='xy', scale_units='xy', scale=escala_vectores, color='red')
-    vectors.append(vector_vx) 
-    label_vx = ax.text(x + vx * 0.1, y, 'v_x', color='red', fontsize=8)
-    labels.append(label_vx)
-
-    # Vector de velocidad en y (verde)
-    vector_vy = ax.quiver(x, y, 0, vy, angles='xy', scale_units='xy', scale=escala_vectores, color='green')
-    vectors.append(vector_vy)
-    label_vy = ax.text(x, y + vy * 0.1, 'v_y', color='green', fontsize=8)
-    labels.append(label_vy)
-
-    # Vector de velocidad resultante (negro)
-    vector_v = ax.quiver(x, y, vx, vy, angles='xy', scale_units='xy', scale=escala_vectores, color='black')
-    vectors.append(vector_v)
-    label_v = ax.text(x + vx * 0.1, y + vy * 0.1, 'v', color='black', fontsize=8)
-    labels.append(label_v)
-
-    # Vector de posición (azul)
-    vector_position = ax.quiver(0, 0, x, y, angles='xy', scale_units='xy', scale=1, color='pink')
-    vectors.append(vector_position)
-    label_position = ax.text(x / 2, y / 2, 'Posición', color='pink', fontsize=8)
-    labels.append(label_position)
-
-def on_click(event):
-    # Si el clic está fuera de los límites de la gráfica, no hacer nada
-    if event.xdata is None or event.ydata is None:
-        return
-
-    # Obtener la coordenada x del clic
-    x_click = event.xdata
-
-    # Encontrar el índice del punto más cercano en la trayectoria
-    index = (np.abs(x_vals - x_click)).argmin()
-
-    # Obtener las coordenadas (x, y) del punto más cercano
-    x = x_vals[index]
-    y = y_vals[index]
-    t = t_vals[index]
-
-    # Calcular componentes de velocidad en ese punto
-    vx = v0 * np.cos(angle_rad)  # Velocidad en x constante
-    vy = v0 * np.sin(angle_rad) - g * t  # Velocidad en y cambia con el tiempo
-
-    # Actualizar el punto de posición
-    position_dot.set_data([x], [y])
-
-    # Mostrar vectores en el punto seleccionado
-    mostrar_vectores_en_punto(x, y, vx, vy)
-
-    # Actualizar el texto de tiempo y velocidad
-    time_text.set_text(f'Tiempo: {t:.2f} s')
-    velocity_text.set_text(f'Velocidad total: {np.sqrt(vx**2 + vy**2):.2f} m/s, Velocidad en x: {vx:.2f} m/s, Velocidad en y: {vy:.2f} m/s')
-
-    plt.draw()
-
-# Conectar el evento de clic a la función on_click
-fig.canvas.mpl_connect('button_press_event', on_click)
-
-plt.show()
+escala_vectores = 10  # Escala de los vectores de velocidad (prueba distintos valores)
+
+
+class TrajectoryAnimation:
+    """Figura de la trayectoria con todos sus artistas creados una vez."""
+
+    def __init__(self, x_target, v0=v0, g=g, escala_vectores=escala_vectores, n_points=500, speed=1.0,
+                 overlay_high=False):
+        import matplotlib.pyplot as plt
+
+        solucion = ballistics.solve(x_target, v0, g)
+        if not solucion["reachable"]:
+            raise ValueError("El objetivo está fuera del alcance máximo para la velocidad inicial dada.")
+        self.x_target = x_target
+        self.v0 = v0
+        self.g = g
+        self.speed = speed
+        # Se usa el ángulo bajo (el de menor tiempo de vuelo)
+        self.angle_rad = float(solucion["theta_low"])
+        self.angulo_optimo = math.degrees(self.angle_rad)
+        self.theta_high = float(solucion["theta_high"])
+        self.t_vals, self.x_vals, self.y_vals = ballistics.trajectory(self.angle_rad, v0, n_points, g)
+        self.vx = v0 * math.cos(self.angle_rad)  # Velocidad en x constante
+        self.vy_vals = v0 * math.sin(self.angle_rad) - g * self.t_vals  # Velocidad en y cambia con el tiempo
+
+        # Configurar la figura de Matplotlib con eje x fijo de 0 a 100
+        self.fig, self.ax = plt.subplots(figsize=(10, 6))
+        ax = self.ax
+        ax.set_xlim(0, 100)  # Rango fijo de 0 a 100 en el eje x
+        ax.set_ylim(0, self.y_vals.max() * 1.5)
+        ax.set_xlabel("Distancia (m)")
+        ax.set_ylabel("Altura (m)")
+        ax.set_title(f"Trayectoria Parabólica (Ángulo = {self.angulo_optimo:.2f}°)")
+
+        # Elementos de la animación
+        self.trajectory_line, = ax.plot([], [], 'b-', lw=2, label="Trayectoria")  # Línea de trayectoria
+        self.position_dot, = ax.plot([], [], 'ro')  # Punto de la posición
+        self.picker = None
+        if overlay_high:
+            import trajectory_picker
+
+            _, x_high, y_high = ballistics.trajectory(self.theta_high, v0, n_points, g)
+            ax.plot(x_high, y_high, 'g--', lw=1, label=f"Ángulo alto ({math.degrees(self.theta_high):.2f}°)")
+            ax.set_ylim(0, y_high.max() * 1.1)
+            x_min, x_max = ax.get_xlim()
+            y_min, y_max = ax.get_ylim()
+            self.picker = trajectory_picker.TrajectoryPicker(
+                [self.angle_rad, self.theta_high], v0, g, scale=(x_max - x_min, y_max - y_min))
+        ax.legend(loc="upper right")
+
+        # Texto para mostrar datos
+        self.time_text = ax.text(0.02, 0.95, '', transform=ax.transAxes)
+        self.velocity_text = ax.text(0.02, 0.90, '', transform=ax.transAxes)
+
+        # Vectores de velocidad (quiver) y de posición, con sus etiquetas: se mueven en cada cuadro
+        def vector(color, scale):
+            return ax.quiver([0.0], [0.0], [0.0], [0.0], angles='xy', scale_units='xy', scale=scale, color=color)
+
+        self.vector_vx = vector('red', escala_vectores)
+        self.vector_vy = vector('green', escala_vectores)
+        self.vector_v = vector('black', escala_vectores)
+        self.vector_position = vector('pink', 1)
+        self.label_vx = ax.text(0, 0, 'v_x', color='red', fontsize=8)
+        self.label_vy = ax.text(0, 0, 'v_y', color='green', fontsize=8)
+        self.label_v = ax.text(0, 0, 'v', color='black', fontsize=8)
+        self.label_position = ax.text(0, 0, '  Posición', color='pink', fontsize=8)
+        self.artists = (self.trajectory_line, self.position_dot, self.time_text, self.velocity_text,
+                        self.vector_vx, self.vector_vy, self.vector_v, self.vector_position,
+                        self.label_vx, self.label_vy, self.label_v, self.label_position)
+        self.set_visible(False)
+
+        self.animation = None
+        self.dropped_frames = 0
+        self._start = None
+        self._last_index = -1
+
+    def set_visible(self, visible):
+        for artist in self.artists:
+            artist.set_visible(visible)
+
+    def draw_state(self, index, trail=True):
+        """Actualiza todos los artistas para la muestra ``index`` de la trayectoria."""
+        # Las vistas de los arreglos no copian datos
+        if trail:
+            self.trajectory_line.set_data(self.x_vals[:index + 1], self.y_vals[:index + 1])
+        return self.draw_point(self.t_vals[index], self.x_vals[index], self.y_vals[index],
+                               self.vx, self.vy_vals[index])
+
+    def draw_point(self, t, x, y, vx, vy):
+        """Mueve el punto, los vectores y los textos al estado dado."""
+        v = math.hypot(vx, vy)  # Magnitud de la velocidad resultante
+        self.position_dot.set_data([x], [y])
+
+        for quiver in (self.vector_vx, self.vector_vy, self.vector_v):
+            quiver.set_offsets((x, y))
+        self.vector_vx.set_UVC(vx, 0)
+        self.vector_vy.set_UVC(0, vy)
+        self.vector_v.set_UVC(vx, vy)
+        self.vector_position.set_UVC(x, y)
+
+        self.label_vx.set_position((x + vx * 0.1, y))
+        self.label_vy.set_position((x, y + vy * 0.1))
+        self.label_v.set_position((x + vx * 0.1, y + vy * 0.1))
+        self.label_position.set_position((x / 2, y / 2))
+
+        # Actualizar el texto de tiempo y velocidad
+        self.time_text.set_text(f'Tiempo: {t:.2f} s')
+        self.velocity_text.set_text(f'Velocidad total: {v:.2f} m/s, Velocidad en x: {vx:.2f} m/s, '
+                                    f'Velocidad en y: {vy:.2f} m/s')
+        self.set_visible(True)
+        return self.artists
+
+    def _init(self):
+        self.set_visible(False)
+        return self.artists
+
+    def _frames(self):
+        # Índice de la muestra que corresponde al tiempo real transcurrido: si el
+        # dibujo se atrasa, se saltean las muestras intermedias
+        self._start = time.perf_counter()
+        self._last_index = -1
+        last = len(self.t_vals) - 1
+        flight_time = self.t_vals[-1]
+        while self._last_index < last:
+            elapsed = (time.perf_counter() - self._start) * self.speed
+            index = int(np.searchsorted(self.t_vals, elapsed, side="right")) - 1
+            index = min(max(index, self._last_index + 1), last)
+            self.dropped_frames += index - self._last_index - 1
+            self._last_index = index
+            yield index
+            if elapsed > flight_time:
+                break
+
+    def show(self, fps=60):
+        import matplotlib.animation as animation
+        import matplotlib.pyplot as plt
+
+        self.animation = animation.FuncAnimation(
+            self.fig, self.draw_state, frames=self._frames, init_func=self._init, blit=True,
+            interval=1000 / fps, repeat=False, cache_frame_data=False)
+        # Conectar el evento de clic para mostrar vectores en puntos específicos
+        self.fig.canvas.mpl_connect('button_press_event', self.on_click)
+        plt.show()
+
+    def inspect(self, x, y=None):
+        """Estado exacto en la abscisa ``x``, o en el punto más cercano a ``(x, y)`` si hay dos curvas.
+
+        Devuelve un diccionario con ``curve`` (0 = ángulo bajo), ``t``, ``x``, ``y``, ``vx`` y ``vy``.
+        """
+        if self.picker is not None and y is not None:
+            return self.picker.nearest(x, y)
+        x = min(max(x, 0.0), float(self.x_vals[-1]))
+        t, y, vx, vy = ballistics.state_at_x(x, self.angle_rad, self.v0, self.g)
+        return {"curve": 0, "t": float(t), "x": x, "y": float(y), "vx": float(vx), "vy": float(vy)}
+
+    def on_click(self, event):
+        # Si el clic está fuera de los límites de la gráfica, no hacer nada
+        if event.xdata is None or event.ydata is None:
+            return
+        state = self.inspect(event.xdata, event.ydata)
+        if state["curve"] == 0:
+            # x crece con el tiempo: el tramo recorrido se ubica con búsqueda binaria
+            index = int(np.searchsorted(self.x_vals, state["x"], side="right"))
+            self.trajectory_line.set_data(self.x_vals[:index], self.y_vals[:index])
+        self.draw_point(state["t"], state["x"], state["y"], state["vx"], state["vy"])
+        self.fig.canvas.draw_idle()
+
+    def frame_indices(self, fps):
+        """Muestras de un video a ``fps`` cuadros por segundo en tiempo real (con ``speed``)."""
+        duration = self.t_vals[-1] / self.speed
+        n_frames = max(int(math.ceil(duration * fps)) + 1, 2)
+        times = np.linspace(0.0, self.t_vals[-1], n_frames)
+        return np.minimum(np.searchsorted(self.t_vals, times), len(self.t_vals) - 1)
+
+    def render(self, output, fps=30):
+        """Genera un video (.mp4/.gif) o una carpeta de PNG; devuelve la cantidad de cuadros."""
+        indices = self.frame_indices(fps)
+        if os.path.splitext(output)[1].lower() in (".mp4", ".gif"):
+            import matplotlib.animation as animation
+
+            if output.lower().endswith(".gif"):
+                writer = animation.PillowWriter(fps=fps)
+            else:
+                writer = animation.FFMpegWriter(fps=fps)
+            with writer.saving(self.fig, output, dpi=self.fig.dpi):
+                for index in indices:
+                    self.draw_state(index)
+                    writer.grab_frame()
+        else:
+            os.makedirs(output, exist_ok=True)
+            for i, index in enumerate(indices):
+                self.draw_state(index)
+                self.fig.savefig(os.path.join(output, f"cuadro_{i:05d}.png"))
+        return len(indices)
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Animación del tiro parabólico")
+    parser.add_argument("--distancia", type=float, default=None,
+                        help="Distancia objetivo (m); si no se da, se mide con el sensor")
+    parser.add_argument("--prueba", action="store_true", help="Simular el sensor de distancia")
+    parser.add_argument("--puerto", default=None, help="Puerto serie del sensor")
+    parser.add_argument("--v0", type=float, default=v0, help="Velocidad inicial (m/s)")
+    parser.add_argument("--velocidad-reproduccion", type=float, default=1.0, dest="speed",
+                        help="1 = tiempo real; 0.5 = cámara lenta")
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--muestras", type=int, default=500, help="Puntos de la trayectoria")
+    parser.add_argument("--ambos", action="store_true", help="Superponer la trayectoria del ángulo alto")
+    parser.add_argument("--headless", metavar="SALIDA", default=None,
+                        help="Sin ventana: video (.mp4/.gif) o carpeta de cuadros PNG")
+    args = parser.parse_args(argv)
+
+    if args.headless:
+        import matplotlib
+        matplotlib.use("Agg")
+
+    if args.distancia is None:
+        import Angulo_search
+
+        kwargs = {"port": args.puerto} if args.puerto else {}
+        x_target = Angulo_search.buscar_distancia(prueba=args.prueba, **kwargs)
+        if x_target is None:
+            print("No se pudo leer la distancia del sensor")
+            sys.exit(1)
+    else:
+        x_target = args.distancia
+    print(f"Distancia: {x_target} ")
+
+    try:
+        anim = TrajectoryAnimation(x_target, args.v0, n_points=args.muestras, speed=args.speed,
+                                   overlay_high=args.ambos)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+    # Mostrar resultados del debug
+    print(f"El ángulo óptimo para que la altura en x = {x_target} sea 0 es aproximadamente: {anim.angulo_optimo:.2f}°")
+    print(f"Ángulo alto alternativo: {math.degrees(anim.theta_high):.2f}°")
+    tan_theta = math.tan(anim.angle_rad)
+    cos_theta_squared = math.cos(anim.angle_rad) ** 2
+    # Mostrar la ecuación de la parábola en la terminal
+    print(f"Ecuación de la parábola: y = {tan_theta:.3f} * x - ({g / (2 * args.v0**2 * cos_theta_squared):.3f}) * x^2")
+
+    if args.headless:
+        start = time.perf_counter()
+        frames = anim.render(args.headless, fps=args.fps)
+        elapsed = time.perf_counter() - start
+        print(f"{frames} cuadros en {elapsed:.2f} s ({frames / elapsed:.1f} cuadros/s) -> {args.headless}")
+    else:
+        anim.show(fps=args.fps)
+        if anim.dropped_frames:
+            print(f"Cuadros salteados para mantener el tiempo real: {anim.dropped_frames}")
+
+
+if __name__ == "__main__":
+    main()
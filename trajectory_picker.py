@@ -0,0 +1,75 @@
+"""Punto más cercano a un clic entre varias trayectorias parabólicas superpuestas.
+
+Las trayectorias se muestrean una vez y sus puntos van a un KD-tree
+(``scipy.spatial.cKDTree``), así cada consulta es O(log n) sin importar
+cuántas curvas ni cuántas muestras haya. El punto del árbol solo elige la
+curva y el tramo: el punto final se refina con Newton sobre la ecuación de
+la parábola, de modo que el estado devuelto (tiempo, posición y velocidad)
+es exacto y no depende de la densidad del muestreo.
+
+Las distancias se miden en unidades de pantalla: ``scale`` es el tamaño de
+los ejes (ancho y alto en metros) para que un metro en x y uno en y pesen
+lo que se ven en la figura.
+
+    picker = TrajectoryPicker([theta_bajo, theta_alto], [25, 25], scale=(100, 30))
+    estado = picker.nearest(12.0, 3.5)   # curve, t, x, y, vx, vy, distance
+"""
+import numpy as np
+from scipy.spatial import cKDTree
+
+import ballistics
+
+# Muestras por curva para el árbol; el refinamiento analítico hace innecesario más
+TREE_POINTS = 2048
+NEWTON_ITERATIONS = 4
+
+
+class TrajectoryPicker:
+    """KD-tree sobre varias trayectorias ``(theta, v0)``."""
+
+    def __init__(self, thetas, v0s, g=ballistics.G, scale=(1.0, 1.0), n_points=TREE_POINTS):
+        self.thetas, self.v0s = np.broadcast_arrays(np.atleast_1d(np.asarray(thetas, dtype=np.float64)),
+                                                    np.atleast_1d(np.asarray(v0s, dtype=np.float64)))
+        self.g = g
+        self.n_points = n_points
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.vx = self.v0s * np.cos(self.thetas)
+        self.vy0 = self.v0s * np.sin(self.thetas)
+        self.t, x, y = ballistics.trajectory(self.thetas, self.v0s, n_points, g)
+        points = np.stack([x.ravel() / self.scale[0], y.ravel() / self.scale[1]], axis=1)
+        self._tree = cKDTree(points)
+
+    def __len__(self):
+        return len(self.thetas)
+
+    def nearest(self, x, y):
+        """Estado exacto del punto más cercano a ``(x, y)`` entre todas las curvas."""
+        _, flat = self._tree.query((x / self.scale[0], y / self.scale[1]))
+        curve, sample = divmod(int(flat), self.n_points)
+        times = self.t[curve]
+        # El mínimo está entre las muestras vecinas; Newton sobre la distancia al cuadrado
+        lo = times[max(sample - 1, 0)]
+        hi = times[min(sample + 1, self.n_points - 1)]
+        t = times[sample]
+        vx, vy0, g = self.vx[curve], self.vy0[curve], self.g
+        sx2, sy2 = self.scale[0] ** 2, self.scale[1] ** 2
+        for _ in range(NEWTON_ITERATIONS):
+            dx = vx * t - x
+            dy = vy0 * t - 0.5 * g * t * t - y
+            vy = vy0 - g * t
+            slope = dx * vx / sx2 + dy * vy / sy2
+            curvature = vx * vx / sx2 + (vy * vy - g * dy) / sy2
+            if curvature <= 0:
+                break
+            t = min(max(t - slope / curvature, lo), hi)
+        px = vx * t
+        py = vy0 * t - 0.5 * g * t * t
+        return {
+            "curve": curve,
+            "t": float(t),
+            "x": float(px),
+            "y": float(py),
+            "vx": float(vx),
+            "vy": float(vy0 - g * t),
+            "distance": float(np.hypot((px - x) / self.scale[0], (py - y) / self.scale[1])),
+        }
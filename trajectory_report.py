@@ -0,0 +1,225 @@
+"""Reporte de trayectorias en lote, sin ventana, para muchas posiciones de plantas.
+
+Lee un CSV de objetivos, los resuelve todos juntos con ``ballistics.solve`` y
+dibuja un gráfico por objetivo en paralelo (un proceso por núcleo, backend
+Agg). La salida es un PNG o SVG por objetivo, o un único PDF de varias
+páginas, más ``resumen.csv`` con ángulos, tiempos de vuelo y alturas.
+
+El CSV necesita una columna ``distancia`` (m); ``id`` y ``v0`` (m/s) son
+opcionales (sin ``id`` se numeran las filas, sin ``v0`` se usa ``--v0``):
+
+    id,distancia,v0
+    planta-01,12.5,25
+    planta-02,18.0,
+
+    python trajectory_report.py objetivos.csv --salida reporte --formato png
+    python trajectory_report.py objetivos.csv --salida reporte.pdf --procesos 4
+"""
+import argparse
+import csv
+import io
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import ballistics
+
+FORMATS = ("png", "svg", "pdf")
+SUMMARY_COLUMNS = ("id", "distancia", "v0", "alcanzable", "angulo_bajo", "angulo_alto",
+                   "tiempo_bajo", "tiempo_alto", "altura_bajo", "altura_alto")
+
+
+def read_targets(path, default_v0=25.0):
+    """``(ids, distancias, velocidades)`` del CSV de objetivos."""
+    ids, distances, velocities = [], [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None or "distancia" not in reader.fieldnames:
+            raise ValueError(f"{path}: falta la columna 'distancia'")
+        for row_number, row in enumerate(reader, start=1):
+            ids.append((row.get("id") or "").strip() or str(row_number))
+            distances.append(float(row["distancia"]))
+            v0 = (row.get("v0") or "").strip()
+            velocities.append(float(v0) if v0 else default_v0)
+    return ids, np.array(distances, dtype=np.float64), np.array(velocities, dtype=np.float64)
+
+
+def summarize(ids, distances, velocities, g=ballistics.G):
+    """Resuelve todos los objetivos de una vez; devuelve una fila (dict) por objetivo."""
+    solution = ballistics.solve(distances, velocities, g)
+    degrees = {branch: np.degrees(solution[f"theta_{branch}"]) for branch in ("low", "high")}
+    rows = []
+    for i, target_id in enumerate(ids):
+        rows.append({
+            "id": target_id,
+            "distancia": float(distances[i]),
+            "v0": float(velocities[i]),
+            "alcanzable": bool(solution["reachable"][i]),
+            "angulo_bajo": float(degrees["low"][i]),
+            "angulo_alto": float(degrees["high"][i]),
+            "tiempo_bajo": float(solution["flight_time_low"][i]),
+            "tiempo_alto": float(solution["flight_time_high"][i]),
+            "altura_bajo": float(solution["apex_low"][i]),
+            "altura_alto": float(solution["apex_high"][i]),
+        })
+    return rows
+
+
+def write_summary(rows, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: (f"{value:.4f}" if isinstance(value, float) else value)
+                             for key, value in row.items()})
+
+
+def format_summary(rows):
+    """Tabla de texto con los ángulos y tiempos de vuelo."""
+    lines = [f"{'id':>12s} {'dist (m)':>9s} {'v0 (m/s)':>9s} {'θ bajo':>8s} {'θ alto':>8s} "
+             f"{'t bajo (s)':>10s} {'t alto (s)':>10s}"]
+    for row in rows:
+        if not row["alcanzable"]:
+            lines.append(f"{row['id']:>12.12s} {row['distancia']:9.2f} {row['v0']:9.2f}   fuera de alcance")
+            continue
+        lines.append(f"{row['id']:>12.12s} {row['distancia']:9.2f} {row['v0']:9.2f} "
+                     f"{row['angulo_bajo']:7.2f}° {row['angulo_alto']:7.2f}° "
+                     f"{row['tiempo_bajo']:10.3f} {row['tiempo_alto']:10.3f}")
+    return "\n".join(lines)
+
+
+def _init_worker():
+    # Cada proceso dibuja sin ventana
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def render_target(row, fmt="png", dpi=100, g=ballistics.G, n_points=200):
+    """Gráfico de un objetivo (ambos ángulos) como bytes en el formato pedido."""
+    # Figure sin pyplot: no hay estado global que compartir ni ventanas que cerrar
+    from matplotlib.figure import Figure
+
+    v0 = row["v0"]
+    theta = np.radians([row["angulo_bajo"], row["angulo_alto"]])
+    _, x, y = ballistics.trajectory(theta, v0, n_points, g)
+
+    fig = Figure(figsize=(8, 5))
+    ax = fig.add_subplot()
+    ax.plot(x[0], y[0], 'b-', lw=2, label=f"θ bajo = {row['angulo_bajo']:.2f}° (t = {row['tiempo_bajo']:.2f} s)")
+    ax.plot(x[1], y[1], 'g--', lw=1.5, label=f"θ alto = {row['angulo_alto']:.2f}° (t = {row['tiempo_alto']:.2f} s)")
+    ax.plot([row["distancia"]], [0], 'rx', ms=10, mew=2, label="Objetivo")
+    ax.set_xlim(0, max(row["distancia"] * 1.1, 1.0))
+    ax.set_ylim(0, max(row["altura_alto"] * 1.1, 1.0))
+    ax.set_xlabel("Distancia (m)")
+    ax.set_ylabel("Altura (m)")
+    ax.set_title(f"{row['id']}: distancia {row['distancia']:.2f} m, v0 {v0:.2f} m/s")
+    ax.legend(loc="upper right")
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=dpi)
+    return buffer.getvalue()
+
+
+def _render_task(task):
+    row, fmt, dpi, g = task
+    return row["id"], render_target(row, fmt, dpi, g)
+
+
+def _file_name(target_id):
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in target_id)
+
+
+def render_all(rows, output, fmt="png", processes=None, dpi=100, g=ballistics.G, progress=None):
+    """Dibuja los objetivos alcanzables en paralelo; devuelve la cantidad de gráficos.
+
+    Con ``fmt="pdf"`` cada proceso rasteriza sus páginas y el proceso principal
+    las une en ``output`` (un solo PDF); si no, ``output`` es un directorio con
+    un archivo por objetivo. ``progress(hechos, total)`` se llama tras cada gráfico.
+    """
+    reachable = [row for row in rows if row["alcanzable"]]
+    # Las páginas del PDF se arman como imágenes con Pillow (ya lo requiere matplotlib)
+    task_format = "png" if fmt == "pdf" else fmt
+    tasks = [(row, task_format, dpi, g) for row in reachable]
+    chunksize = max(1, len(tasks) // (4 * (processes or os.cpu_count() or 1)))
+    pages = []
+    if fmt != "pdf":
+        os.makedirs(output, exist_ok=True)
+
+    with ProcessPoolExecutor(processes, initializer=_init_worker) as pool:
+        for done, (target_id, data) in enumerate(pool.map(_render_task, tasks, chunksize=chunksize), start=1):
+            if fmt == "pdf":
+                pages.append(data)
+            else:
+                with open(os.path.join(output, f"{_file_name(target_id)}.{fmt}"), "wb") as f:
+                    f.write(data)
+            if progress is not None:
+                progress(done, len(tasks))
+
+    if fmt == "pdf" and pages:
+        from PIL import Image
+
+        images = [Image.open(io.BytesIO(page)).convert("RGB") for page in pages]
+        images[0].save(output, format="PDF", save_all=True, append_images=images[1:], resolution=dpi)
+    return len(tasks)
+
+
+class Progress:
+    """Progreso en una sola línea de stderr, como mucho cada ``every`` segundos."""
+
+    def __init__(self, every=0.5):
+        self.every = every
+        self.start = time.perf_counter()
+        self._last = 0.0
+
+    def __call__(self, done, total):
+        now = time.perf_counter()
+        if done < total and now - self._last < self.every:
+            return
+        self._last = now
+        rate = done / max(now - self.start, 1e-9)
+        eta = (total - done) / rate if rate else math.inf
+        print(f"\r{done}/{total} gráficos ({rate:.1f}/s, faltan {eta:.0f} s)", end="", file=sys.stderr)
+        if done == total:
+            print(file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reporte de trayectorias en lote")
+    parser.add_argument("objetivos", help="CSV con columnas distancia[, id, v0]")
+    parser.add_argument("--salida", default="reporte",
+                        help="Directorio (png/svg) o archivo .pdf")
+    parser.add_argument("--formato", choices=FORMATS, default=None,
+                        help="Por defecto pdf si --salida termina en .pdf, si no png")
+    parser.add_argument("--v0", type=float, default=25.0, help="Velocidad inicial si el CSV no la trae (m/s)")
+    parser.add_argument("--g", type=float, default=ballistics.G)
+    parser.add_argument("--procesos", type=int, default=None, help="Por defecto, uno por núcleo")
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--silencioso", action="store_true", help="Sin progreso ni tabla en la terminal")
+    args = parser.parse_args()
+
+    fmt = args.formato or ("pdf" if args.salida.lower().endswith(".pdf") else "png")
+    ids, distances, velocities = read_targets(args.objetivos, args.v0)
+    rows = summarize(ids, distances, velocities, args.g)
+
+    summary_dir = os.path.dirname(os.path.abspath(args.salida)) if fmt == "pdf" else args.salida
+    os.makedirs(summary_dir, exist_ok=True)
+    summary_path = os.path.join(summary_dir, "resumen.csv")
+    write_summary(rows, summary_path)
+
+    start = time.perf_counter()
+    count = render_all(rows, args.salida, fmt, args.procesos, args.dpi, args.g,
+                       progress=None if args.silencioso else Progress())
+    elapsed = time.perf_counter() - start
+
+    if not args.silencioso:
+        print(format_summary(rows))
+    unreachable = len(rows) - count
+    print(f"{count} gráficos en {elapsed:.2f} s ({count / max(elapsed, 1e-9):.1f}/s) -> {args.salida}; "
+          f"resumen en {summary_path}" + (f"; {unreachable} fuera de alcance" if unreachable else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""Protocolo binario versionado de los nodos, junto al CSV de siempre.
+
+Cada trama es little-endian y lleva su propio largo y esquema::
+
+    byte  tamaño  campo
+    0     2       MAGIC (A5 5A)
+    2     2       largo total de la trama (encabezado + campos)
+    4     1       versión del protocolo (VERSION)
+    5     1       esquema: clave de ``sensor_schema.WIRE_SCHEMAS``
+    6     16      identificador del nodo (ASCII, relleno con ceros; vacío = el de la conexión)
+    22    4       número de secuencia (uint32, por nodo)
+    26    8       hora del dispositivo en ms (uint64)
+    34    4·n     campos float32 en el orden del esquema
+
+Los campos se ubican por nombre en ``SENSOR_COLUMNS``, no por posición, así
+un nodo con otro orden o con sensores de menos declara su esquema y sus
+columnas no se confunden. Las columnas que el esquema no trae llegan en
+``nan``; ``declared`` informa qué columnas manda cada nodo para que el
+almacén no las confunda con sensores que fallan.
+
+``ProtocolFramer`` decide el protocolo de cada conexión con el primer byte
+(ningún mensaje CSV empieza con 0xA5): los nodos que mandan CSV siguen
+funcionando sin cambios. ``BinaryFramer`` decodifica de una sola vez, con
+``np.frombuffer`` y un dtype estructurado, cada tramo de tramas consecutivas
+del mismo esquema.
+"""
+import logging
+
+import numpy as np
+
+import metrics
+from framing import LineFramer, frame_stats
+from sensor_schema import SENSOR_COLUMNS, WIRE_SCHEMAS
+
+log = logging.getLogger(__name__)
+_malformed_log_sampler = metrics.Sampler(100)
+
+MAGIC = b"\xa5\x5a"
+VERSION = 1
+NODE_ID_BYTES = 16
+HEADER_DTYPE = np.dtype([
+    ("magic", "<u2"), ("length", "<u2"), ("version", "u1"), ("schema", "u1"),
+    ("node", f"S{NODE_ID_BYTES}"), ("seq", "<u4"), ("device_ms", "<u8"),
+])
+HEADER_SIZE = HEADER_DTYPE.itemsize
+_MAGIC_VALUE = int.from_bytes(MAGIC, "little")
+
+SEQUENCE_GAPS = metrics.counter("sensor_sequence_gaps_total", "Tramas binarias perdidas según la secuencia")
+_connections = {protocol: metrics.counter("sensor_connections_total", "Conexiones recibidas por protocolo",
+                                          labels={"protocol": protocol}) for protocol in ("csv", "binario")}
+
+
+def frame_dtype(schema):
+    """dtype de una trama completa con el esquema ``schema`` (``KeyError`` si no existe)."""
+    fields = WIRE_SCHEMAS[schema]
+    return np.dtype(HEADER_DTYPE.descr + [("fields", "<f4", (len(fields),))])
+
+
+_DTYPES = {(VERSION, schema): frame_dtype(schema) for schema in WIRE_SCHEMAS}
+# Por esquema: posiciones en la trama y columnas de SENSOR_COLUMNS a las que van
+_MAPPINGS = {}
+for _schema, _fields in WIRE_SCHEMAS.items():
+    _pairs = [(i, SENSOR_COLUMNS.index(name)) for i, name in enumerate(_fields) if name in SENSOR_COLUMNS]
+    _MAPPINGS[_schema] = (np.array([i for i, _ in _pairs]), np.array([j for _, j in _pairs]))
+# Por esquema: columnas de SENSOR_COLUMNS que trae, en el orden de SENSOR_COLUMNS
+SCHEMA_COLUMNS = {schema: tuple(name for name in SENSOR_COLUMNS if name in fields)
+                  for schema, fields in WIRE_SCHEMAS.items()}
+
+
+def encode_frames(values, node_ids=None, seq=0, device_ms=0, schema=1):
+    """Tramas (bytes) con una fila de ``values`` cada una, en el orden de campos de ``schema``."""
+    values = np.asarray(values, dtype=np.float32)
+    frames = np.zeros(len(values), dtype=_DTYPES[(VERSION, schema)])
+    frames["magic"] = _MAGIC_VALUE
+    frames["length"] = frames.dtype.itemsize
+    frames["version"] = VERSION
+    frames["schema"] = schema
+    if node_ids is not None:
+        frames["node"] = [str(node_id).encode("ascii") for node_id in node_ids]
+    frames["seq"] = seq
+    frames["device_ms"] = device_ms
+    frames["fields"] = values
+    return frames.tobytes()
+
+
+def to_columns(schema, fields):
+    """Reordena los campos de un esquema en las columnas de ``SENSOR_COLUMNS``."""
+    source, target = _MAPPINGS[schema]
+    values = np.full((len(fields), len(SENSOR_COLUMNS)), np.nan)
+    values[:, target] = fields[:, source]
+    return values
+
+
+class BinaryFramer:
+    """Framing de tramas binarias para una conexión, con la misma interfaz que ``LineFramer``.
+
+    ``malformed`` cuenta las tramas de versión o esquema desconocidos (se saltan
+    por su largo), ``dropped`` los bytes basura salteados para volver a
+    sincronizar con ``MAGIC`` y ``gaps`` las tramas perdidas según la secuencia.
+    ``declared`` devuelve los nodos que empezaron a usar otro esquema.
+    """
+
+    def __init__(self, stats=frame_stats):
+        self.stats = stats
+        self.frames = 0
+        self.malformed = 0
+        self.dropped = 0
+        self.gaps = 0
+        self._pending = b""
+        self._codes = {}
+        self._names = np.empty(0, dtype=object)
+        self._last_seq = np.empty(0, dtype=np.int64)
+        self._schemas = np.empty(0, dtype=np.int64)
+        self._declared = {}
+        self._has_ids = False
+
+    def feed(self, data):
+        """Agrega bytes recibidos y devuelve ``(node_ids, values)`` de las tramas completas."""
+        buffer = self._pending + data
+        runs = []
+        offset = 0
+        malformed = 0
+        dropped = 0
+        while len(buffer) - offset >= HEADER_SIZE:
+            if buffer[offset:offset + 2] != MAGIC:
+                # Basura: se busca la próxima trama
+                found = buffer.find(MAGIC, offset + 1)
+                dropped += 1
+                if found < 0:
+                    # El último byte puede ser el comienzo de la próxima trama
+                    offset = len(buffer) - 1 if buffer.endswith(MAGIC[:1]) else len(buffer)
+                    break
+                offset = found
+                continue
+            length = int.from_bytes(buffer[offset + 2:offset + 4], "little")
+            dtype = _DTYPES.get((buffer[offset + 4], buffer[offset + 5]))
+            if dtype is None or length != dtype.itemsize:
+                if length < HEADER_SIZE:
+                    dropped += 1
+                    offset += 2
+                    continue
+                if len(buffer) - offset < length:
+                    break
+                malformed += 1
+                if _malformed_log_sampler.sample():
+                    log.warning("Trama binaria descartada: versión %d, esquema %d, largo %d",
+                                buffer[offset + 4], buffer[offset + 5], length)
+                offset += length
+                continue
+            count = (len(buffer) - offset) // length
+            if count == 0:
+                break
+            # Tramo de tramas iguales: se decodifica entero y se corta en la primera distinta
+            frames = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+            same = ((frames["magic"] == _MAGIC_VALUE) & (frames["length"] == length)
+                    & (frames["version"] == VERSION) & (frames["schema"] == buffer[offset + 5]))
+            n = count if same.all() else int(same.argmin())
+            runs.append((buffer[offset + 5], frames[:n]))
+            offset += n * length
+        self._pending = buffer[offset:]
+        return self._decode(runs, malformed, dropped)
+
+    def flush(self):
+        """Al cerrarse la conexión, una trama incompleta se descarta."""
+        dropped = 1 if self._pending else 0
+        self._pending = b""
+        return self._decode([], 0, dropped)
+
+    def declared(self):
+        """``(nodo, columnas)`` de los nodos que cambiaron de esquema desde la llamada anterior.
+
+        ``nodo`` es ``None`` para las tramas sin identificador (el nodo de la conexión).
+        """
+        declared, self._declared = self._declared, {}
+        return list(declared.items())
+
+    def _decode(self, runs, malformed, dropped):
+        codes = []
+        values = []
+        for schema, frames in runs:
+            run_codes = self._node_codes(frames["node"])
+            changed = np.unique(run_codes[self._schemas[run_codes] != schema])
+            if len(changed):
+                self._schemas[changed] = schema
+                for code in changed:
+                    self._declared[self._names[code]] = SCHEMA_COLUMNS[schema]
+            codes.append(run_codes)
+            values.append(to_columns(schema, frames["fields"].astype(np.float64)))
+        n = sum(len(v) for v in values)
+        if n:
+            codes = np.concatenate(codes)
+            self._count_gaps(codes, np.concatenate([frames["seq"] for _, frames in runs]))
+        self.frames += n
+        self.malformed += malformed
+        self.dropped += dropped
+        if self.stats is not None and (n or malformed or dropped):
+            self.stats.add(n, malformed, dropped)
+        if not n:
+            return None, np.empty((0, len(SENSOR_COLUMNS)))
+        return (self._names[codes] if self._has_ids else None), np.concatenate(values)
+
+    def _node_codes(self, nodes):
+        # Un código entero por nodo de la conexión; el nombre se decodifica una sola vez
+        codes = self._codes
+        result = np.empty(len(nodes), dtype=np.intp)
+        for i, node in enumerate(nodes.tolist()):
+            code = codes.get(node)
+            if code is None:
+                code = codes[node] = len(codes)
+                name = node.decode("ascii", errors="replace") or None
+                self._has_ids = self._has_ids or name is not None
+                self._names = np.append(self._names, np.array([name], dtype=object))
+                self._last_seq = np.append(self._last_seq, -1)
+                self._schemas = np.append(self._schemas, -1)
+            result[i] = code
+        return result
+
+    def _count_gaps(self, codes, seq):
+        # Saltos de secuencia por nodo, para todas las tramas del bloque a la vez
+        order = np.argsort(codes, kind="stable")
+        codes = codes[order]
+        seq = seq[order].astype(np.int64)
+        change = codes[1:] != codes[:-1]
+        first = np.ones(len(codes), dtype=bool)
+        first[1:] = change
+        last = np.ones(len(codes), dtype=bool)
+        last[:-1] = change
+        previous = np.empty_like(seq)
+        previous[1:] = seq[:-1]
+        previous[first] = self._last_seq[codes[first]]
+        # Diferencias en aritmética de 32 bits (la secuencia da la vuelta); los
+        # saltos hacia atrás (reinicio del nodo) no cuentan como pérdidas
+        step = (seq - previous) % 2**32
+        gaps = int(np.where((previous >= 0) & (step > 1) & (step < 2**31), step - 1, 0).sum())
+        self._last_seq[codes[last]] = seq[last]
+        if gaps:
+            self.gaps += gaps
+            SEQUENCE_GAPS.inc(gaps)
+
+
+class ProtocolFramer:
+    """Framer de una conexión: binario si el primer byte es el de ``MAGIC``, CSV si no."""
+
+    def __init__(self, stats=frame_stats):
+        self.stats = stats
+        self.framer = None
+
+    @property
+    def protocol(self):
+        if self.framer is None:
+            return None
+        return "binario" if isinstance(self.framer, BinaryFramer) else "csv"
+
+    def feed(self, data):
+        if self.framer is None:
+            if not data:
+                return None, np.empty((0, len(SENSOR_COLUMNS)))
+            binary = data[:1] == MAGIC[:1]
+            self.framer = BinaryFramer(self.stats) if binary else LineFramer(stats=self.stats)
+            _connections[self.protocol].inc()
+        return self.framer.feed(data)
+
+    def flush(self):
+        if self.framer is None:
+            return None, np.empty((0, len(SENSOR_COLUMNS)))
+        return self.framer.flush()
+
+    def declared(self):
+        """Esquemas nuevos de la conexión (``BinaryFramer.declared``); el CSV trae todas las columnas."""
+        if not isinstance(self.framer, BinaryFramer):
+            return []
+        return self.framer.declared()